@@ -3,33 +3,59 @@ import os
 import logging
 import time
 import asyncio
-from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 
+from config import config
 from security.secret_provider import get_secret
 
+try:
+    import httpx
+    from openai import AsyncAzureOpenAI, APIError, APIConnectionError, RateLimitError
+except ImportError:  # Only the mock client is available
+    AsyncAzureOpenAI = None
+
 USE_MOCK = None  # Will be determined asynchronously
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-# Global client instance - will be initialized asynchronously
-_client: Optional['AzureOpenAI'] = None
+# Connection settings - resolved asynchronously on first use
+_settings: Optional[Dict[str, str]] = None
 _model: Optional[str] = None
 _client_initialized = False
+# Client and connection pool per event loop, shared by every LLMClient on it
+_pools: Dict[asyncio.AbstractEventLoop, '_ClientPool'] = {}
+# Request rate limit shared by every pool in the process
+_limiter: Optional['TokenBucket'] = None
+
+# Sampling temperature for analysis and recommendation calls
+TEMPERATURE = 0.2
+
+MOCK_RESPONSE = (
+    "Findings:\n"
+    "- [high] Identity: MFA not enforced for admins.\n"
+    "- [medium] Data: No DLP policies for M365.\n"
+    "- [low] SecOps: Runbooks missing for P1 incidents.\n"
+    "\nRecommendations:\n"
+    "1) Enforce Conditional Access + MFA for privileged roles (P1, M effort, 4 weeks)\n"
+    "2) Deploy baseline DLP policies for M365 (P2, M effort, 6 weeks)\n"
+    "3) Author incident runbooks and test (P3, S effort, 3 weeks)\n"
+)
 
 async def _initialize_client(correlation_id: Optional[str] = None) -> bool:
-    """Initialize OpenAI client with secret provider"""
-    global _client, _model, USE_MOCK, _client_initialized
-    
+    """Resolve OpenAI connection settings with secret provider"""
+    global _settings, _model, USE_MOCK, _client_initialized
+
     if _client_initialized:
         return not USE_MOCK
-    
+
     try:
         # Get secrets using secret provider
         endpoint = await get_secret("azure-openai-endpoint", correlation_id)
         api_key = await get_secret("azure-openai-api-key", correlation_id)
         deployment = await get_secret("azure-openai-deployment", correlation_id)
-        
+
         # Fallback to environment variables for local development
         if not endpoint:
             endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
@@ -37,18 +63,19 @@ async def _initialize_client(correlation_id: Optional[str] = None) -> bool:
             api_key = os.getenv("AZURE_OPENAI_API_KEY")
         if not deployment:
             deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-        
+
         USE_MOCK = not (endpoint and api_key and deployment)
-        
+
         if not USE_MOCK:
-            from openai import AzureOpenAI, APIError, APIConnectionError, RateLimitError
-            _client = AzureOpenAI(
-                api_key=api_key,
-                api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01"),
-                azure_endpoint=endpoint,
-            )
+            if AsyncAzureOpenAI is None:
+                raise ImportError("openai and httpx are required for Azure OpenAI")
+            _settings = {
+                "api_key": api_key,
+                "api_version": os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01"),
+                "azure_endpoint": endpoint,
+            }
             _model = deployment
-            
+
             logger.info(
                 "Initialized OpenAI client with secret provider",
                 extra={"correlation_id": correlation_id, "endpoint": endpoint}
@@ -58,10 +85,10 @@ async def _initialize_client(correlation_id: Optional[str] = None) -> bool:
                 "Using mock LLM client - secrets not available",
                 extra={"correlation_id": correlation_id}
             )
-        
+
         _client_initialized = True
         return not USE_MOCK
-        
+
     except (ImportError, ModuleNotFoundError) as e:
         logger.error(f"Failed to import OpenAI client: {e}", exc_info=True)
         USE_MOCK = True
@@ -82,92 +109,257 @@ class LLMError(Exception):
     """Custom exception for LLM-related errors"""
     pass
 
+class TokenBucket:
+    """
+    Token bucket limiting requests per minute (0 = unlimited)
+
+    Up to ten seconds' worth of requests may go out in a burst. pause() holds
+    every request back until a server-requested Retry-After has passed, so
+    one 429 slows all callers instead of each finding out on its own.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, burst: Optional[float] = None):
+        self.rate = requests_per_minute / 60
+        self.capacity = burst if burst is not None else max(1.0, self.rate * 10)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            if self.rate <= 0:
+                return
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class _ClientPool:
+    """AsyncAzureOpenAI client with its connection pool and concurrency limit"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, limiter: TokenBucket):
+        settings = config.azure_openai
+        self.loop = loop
+        self.limiter = limiter
+        self.slots = asyncio.Semaphore(max(1, settings.max_concurrent_requests))
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_connections,
+            ),
+            timeout=httpx.Timeout(settings.request_timeout_seconds, connect=10.0),
+        )
+        # Retries are ours, so back-off never blocks and honours the limiter
+        self.client = AsyncAzureOpenAI(**_settings, http_client=self.http_client, max_retries=0)
+
+    async def close(self) -> None:
+        await self.client.close()
+        await self.http_client.aclose()
+
+async def _get_pool() -> _ClientPool:
+    """
+    The client pool for the running event loop
+
+    Each loop gets its own pool, since httpx connections are bound to the
+    loop that opened them; the rate limiter is shared. Pools of loops that
+    have since closed (asyncio.run in the sync wrappers) are closed here.
+    """
+    global _limiter
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        if _limiter is None:
+            _limiter = TokenBucket(config.azure_openai.requests_per_minute)
+        pool = _pools[loop] = _ClientPool(loop, _limiter)
+        for stale_loop in [l for l in list(_pools) if l.is_closed()]:
+            stale = _pools.pop(stale_loop, None)
+            if stale is not None:
+                await _close_pool(stale)
+    return pool
+
+async def _close_pool(pool: _ClientPool) -> None:
+    try:
+        await pool.close()
+    except Exception as e:
+        logger.warning(f"Error closing LLM client: {e}")
+
+async def close_llm_client() -> None:
+    """Close every loop's connection pool; called on application shutdown"""
+    loop = asyncio.get_running_loop()
+    pools = list(_pools.items())
+    _pools.clear()
+    for pool_loop, pool in pools:
+        if pool_loop is not loop and pool_loop.is_running():
+            # Still serving another thread; close it there
+            asyncio.run_coroutine_threadsafe(pool.close(), pool_loop)
+        else:
+            await _close_pool(pool)
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-requested delay from an OpenAI error's Retry-After headers, if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) / scale)
+        except (TypeError, ValueError):
+            # HTTP-date values fall back to exponential back-off
+            continue
+    return None
+
 class LLMClient:
     def __init__(self, correlation_id: Optional[str] = None):
         self.correlation_id = correlation_id
-    
-    async def generate(self, system: str, user: str) -> str:
-        # Ensure client is initialized
+
+    async def cache_identity(self) -> Optional[Tuple[str, str, float]]:
+        """
+        (model, deployment, temperature) that determine this client's output
+
+        The deployment part covers endpoint and API version so any change to
+        where requests go invalidates cached responses. None for the mock
+        client, whose output is never worth caching.
+        """
         await _initialize_client(self.correlation_id)
-        if USE_MOCK or not _client:
-            # Simple deterministic stub for demos
-            return (
-                "Findings:\n"
-                "- [high] Identity: MFA not enforced for admins.\n"
-                "- [medium] Data: No DLP policies for M365.\n"
-                "- [low] SecOps: Runbooks missing for P1 incidents.\n"
-                "\nRecommendations:\n"
-                "1) Enforce Conditional Access + MFA for privileged roles (P1, M effort, 4 weeks)\n"
-                "2) Deploy baseline DLP policies for M365 (P2, M effort, 6 weeks)\n"
-                "3) Author incident runbooks and test (P3, S effort, 3 weeks)\n"
-            )
-        else:
-            # Implement retry logic with exponential backoff
-            max_retries = 3
-            base_delay = 1.0  # seconds
-            
-            for attempt in range(max_retries):
+        if USE_MOCK or not _settings:
+            return None
+        deployment = f"{_settings['azure_endpoint']}|{_model}|{_settings['api_version']}"
+        return config.azure_openai.chat_model or _model, deployment, TEMPERATURE
+
+    @staticmethod
+    def _messages(system: str, user: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ]
+
+    @asynccontextmanager
+    async def _create(self, pool: _ClientPool, messages: List[Dict[str, str]], stream: bool = False) -> AsyncIterator[Any]:
+        """
+        Send a chat completion request with rate limiting and async retries
+
+        Holds one of the pool's slots until the with block exits, however it
+        exits (including cancellation), so the response or stream can be
+        consumed under it.
+        """
+        # Implement retry logic with exponential backoff
+        max_retries = max(1, config.azure_openai.max_retries)
+        base_delay = 1.0  # seconds
+
+        for attempt in range(max_retries):
+            await pool.limiter.acquire()
+            async with pool.slots:
                 try:
-                    resp = _client.chat.completions.create(
+                    resp = await pool.client.chat.completions.create(
                         model=_model,
-                        messages=[
-                            {"role": "system", "content": system},
-                            {"role": "user", "content": user},
-                        ],
-                        temperature=0.2,
+                        messages=messages,
+                        temperature=TEMPERATURE,
+                        stream=stream,
                     )
-                    
-                    # Validate response structure
-                    if not resp:
-                        logger.error("OpenAI API returned empty response")
-                        raise LLMError("Empty response from OpenAI API")
-                    
-                    if not hasattr(resp, 'choices') or not resp.choices:
-                        logger.error(f"OpenAI API response missing choices: {resp}")
-                        raise LLMError("Invalid response structure: missing choices")
-                    
-                    if len(resp.choices) == 0:
-                        logger.error(f"OpenAI API returned empty choices list: {resp}")
-                        raise LLMError("Invalid response structure: empty choices list")
-                    
-                    first_choice = resp.choices[0]
-                    if not hasattr(first_choice, 'message') or not first_choice.message:
-                        logger.error(f"OpenAI API choice missing message: {first_choice}")
-                        raise LLMError("Invalid response structure: missing message")
-                    
-                    if not hasattr(first_choice.message, 'content') or first_choice.message.content is None:
-                        logger.error(f"OpenAI API message missing content: {first_choice.message}")
-                        raise LLMError("Invalid response structure: missing message content")
-                    
-                    content = first_choice.message.content
-                    if not content or not content.strip():
-                        logger.warning("OpenAI API returned empty content")
-                        return "No content generated by the model."
-                    
-                    return content
-                    
+
                 except RateLimitError as e:
+                    retry_after = retry_after_seconds(e)
                     if attempt < max_retries - 1:
-                        delay = base_delay * (2 ** attempt)  # exponential backoff
+                        delay = retry_after if retry_after is not None else base_delay * (2 ** attempt)
+                        pool.limiter.pause(delay)
                         logger.warning(f"Rate limit hit, retrying in {delay}s. Attempt {attempt + 1}/{max_retries}: {e}")
-                        time.sleep(delay)
-                    else:
-                        logger.error(f"Rate limit error after {max_retries} attempts: {e}")
-                        raise LLMError(f"Rate limit exceeded after {max_retries} retries") from e
-                        
+                        continue
+                    logger.error(f"Rate limit error after {max_retries} attempts: {e}")
+                    raise LLMError(f"Rate limit exceeded after {max_retries} retries") from e
+
                 except APIConnectionError as e:
                     if attempt < max_retries - 1:
                         delay = base_delay * (2 ** attempt)
                         logger.warning(f"Connection error, retrying in {delay}s. Attempt {attempt + 1}/{max_retries}: {e}")
-                        time.sleep(delay)
                     else:
                         logger.error(f"Connection error after {max_retries} attempts: {e}")
                         raise LLMError(f"Connection failed after {max_retries} retries") from e
-                        
+
                 except APIError as e:
                     logger.error(f"OpenAI API error: {e}")
                     raise LLMError(f"OpenAI API error: {str(e)}") from e
-                    
+
                 except Exception as e:
                     logger.exception(f"Unexpected error calling OpenAI API: {e}")
                     raise LLMError(f"Unexpected error: {str(e)}") from e
+
+                else:
+                    yield resp
+                    return
+            # Connection errors back off without holding a slot
+            await asyncio.sleep(delay)
+
+    async def generate(self, system: str, user: str) -> str:
+        # Ensure client is initialized
+        await _initialize_client(self.correlation_id)
+        if USE_MOCK or not _settings:
+            # Simple deterministic stub for demos
+            return MOCK_RESPONSE
+
+        pool = await _get_pool()
+        async with self._create(pool, self._messages(system, user)) as resp:
+            pass  # Fully read; the slot is free before validation
+
+        # Validate response structure
+        if not resp:
+            logger.error("OpenAI API returned empty response")
+            raise LLMError("Empty response from OpenAI API")
+
+        if not hasattr(resp, 'choices') or not resp.choices:
+            logger.error(f"OpenAI API response missing choices: {resp}")
+            raise LLMError("Invalid response structure: missing choices")
+
+        if len(resp.choices) == 0:
+            logger.error(f"OpenAI API returned empty choices list: {resp}")
+            raise LLMError("Invalid response structure: empty choices list")
+
+        first_choice = resp.choices[0]
+        if not hasattr(first_choice, 'message') or not first_choice.message:
+            logger.error(f"OpenAI API choice missing message: {first_choice}")
+            raise LLMError("Invalid response structure: missing message")
+
+        if not hasattr(first_choice.message, 'content') or first_choice.message.content is None:
+            logger.error(f"OpenAI API message missing content: {first_choice.message}")
+            raise LLMError("Invalid response structure: missing message content")
+
+        content = first_choice.message.content
+        if not content or not content.strip():
+            logger.warning("OpenAI API returned empty content")
+            return "No content generated by the model."
+
+        return content
+
+    async def generate_stream(self, system: str, user: str) -> AsyncIterator[str]:
+        """
+        Yield the completion text in pieces as the model produces it
+
+        Failures before the first piece are retried like generate(); a
+        stream that breaks part way raises LLMError.
+        """
+        await _initialize_client(self.correlation_id)
+        if USE_MOCK or not _settings:
+            for line in MOCK_RESPONSE.splitlines(keepends=True):
+                yield line
+            return
+
+        pool = await _get_pool()
+        async with self._create(pool, self._messages(system, user), stream=True) as stream:
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            except (APIError, httpx.HTTPError) as e:
+                logger.error(f"OpenAI stream interrupted: {e}")
+                raise LLMError(f"Stream interrupted: {str(e)}") from e
+            finally:
+                await stream.close()
@@ -3,10 +3,12 @@ import sys
 sys.path.append("/app")
 import re
 import logging
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from pydantic import BaseModel
 from domain.models import Finding, Recommendation, RunLog
 from ai.llm import LLMClient
+from ai.response_cache import LLMResponseCache, estimate_tokens
+from config import config
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -31,6 +33,9 @@ RECOMMENDATION_PATTERN = re.compile(
     r'^(?:[0-9]+[.)\s]+|[-*•]\s+)?(.+?)(?:\s*\(([^)]+)\))?$'
 )
 
+# "6 weeks", "6 week" or "6w"; the leading \b keeps "P1" from reading as 1 week
+WEEKS_PATTERN = re.compile(r'\b(\d+)\s*(?:weeks?|w)\b', re.IGNORECASE)
+
 # Severity normalization mapping
 SEVERITY_MAP = {
     'informational': 'info',
@@ -41,148 +46,226 @@ SEVERITY_MAP = {
 }
 
 class Orchestrator:
-    def __init__(self, llm: LLMClient):
+    def __init__(self, llm: LLMClient, response_cache: Optional[LLMResponseCache] = None):
         self.llm = llm
+        self.response_cache = response_cache
 
-    def analyze(self, assessment_id: str, content: str):
-        text = self.llm.generate(SYSTEM_ANALYZE, content)
-        findings: List[Finding] = []
-        
-        for line in text.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-                
-            match = FINDING_PATTERN.match(line)
-            if match:
-                severity_raw = match.group(1)
-                area = match.group(2)
-                title = match.group(3)
-                
-                # Normalize severity
-                severity = SEVERITY_MAP.get(severity_raw.lower(), 'medium')
-                
-                # Clean up captured groups
-                if area:
-                    area = area.strip().strip('"\'')
-                title = title.strip().strip('"\'')
-                
-                # Only create finding if we have a title
-                if title:
-                    findings.append(Finding(
-                        assessment_id=assessment_id,
-                        title=title,
-                        severity=severity,
-                        area=area
-                    ))
-                    logger.debug(f"Parsed finding: severity={severity}, area={area}, title={title[:50]}...")
-                else:
-                    logger.warning(f"Skipped finding with empty title from line: {line}")
-            else:
-                # Log lines that look like findings but didn't match
-                if any(marker in line.lower() for marker in ['low', 'medium', 'high', 'critical']):
-                    logger.debug(f"Line might contain finding but didn't match pattern: {line}")
-        
+    async def _generate_lines(
+        self,
+        system: str,
+        user: str,
+        output: List[str],
+        engagement_id: Optional[str] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[str]:
+        """
+        Yield the model output one complete line at a time
+
+        With streaming enabled, lines are yielded as soon as the model has
+        finished them so parsing overlaps generation. Raw text is appended to
+        output for the run log preview.
+
+        Responses are cached per engagement when a response cache is set;
+        use_cache=False skips the lookup but still stores the fresh answer.
+        """
+        cache_key = None
+        identity_fn = getattr(self.llm, "cache_identity", None)
+        identity = await identity_fn() if self.response_cache and engagement_id and identity_fn else None
+        if identity:
+            model, deployment, temperature = identity
+            cache_key = LLMResponseCache.make_key(model, deployment, temperature, system, user, engagement_id)
+            cached = await self.response_cache.get(cache_key, deployment) if use_cache else None
+            if not use_cache:
+                self.response_cache.metrics.bypassed += 1
+            if cached is not None:
+                logger.debug(f"LLM response cache hit for engagement {engagement_id}")
+                output.append(cached)
+                for line in cached.splitlines():
+                    yield line
+                return
+
+        generate_stream = getattr(self.llm, "generate_stream", None)
+        if not (config.azure_openai.stream_responses and generate_stream):
+            text = await self.llm.generate(system, user)
+            output.append(text)
+            for line in text.splitlines():
+                yield line
+        else:
+            pending = ""
+            async for piece in generate_stream(system, user):
+                output.append(piece)
+                pending += piece
+                *lines, pending = pending.split("\n")
+                for line in lines:
+                    yield line
+            if pending:
+                yield pending
+
+        if cache_key:
+            text = "".join(output)
+            await self.response_cache.put(
+                cache_key, engagement_id, deployment, text, estimate_tokens(system, user, text)
+            )
+
+    @staticmethod
+    def _preview(text: str) -> str:
         # Safely limit output preview
         preview_lines = text.splitlines()[:8]
-        preview = "\n".join(preview_lines)[:500]  # Limit to 500 chars
-        
+        return "\n".join(preview_lines)[:500]  # Limit to 500 chars
+
+    async def analyze(
+        self,
+        assessment_id: str,
+        content: str,
+        engagement_id: Optional[str] = None,
+        use_cache: bool = True
+    ):
+        output: List[str] = []
+        findings: List[Finding] = []
+
+        async for line in self._generate_lines(SYSTEM_ANALYZE, content, output, engagement_id, use_cache):
+            finding = self._parse_finding(assessment_id, line)
+            if finding:
+                findings.append(finding)
+
         log = RunLog(
             assessment_id=assessment_id,
             agent="DocAnalyzer",
             input_preview=content[:200],
-            output_preview=preview
+            output_preview=self._preview("".join(output))
         )
         return findings, log
 
-    def recommend(self, assessment_id: str, findings_for_prompt: str):
-        text = self.llm.generate(SYSTEM_RECOMMEND, findings_for_prompt)
-        recs: List[Recommendation] = []
-        
-        for line in text.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Try to match recommendation pattern
-            match = RECOMMENDATION_PATTERN.match(line)
-            if match:
-                title_part = match.group(1)
-                metadata_part = match.group(2)
-                
-                # Skip if title is too short or looks like just a number
-                if not title_part or len(title_part) < 5 or title_part.isdigit():
-                    continue
-                
-                # Default values
-                priority = "P2"
-                effort = "M"
-                weeks: Optional[int] = None
-                
-                # Parse metadata if present
-                if metadata_part:
-                    # Normalize metadata to lowercase for matching
-                    meta_lower = metadata_part.lower()
-                    tokens = re.split(r'[,;\s]+', metadata_part)
-                    
-                    # Extract priority
-                    if 'p1' in meta_lower:
-                        priority = "P1"
-                    elif 'p3' in meta_lower:
-                        priority = "P3"
-                    elif 'p2' in meta_lower:
-                        priority = "P2"
-                    
-                    # Extract effort
-                    for token in tokens:
-                        token_clean = token.strip().upper()
-                        if token_clean == 'S' or 'small' in token.lower():
-                            effort = "S"
-                        elif token_clean == 'L' or 'large' in token.lower():
-                            effort = "L"
-                        elif token_clean == 'M' or 'medium' in token.lower():
-                            effort = "M"
-                    
-                    # Extract weeks
-                    for token in tokens:
-                        # Look for patterns like "6 weeks", "6w", or just "6"
-                        week_match = re.search(r'(\d+)\s*(?:weeks?|w)?', token)
-                        if week_match:
-                            try:
-                                weeks = int(week_match.group(1))
-                                break
-                            except ValueError:
-                                pass
-                    
-                    # Clean title by removing metadata
-                    title_clean = title_part.strip()
-                else:
-                    title_clean = line.strip()
-                
-                # Remove list markers from title
-                title_clean = re.sub(r'^[0-9]+[.)\s]+|^[-*•]\s+', '', title_clean).strip()
-                
-                # Limit title length
-                if len(title_clean) > 200:
-                    title_clean = title_clean[:197] + "..."
-                
-                recs.append(Recommendation(
+    @staticmethod
+    def _parse_finding(assessment_id: str, line: str) -> Optional[Finding]:
+        line = line.strip()
+        if not line:
+            return None
+
+        match = FINDING_PATTERN.match(line)
+        if match:
+            severity_raw = match.group(1)
+            area = match.group(2)
+            title = match.group(3)
+
+            # Normalize severity
+            severity = SEVERITY_MAP.get(severity_raw.lower(), 'medium')
+
+            # Clean up captured groups
+            if area:
+                area = area.strip().strip('"\'')
+            title = title.strip().strip('"\'')
+
+            # Only create finding if we have a title
+            if title:
+                logger.debug(f"Parsed finding: severity={severity}, area={area}, title={title[:50]}...")
+                return Finding(
                     assessment_id=assessment_id,
-                    title=title_clean,
-                    priority=priority,
-                    effort=effort,
-                    timeline_weeks=weeks
-                ))
-                logger.debug(f"Parsed recommendation: priority={priority}, effort={effort}, weeks={weeks}, title={title_clean[:50]}...")
-        
-        # Safely limit output preview
-        preview_lines = text.splitlines()[:8]
-        preview = "\n".join(preview_lines)[:500]  # Limit to 500 chars
-        
+                    title=title,
+                    severity=severity,
+                    area=area
+                )
+            logger.warning(f"Skipped finding with empty title from line: {line}")
+        else:
+            # Log lines that look like findings but didn't match
+            if any(marker in line.lower() for marker in ['low', 'medium', 'high', 'critical']):
+                logger.debug(f"Line might contain finding but didn't match pattern: {line}")
+        return None
+
+    async def recommend(
+        self,
+        assessment_id: str,
+        findings_for_prompt: str,
+        engagement_id: Optional[str] = None,
+        use_cache: bool = True
+    ):
+        output: List[str] = []
+        recs: List[Recommendation] = []
+
+        async for line in self._generate_lines(
+            SYSTEM_RECOMMEND, findings_for_prompt, output, engagement_id, use_cache
+        ):
+            rec = self._parse_recommendation(assessment_id, line)
+            if rec:
+                recs.append(rec)
+
         log = RunLog(
             assessment_id=assessment_id,
             agent="GapRecommender",
             input_preview=findings_for_prompt[:200],
-            output_preview=preview
+            output_preview=self._preview("".join(output))
         )
         return recs, log
+
+    @staticmethod
+    def _parse_recommendation(assessment_id: str, line: str) -> Optional[Recommendation]:
+        line = line.strip()
+        if not line:
+            return None
+
+        # Try to match recommendation pattern
+        match = RECOMMENDATION_PATTERN.match(line)
+        if not match:
+            return None
+
+        title_part = match.group(1)
+        metadata_part = match.group(2)
+
+        # Skip if title is too short or looks like just a number
+        if not title_part or len(title_part) < 5 or title_part.isdigit():
+            return None
+
+        # Default values
+        priority = "P2"
+        effort = "M"
+        weeks: Optional[int] = None
+
+        # Parse metadata if present
+        if metadata_part:
+            # Normalize metadata to lowercase for matching
+            meta_lower = metadata_part.lower()
+            tokens = re.split(r'[,;\s]+', metadata_part)
+
+            # Extract priority
+            if 'p1' in meta_lower:
+                priority = "P1"
+            elif 'p3' in meta_lower:
+                priority = "P3"
+            elif 'p2' in meta_lower:
+                priority = "P2"
+
+            # Extract effort
+            for token in tokens:
+                token_clean = token.strip().upper()
+                if token_clean == 'S' or 'small' in token.lower():
+                    effort = "S"
+                elif token_clean == 'L' or 'large' in token.lower():
+                    effort = "L"
+                elif token_clean == 'M' or 'medium' in token.lower():
+                    effort = "M"
+
+            # Extract weeks
+            week_match = WEEKS_PATTERN.search(metadata_part)
+            if week_match:
+                weeks = int(week_match.group(1))
+
+            # Clean title by removing metadata
+            title_clean = title_part.strip()
+        else:
+            title_clean = line.strip()
+
+        # Remove list markers from title
+        title_clean = re.sub(r'^[0-9]+[.)\s]+|^[-*•]\s+', '', title_clean).strip()
+
+        # Limit title length
+        if len(title_clean) > 200:
+            title_clean = title_clean[:197] + "..."
+
+        logger.debug(f"Parsed recommendation: priority={priority}, effort={effort}, weeks={weeks}, title={title_clean[:50]}...")
+        return Recommendation(
+            assessment_id=assessment_id,
+            title=title_clean,
+            priority=priority,
+            effort=effort,
+            timeline_weeks=weeks
+        )
@@ -0,0 +1,245 @@
+"""
+Content-addressed cache of LLM responses
+
+Analysis and recommendation prompts are deterministic enough (fixed system
+prompts, temperature 0.2) that re-running an unchanged assessment can reuse
+the previous answer instead of paying model latency and tokens again.
+
+Responses are stored in a WAL-mode SQLite database on local disk, shared by
+every worker on the host. The key is a SHA-256 of the model, deployment,
+temperature, prompts and engagement, so entries never cross engagements and
+a GDPR purge can drop an engagement's rows. Entries written under another
+deployment are deleted the first time a new deployment is seen. The
+database is kept under max_size_mb by evicting least recently used rows.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import config
+from util.sqlite import ProcessConnection
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token for estimating tokens saved by hits
+CHARS_PER_TOKEN = 4
+
+# Eviction trims the cache to this fraction of its size limit
+EVICTION_TARGET_RATIO = 0.9
+
+
+@dataclass
+class ResponseCacheMetrics:
+    """Hit, miss and saving counters for this process"""
+    hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+    writes: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    saved_tokens_estimate: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def estimate_tokens(*texts: str) -> int:
+    return sum(len(text) for text in texts) // CHARS_PER_TOKEN
+
+
+class LLMResponseCache:
+    """SQLite-backed LLM response cache, safe to share between workers"""
+
+    def __init__(self, path: str, max_size_mb: float = 256, ttl_seconds: float = 0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds  # 0 = no expiry
+        self.metrics = ResponseCacheMetrics()
+        self._db = ProcessConnection(self.path)
+        self._deployment: Optional[str] = None
+
+        with self._db.connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    engagement_id TEXT NOT NULL,
+                    deployment TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_llm_responses_engagement
+                    ON llm_responses (engagement_id);
+                CREATE INDEX IF NOT EXISTS idx_llm_responses_access
+                    ON llm_responses (last_access);
+            """)
+
+    @staticmethod
+    def make_key(
+        model: str,
+        deployment: str,
+        temperature: float,
+        system: str,
+        user: str,
+        engagement_id: str
+    ) -> str:
+        payload = json.dumps(
+            [model, deployment, temperature, system, user, engagement_id],
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # Reads
+    def _get(self, key: str, deployment: str) -> Optional[str]:
+        self._check_deployment(deployment)
+        now = time.time()
+        with self._db.connection() as conn:
+            row = conn.execute(
+                "SELECT response, tokens, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds and row[2] + self.ttl_seconds <= now:
+                conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+        self.metrics.saved_tokens_estimate += row[1]
+        return row[0]
+
+    async def get(self, key: str, deployment: str) -> Optional[str]:
+        """Cached response for key, or None"""
+        try:
+            response = await asyncio.to_thread(self._get, key, deployment)
+        except sqlite3.Error as e:
+            logger.warning("LLM response cache read failed", extra={"error": str(e)})
+            response = None
+        if response is None:
+            self.metrics.misses += 1
+        else:
+            self.metrics.hits += 1
+        return response
+
+    # Writes
+    def _put(self, key: str, engagement_id: str, deployment: str, response: str, tokens: int) -> None:
+        self._check_deployment(deployment)
+        now = time.time()
+        size = len(key) + len(response.encode("utf-8"))
+        with self._db.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses "
+                "(key, engagement_id, deployment, response, size, tokens, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, engagement_id, deployment, response, size, tokens, now, now)
+            )
+            self._evict(conn)
+        self.metrics.writes += 1
+
+    async def put(self, key: str, engagement_id: str, deployment: str, response: str, tokens: int) -> None:
+        """Store a response; tokens is the estimated cost a later hit saves"""
+        try:
+            await asyncio.to_thread(self._put, key, engagement_id, deployment, response, tokens)
+        except sqlite3.Error as e:
+            logger.warning("LLM response cache write failed", extra={"error": str(e)})
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+        target = int(self.max_size_bytes * EVICTION_TARGET_RATIO)
+        evicted = 0
+        rows = conn.execute("SELECT key, size FROM llm_responses ORDER BY last_access").fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= target:
+                break
+            stale.append((key,))
+            total -= size
+            evicted += 1
+        conn.executemany("DELETE FROM llm_responses WHERE key = ?", stale)
+        self.metrics.evictions += evicted
+
+    # Invalidation
+    def _check_deployment(self, deployment: str) -> None:
+        """Drop entries from other deployments when the deployment changes"""
+        if deployment == self._deployment:
+            return
+        with self._db.connection() as conn:
+            deleted = conn.execute(
+                "DELETE FROM llm_responses WHERE deployment != ?", (deployment,)
+            ).rowcount
+        if deleted:
+            self.metrics.invalidations += deleted
+            logger.info(
+                "Invalidated LLM responses cached for a previous deployment",
+                extra={"deployment": deployment, "entries": deleted}
+            )
+        self._deployment = deployment
+
+    def _delete_engagement(self, engagement_id: str) -> int:
+        with self._db.connection() as conn:
+            return conn.execute(
+                "DELETE FROM llm_responses WHERE engagement_id = ?", (engagement_id,)
+            ).rowcount
+
+    async def delete_engagement(self, engagement_id: str) -> int:
+        """Remove every cached response for an engagement"""
+        deleted = await asyncio.to_thread(self._delete_engagement, engagement_id)
+        self.metrics.invalidations += deleted
+        return deleted
+
+    def _stats(self) -> Dict[str, int]:
+        with self._db.connection() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+            ).fetchone()
+        return {"entries": entries, "size_bytes": size}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics: Dict[str, Any] = asdict(self.metrics)
+        metrics["hit_rate"] = round(self.metrics.hit_rate, 4)
+        metrics["max_size_bytes"] = self.max_size_bytes
+        try:
+            metrics.update(self._stats())
+        except sqlite3.Error as e:
+            logger.warning("LLM response cache stats failed", extra={"error": str(e)})
+        return metrics
+
+    def close(self) -> None:
+        self._db.close()
+
+
+# Process-wide cache, created on first use when enabled
+_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """The configured response cache, or None when caching is disabled"""
+    global _response_cache
+    settings = config.azure_openai
+    if not settings.response_cache_enabled:
+        return None
+    if _response_cache is None:
+        _response_cache = LLMResponseCache(
+            settings.response_cache_path,
+            max_size_mb=settings.response_cache_max_size_mb,
+            ttl_seconds=settings.response_cache_ttl_seconds
+        )
+    return _response_cache
+
+
+def get_llm_response_cache_metrics() -> Optional[Dict[str, Any]]:
+    cache = get_llm_response_cache()
+    return cache.get_metrics() if cache else None
@@ -32,9 +32,28 @@ class DatabaseErrorCategory:
     QUOTA_EXCEEDED = "quota_exceeded"
     TRANSIENT = "transient"
     PERMISSION = "permission"
+    BUDGET_EXCEEDED = "budget_exceeded"
     UNKNOWN = "unknown"
 
 
+class RequestUnitBudgetExceededError(Exception):
+    """
+    Raised when one request consumes more Cosmos RUs than its budget allows
+    
+    Unlike a throttle this is not retried or backed off: the budget caps the
+    request's total spend, so a retry would pay for the same pages again and
+    fail at the same point. The caller has to narrow the query instead.
+    """
+    
+    def __init__(self, consumed_ru: float, budget_ru: float, context: str = ""):
+        self.consumed_ru = consumed_ru
+        self.budget_ru = budget_ru
+        super().__init__(
+            f"Request unit budget exceeded{f' in {context}' if context else ''}: "
+            f"{consumed_ru:.1f} RU consumed, budget {budget_ru:.1f} RU"
+        )
+
+
 # Retry configuration
 DEFAULT_MAX_RETRIES = 3
 DEFAULT_BASE_DELAY = 0.5  # seconds
@@ -52,6 +71,9 @@ def categorize_database_error(error: Exception) -> str:
     Returns:
         Error category from DatabaseErrorCategory
     """
+    if isinstance(error, RequestUnitBudgetExceededError):
+        return DatabaseErrorCategory.BUDGET_EXCEEDED
+    
     if isinstance(error, CosmosResourceNotFoundError):
         return DatabaseErrorCategory.NOT_FOUND
     
@@ -192,6 +214,10 @@ def translate_database_error(error: Exception, context: str = "") -> HTTPExcepti
     elif category == DatabaseErrorCategory.TRANSIENT:
         return HTTPException(503, "Service temporarily unavailable - please retry")
     
+    elif category == DatabaseErrorCategory.BUDGET_EXCEEDED:
+        # Not retryable (see RequestUnitBudgetExceededError); no Retry-After is sent
+        return HTTPException(429, "Request exceeded its database cost budget - narrow the query or page size")
+    
     else:
         # Unknown errors - don't expose internal details
         return HTTPException(500, "An unexpected error occurred")
@@ -1,11 +1,14 @@
 # app/api/main.py
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlmodel import Session, select
 from pathlib import Path
+import asyncio
 import json
 import os
 import logging
+from dataclasses import asdict
 from typing import List, Dict
 from datetime import datetime, timezone
 from api.assist import router as assist_router
@@ -17,8 +20,10 @@ from api.scoring import compute_scores
 from api.routes import assessments as assessments_router, orchestrations as orchestrations_router, engagements as engagements_router, documents, summary, presets as presets_router, version as version_router, admin_auth as admin_auth_router, gdpr as gdpr_router, admin_settings as admin_settings_router, evidence as evidence_router, csf as csf_router, workshops as workshops_router, minutes as minutes_router, roadmap_prioritization as roadmap_prioritization_router, chat as chat_router
 from domain.repository import InMemoryRepository
 from domain.file_repo import FileRepository
-from ai.llm import LLMClient
+from ai.llm import LLMClient, close_llm_client
 from ai.orchestrator import Orchestrator
+from ai.response_cache import get_llm_response_cache, get_llm_response_cache_metrics
+from services.embedding_cache import get_embedding_cache_metrics
 from config import config
 
 # Import middleware components
@@ -27,6 +32,12 @@ from .middleware.security_headers import SecurityHeadersMiddleware
 from .middleware.rate_limiting import RateLimitingMiddleware
 from services.performance import start_performance_monitoring, stop_performance_monitoring
 from services.cache import cache_manager
+from services.shared_cache import create_shared_backend
+from repos.cosmos_client import close_cosmos_client_pools
+from services.audit import create_audit_service
+from services.background_jobs import create_background_job_service, get_job_scheduler, stop_job_scheduler
+from services.aad_groups import close_aad_role_resolver, create_aad_groups_service
+from services.audit_sink import close_audit_sinks, get_audit_sink_metrics
 
 app = FastAPI(title="AI Maturity Tool API", version="0.1.0")
 
@@ -98,7 +109,7 @@ async def on_startup():
     
     # Wire up domain dependencies with error handling
     try:
-        app.state.repo = FileRepository()
+        app.state.repo = FileRepository(storage_mode=config.storage.repo_storage_mode)
         logger.info("File repository initialized")
     except Exception as e:
         logger.error(f"File repository initialization failed: {e}")
@@ -110,7 +121,7 @@ async def on_startup():
         logger.warning("Using in-memory repository fallback")
     
     try:
-        app.state.orchestrator = Orchestrator(LLMClient())
+        app.state.orchestrator = Orchestrator(LLMClient(), get_llm_response_cache())
         logger.info("Orchestrator initialized")
     except Exception as e:
         logger.error(f"Orchestrator initialization failed: {e}")
@@ -127,6 +138,12 @@ async def on_startup():
         # Start cache cleanup tasks
         try:
             if config.cache.enabled:
+                shared_backend = create_shared_backend(config.cache.shared_backend, config.cache.shared_path)
+                if shared_backend is not None:
+                    cache_manager.configure_shared_backend(
+                        shared_backend,
+                        poll_interval_seconds=config.cache.shared_poll_interval_seconds
+                    )
                 await cache_manager.start_all_cleanup()
                 logger.info(
                     "Cache services started",
@@ -134,7 +151,8 @@ async def on_startup():
                         "cache_enabled": config.cache.enabled,
                         "presets_ttl": config.cache.presets_ttl_seconds,
                         "framework_ttl": config.cache.framework_ttl_seconds,
-                        "user_roles_ttl": config.cache.user_roles_ttl_seconds
+                        "user_roles_ttl": config.cache.user_roles_ttl_seconds,
+                        "shared_backend": config.cache.shared_backend
                     }
                 )
             else:
@@ -166,9 +184,34 @@ async def on_startup():
             if not graceful_mode:
                 raise
             logger.warning("Performance monitoring disabled due to initialization failure")
+        
+        # Load AAD groups of known users in Graph $batch calls, off the startup path
+        if config.is_aad_groups_enabled():
+            warmup_emails = [
+                e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()
+            ] + config.aad_groups.warmup_emails
+            if warmup_emails:
+                app.state.aad_warmup_task = asyncio.create_task(
+                    create_aad_groups_service("startup-warmup").warm_up(warmup_emails)
+                )
     else:
         logger.info("Performance monitoring and cache services skipped in graceful mode")
     
+    # Start the background job scheduler; queued jobs only run here, so
+    # graceful mode starts it too
+    try:
+        if config.jobs.worker_enabled:
+            repository = app.state.repo
+            job_service = create_background_job_service(repository, create_audit_service(repository))
+            await get_job_scheduler().start(job_service)
+        else:
+            logger.info("Background job worker disabled")
+    except Exception as e:
+        logger.error(f"Background job scheduler initialization failed: {e}")
+        if not graceful_mode:
+            raise
+        logger.warning("Background jobs will stay queued until a worker with a running scheduler picks them up")
+    
     # Validate RAG configuration if enabled
     if config.rag.enabled:
         is_valid, errors = config.validate_azure_config()
@@ -369,6 +412,42 @@ async def on_shutdown():
     except Exception as e:
         logger.error(f"Error stopping cache services: {e}")
     
+    # Stop the background job scheduler
+    try:
+        await stop_job_scheduler()
+    except Exception as e:
+        logger.error(f"Error stopping background job scheduler: {e}")
+    
+    # Write buffered audit events before their destinations close
+    try:
+        await close_audit_sinks()
+    except Exception as e:
+        logger.error(f"Error flushing audit events: {e}")
+    
+    # Stop the AAD group warmup if it is still running, before its session closes
+    warmup_task = getattr(app.state, "aad_warmup_task", None)
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+        await asyncio.gather(warmup_task, return_exceptions=True)
+    
+    # Close the shared Microsoft Graph sessions
+    try:
+        await close_aad_role_resolver()
+    except Exception as e:
+        logger.error(f"Error closing AAD role resolver: {e}")
+    
+    # Close shared Cosmos DB clients
+    try:
+        await close_cosmos_client_pools()
+    except Exception as e:
+        logger.error(f"Error closing Cosmos DB clients: {e}")
+    
+    # Close the pooled Azure OpenAI connections
+    try:
+        await close_llm_client()
+    except Exception as e:
+        logger.error(f"Error closing LLM client: {e}")
+    
     logger.info("Application shutdown complete")
 
 
@@ -395,12 +474,13 @@ async def get_feature_flags():
 @app.get("/api/performance/metrics")
 async def get_performance_metrics(time_window_minutes: int = 60):
     """Get performance metrics for monitoring and debugging"""
-    from services.performance import get_performance_statistics, get_recent_alerts
+    from services.performance import get_latency_percentiles, get_performance_statistics, get_recent_alerts
     from services.cache import get_cache_metrics
     
     try:
         # Get performance statistics
         perf_stats = get_performance_statistics(time_window_minutes)
+        latency = get_latency_percentiles(time_window_minutes)
         
         # Get recent alerts
         recent_alerts = get_recent_alerts(limit=20)
@@ -423,7 +503,14 @@ async def get_performance_metrics(time_window_minutes: int = 60):
                 "memory_usage_mb": round(perf_stats.memory_usage_mb, 2),
                 "cpu_usage_percent": round(perf_stats.cpu_usage_percent, 2)
             },
+            "latency_percentiles": {
+                group: {name: asdict(summary) for name, summary in summaries.items()}
+                for group, summaries in latency.items()
+            },
             "cache_metrics": cache_metrics,
+            "audit_sinks": get_audit_sink_metrics(),
+            "llm_response_cache": get_llm_response_cache_metrics(),
+            "embedding_cache": get_embedding_cache_metrics(),
             "recent_alerts": [
                 {
                     "type": alert.alert_type,
@@ -447,6 +534,17 @@ async def get_performance_metrics(time_window_minutes: int = 60):
         raise HTTPException(status_code=500, detail="Failed to retrieve performance metrics")
 
 
+@app.get("/api/performance/metrics/prometheus", response_class=PlainTextResponse)
+async def get_prometheus_metrics(time_window_minutes: int = 5):
+    """Latency summaries per route and query type in Prometheus text format"""
+    from services.performance import export_prometheus_metrics
+    
+    return PlainTextResponse(
+        export_prometheus_metrics(time_window_minutes),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
 
 # Add diagnostic endpoint to verify API is working
 @app.get("/api/diagnostic")
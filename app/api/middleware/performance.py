@@ -18,6 +18,7 @@ from starlette.responses import Response as StarletteResponse
 
 from config import config
 from services.performance import performance_monitor, RequestMetrics
+from repos.cosmos_client import begin_request_charge
 import logging
 
 logger = logging.getLogger(__name__)
@@ -73,7 +74,10 @@ class PerformanceTrackingMiddleware(BaseHTTPMiddleware):
         cache_hits_start, cache_misses_start = self._get_cache_metrics()
         
         # Track query count before request
-        initial_query_count = len(performance_monitor.query_metrics)
+        initial_query_count = performance_monitor.total_queries
+        
+        # Scope Cosmos RU accounting (and the optional RU budget) to this request
+        request_charge = begin_request_charge(config.cosmos.max_request_units_per_request or None)
         
         # Set correlation ID in request state for other components
         request.state.correlation_id = correlation_id
@@ -120,7 +124,7 @@ class PerformanceTrackingMiddleware(BaseHTTPMiddleware):
         # Calculate deltas
         cache_hits_delta = cache_hits_end - cache_hits_start
         cache_misses_delta = cache_misses_end - cache_misses_start
-        db_queries_delta = len(performance_monitor.query_metrics) - initial_query_count
+        db_queries_delta = performance_monitor.total_queries - initial_query_count
         
         # Create request metrics
         request_metrics = RequestMetrics(
@@ -142,6 +146,8 @@ class PerformanceTrackingMiddleware(BaseHTTPMiddleware):
         if self.enable_timing_headers:
             response.headers["X-Response-Time-MS"] = str(round(execution_time_ms, 2))
             response.headers["X-Correlation-ID"] = correlation_id
+            if request_charge.operations:
+                response.headers["X-Cosmos-Request-Charge"] = str(round(request_charge.total_ru, 2))
         
         if self.enable_cache_headers and (cache_hits_delta > 0 or cache_misses_delta > 0):
             response.headers["X-Cache-Hits"] = str(cache_hits_delta)
@@ -162,6 +168,7 @@ class PerformanceTrackingMiddleware(BaseHTTPMiddleware):
                     "cache_hits": cache_hits_delta,
                     "cache_misses": cache_misses_delta,
                     "db_queries": db_queries_delta,
+                    "request_charge_ru": round(request_charge.total_ru, 2),
                     "correlation_id": correlation_id,
                     "user_id": user_id
                 }
@@ -179,6 +186,7 @@ class PerformanceTrackingMiddleware(BaseHTTPMiddleware):
                     "cache_hits": cache_hits_delta,
                     "cache_misses": cache_misses_delta,
                     "db_queries": db_queries_delta,
+                    "request_charge_ru": round(request_charge.total_ru, 2),
                     "correlation_id": correlation_id,
                     "user_id": user_id
                 }
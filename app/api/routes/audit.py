@@ -4,6 +4,7 @@ Provides REST endpoints for managing audit logs and compliance reporting.
 """
 import os
 import asyncio
+import contextlib
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, List, Optional, Union
 from pathlib import Path
@@ -181,10 +182,13 @@ async def get_audit_event_detail(
         end_date = datetime.now(timezone.utc)
         start_date = end_date - timedelta(days=90)
         
-        events = await audit_logger._read_audit_events(start_date, end_date)
-        
-        # Find specific event
-        event = next((e for e in events if e['event_id'] == event_id), None)
+        # Find specific event, stopping at the first match
+        event = None
+        async with contextlib.aclosing(audit_logger.iter_audit_events(start_date, end_date)) as events:
+            async for candidate in events:
+                if candidate['event_id'] == event_id:
+                    event = candidate
+                    break
         
         if not event:
             raise HTTPException(status_code=404, detail="Audit event not found")
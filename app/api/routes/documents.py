@@ -310,34 +310,10 @@ async def reindex_documents(
         try:
             rag_service = create_rag_service(correlation_id)
             
-            # Prepare documents with text content
-            doc_tuples = []
-            for doc in documents:
-                if os.path.exists(doc.path):
-                    extract_result = extract_text(doc.path, doc.content_type)
-                    if extract_result.text:
-                        doc_tuples.append((doc, extract_result.text))
-                    else:
-                        logger.warning(
-                            "Skipping document with no extractable text",
-                            extra={
-                                "correlation_id": correlation_id,
-                                "document_id": doc.id,
-                                "filename": doc.filename
-                            }
-                        )
-                else:
-                    logger.warning(
-                        "Skipping missing document file",
-                        extra={
-                            "correlation_id": correlation_id,
-                            "document_id": doc.id,
-                            "path": doc.path
-                        }
-                    )
-            
-            if doc_tuples:
-                await rag_service.reindex_engagement_documents(engagement_id, doc_tuples)
+            # Text is extracted inside the ingestion pipeline, overlapping
+            # with embedding; missing or empty files are marked failed there
+            doc_tuples = [(doc, None) for doc in documents]
+            await rag_service.reindex_engagement_documents(engagement_id, doc_tuples)
             
         except Exception as e:
             logger.error(
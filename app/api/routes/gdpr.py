@@ -15,6 +15,7 @@ All endpoints include proper authentication guards and audit logging.
 import logging
 from typing import Dict, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from datetime import datetime
 
 from api.schemas.gdpr import (
@@ -31,6 +32,7 @@ from domain.repository import Repository
 from services.gdpr import create_gdpr_service
 from services.audit import create_audit_service
 from services.background_jobs import create_background_job_service
+from services.gdpr_export import open_export
 from util.logging import get_correlation_id
 
 logger = logging.getLogger(__name__)
@@ -78,7 +80,9 @@ async def export_engagement_data(
     - Documents and metadata
     - Optional: Vector embeddings
     
-    Returns a complete JSON bundle with all engagement data.
+    The export is written by a background job as gzip-compressed NDJSON (one
+    {"collection", "record"} object per line). Returns the job ID and a
+    download_url that serves the file once the job completes.
     
     **Required Role:** Lead or Admin
     **Legal Basis:** GDPR Article 15 - Right of access
@@ -133,6 +137,51 @@ async def export_engagement_data(
         raise HTTPException(500, f"Data export failed: {str(e)}")
 
 
+@router.get("/engagements/{engagement_id}/export/{export_id}/download")
+async def download_engagement_export(
+    engagement_id: str,
+    export_id: str,
+    services: Dict = Depends(get_services)
+) -> StreamingResponse:
+    """
+    Download a completed engagement export (Lead/Admin only)
+    
+    Streams the NDJSON file in chunks. Returns 404 until the export job has
+    finished writing it.
+    
+    **Required Role:** Lead or Admin
+    """
+    ctx = services["ctx"]
+    
+    if ctx["engagement_id"] != engagement_id:
+        raise HTTPException(400, "Engagement ID mismatch")
+    require_member(services["repository"], ctx, min_role="lead")
+    
+    export = await open_export(engagement_id, export_id)
+    if export is None:
+        raise HTTPException(404, "Export not found or not yet complete")
+    file_name, chunks = export
+    
+    await services["audit_service"].log_audit_event(
+        action_type="data_access",
+        user_email=ctx["user_email"],
+        action_description=f"GDPR data export downloaded for engagement {engagement_id}",
+        engagement_id=engagement_id,
+        resource_type="engagement",
+        resource_id=engagement_id,
+        data_subject_email=ctx["user_email"],
+        correlation_id=services["correlation_id"],
+        metadata={"export_id": export_id}
+    )
+    
+    media_type = "application/gzip" if file_name.endswith(".gz") else "application/x-ndjson"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="gdpr-export-{engagement_id}-{file_name}"'}
+    )
+
+
 # Data Purge Endpoints
 @router.post("/engagements/{engagement_id}/purge", response_model=GDPRDataPurgeResponse)
 async def initiate_data_purge(
@@ -213,8 +262,9 @@ async def list_background_jobs(
     job_type: Optional[str] = Query(None, description="Filter by job type"),
     status: Optional[str] = Query(None, description="Filter by job status"),
     engagement_id: Optional[str] = Query(None, description="Filter by engagement ID"),
-    page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(50, ge=1, le=100, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_count: bool = Query(False, description="Include the approximate total count"),
     services: Dict = Depends(get_services)
 ) -> BackgroundJobListResponse:
     """
@@ -222,6 +272,8 @@ async def list_background_jobs(
     
     Returns paginated list of background jobs with optional filtering.
     Useful for monitoring GDPR operations and system maintenance.
+    Follow next_cursor to page through results; total_count is approximate
+    and only available when filtering by engagement at most.
     
     **Required Role:** Admin
     """
@@ -240,7 +292,7 @@ async def list_background_jobs(
                 'user_email': ctx['user_email'],
                 'job_type': job_type,
                 'status': status,
-                'page': page,
+                'has_cursor': cursor is not None,
                 'correlation_id': correlation_id
             }
         )
@@ -251,8 +303,9 @@ async def list_background_jobs(
             engagement_id=engagement_id,
             job_type=job_type,
             status=status,
-            page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor,
+            include_count=include_count
         )
         
         return jobs_response
@@ -516,8 +569,9 @@ async def get_audit_logs(
     action_type: Optional[AuditActionType] = Query(None, description="Filter by action type"),
     start_date: Optional[datetime] = Query(None, description="Filter by start date"),
     end_date: Optional[datetime] = Query(None, description="Filter by end date"),
-    page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(100, ge=1, le=500, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_count: bool = Query(False, description="Include the approximate total count"),
     services: Dict = Depends(get_services)
 ) -> AuditLogResponse:
     """
@@ -525,6 +579,8 @@ async def get_audit_logs(
     
     Returns paginated audit logs with filtering capabilities.
     Essential for GDPR compliance monitoring and investigation.
+    Follow next_cursor to page through results; total_count is approximate
+    and only available when filtering by engagement at most.
     
     **Required Role:** Admin
     """
@@ -544,7 +600,7 @@ async def get_audit_logs(
                 'filter_engagement_id': engagement_id,
                 'filter_user_email': user_email,
                 'filter_action_type': action_type,
-                'page': page,
+                'has_cursor': cursor is not None,
                 'correlation_id': correlation_id
             }
         )
@@ -555,8 +611,9 @@ async def get_audit_logs(
             action_type=action_type,
             start_date=start_date,
             end_date=end_date,
-            page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor,
+            include_count=include_count
         )
         
         return audit_response
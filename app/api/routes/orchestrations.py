@@ -31,6 +31,7 @@ class AnalyzeRequest(BaseModel):
     assessment_id: str
     content: str
     use_evidence: bool = False
+    use_cache: bool = True  # False forces a fresh model call
 
 class AnalyzeResponse(BaseModel):
     findings: List[Finding]
@@ -166,7 +167,9 @@ Please analyze the original content while considering the relevant evidence prov
         )
     
     # Perform analysis
-    findings, log = orch.analyze(req.assessment_id, analysis_content)
+    findings, log = await orch.analyze(
+        req.assessment_id, analysis_content, engagement_id=ctx["engagement_id"], use_cache=req.use_cache
+    )
     
     # Track evidence usage and citations
     evidence_used = False
@@ -204,6 +207,7 @@ Please analyze the original content while considering the relevant evidence prov
 
 class RecommendRequest(BaseModel):
     assessment_id: str
+    use_cache: bool = True  # False forces a fresh model call
 
 class RecommendResponse(BaseModel):
     recommendations: List[Recommendation]
@@ -368,7 +372,9 @@ Please generate recommendations considering both the findings and the relevant e
             # Continue without evidence rather than failing
     
     # Generate recommendations
-    recs, log = orch.recommend(req.assessment_id, recommendation_content)
+    recs, log = await orch.recommend(
+        req.assessment_id, recommendation_content, engagement_id=engagement_id, use_cache=req.use_cache
+    )
     
     # Update log with evidence information if used
     if evidence_used:
@@ -627,7 +633,7 @@ async def analyze_doc(
     if not orch:
         raise HTTPException(500, "Orchestrator not configured")
     
-    findings, log = orch.analyze(assessment.id, ex.text)
+    findings, log = await orch.analyze(assessment.id, ex.text, engagement_id=engagement_id)
     repo.add_findings(assessment.id, findings)
     repo.add_runlog(log)
     
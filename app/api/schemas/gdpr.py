@@ -50,6 +50,8 @@ class GDPRDataExportResponse(BaseModel):
     size_bytes: Optional[int] = None
     record_count: int = 0
     error_message: Optional[str] = None
+    job_id: Optional[str] = Field(default=None, description="Background job writing the export")
+    download_url: Optional[str] = Field(default=None, description="NDJSON download, available once the job completes")
 
 
 # GDPR Data Purge Models
@@ -94,10 +96,12 @@ class BackgroundJob(BaseModel):
     
     # Job configuration
     parameters: Dict[str, Any] = Field(default_factory=dict)
+    priority: int = Field(default=0, description="Higher numbers run first")
     
     # Progress tracking
     progress_percent: int = Field(default=0, ge=0, le=100)
     progress_message: Optional[str] = None
+    checkpoint: Optional[Dict[str, Any]] = Field(default=None, description="Handler state to resume from after a retry or lost worker")
     
     # Results and errors
     result: Optional[Dict[str, Any]] = None
@@ -118,10 +122,10 @@ class BackgroundJobResponse(BaseModel):
 class BackgroundJobListResponse(BaseModel):
     """Response model for listing background jobs"""
     jobs: List[BackgroundJob]
-    total_count: int
-    page: int = 1
+    total_count: Optional[int] = Field(default=None, description="Approximate total, when requested and available")
     page_size: int = 50
     has_more: bool = False
+    next_cursor: Optional[str] = Field(default=None, description="Pass as cursor to fetch the next page")
 
 
 # Audit Log Models
@@ -167,10 +171,10 @@ class AuditLogEntry(BaseModel):
 class AuditLogResponse(BaseModel):
     """Response model for audit log queries"""
     entries: List[AuditLogEntry]
-    total_count: int
-    page: int = 1
+    total_count: Optional[int] = Field(default=None, description="Approximate total, when requested and available")
     page_size: int = 100
     has_more: bool = False
+    next_cursor: Optional[str] = Field(default=None, description="Pass as cursor to fetch the next page")
 
 
 # TTL Configuration Models
@@ -1,3 +1,4 @@
+import email.utils
 import os
 import logging
 from fastapi import Header, HTTPException, Depends, Request
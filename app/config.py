@@ -3,7 +3,7 @@ Configuration settings for the AI-Enabled Cyber Maturity Assessment application.
 Includes Azure AI Search, OpenAI, and RAG service configurations.
 """
 import os
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings
 
@@ -17,6 +17,19 @@ class AzureOpenAIConfig(BaseModel):
     embedding_model: str = Field(default_factory=lambda: os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-3-large"))
     embedding_dimensions: int = Field(default_factory=lambda: int(os.getenv("AZURE_OPENAI_EMBEDDING_DIMENSIONS", "3072")))
     max_tokens_per_request: int = Field(default_factory=lambda: int(os.getenv("AZURE_OPENAI_MAX_TOKENS", "8000")))
+    chat_model: str = Field(default_factory=lambda: os.getenv("AZURE_OPENAI_CHAT_MODEL", ""))  # Model behind the chat deployment
+    # Chat completion client: shared connection pool, concurrency and rate limits
+    max_connections: int = Field(default_factory=lambda: int(os.getenv("AZURE_OPENAI_MAX_CONNECTIONS", "32")))
+    max_concurrent_requests: int = Field(default_factory=lambda: int(os.getenv("AZURE_OPENAI_MAX_CONCURRENT_REQUESTS", "16")))
+    requests_per_minute: float = Field(default_factory=lambda: float(os.getenv("AZURE_OPENAI_REQUESTS_PER_MINUTE", "0")))  # 0 = unlimited
+    request_timeout_seconds: float = Field(default_factory=lambda: float(os.getenv("AZURE_OPENAI_REQUEST_TIMEOUT_SECONDS", "60")))
+    max_retries: int = Field(default_factory=lambda: int(os.getenv("AZURE_OPENAI_MAX_RETRIES", "3")))
+    stream_responses: bool = Field(default_factory=lambda: os.getenv("AZURE_OPENAI_STREAM_RESPONSES", "false").lower() == "true")
+    # Response cache for analyze/recommend, keyed by a hash of model, prompts and engagement
+    response_cache_enabled: bool = Field(default_factory=lambda: os.getenv("AZURE_OPENAI_RESPONSE_CACHE_ENABLED", "false").lower() == "true")
+    response_cache_path: str = Field(default_factory=lambda: os.getenv("AZURE_OPENAI_RESPONSE_CACHE_PATH", "data/cache/llm_responses.db"))
+    response_cache_max_size_mb: float = Field(default_factory=lambda: float(os.getenv("AZURE_OPENAI_RESPONSE_CACHE_MAX_SIZE_MB", "256")))
+    response_cache_ttl_seconds: float = Field(default_factory=lambda: float(os.getenv("AZURE_OPENAI_RESPONSE_CACHE_TTL_SECONDS", "0")))  # 0 = no expiry
 
 
 class AzureSearchConfig(BaseModel):
@@ -34,6 +47,15 @@ class EmbeddingsConfig(BaseModel):
     batch_size: int = Field(default_factory=lambda: int(os.getenv("EMBEDDING_BATCH_SIZE", "16")))
     max_retries: int = Field(default_factory=lambda: int(os.getenv("EMBEDDING_MAX_RETRIES", "3")))
     retry_delay: float = Field(default_factory=lambda: float(os.getenv("EMBEDDING_RETRY_DELAY", "1.0")))
+    # Cross-document batching in the ingestion pipeline
+    max_batch_tokens: int = Field(default_factory=lambda: int(os.getenv("EMBEDDING_MAX_BATCH_TOKENS", "64000")))
+    max_concurrency: int = Field(default_factory=lambda: int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "8")))
+    initial_concurrency: int = Field(default_factory=lambda: int(os.getenv("EMBEDDING_INITIAL_CONCURRENCY", "2")))
+    # Embedding cache keyed by model, deployment, dimensions and text hash
+    cache_enabled: bool = Field(default_factory=lambda: os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true")
+    cache_path: str = Field(default_factory=lambda: os.getenv("EMBEDDING_CACHE_PATH", "data/cache/embeddings.db"))
+    cache_memory_entries: int = Field(default_factory=lambda: int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "4096")))
+    cache_max_size_mb: float = Field(default_factory=lambda: float(os.getenv("EMBEDDING_CACHE_MAX_SIZE_MB", "1024")))
 
 
 class RAGConfig(BaseModel):
@@ -58,6 +80,17 @@ class RAGConfig(BaseModel):
     chunk_overlap_percent: float = Field(default_factory=lambda: float(os.getenv("RAG_CHUNK_OVERLAP", "0.1")))  # 10% overlap
     batch_processing_size: int = Field(default_factory=lambda: int(os.getenv("RAG_BATCH_SIZE", "10")))
     rate_limit_requests_per_minute: int = Field(default_factory=lambda: int(os.getenv("RAG_RATE_LIMIT", "100")))
+    
+    # In-process vector index for Cosmos DB backend
+    vector_index_enabled: bool = Field(default_factory=lambda: os.getenv("RAG_VECTOR_INDEX_ENABLED", "true").lower() == "true")
+    vector_index_max_engagements: int = Field(default_factory=lambda: int(os.getenv("RAG_VECTOR_INDEX_MAX_ENGAGEMENTS", "32")))
+    vector_index_ttl_seconds: int = Field(default_factory=lambda: int(os.getenv("RAG_VECTOR_INDEX_TTL_SECONDS", "300")))
+    
+    # Staged ingestion pipeline (extract -> chunk -> embed -> upload)
+    ingestion_queue_size: int = Field(default_factory=lambda: int(os.getenv("RAG_INGESTION_QUEUE_SIZE", "256")))
+    ingestion_extract_workers: int = Field(default_factory=lambda: int(os.getenv("RAG_INGESTION_EXTRACT_WORKERS", "4")))
+    ingestion_upload_batch_size: int = Field(default_factory=lambda: int(os.getenv("RAG_INGESTION_UPLOAD_BATCH_SIZE", "50")))
+    ingestion_checkpoint_dir: str = Field(default_factory=lambda: os.getenv("RAG_INGESTION_CHECKPOINT_DIR", "data/rag/checkpoints"))
 
 
 class StorageConfig(BaseModel):
@@ -65,10 +98,19 @@ class StorageConfig(BaseModel):
     upload_root: str = Field(default_factory=lambda: os.getenv("UPLOAD_ROOT", "data/engagements"))
     max_upload_mb: int = Field(default_factory=lambda: int(os.getenv("MAX_UPLOAD_MB", "10")))
     
+    # Local FileRepository persistence: "journal" (append-only JSONL + snapshot) or "snapshot"
+    repo_storage_mode: str = Field(default_factory=lambda: os.getenv("FILE_REPO_STORAGE_MODE", "journal").lower())
+    
     # Azure Blob Storage (optional)
     use_blob_storage: bool = Field(default_factory=lambda: os.getenv("USE_BLOB_STORAGE", "false").lower() == "true")
     azure_storage_account: Optional[str] = Field(default_factory=lambda: os.getenv("AZURE_STORAGE_ACCOUNT"))
     azure_storage_container: str = Field(default_factory=lambda: os.getenv("AZURE_STORAGE_CONTAINER", "documents"))
+    
+    # GDPR engagement exports (NDJSON; written to blob storage when enabled above)
+    gdpr_export_dir: str = Field(default_factory=lambda: os.getenv("GDPR_EXPORT_DIR", "data/exports"))
+    gdpr_export_container: str = Field(default_factory=lambda: os.getenv("GDPR_EXPORT_CONTAINER", "gdpr-exports"))
+    gdpr_export_compress: bool = Field(default_factory=lambda: os.getenv("GDPR_EXPORT_COMPRESS", "true").lower() == "true")
+    gdpr_export_chunk_kb: int = Field(default_factory=lambda: int(os.getenv("GDPR_EXPORT_CHUNK_KB", "1024")))  # Write/upload chunk size
 
 
 class AADGroupsConfig(BaseModel):
@@ -87,6 +129,14 @@ class AADGroupsConfig(BaseModel):
     # Caching configuration
     cache_ttl_minutes: int = Field(default_factory=lambda: int(os.getenv("AAD_CACHE_TTL_MINUTES", "15")))
     
+    # Microsoft Graph access
+    graph_base_url: str = Field(default_factory=lambda: os.getenv("AAD_GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0"))
+    token_refresh_margin_seconds: int = Field(default_factory=lambda: int(os.getenv("AAD_TOKEN_REFRESH_MARGIN_SECONDS", "300")))
+    # Users whose groups are loaded (via Graph $batch) at startup, besides ADMIN_EMAILS
+    warmup_emails: list[str] = Field(default_factory=lambda: [
+        e.strip() for e in os.getenv("AAD_WARMUP_EMAILS", "").split(",") if e.strip()
+    ])
+    
     # Security settings
     require_tenant_isolation: bool = Field(default_factory=lambda: os.getenv("AAD_REQUIRE_TENANT_ISOLATION", "true").lower() == "true")
     allowed_tenant_ids: list[str] = Field(default_factory=lambda: [
@@ -130,9 +180,32 @@ class CacheConfig(BaseModel):
     
     # General cache settings
     cleanup_interval_seconds: int = Field(default_factory=lambda: int(os.getenv("CACHE_CLEANUP_INTERVAL_SECONDS", "300")))  # 5 minutes
+    stale_while_revalidate_seconds: int = Field(default_factory=lambda: int(os.getenv("CACHE_STALE_WHILE_REVALIDATE_SECONDS", "0")))  # Serve expired value while refreshing (0 = off)
+    negative_ttl_seconds: int = Field(default_factory=lambda: int(os.getenv("CACHE_NEGATIVE_TTL_SECONDS", "0")))  # TTL cap for cached None results (0 = None is not cached)
+    
+    # Shared L2 tier across gunicorn workers ("none" or "sqlite")
+    shared_backend: str = Field(default_factory=lambda: os.getenv("CACHE_SHARED_BACKEND", "none").lower())
+    shared_path: str = Field(default_factory=lambda: os.getenv("CACHE_SHARED_PATH", "data/cache/shared_cache.db"))
+    shared_poll_interval_seconds: float = Field(default_factory=lambda: float(os.getenv("CACHE_SHARED_POLL_INTERVAL_SECONDS", "1.0")))  # Cross-worker invalidation latency
     enabled: bool = Field(default_factory=lambda: os.getenv("CACHE_ENABLED", "true").lower() == "true")
 
 
+class CosmosConfig(BaseModel):
+    """Cosmos DB repository client configuration"""
+    endpoint: Optional[str] = Field(default_factory=lambda: os.getenv("COSMOS_ENDPOINT"))
+    database: str = Field(default_factory=lambda: os.getenv("COSMOS_DATABASE", "cybermaturity"))
+    key: Optional[str] = Field(default_factory=lambda: os.getenv("COSMOS_KEY"))  # Emulator/dev only; managed identity otherwise
+    connection_verify: bool = Field(default_factory=lambda: os.getenv("COSMOS_CONNECTION_VERIFY", "true").lower() == "true")
+    connection_limit: int = Field(default_factory=lambda: int(os.getenv("COSMOS_CONNECTION_LIMIT", "100")))  # Open connections per process
+    connection_limit_per_host: int = Field(default_factory=lambda: int(os.getenv("COSMOS_CONNECTION_LIMIT_PER_HOST", "0")))  # 0 = unlimited
+    max_request_units_per_request: float = Field(default_factory=lambda: float(os.getenv("COSMOS_MAX_RU_PER_REQUEST", "0")))  # 0 = no budget
+    query_page_size: int = Field(default_factory=lambda: int(os.getenv("COSMOS_QUERY_PAGE_SIZE", "100")))
+    counter_refresh_seconds: float = Field(default_factory=lambda: float(os.getenv("COSMOS_COUNTER_REFRESH_SECONDS", "300")))  # Age at which approximate counts are recounted
+    # Bulk deletes (engagement purges): transactional batches in flight and RU/s pacing (0 = unpaced)
+    bulk_delete_parallelism: int = Field(default_factory=lambda: int(os.getenv("COSMOS_BULK_DELETE_PARALLELISM", "4")))
+    bulk_delete_max_ru_per_second: float = Field(default_factory=lambda: float(os.getenv("COSMOS_BULK_DELETE_MAX_RU_PER_SECOND", "0")))
+
+
 class PerformanceConfig(BaseModel):
     """Performance monitoring and optimization configuration"""
     # Request timing configuration
@@ -159,6 +232,11 @@ class PerformanceConfig(BaseModel):
     enable_performance_alerts: bool = Field(default_factory=lambda: os.getenv("PERF_ENABLE_ALERTS", "false").lower() == "true")
     alert_slow_request_count_threshold: int = Field(default_factory=lambda: int(os.getenv("PERF_ALERT_SLOW_REQUEST_COUNT", "10")))
     alert_time_window_minutes: int = Field(default_factory=lambda: int(os.getenv("PERF_ALERT_TIME_WINDOW_MINUTES", "5")))
+    
+    # Streaming latency aggregates (rotating time buckets)
+    metrics_bucket_seconds: int = Field(default_factory=lambda: int(os.getenv("PERF_METRICS_BUCKET_SECONDS", "60")))
+    metrics_retention_minutes: int = Field(default_factory=lambda: int(os.getenv("PERF_METRICS_RETENTION_MINUTES", "60")))
+    metrics_max_series: int = Field(default_factory=lambda: int(os.getenv("PERF_METRICS_MAX_SERIES", "500")))
 
 
 class ServiceBusConfig(BaseModel):
@@ -172,11 +250,50 @@ class ServiceBusConfig(BaseModel):
     retry_delay_seconds: int = Field(default_factory=lambda: int(os.getenv("SERVICE_BUS_RETRY_DELAY", "5")))
     message_ttl_seconds: int = Field(default_factory=lambda: int(os.getenv("SERVICE_BUS_MESSAGE_TTL", "3600")))
     
+    # Consumer runtime
+    max_concurrent_calls: int = Field(default_factory=lambda: int(os.getenv("SERVICE_BUS_MAX_CONCURRENT_CALLS", "4")))
+    prefetch_count: int = Field(default_factory=lambda: int(os.getenv("SERVICE_BUS_PREFETCH_COUNT", "4")))
+    lock_duration_seconds: float = Field(default_factory=lambda: float(os.getenv("SERVICE_BUS_LOCK_DURATION", "60")))
+    max_wait_seconds: float = Field(default_factory=lambda: float(os.getenv("SERVICE_BUS_MAX_WAIT_SECONDS", "30")))
+    
+    # Local queue used without Azure Service Bus: memory | sqlite
+    local_backend: str = Field(default_factory=lambda: os.getenv("SERVICE_BUS_LOCAL_BACKEND", "memory"))
+    local_path: str = Field(default_factory=lambda: os.getenv("SERVICE_BUS_LOCAL_PATH", "data/queue/messages.db"))
+    local_poll_interval_seconds: float = Field(default_factory=lambda: float(os.getenv("SERVICE_BUS_LOCAL_POLL_INTERVAL", "0.5")))
+    dlq_retention_seconds: int = Field(default_factory=lambda: int(os.getenv("SERVICE_BUS_DLQ_RETENTION", "604800")))
+    
     def is_configured(self) -> bool:
         """Check if Service Bus is properly configured"""
         return bool(self.namespace and self.connection_string)
 
 
+class JobsConfig(BaseModel):
+    """Background job scheduler configuration"""
+    queue_path: str = Field(default_factory=lambda: os.getenv("BACKGROUND_JOBS_QUEUE_PATH", "data/jobs/queue.db"))
+    max_concurrent_jobs: int = Field(default_factory=lambda: int(os.getenv("BACKGROUND_JOBS_MAX_CONCURRENT", "4")))  # Per worker process
+    # Per job type across all workers, e.g. "data_export=2,data_purge=1"; unlisted types use max_concurrent_jobs
+    concurrency_limits: Dict[str, int] = Field(default_factory=lambda: {
+        name.strip(): int(limit)
+        for name, _, limit in (
+            item.partition("=") for item in os.getenv(
+                "BACKGROUND_JOBS_CONCURRENCY_LIMITS", "data_export=2,data_purge=1,ttl_cleanup=1,audit_retention=1"
+            ).split(",")
+        )
+        if name.strip() and limit.strip()
+    })
+    lease_seconds: float = Field(default_factory=lambda: float(os.getenv("BACKGROUND_JOBS_LEASE_SECONDS", "60")))
+    poll_interval_seconds: float = Field(default_factory=lambda: float(os.getenv("BACKGROUND_JOBS_POLL_INTERVAL", "1.0")))
+    worker_enabled: bool = Field(default_factory=lambda: os.getenv("BACKGROUND_JOBS_WORKER_ENABLED", "true").lower() == "true")
+
+
+class AuditConfig(BaseModel):
+    """Buffered audit sink configuration"""
+    buffer_max_events: int = Field(default_factory=lambda: int(os.getenv("AUDIT_BUFFER_MAX_EVENTS", "10000")))  # Writers wait for space beyond this
+    flush_batch_size: int = Field(default_factory=lambda: int(os.getenv("AUDIT_FLUSH_BATCH_SIZE", "500")))
+    flush_interval_seconds: float = Field(default_factory=lambda: float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1.0")))
+    write_attempts: int = Field(default_factory=lambda: int(os.getenv("AUDIT_WRITE_ATTEMPTS", "3")))
+
+
 class AppConfig(BaseModel):
     """Main application configuration"""
     azure_openai: AzureOpenAIConfig = Field(default_factory=AzureOpenAIConfig)
@@ -187,8 +304,11 @@ class AppConfig(BaseModel):
     logging: LoggingConfig = Field(default_factory=LoggingConfig)
     aad_groups: AADGroupsConfig = Field(default_factory=AADGroupsConfig)
     cache: CacheConfig = Field(default_factory=CacheConfig)
+    cosmos: CosmosConfig = Field(default_factory=CosmosConfig)
     performance: PerformanceConfig = Field(default_factory=PerformanceConfig)
     service_bus: ServiceBusConfig = Field(default_factory=ServiceBusConfig)
+    jobs: JobsConfig = Field(default_factory=JobsConfig)
+    audit: AuditConfig = Field(default_factory=AuditConfig)
     
     # Admin settings
     admin_emails: list[str] = Field(default_factory=lambda: [
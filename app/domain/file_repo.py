@@ -6,38 +6,67 @@ import tempfile
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 import threading
 from domain.models import Assessment, Question, Response, Finding, Recommendation, RunLog, Engagement, Membership, Document
 from domain.repository import Repository
+from domain.indexes import RepositoryIndexes
 
 logger = logging.getLogger(__name__)
 
+# Storage modes: "snapshot" rewrites db.json on every mutation; "journal"
+# appends each mutation to a per-collection JSONL file and folds the
+# journals into db.json periodically
+STORAGE_MODE_SNAPSHOT = "snapshot"
+STORAGE_MODE_JOURNAL = "journal"
+
+# Journals are compacted once they outgrow the snapshot (and this floor), so
+# the snapshot rewrite is amortized over at least that many appended bytes
+JOURNAL_MIN_COMPACTION_BYTES = 4 * 1024 * 1024
+
+MODEL_TYPES = {
+    "engagements": Engagement,
+    "memberships": Membership,
+    "assessments": Assessment,
+    "questions": Question,
+    "responses": Response,
+    "findings": Finding,
+    "recommendations": Recommendation,
+    "runlogs": RunLog,
+    "documents": Document,
+}
+
 
 class FileRepository(Repository):
-    def __init__(self, base_path: str = "data/engagements"):
+    def __init__(
+        self,
+        base_path: str = "data/engagements",
+        storage_mode: str = STORAGE_MODE_JOURNAL,
+        journal_min_compaction_bytes: int = JOURNAL_MIN_COMPACTION_BYTES
+    ):
+        if storage_mode not in (STORAGE_MODE_SNAPSHOT, STORAGE_MODE_JOURNAL):
+            raise ValueError(f"Unknown FileRepository storage mode: {storage_mode}")
         self.base_path = Path(base_path)
         self.base_path.mkdir(parents=True, exist_ok=True)
+        self.storage_mode = storage_mode
+        self.journal_min_compaction_bytes = journal_min_compaction_bytes
         self._lock = threading.RLock()
         self._db_file = self.base_path / "db.json"
+        self._journal_dir = self.base_path / "journal"
+        self._journal_handles: Dict[str, object] = {}
+        self._journal_bytes = 0
+        self._indexes = RepositoryIndexes()
         self._load_db()
 
     def _load_db(self):
-        """Load the database from file or create empty structure"""
+        """Load the snapshot, replay any journal tail, or create empty structure"""
         if self._db_file.exists():
             try:
                 with open(self._db_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                     self._db = {
-                        "engagements": {k: Engagement(**v) for k, v in data.get("engagements", {}).items()},
-                        "memberships": {k: Membership(**v) for k, v in data.get("memberships", {}).items()},
-                        "assessments": {k: Assessment(**v) for k, v in data.get("assessments", {}).items()},
-                        "questions": {k: Question(**v) for k, v in data.get("questions", {}).items()},
-                        "responses": {k: Response(**v) for k, v in data.get("responses", {}).items()},
-                        "findings": {k: Finding(**v) for k, v in data.get("findings", {}).items()},
-                        "recommendations": {k: Recommendation(**v) for k, v in data.get("recommendations", {}).items()},
-                        "runlogs": {k: RunLog(**v) for k, v in data.get("runlogs", {}).items()},
-                        "documents": {k: Document(**v) for k, v in data.get("documents", {}).items()}
+                        collection: {k: model(**v) for k, v in data.get(collection, {}).items()}
+                        for collection, model in MODEL_TYPES.items()
                     }
             except (json.JSONDecodeError, OSError) as e:
                 logger.error(f"Failed to load database from {self._db_file}: {e}")
@@ -58,22 +87,152 @@ class FileRepository(Repository):
                 self._init_empty_db()
         else:
             self._init_empty_db()
+
+        replayed = self._replay_journals()
+        if replayed and self.storage_mode == STORAGE_MODE_SNAPSHOT:
+            # Fold journals left by journal mode into the snapshot so they are
+            # not replayed over later snapshot-mode writes
+            self._compact()
+        self._indexes.rebuild(self._db)
     
     def _init_empty_db(self):
         """Initialize an empty database structure"""
-        self._db = {
-            "engagements": {},
-            "memberships": {},
-            "assessments": {},
-            "questions": {},
-            "responses": {},
-            "findings": {},
-            "recommendations": {},
-            "runlogs": {},
-            "documents": {}
-        }
+        self._db = {collection: {} for collection in MODEL_TYPES}
         self._save_db()
 
+    def _put(self, collection: str, item):
+        """Insert or replace a record and keep the secondary indexes in step"""
+        items = self._db[collection]
+        self._indexes.put(collection, items.get(item.id), item)
+        items[item.id] = item
+
+    def _journal_path(self, collection: str) -> Path:
+        return self._journal_dir / f"{collection}.jsonl"
+
+    def _replay_journals(self) -> int:
+        """Apply journal records written after the snapshot, returning the count applied
+
+        Each line is one mutation batch. A torn final line from a crash
+        mid-append is discarded, so a batch is applied entirely or not at
+        all, matching the atomic-replace guarantee of snapshot mode.
+        """
+        applied = 0
+        self._journal_bytes = 0
+        for collection, model in MODEL_TYPES.items():
+            path = self._journal_path(collection)
+            if not path.exists():
+                continue
+
+            items = self._db[collection]
+            valid_bytes = 0
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        logger.warning(f"Discarding incomplete trailing record in {path}")
+                        break
+                    valid_bytes += len(line)
+                    try:
+                        record = json.loads(line)
+                        for k, v in record.get("put", {}).items():
+                            items[k] = model(**v)
+                        for k in record.get("delete", []):
+                            items.pop(k, None)
+                    except Exception as e:
+                        logger.error(f"Skipping unreadable journal record in {path}: {e}")
+                        continue
+                    applied += 1
+
+            if valid_bytes < path.stat().st_size:
+                # Drop the torn tail so later appends start on a clean line
+                with open(path, 'r+b') as f:
+                    f.truncate(valid_bytes)
+            self._journal_bytes += valid_bytes
+
+        if applied:
+            logger.info(f"Replayed {applied} journal records from {self._journal_dir}")
+        return applied
+
+    def _persist(self, collection: str, put: Iterable = (), delete: Iterable[str] = ()):
+        """Persist one mutation batch for a collection
+
+        In journal mode this appends a single JSONL record and fsyncs the
+        journal, so the cost is O(record) rather than O(database).
+        """
+        if self.storage_mode == STORAGE_MODE_SNAPSHOT:
+            self._save_db()
+            return
+
+        record = {}
+        put = {item.id: item.model_dump(mode='json') for item in put}
+        if put:
+            record["put"] = put
+        delete = list(delete)
+        if delete:
+            record["delete"] = delete
+        line = (json.dumps(record, default=str) + "\n").encode('utf-8')
+
+        handle = self._journal_handles.get(collection)
+        if handle is None:
+            self._journal_dir.mkdir(parents=True, exist_ok=True)
+            path = self._journal_path(collection)
+            created = not path.exists()
+            handle = open(path, 'ab')
+            self._journal_handles[collection] = handle
+            if created:
+                self._fsync_dir(self._journal_dir)
+
+        handle.write(line)
+        handle.flush()
+        os.fsync(handle.fileno())
+        self._journal_bytes += len(line)
+
+        snapshot_bytes = self._db_file.stat().st_size if self._db_file.exists() else 0
+        if self._journal_bytes > max(self.journal_min_compaction_bytes, snapshot_bytes):
+            self._compact()
+
+    def _compact(self):
+        """Fold the journals into a new snapshot and truncate them
+
+        The snapshot is replaced atomically before the journals are
+        truncated; a crash in between only replays records already in the
+        snapshot, which is idempotent.
+        """
+        self._save_db()
+        for handle in self._journal_handles.values():
+            handle.close()
+        self._journal_handles.clear()
+        for collection in MODEL_TYPES:
+            path = self._journal_path(collection)
+            if path.exists():
+                with open(path, 'r+b') as f:
+                    f.truncate(0)
+                    os.fsync(f.fileno())
+        self._journal_bytes = 0
+        logger.debug(f"Compacted journals into {self._db_file}")
+
+    def compact(self):
+        """Fold pending journal records into the db.json snapshot"""
+        with self._lock:
+            if self.storage_mode == STORAGE_MODE_JOURNAL:
+                self._compact()
+
+    def close(self):
+        """Close open journal files"""
+        with self._lock:
+            for handle in self._journal_handles.values():
+                handle.close()
+            self._journal_handles.clear()
+
+    @staticmethod
+    def _fsync_dir(path: Path):
+        try:
+            dir_fd = os.open(path, os.O_RDONLY)
+            os.fsync(dir_fd)
+            os.close(dir_fd)
+        except (OSError, AttributeError):
+            # Directory fsync not supported on all platforms
+            pass
+
     def _save_db(self):
         """Save the database to file atomically"""
         data = {
@@ -103,13 +262,7 @@ class FileRepository(Repository):
             temp_file = None  # Successfully moved, don't clean up
             
             # Optionally fsync the directory (for maximum durability)
-            try:
-                dir_fd = os.open(self._db_file.parent, os.O_RDONLY)
-                os.fsync(dir_fd)
-                os.close(dir_fd)
-            except (OSError, AttributeError):
-                # Directory fsync not supported on all platforms
-                pass
+            self._fsync_dir(self._db_file.parent)
                 
         except Exception as e:
             logger.error(f"Failed to save database: {e}")
@@ -126,8 +279,8 @@ class FileRepository(Repository):
         with self._lock:
             if e.id in self._db["engagements"]:
                 raise ValueError(f"Engagement with ID {e.id} already exists")
-            self._db["engagements"][e.id] = e
-            self._save_db()
+            self._put("engagements", e)
+            self._persist("engagements", put=[e])
             return e
 
     def list_engagements_for_user(self, user_email: str, admin: bool) -> List[Engagement]:
@@ -136,27 +289,27 @@ class FileRepository(Repository):
                 return list(self._db["engagements"].values())
             else:
                 # Get engagements where user is a member
-                user_engagement_ids = {m.engagement_id for m in self._db["memberships"].values() 
-                                       if m.user_email.lower() == user_email.lower()}
-                return [e for e in self._db["engagements"].values() if e.id in user_engagement_ids]
+                memberships = self._db["memberships"]
+                engagements = self._db["engagements"]
+                user_engagement_ids = dict.fromkeys(
+                    memberships[mid].engagement_id
+                    for mid in self._indexes.ids("memberships", "email", user_email.lower())
+                )
+                return [engagements[eid] for eid in user_engagement_ids if eid in engagements]
 
     def add_membership(self, m: Membership) -> Membership:
         with self._lock:
             # Check if membership already exists
-            existing = [mem for mem in self._db["memberships"].values() 
-                        if mem.engagement_id == m.engagement_id and mem.user_email.lower() == m.user_email.lower()]
-            if existing:
+            if self._indexes.ids("memberships", "engagement_email", (m.engagement_id, m.user_email.lower())):
                 raise ValueError(f"User {m.user_email} is already a member of engagement {m.engagement_id}")
-            self._db["memberships"][m.id] = m
-            self._save_db()
+            self._put("memberships", m)
+            self._persist("memberships", put=[m])
             return m
 
     def get_membership(self, engagement_id: str, user_email: str) -> Optional[Membership]:
         with self._lock:
-            for m in self._db["memberships"].values():
-                if m.engagement_id == engagement_id and m.user_email.lower() == user_email.lower():
-                    return m
-            return None
+            ids = self._indexes.ids("memberships", "engagement_email", (engagement_id, user_email.lower()))
+            return self._db["memberships"][ids[0]] if ids else None
 
     # Assessment methods
     def create_assessment(self, a: Assessment) -> Assessment:
@@ -165,8 +318,8 @@ class FileRepository(Repository):
                 raise ValueError(f"Assessment with ID {a.id} already exists")
             if not hasattr(a, 'engagement_id') or not a.engagement_id:
                 raise ValueError("Assessment must have an engagement_id")
-            self._db["assessments"][a.id] = a
-            self._save_db()
+            self._put("assessments", a)
+            self._persist("assessments", put=[a])
             return a
 
     def get_assessment(self, assessment_id: str) -> Optional[Assessment]:
@@ -175,19 +328,19 @@ class FileRepository(Repository):
 
     def list_assessments(self, engagement_id: str) -> List[Assessment]:
         with self._lock:
-            return [a for a in self._db["assessments"].values() if a.engagement_id == engagement_id]
+            return self._indexes.lookup(self._db["assessments"], "assessments", "engagement", [engagement_id])
 
     # Question and Response methods
     def add_question(self, q: Question) -> Question:
         with self._lock:
-            self._db["questions"][q.id] = q
-            self._save_db()
+            self._put("questions", q)
+            self._persist("questions", put=[q])
             return q
 
     def save_response(self, r: Response) -> Response:
         with self._lock:
-            self._db["responses"][r.id] = r
-            self._save_db()
+            self._put("responses", r)
+            self._persist("responses", put=[r])
             return r
 
     # Finding methods
@@ -201,16 +354,16 @@ class FileRepository(Repository):
                 # Create a copy to avoid mutating the original
                 f_copy = f.model_copy()
                 f_copy.assessment_id = assessment_id
-                self._db["findings"][f_copy.id] = f_copy
+                self._put("findings", f_copy)
                 result.append(f_copy)
-            self._save_db()
+            self._persist("findings", put=result)
             return result
 
     def get_findings(self, engagement_id: str) -> List[Finding]:
         with self._lock:
             # Get all findings for assessments in this engagement
-            engagement_assessment_ids = {a.id for a in self._db["assessments"].values() if a.engagement_id == engagement_id}
-            return [f for f in self._db["findings"].values() if f.assessment_id in engagement_assessment_ids]
+            assessment_ids = self._indexes.ids("assessments", "engagement", engagement_id)
+            return self._indexes.lookup(self._db["findings"], "findings", "assessment", assessment_ids)
 
     # Recommendation methods
     def add_recommendations(self, assessment_id: str, items: List[Recommendation]) -> List[Recommendation]:
@@ -228,16 +381,16 @@ class FileRepository(Repository):
                 # Create a copy to avoid mutating the original
                 rec_copy = rec.model_copy()
                 rec_copy.assessment_id = assessment_id
-                self._db["recommendations"][rec_copy.id] = rec_copy
+                self._put("recommendations", rec_copy)
                 result.append(rec_copy)
-            self._save_db()
+            self._persist("recommendations", put=result)
             return result
 
     def get_recommendations(self, engagement_id: str) -> List[Recommendation]:
         with self._lock:
             # Get all recommendations for assessments in this engagement
-            engagement_assessment_ids = {a.id for a in self._db["assessments"].values() if a.engagement_id == engagement_id}
-            return [r for r in self._db["recommendations"].values() if r.assessment_id in engagement_assessment_ids]
+            assessment_ids = self._indexes.ids("assessments", "engagement", engagement_id)
+            return self._indexes.lookup(self._db["recommendations"], "recommendations", "assessment", assessment_ids)
 
     # RunLog methods
     def add_runlog(self, log: RunLog) -> RunLog:
@@ -245,26 +398,26 @@ class FileRepository(Repository):
             # Validate required fields
             if not log.assessment_id:
                 raise ValueError("RunLog must have an assessment_id")
-            self._db["runlogs"][log.id] = log
-            self._save_db()
+            self._put("runlogs", log)
+            self._persist("runlogs", put=[log])
             return log
 
     def get_runlogs(self, engagement_id: str) -> List[RunLog]:
         with self._lock:
             # Get all runlogs for assessments in this engagement
-            engagement_assessment_ids = {a.id for a in self._db["assessments"].values() if a.engagement_id == engagement_id}
-            return [log for log in self._db["runlogs"].values() if log.assessment_id in engagement_assessment_ids]
+            assessment_ids = self._indexes.ids("assessments", "engagement", engagement_id)
+            return self._indexes.lookup(self._db["runlogs"], "runlogs", "assessment", assessment_ids)
     
     # Document methods
     def add_document(self, d: Document) -> Document:
         with self._lock:
-            self._db["documents"][d.id] = d
-            self._save_db()
+            self._put("documents", d)
+            self._persist("documents", put=[d])
             return d
     
     def list_documents(self, engagement_id: str) -> List[Document]:
         with self._lock:
-            return [d for d in self._db["documents"].values() if d.engagement_id == engagement_id]
+            return self._indexes.lookup(self._db["documents"], "documents", "engagement", [engagement_id])
     
     def get_document(self, engagement_id: str, doc_id: str) -> Optional[Document]:
         with self._lock:
@@ -295,5 +448,6 @@ class FileRepository(Repository):
             
             # Always remove from database even if file deletion failed
             self._db["documents"].pop(doc_id, None)
-            self._save_db()
+            self._indexes.remove("documents", doc)
+            self._persist("documents", delete=[doc_id])
             return True
@@ -0,0 +1,100 @@
+"""
+Secondary indexes for the local repositories.
+
+FileRepository and InMemoryRepository keep each collection as an id -> model
+dict. The indexes here map a lookup key (engagement id, assessment id,
+lowercased email) to the ids of matching records, so per-engagement reads
+cost O(result) instead of a scan of every collection. Callers update the
+indexes on every mutation and rebuild them after loading from disk.
+"""
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+
+class SecondaryIndex:
+    """Maps a derived key to the ids of the records that carry it
+
+    Ids are kept in insertion-ordered dicts so lookups return records in the
+    order they were added, like the collection scans they replace.
+    """
+
+    def __init__(self, key_fn: Callable[[Any], Optional[Hashable]]):
+        self._key_fn = key_fn
+        self._ids: Dict[Hashable, Dict[str, None]] = {}
+
+    def add(self, item: BaseModel) -> None:
+        key = self._key_fn(item)
+        if key is not None:
+            self._ids.setdefault(key, {})[item.id] = None
+
+    def remove(self, item: BaseModel) -> None:
+        key = self._key_fn(item)
+        ids = self._ids.get(key)
+        if ids is not None:
+            ids.pop(item.id, None)
+            if not ids:
+                del self._ids[key]
+
+    def replace(self, old: Optional[BaseModel], new: BaseModel) -> None:
+        if old is not None:
+            if self._key_fn(old) == self._key_fn(new):
+                return
+            self.remove(old)
+        self.add(new)
+
+    def ids(self, key: Hashable) -> List[str]:
+        return list(self._ids.get(key, ()))
+
+    def clear(self) -> None:
+        self._ids.clear()
+
+
+# collection -> index name -> key function
+INDEX_DEFINITIONS: Dict[str, Dict[str, Callable[[Any], Optional[Hashable]]]] = {
+    "assessments": {"engagement": lambda a: a.engagement_id},
+    "findings": {"assessment": lambda f: f.assessment_id},
+    "recommendations": {"assessment": lambda r: r.assessment_id},
+    "runlogs": {"assessment": lambda log: log.assessment_id},
+    "documents": {"engagement": lambda d: d.engagement_id},
+    "memberships": {
+        "email": lambda m: m.user_email.lower(),
+        "engagement_email": lambda m: (m.engagement_id, m.user_email.lower()),
+    },
+}
+
+
+class RepositoryIndexes:
+    """All secondary indexes for one repository"""
+
+    def __init__(self):
+        self._indexes: Dict[str, Dict[str, SecondaryIndex]] = {
+            collection: {name: SecondaryIndex(key_fn) for name, key_fn in indexes.items()}
+            for collection, indexes in INDEX_DEFINITIONS.items()
+        }
+
+    def put(self, collection: str, old: Optional[BaseModel], new: BaseModel) -> None:
+        """Record that new replaced old (or was inserted when old is None)"""
+        for index in self._indexes.get(collection, {}).values():
+            index.replace(old, new)
+
+    def remove(self, collection: str, item: BaseModel) -> None:
+        for index in self._indexes.get(collection, {}).values():
+            index.remove(item)
+
+    def rebuild(self, collections: Dict[str, Dict[str, BaseModel]]) -> None:
+        """Rebuild every index from the full collections, e.g. after a load"""
+        for collection, indexes in self._indexes.items():
+            items = collections.get(collection, {}).values()
+            for index in indexes.values():
+                index.clear()
+                for item in items:
+                    index.add(item)
+
+    def ids(self, collection: str, name: str, key: Hashable) -> List[str]:
+        return self._indexes[collection][name].ids(key)
+
+    def lookup(self, items: Dict[str, BaseModel], collection: str, name: str, keys: Iterable[Hashable]) -> List[BaseModel]:
+        """Records of a collection whose index key is in keys"""
+        index = self._indexes[collection][name]
+        return [items[item_id] for key in keys for item_id in index.ids(key)]
@@ -4,6 +4,7 @@ sys.path.append("/app")
 import threading
 import logging
 from typing import Dict, List, Optional, Tuple
+from domain.indexes import RepositoryIndexes
 from domain.models import Assessment, Question, Response, Finding, Recommendation, RunLog, Engagement, Membership, Document, Workshop, ConsentRecord, Minutes, ChatMessage, RunCard
 
 logger = logging.getLogger(__name__)
@@ -67,15 +68,23 @@ class InMemoryRepository(Repository):
         self.memberships: Dict[str, Membership] = {}
         self.documents: Dict[str, Document] = {}
         self.minutes: Dict[str, Minutes] = {}
+        # Secondary indexes for per-engagement reads
+        self._indexes = RepositoryIndexes()
         # Thread safety lock
         self._lock = threading.RLock()
 
+    def _put(self, collection: str, item) -> None:
+        """Insert or replace a record and keep the secondary indexes in step"""
+        items = getattr(self, collection)
+        self._indexes.put(collection, items.get(item.id), item)
+        items[item.id] = item
+
     # Engagement & Membership methods
     def create_engagement(self, e: Engagement) -> Engagement:
         with self._lock:
             if e.id in self.engagements:
                 raise ValueError(f"Engagement with ID {e.id} already exists")
-            self.engagements[e.id] = e
+            self._put("engagements", e)
             return e
 
     def list_engagements_for_user(self, user_email: str, admin: bool) -> List[Engagement]:
@@ -84,33 +93,31 @@ class InMemoryRepository(Repository):
                 return list(self.engagements.values())
             else:
                 # Get engagements where user is a member
-                user_engagement_ids = {m.engagement_id for m in self.memberships.values() 
-                                       if m.user_email.lower() == user_email.lower()}
-                return [e for e in self.engagements.values() if e.id in user_engagement_ids]
+                user_engagement_ids = dict.fromkeys(
+                    self.memberships[mid].engagement_id
+                    for mid in self._indexes.ids("memberships", "email", user_email.lower())
+                )
+                return [self.engagements[eid] for eid in user_engagement_ids if eid in self.engagements]
 
     def add_membership(self, m: Membership) -> Membership:
         with self._lock:
             # Check if membership already exists
-            existing = [mem for mem in self.memberships.values() 
-                        if mem.engagement_id == m.engagement_id and mem.user_email.lower() == m.user_email.lower()]
-            if existing:
+            if self._indexes.ids("memberships", "engagement_email", (m.engagement_id, m.user_email.lower())):
                 raise ValueError(f"User {m.user_email} is already a member of engagement {m.engagement_id}")
-            self.memberships[m.id] = m
+            self._put("memberships", m)
             return m
 
     def get_membership(self, engagement_id: str, user_email: str) -> Optional[Membership]:
         with self._lock:
-            for m in self.memberships.values():
-                if m.engagement_id == engagement_id and m.user_email.lower() == user_email.lower():
-                    return m
-            return None
+            ids = self._indexes.ids("memberships", "engagement_email", (engagement_id, user_email.lower()))
+            return self.memberships[ids[0]] if ids else None
 
     def create_assessment(self, a: Assessment) -> Assessment:
         with self._lock:
             # Check if assessment already exists
             if a.id in self.assessments:
                 raise ValueError(f"Assessment with ID {a.id} already exists")
-            self.assessments[a.id] = a
+            self._put("assessments", a)
             return a
 
     def get_assessment(self, assessment_id: str) -> Optional[Assessment]:
@@ -119,29 +126,29 @@ class InMemoryRepository(Repository):
 
     def list_assessments(self, engagement_id: str) -> List[Assessment]:
         with self._lock:
-            return [a for a in self.assessments.values() if a.engagement_id == engagement_id]
+            return self._indexes.lookup(self.assessments, "assessments", "engagement", [engagement_id])
 
     def add_question(self, q: Question) -> Question:
         with self._lock:
-            self.questions[q.id] = q
+            self._put("questions", q)
             return q
 
     def save_response(self, r: Response) -> Response:
         with self._lock:
-            self.responses[r.id] = r
+            self._put("responses", r)
             return r
 
-    def add_findings(self, engagement_id: str, items: List[Finding]) -> List[Finding]:
+    def add_findings(self, assessment_id: str, items: List[Finding]) -> List[Finding]:
         with self._lock:
             result = []
             for f in items:
-                # Validate engagement_id consistency
-                if f.engagement_id and f.engagement_id != engagement_id:
-                    raise ValueError(f"Finding {f.id} has mismatched engagement_id: {f.engagement_id} != {engagement_id}")
+                # Validate assessment_id consistency
+                if f.assessment_id and f.assessment_id != assessment_id:
+                    raise ValueError(f"Finding {f.id} has mismatched assessment_id: {f.assessment_id} != {assessment_id}")
                 # Create a copy to avoid mutating the original
                 f_copy = f.model_copy()
-                f_copy.engagement_id = engagement_id
-                self.findings[f_copy.id] = f_copy
+                f_copy.assessment_id = assessment_id
+                self._put("findings", f_copy)
                 result.append(f_copy)
             return result
 
@@ -160,7 +167,7 @@ class InMemoryRepository(Repository):
                 # Create a copy to avoid mutating the original
                 rec_copy = rec.model_copy()
                 rec_copy.assessment_id = assessment_id
-                self.recommendations[rec_copy.id] = rec_copy
+                self._put("recommendations", rec_copy)
                 result.append(rec_copy)
             return result
 
@@ -169,38 +176,38 @@ class InMemoryRepository(Repository):
             # Validate required fields
             if not log.assessment_id:
                 raise ValueError("RunLog must have an assessment_id")
-            self.runlogs[log.id] = log
+            self._put("runlogs", log)
             return log
 
     def get_findings(self, engagement_id: str) -> List[Finding]:
         with self._lock:
             # Get all findings for assessments in this engagement
-            engagement_assessment_ids = {a.id for a in self.assessments.values() if a.engagement_id == engagement_id}
-            return [f for f in self.findings.values() if f.assessment_id in engagement_assessment_ids]
+            assessment_ids = self._indexes.ids("assessments", "engagement", engagement_id)
+            return self._indexes.lookup(self.findings, "findings", "assessment", assessment_ids)
 
     def get_recommendations(self, engagement_id: str) -> List[Recommendation]:
         with self._lock:
             # Get all recommendations for assessments in this engagement
-            engagement_assessment_ids = {a.id for a in self.assessments.values() if a.engagement_id == engagement_id}
-            return [r for r in self.recommendations.values() if r.assessment_id in engagement_assessment_ids]
+            assessment_ids = self._indexes.ids("assessments", "engagement", engagement_id)
+            return self._indexes.lookup(self.recommendations, "recommendations", "assessment", assessment_ids)
 
     def get_runlogs(self, engagement_id: str) -> List[RunLog]:
         with self._lock:
             # Get all runlogs for assessments in this engagement
-            engagement_assessment_ids = {a.id for a in self.assessments.values() if a.engagement_id == engagement_id}
-            return [log for log in self.runlogs.values() if log.assessment_id in engagement_assessment_ids]
+            assessment_ids = self._indexes.ids("assessments", "engagement", engagement_id)
+            return self._indexes.lookup(self.runlogs, "runlogs", "assessment", assessment_ids)
     
     # Document methods
     def add_document(self, d: Document) -> Document:
         with self._lock:
             if d.id in self.documents:
                 raise ValueError(f"Document with ID {d.id} already exists")
-            self.documents[d.id] = d
+            self._put("documents", d)
             return d
     
     def list_documents(self, engagement_id: str) -> List[Document]:
         with self._lock:
-            return [d for d in self.documents.values() if d.engagement_id == engagement_id]
+            return self._indexes.lookup(self.documents, "documents", "engagement", [engagement_id])
     
     def get_document(self, engagement_id: str, doc_id: str) -> Optional[Document]:
         with self._lock:
@@ -223,6 +230,7 @@ class InMemoryRepository(Repository):
                     logger.warning(f"Failed to delete file {doc.path} for document {doc_id} in engagement {engagement_id}: {e}")
             # Always remove document from memory even if file deletion failed
             del self.documents[doc_id]
+            self._indexes.remove("documents", doc)
             return True
     
     # Minutes methods
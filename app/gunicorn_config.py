@@ -43,6 +43,8 @@ keyfile = None
 certfile = None
 
 # Preload application for better performance
+# Each worker still holds its own in-process caches; set CACHE_SHARED_BACKEND=sqlite
+# to share cached values and propagate invalidations between workers
 preload_app = True
 
 def when_ready(server):
@@ -0,0 +1,275 @@
+"""
+Bulk deletion engine for Cosmos DB
+
+Deletes items in transactional batches (up to 100 operations, one partition
+key per batch) with a bounded number of batches in flight. RU consumption is
+paced to an optional per-second target, and throttled batches (429) back off
+for the service's retry-after interval before being retried.
+
+Items may span partitions (e.g. runlogs are partitioned by assessment), so
+the engine takes (item ID, partition key) pairs and fills one batch per
+partition key.
+
+Deletes are idempotent, so resuming only needs to know which containers are
+finished: re-querying a partly deleted container returns just the items that
+remain. Items already gone (404) are counted and dropped from their batch;
+callers that need the container empty should check what remains.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from azure.cosmos.exceptions import CosmosBatchOperationError, CosmosHttpResponseError
+
+import api.database_errors as database_errors
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Cosmos DB limit on operations per transactional batch
+MAX_BATCH_OPERATIONS = 100
+
+RETRY_AFTER_HEADER = "x-ms-retry-after-ms"
+
+# Runs one transactional batch against a partition key and returns its RU charge
+BatchExecutor = Callable[[List[Tuple[str, Tuple[Any, ...]]], Any], Awaitable[float]]
+
+
+@dataclass
+class DeletionMetrics:
+    """Deletion progress and throughput for one container"""
+    container: str
+    deleted: int = 0
+    not_found: int = 0
+    batches: int = 0
+    throttled: int = 0
+    request_charge: float = 0.0
+    elapsed_seconds: float = 0.0
+    completed: bool = False
+
+    @property
+    def items_per_second(self) -> float:
+        return self.deleted / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    @property
+    def ru_per_second(self) -> float:
+        return self.request_charge / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **asdict(self),
+            "request_charge": round(self.request_charge, 2),
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "items_per_second": round(self.items_per_second, 1),
+            "ru_per_second": round(self.ru_per_second, 1)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DeletionMetrics":
+        fields = cls.__dataclass_fields__
+        return cls(**{key: value for key, value in data.items() if key in fields})
+
+
+class RequestUnitPacer:
+    """Spaces out work so RU consumption averages at most ru_per_second (0 = unlimited)"""
+
+    def __init__(self, ru_per_second: float = 0):
+        self.ru_per_second = ru_per_second
+        self._available_at = 0.0
+
+    async def wait(self) -> None:
+        delay = self._available_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def consume(self, request_charge: float) -> None:
+        if self.ru_per_second > 0:
+            self._available_at = max(self._available_at, time.monotonic()) + request_charge / self.ru_per_second
+
+
+class BulkDeleteEngine:
+    """Deletes items in parallel transactional batches, one partition key per batch"""
+
+    def __init__(
+        self,
+        max_parallel_batches: int = 4,
+        batch_size: int = MAX_BATCH_OPERATIONS,
+        max_ru_per_second: float = 0,
+        max_retries: int = 8,
+        progress_interval_seconds: float = 1.0
+    ):
+        self.max_parallel_batches = max(1, max_parallel_batches)
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_OPERATIONS))
+        self.max_retries = max_retries
+        self.progress_interval_seconds = progress_interval_seconds
+        self.pacer = RequestUnitPacer(max_ru_per_second)
+
+    async def delete(
+        self,
+        item_ids: Union[AsyncIterable[str], Iterable[str]],
+        partition_key: str,
+        execute_batch: BatchExecutor,
+        metrics: DeletionMetrics,
+        on_progress: Optional[Callable[[DeletionMetrics], Awaitable[None]]] = None
+    ) -> DeletionMetrics:
+        """Delete every ID from item_ids, all in one partition, and return the updated metrics"""
+        async def items():
+            async for item_id in _aiter(item_ids):
+                yield item_id, partition_key
+
+        return await self.delete_items(items(), execute_batch, metrics, on_progress)
+
+    async def delete_items(
+        self,
+        items: Union[AsyncIterable[Tuple[str, Any]], Iterable[Tuple[str, Any]]],
+        execute_batch: BatchExecutor,
+        metrics: DeletionMetrics,
+        on_progress: Optional[Callable[[DeletionMetrics], Awaitable[None]]] = None
+    ) -> DeletionMetrics:
+        """
+        Delete every (item ID, partition key) pair and return the updated metrics
+
+        Items are consumed as batches free up, so a paged query feeding this
+        is never read far ahead of the deletes. Partially filled batches are
+        held per partition key until they fill or the items run out.
+        """
+        slots = asyncio.Semaphore(self.max_parallel_batches)
+        tasks: set = set()
+        failure: List[BaseException] = []
+        started = time.perf_counter()
+        elapsed_before = metrics.elapsed_seconds
+        last_progress = time.monotonic()
+
+        async def run(batch: List[str], partition_key: Any):
+            nonlocal last_progress
+            try:
+                await self._delete_batch(batch, partition_key, execute_batch, metrics)
+                metrics.elapsed_seconds = elapsed_before + time.perf_counter() - started
+                if on_progress is not None and time.monotonic() - last_progress >= self.progress_interval_seconds:
+                    last_progress = time.monotonic()
+                    await on_progress(metrics)
+            except BaseException as e:
+                failure.append(e)
+            finally:
+                slots.release()
+
+        async def submit(batch: List[str], partition_key: Any):
+            await slots.acquire()
+            if failure:
+                slots.release()
+                return
+            task = asyncio.create_task(run(batch, partition_key))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        try:
+            batches: Dict[Any, List[str]] = {}
+            async for item_id, partition_key in _aiter(items):
+                batch = batches.setdefault(partition_key, [])
+                batch.append(item_id)
+                if len(batch) == self.batch_size:
+                    await submit(batches.pop(partition_key), partition_key)
+                if failure:
+                    break
+            for partition_key, batch in batches.items():
+                if failure:
+                    break
+                await submit(batch, partition_key)
+            await asyncio.gather(*list(tasks))
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            metrics.elapsed_seconds = elapsed_before + time.perf_counter() - started
+
+        if failure:
+            raise failure[0]
+        return metrics
+
+    async def _delete_batch(
+        self,
+        item_ids: List[str],
+        partition_key: Any,
+        execute_batch: BatchExecutor,
+        metrics: DeletionMetrics
+    ) -> None:
+        pending = list(item_ids)
+        attempt = 0
+        while pending:
+            await self.pacer.wait()
+            try:
+                request_charge = await execute_batch([("delete", (item_id,)) for item_id in pending], partition_key)
+            except CosmosBatchOperationError as e:
+                if e.status_code == 429:
+                    attempt = await self._back_off(e, attempt, metrics)
+                    continue
+                failed = _failed_operation_status(e)
+                if failed is not None and failed[1] == 404:
+                    # Already deleted; the rest of the batch was rolled back, so retry it
+                    pending.pop(failed[0])
+                    metrics.not_found += 1
+                    continue
+                raise
+            except CosmosHttpResponseError as e:
+                if not database_errors.is_retryable_error(e):
+                    raise
+                attempt = await self._back_off(e, attempt, metrics)
+                continue
+
+            metrics.deleted += len(pending)
+            metrics.batches += 1
+            metrics.request_charge += request_charge
+            self.pacer.consume(request_charge)
+            return
+
+    async def _back_off(self, error: Exception, attempt: int, metrics: DeletionMetrics) -> int:
+        if attempt >= self.max_retries:
+            raise error
+        if getattr(error, "status_code", None) == 429:
+            metrics.throttled += 1
+        delay = _retry_after_seconds(error)
+        if delay is None:
+            delay = database_errors.calculate_retry_delay(attempt)
+        logger.debug(
+            "Bulk delete batch backing off",
+            extra={"container": metrics.container, "attempt": attempt + 1, "delay_seconds": delay}
+        )
+        await asyncio.sleep(delay)
+        return attempt + 1
+
+
+def create_bulk_delete_engine() -> BulkDeleteEngine:
+    """Engine configured from CosmosConfig"""
+    return BulkDeleteEngine(
+        max_parallel_batches=config.cosmos.bulk_delete_parallelism,
+        max_ru_per_second=config.cosmos.bulk_delete_max_ru_per_second
+    )
+
+
+def _failed_operation_status(error: CosmosBatchOperationError) -> Optional[Tuple[int, int]]:
+    """(index, status code) of the operation that failed a batch"""
+    index = error.error_index
+    responses = error.operation_responses or []
+    if index is None or index >= len(responses):
+        return None
+    return index, responses[index].get("statusCode")
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    headers = getattr(error, "headers", None) or {}
+    try:
+        value = headers.get(RETRY_AFTER_HEADER)
+        return float(value) / 1000 if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def _aiter(items: Union[AsyncIterable[Any], Iterable[Any]]):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
@@ -0,0 +1,322 @@
+"""
+Shared async Cosmos DB client
+
+Provides the process-wide azure.cosmos.aio client used by CosmosRepository:
+- One client (and one aiohttp connection pool) per event loop in the process
+- Tunable connection limits
+- Lazy, once-per-process container creation
+- Request unit (RU) accounting with an optional per-request budget
+
+Set COSMOS_KEY (and COSMOS_CONNECTION_VERIFY=false) to point the client at
+the local Cosmos DB emulator instead of using managed identity.
+"""
+
+import asyncio
+import base64
+import logging
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from azure.cosmos import PartitionKey
+from azure.cosmos.aio import CosmosClient, ContainerProxy, DatabaseProxy
+
+from api.database_errors import RequestUnitBudgetExceededError
+from config import config
+
+logger = logging.getLogger(__name__)
+
+REQUEST_CHARGE_HEADER = "x-ms-request-charge"
+
+# Container name -> partition key path and default TTL (None: no TTL, -1: per item)
+CONTAINER_CONFIGS: Dict[str, Dict[str, Any]] = {
+    "engagements": {"partition_key": "/id", "ttl": None},
+    "memberships": {"partition_key": "/engagement_id", "ttl": None},
+    "assessments": {"partition_key": "/engagement_id", "ttl": None},
+    "questions": {"partition_key": "/assessment_id", "ttl": None},
+    "responses": {"partition_key": "/assessment_id", "ttl": None},
+    "findings": {"partition_key": "/assessment_id", "ttl": None},
+    "recommendations": {"partition_key": "/assessment_id", "ttl": None},
+    "documents": {"partition_key": "/engagement_id", "ttl": None},
+    "runlogs": {"partition_key": "/assessment_id", "ttl": 7776000},  # 90 days
+    "background_jobs": {"partition_key": "/created_by", "ttl": -1},
+    "audit_logs": {"partition_key": "/engagement_id", "ttl": 220752000},  # 7 years
+    "embeddings": {"partition_key": "/engagement_id", "ttl": 31536000},  # 1 year
+    "workshops": {"partition_key": "/engagement_id", "ttl": None},
+    "minutes": {"partition_key": "/workshop_id", "ttl": None},
+    "evidence": {"partition_key": "/engagement_id", "ttl": None},
+    "counters": {"partition_key": "/id", "ttl": None},
+}
+
+DEFAULT_CONTAINER_CONFIG: Dict[str, Any] = {"partition_key": "/engagement_id", "ttl": None}
+
+
+def partition_key_field(container_name: str) -> str:
+    """Item field holding a container's partition key, e.g. "assessment_id" for runlogs"""
+    return CONTAINER_CONFIGS.get(container_name, DEFAULT_CONTAINER_CONFIG)["partition_key"].lstrip("/")
+
+
+def encode_cursor(continuation_token: Optional[str]) -> Optional[str]:
+    """Wrap a Cosmos continuation token as an opaque, URL-safe API cursor"""
+    if not continuation_token:
+        return None
+    return base64.urlsafe_b64encode(continuation_token.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[str]:
+    """Continuation token for an API cursor; raises ValueError if malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.b64decode(padded.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+
+class RequestChargeTracker:
+    """
+    Accumulates RU charges for one unit of work (typically one API request)
+
+    The SDK reports each response's charge through response_hook; callers
+    check the budget after every operation so a runaway query fails fast
+    instead of draining the container's throughput.
+    """
+
+    def __init__(self, budget_ru: Optional[float] = None):
+        self.budget_ru = budget_ru
+        self.total_ru = 0.0
+        self.operations = 0
+
+    def record(self, headers: Mapping[str, Any]) -> float:
+        try:
+            charge = float(headers.get(REQUEST_CHARGE_HEADER, 0) or 0)
+        except (TypeError, ValueError):
+            charge = 0.0
+        self.total_ru += charge
+        self.operations += 1
+        return charge
+
+    def hook(self) -> Callable[[Mapping[str, Any], Any], None]:
+        """response_hook for azure.cosmos.aio calls"""
+        def response_hook(headers: Mapping[str, Any], _result: Any) -> None:
+            self.record(headers)
+        return response_hook
+
+    def check(self, context: str = "") -> None:
+        """Raise once the accumulated charge exceeds the budget"""
+        if self.budget_ru and self.total_ru > self.budget_ru:
+            raise RequestUnitBudgetExceededError(self.total_ru, self.budget_ru, context)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ru": round(self.total_ru, 2),
+            "operations": self.operations,
+            "budget_ru": self.budget_ru
+        }
+
+
+# Tracker for the current unit of work; the performance middleware starts one
+# per HTTP request so charges and budgets never leak between requests. Tasks
+# inherit it, so background work (audit flushes, cache refreshes, jobs) is
+# started in a fresh contextvars.Context() to stay off the request's budget.
+_request_charge: ContextVar[Optional[RequestChargeTracker]] = ContextVar("cosmos_request_charge", default=None)
+
+
+def begin_request_charge(budget_ru: Optional[float] = None) -> RequestChargeTracker:
+    """Start RU accounting for the current request or job and return its tracker"""
+    tracker = RequestChargeTracker(budget_ru)
+    _request_charge.set(tracker)
+    return tracker
+
+
+def current_request_charge() -> Optional[RequestChargeTracker]:
+    """Tracker started by begin_request_charge in this context, if any"""
+    return _request_charge.get()
+
+
+@dataclass
+class _LoopClient:
+    """Client, database proxy and container proxies bound to one event loop"""
+    client: Any
+    database: Any
+    # AAD credential, which the Cosmos client does not close
+    credential: Optional[Any] = None
+    containers: Dict[str, ContainerProxy] = field(default_factory=dict)
+    container_locks: Dict[str, asyncio.Lock] = field(default_factory=dict)
+
+    async def close(self) -> None:
+        try:
+            await self.client.close()
+        finally:
+            if self.credential is not None:
+                await self.credential.close()
+
+
+class CosmosClientPool:
+    """
+    Process-wide async Cosmos clients with cached container proxies
+
+    aiohttp sessions are bound to the event loop that created them, so each
+    loop that uses the pool (the application loop, the asyncio.run sync
+    wrappers, a fresh test loop) gets its own client. A client is closed once
+    its loop has closed, or by close(), never while its loop may still have
+    queries in flight.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        database_name: str,
+        key: Optional[str] = None,
+        connection_limit: int = 100,
+        connection_limit_per_host: int = 0,
+        connection_verify: bool = True,
+        client_factory: Optional[Callable[[], Any]] = None
+    ):
+        self.endpoint = endpoint
+        self.database_name = database_name
+        self.key = key
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.connection_verify = connection_verify
+        self._client_factory = client_factory
+
+        self._clients: Dict[asyncio.AbstractEventLoop, _LoopClient] = {}
+
+    def _create_client(self, credential: Any) -> CosmosClient:
+        """Build an aio CosmosClient whose transport caps open connections"""
+        import aiohttp
+        from azure.core.pipeline.transport import AioHttpTransport
+
+        connector = aiohttp.TCPConnector(
+            limit=self.connection_limit,
+            limit_per_host=self.connection_limit_per_host,
+            ssl=self.connection_verify
+        )
+        transport = AioHttpTransport(session=aiohttp.ClientSession(connector=connector), session_owner=True)
+        return CosmosClient(
+            url=self.endpoint,
+            credential=credential,
+            transport=transport,
+            connection_verify=self.connection_verify
+        )
+
+    def _open(self) -> _LoopClient:
+        if self._client_factory is not None:
+            client, credential = self._client_factory(), None
+        elif self.key:
+            client, credential = self._create_client(self.key), None
+        else:
+            from azure.identity.aio import DefaultAzureCredential
+            credential = DefaultAzureCredential()
+            client = self._create_client(credential)
+        return _LoopClient(client, client.get_database_client(self.database_name), credential)
+
+    async def _ensure_client(self) -> _LoopClient:
+        loop = asyncio.get_running_loop()
+        current = self._clients.get(loop)
+        if current is None:
+            current = self._clients[loop] = self._open()
+            logger.info(
+                "Initialized async Cosmos DB client",
+                extra={
+                    "endpoint": self.endpoint,
+                    "database": self.database_name,
+                    "connection_limit": self.connection_limit
+                }
+            )
+            # Clients of finished loops (asyncio.run) have nothing in flight
+            for stale_loop in [l for l in list(self._clients) if l.is_closed()]:
+                stale = self._clients.pop(stale_loop, None)
+                if stale is not None:
+                    await self._close_quietly(stale)
+        return current
+
+    @staticmethod
+    async def _close_quietly(loop_client: _LoopClient) -> None:
+        try:
+            await loop_client.close()
+        except Exception as e:
+            logger.warning(f"Error closing Cosmos client: {e}")
+
+    async def get_container(self, name: str) -> ContainerProxy:
+        """
+        Container proxy for name
+
+        With key auth (emulator/dev) the container is created on first use if
+        it does not exist. Managed identity data-plane roles cannot create
+        containers, so they are expected to be provisioned already.
+        """
+        current = await self._ensure_client()
+        container = current.containers.get(name)
+        if container is not None:
+            return container
+
+        if not self.key:
+            container = current.database.get_container_client(name)
+            current.containers[name] = container
+            return container
+
+        lock = current.container_locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            container = current.containers.get(name)
+            if container is None:
+                settings = CONTAINER_CONFIGS.get(name, DEFAULT_CONTAINER_CONFIG)
+                options = {
+                    "id": name,
+                    "partition_key": PartitionKey(path=settings["partition_key"]),
+                    "offer_throughput": 400
+                }
+                if settings["ttl"] is not None:
+                    options["default_ttl"] = settings["ttl"]
+                container = await current.database.create_container_if_not_exists(**options)
+                current.containers[name] = container
+        return container
+
+    async def close(self) -> None:
+        """Close every loop's client (application shutdown)"""
+        loop = asyncio.get_running_loop()
+        clients = list(self._clients.items())
+        self._clients.clear()
+        for client_loop, loop_client in clients:
+            if client_loop is not loop and client_loop.is_running():
+                # Still serving another thread; close it there
+                asyncio.run_coroutine_threadsafe(loop_client.close(), client_loop)
+            else:
+                await self._close_quietly(loop_client)
+
+
+_pools: Dict[Tuple[str, str], CosmosClientPool] = {}
+
+
+def get_cosmos_client_pool(endpoint: Optional[str] = None, database_name: Optional[str] = None) -> CosmosClientPool:
+    """Shared client pool for an endpoint/database, configured from config.cosmos"""
+    endpoint = endpoint or config.cosmos.endpoint
+    database_name = database_name or config.cosmos.database
+    if not endpoint:
+        raise ValueError("COSMOS_ENDPOINT environment variable is required")
+
+    key = (endpoint, database_name)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = CosmosClientPool(
+            endpoint=endpoint,
+            database_name=database_name,
+            key=config.cosmos.key,
+            connection_limit=config.cosmos.connection_limit,
+            connection_limit_per_host=config.cosmos.connection_limit_per_host,
+            connection_verify=config.cosmos.connection_verify
+        )
+        _pools[key] = pool
+    return pool
+
+
+async def close_cosmos_client_pools() -> None:
+    """Close all shared clients (application shutdown)"""
+    for pool in list(_pools.values()):
+        try:
+            await pool.close()
+        except Exception as e:
+            logger.warning(f"Error closing Cosmos client: {e}")
+    _pools.clear()
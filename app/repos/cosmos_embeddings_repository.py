@@ -16,6 +16,8 @@ from azure.cosmos.exceptions import CosmosResourceNotFoundError, CosmosHttpRespo
 from azure.identity import DefaultAzureCredential
 
 from domain.models import EmbeddingDocument
+from repos.bulk_delete import DeletionMetrics, create_bulk_delete_engine
+from repos.vector_index import EngagementVectorIndex, get_vector_index_registry, HAS_NUMPY
 import sys
 sys.path.append("/app")
 from config import config
@@ -182,6 +184,7 @@ class CosmosEmbeddingsRepository:
             
             successful = 0
             errors = []
+            stored = []
             
             # Process embeddings in batches to avoid rate limits
             batch_size = 25  # Cosmos DB batch operation limit
@@ -210,6 +213,7 @@ class CosmosEmbeddingsRepository:
                             body=doc_dict
                         )
                         successful += 1
+                        stored.append(doc_dict)
                         
                     except CosmosHttpResponseError as e:
                         error_msg = f"Failed to store embedding {embedding.id}: {e.message}"
@@ -238,6 +242,8 @@ class CosmosEmbeddingsRepository:
                 if i + batch_size < len(embeddings):
                     await asyncio.sleep(0.1)
             
+            self._update_vector_index(stored)
+            
             logger.info(
                 "Completed embeddings storage",
                 extra={
@@ -297,56 +303,31 @@ class CosmosEmbeddingsRepository:
             
             start_time = time.time()
             
-            # Note: Cosmos DB doesn't have native vector search yet
-            # We'll implement a brute-force approach for now
-            # In production, consider Azure Cognitive Search for vector search
-            
-            # Query all embeddings for the engagement
-            query = {
-                "query": "SELECT * FROM c WHERE c.engagement_id = @engagement_id",
-                "parameters": [
-                    {"name": "@engagement_id", "value": engagement_id}
-                ]
-            }
-            
-            items = await asyncio.to_thread(
-                lambda: list(self.container.query_items(
-                    query=query["query"],
-                    parameters=query["parameters"],
-                    partition_key=engagement_id
-                ))
-            )
-            
-            # Calculate similarity scores
-            results = []
-            for item in items:
-                try:
-                    # Convert back to EmbeddingDocument
-                    embedding_doc = EmbeddingDocument(**item)
-                    
-                    # Calculate cosine similarity
-                    similarity = self._calculate_cosine_similarity(query_vector, embedding_doc.vector)
-                    
-                    if similarity >= similarity_threshold:
+            # Note: Cosmos DB doesn't have native vector search yet.
+            # Prefer the warm in-process index; build it from Cosmos on a miss.
+            index = await self._get_vector_index(engagement_id)
+            if index is not None:
+                results = []
+                for payload, vector, similarity in index.search(query_vector, top_k, similarity_threshold):
+                    try:
                         results.append(VectorSearchResult(
-                            embedding_doc=embedding_doc,
+                            embedding_doc=EmbeddingDocument(vector=vector, **payload),
                             similarity_score=similarity
                         ))
-                        
-                except Exception as e:
-                    logger.warning(
-                        "Failed to process embedding document in search",
-                        extra={
-                            "correlation_id": self.correlation_id,
-                            "item_id": item.get("id", "unknown"),
-                            "error": str(e)
-                        }
-                    )
-                    continue
-            
-            # Sort by similarity score and limit results
-            results.sort(key=lambda r: r.similarity_score, reverse=True)
-            results = results[:top_k]
+                    except Exception as e:
+                        logger.warning(
+                            "Failed to process embedding document in search",
+                            extra={
+                                "correlation_id": self.correlation_id,
+                                "item_id": payload.get("id", "unknown"),
+                                "error": str(e)
+                            }
+                        )
+                total_candidates = len(index)
+            else:
+                items = await self._query_engagement_embeddings(engagement_id)
+                results = self._brute_force_search(items, query_vector, top_k, similarity_threshold)
+                total_candidates = len(items)
             
             search_duration = time.time() - start_time
             
@@ -356,7 +337,7 @@ class CosmosEmbeddingsRepository:
                     "correlation_id": self.correlation_id,
                     "engagement_id": engagement_id,
                     "results_found": len(results),
-                    "total_candidates": len(items),
+                    "total_candidates": total_candidates,
                     "search_duration_seconds": round(search_duration, 3),
                     "top_k": top_k
                 }
@@ -375,6 +356,128 @@ class CosmosEmbeddingsRepository:
             )
             raise
     
+    async def _query_engagement_embeddings(self, engagement_id: str) -> List[Dict[str, Any]]:
+        """Load every embedding item for an engagement from its partition"""
+        query = {
+            "query": "SELECT * FROM c WHERE c.engagement_id = @engagement_id",
+            "parameters": [
+                {"name": "@engagement_id", "value": engagement_id}
+            ]
+        }
+        
+        return await asyncio.to_thread(
+            lambda: list(self.container.query_items(
+                query=query["query"],
+                parameters=query["parameters"],
+                partition_key=engagement_id
+            ))
+        )
+    
+    async def _get_vector_index(self, engagement_id: str) -> Optional[EngagementVectorIndex]:
+        """
+        Get the warm vector index for an engagement, loading it on a miss.
+        
+        Returns None when the index is disabled or numpy is unavailable, in
+        which case callers fall back to the brute-force scan.
+        """
+        if not (HAS_NUMPY and config.rag.vector_index_enabled):
+            return None
+        
+        registry = get_vector_index_registry(
+            max_engagements=config.rag.vector_index_max_engagements,
+            ttl_seconds=config.rag.vector_index_ttl_seconds
+        )
+        index = registry.get(engagement_id)
+        if index is not None:
+            return index
+        
+        # Coalesce concurrent cold loads so only one request scans the partition
+        async with registry.build_lock(engagement_id):
+            index = registry.get(engagement_id)
+            if index is not None:
+                return index
+            
+            load_start = time.time()
+            generation = registry.generation(engagement_id)
+            items = await self._query_engagement_embeddings(engagement_id)
+            index = EngagementVectorIndex(engagement_id, initial_capacity=max(len(items), 1))
+            index.upsert(items)
+            if not registry.put(index, expected_generation=generation):
+                # A store or delete landed while the partition was read; this
+                # search uses what was read, the next one rebuilds
+                logger.info(
+                    "Embeddings changed during vector index build; not caching it",
+                    extra={"correlation_id": self.correlation_id, "engagement_id": engagement_id}
+                )
+                return index
+            
+            logger.info(
+                "Built engagement vector index",
+                extra={
+                    "correlation_id": self.correlation_id,
+                    "engagement_id": engagement_id,
+                    "vectors": len(index),
+                    "dimensions": index.dimensions,
+                    "load_duration_seconds": round(time.time() - load_start, 3)
+                }
+            )
+            return index
+    
+    def _update_vector_index(self, stored: List[Dict[str, Any]]):
+        """Apply freshly stored embeddings to any warm engagement indexes"""
+        if not (stored and HAS_NUMPY and config.rag.vector_index_enabled):
+            return
+        
+        registry = get_vector_index_registry()
+        by_engagement: Dict[str, List[Dict[str, Any]]] = {}
+        for doc_dict in stored:
+            by_engagement.setdefault(doc_dict["engagement_id"], []).append(doc_dict)
+        
+        for engagement_id, items in by_engagement.items():
+            registry.record_write(engagement_id)
+            # Cold engagements are loaded in full on their next search
+            index = registry.get(engagement_id)
+            if index is not None:
+                index.upsert(items)
+    
+    def _brute_force_search(
+        self,
+        items: List[Dict[str, Any]],
+        query_vector: List[float],
+        top_k: int,
+        similarity_threshold: float
+    ) -> List[VectorSearchResult]:
+        """Score every item with pure-Python cosine similarity"""
+        results = []
+        for item in items:
+            try:
+                # Convert back to EmbeddingDocument
+                embedding_doc = EmbeddingDocument(**item)
+                
+                # Calculate cosine similarity
+                similarity = self._calculate_cosine_similarity(query_vector, embedding_doc.vector)
+                
+                if similarity >= similarity_threshold:
+                    results.append(VectorSearchResult(
+                        embedding_doc=embedding_doc,
+                        similarity_score=similarity
+                    ))
+                    
+            except Exception as e:
+                logger.warning(
+                    "Failed to process embedding document in search",
+                    extra={
+                        "correlation_id": self.correlation_id,
+                        "item_id": item.get("id", "unknown"),
+                        "error": str(e)
+                    }
+                )
+                continue
+        
+        # Sort by similarity score and limit results
+        results.sort(key=lambda r: r.similarity_score, reverse=True)
+        return results[:top_k]
+    
     def _calculate_cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors"""
         try:
@@ -393,6 +496,40 @@ class CosmosEmbeddingsRepository:
         except Exception:
             return 0.0
     
+    async def _bulk_delete(
+        self,
+        engagement_id: str,
+        id_query: str,
+        parameters: List[Dict[str, Any]]
+    ) -> DeletionMetrics:
+        """Delete the embeddings whose IDs id_query returns, in parallel transactional batches"""
+        item_ids = await asyncio.to_thread(
+            lambda: list(self.container.query_items(
+                query=id_query,
+                parameters=parameters,
+                partition_key=engagement_id
+            ))
+        )
+        
+        async def execute_batch(operations, partition_key) -> float:
+            charges = []
+            await asyncio.to_thread(
+                self.container.execute_item_batch,
+                batch_operations=operations,
+                partition_key=partition_key,
+                response_hook=lambda headers, _result: charges.append(
+                    float(headers.get("x-ms-request-charge", 0) or 0)
+                )
+            )
+            return sum(charges)
+        
+        return await create_bulk_delete_engine().delete(
+            item_ids,
+            engagement_id,
+            execute_batch,
+            DeletionMetrics(container=config.rag.cosmos_container_name)
+        )
+    
     async def delete_embeddings_by_document(self, engagement_id: str, doc_id: str) -> int:
         """
         Delete all embeddings for a specific document.
@@ -414,45 +551,22 @@ class CosmosEmbeddingsRepository:
                 }
             )
             
-            # Find all embeddings for the document
-            query = {
-                "query": "SELECT c.id FROM c WHERE c.engagement_id = @engagement_id AND c.doc_id = @doc_id",
-                "parameters": [
+            metrics = await self._bulk_delete(
+                engagement_id,
+                "SELECT VALUE c.id FROM c WHERE c.engagement_id = @engagement_id AND c.doc_id = @doc_id",
+                [
                     {"name": "@engagement_id", "value": engagement_id},
                     {"name": "@doc_id", "value": doc_id}
                 ]
-            }
-            
-            items = await asyncio.to_thread(
-                lambda: list(self.container.query_items(
-                    query=query["query"],
-                    parameters=query["parameters"],
-                    partition_key=engagement_id
-                ))
             )
+            deleted_count = metrics.deleted
             
-            # Delete each embedding
-            deleted_count = 0
-            for item in items:
-                try:
-                    await asyncio.to_thread(
-                        self.container.delete_item,
-                        item=item["id"],
-                        partition_key=engagement_id
-                    )
-                    deleted_count += 1
-                except CosmosResourceNotFoundError:
-                    # Already deleted, continue
-                    pass
-                except Exception as e:
-                    logger.warning(
-                        "Failed to delete embedding",
-                        extra={
-                            "correlation_id": self.correlation_id,
-                            "embedding_id": item["id"],
-                            "error": str(e)
-                        }
-                    )
+            if HAS_NUMPY:
+                registry = get_vector_index_registry()
+                registry.record_write(engagement_id)
+                index = registry.get(engagement_id)
+                if index is not None:
+                    index.remove_document(doc_id)
             
             logger.info(
                 "Embeddings deletion completed",
@@ -460,7 +574,8 @@ class CosmosEmbeddingsRepository:
                     "correlation_id": self.correlation_id,
                     "engagement_id": engagement_id,
                     "doc_id": doc_id,
-                    "deleted_count": deleted_count
+                    "deleted_count": deleted_count,
+                    "deletion_metrics": metrics.to_dict()
                 }
             )
             
@@ -497,60 +612,25 @@ class CosmosEmbeddingsRepository:
                 }
             )
             
-            # Find all embeddings for the engagement
-            query = {
-                "query": "SELECT c.id FROM c WHERE c.engagement_id = @engagement_id",
-                "parameters": [
-                    {"name": "@engagement_id", "value": engagement_id}
-                ]
-            }
-            
-            items = await asyncio.to_thread(
-                lambda: list(self.container.query_items(
-                    query=query["query"],
-                    parameters=query["parameters"],
-                    partition_key=engagement_id
-                ))
+            metrics = await self._bulk_delete(
+                engagement_id,
+                "SELECT VALUE c.id FROM c WHERE c.engagement_id = @engagement_id",
+                [{"name": "@engagement_id", "value": engagement_id}]
             )
+            deleted_count = metrics.deleted
             
-            # Delete in batches
-            deleted_count = 0
-            batch_size = 25
-            
-            for i in range(0, len(items), batch_size):
-                batch = items[i:i + batch_size]
-                
-                for item in batch:
-                    try:
-                        await asyncio.to_thread(
-                            self.container.delete_item,
-                            item=item["id"],
-                            partition_key=engagement_id
-                        )
-                        deleted_count += 1
-                    except CosmosResourceNotFoundError:
-                        # Already deleted, continue
-                        pass
-                    except Exception as e:
-                        logger.warning(
-                            "Failed to delete embedding",
-                            extra={
-                                "correlation_id": self.correlation_id,
-                                "embedding_id": item["id"],
-                                "error": str(e)
-                            }
-                        )
-                
-                # Add delay between batches
-                if i + batch_size < len(items):
-                    await asyncio.sleep(0.1)
+            if HAS_NUMPY:
+                registry = get_vector_index_registry()
+                registry.record_write(engagement_id)
+                registry.invalidate(engagement_id)
             
             logger.info(
                 "Engagement embeddings deletion completed",
                 extra={
                     "correlation_id": self.correlation_id,
                     "engagement_id": engagement_id,
-                    "deleted_count": deleted_count
+                    "deleted_count": deleted_count,
+                    "deletion_metrics": metrics.to_dict()
                 }
             )
             
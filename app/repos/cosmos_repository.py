@@ -7,16 +7,17 @@ Extends the base repository interface with Cosmos DB-specific functionality incl
 - Background job persistence
 - Audit log storage with integrity verification
 - Engagement-scoped data operations
+- Shared async client with streaming queries and per-request RU budgets
+- Cursor pagination with approximate counts from periodically refreshed counter documents
 """
 
 import asyncio
 import json
 import logging
-import os
+import time
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional, Any, Union
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Any, Tuple, Union
 
-from azure.cosmos import CosmosClient, PartitionKey
 from azure.cosmos.exceptions import CosmosResourceNotFoundError, CosmosHttpResponseError
 from fastapi import HTTPException
 from api.database_errors import (
@@ -24,7 +25,6 @@ from api.database_errors import (
     handle_database_errors,
     translate_database_error
 )
-from azure.identity import DefaultAzureCredential
 
 from domain.models import (
     Assessment, Question, Response, Finding, Recommendation, RunLog,
@@ -33,230 +33,274 @@ from domain.models import (
 )
 from domain.repository import Repository
 from api.schemas.gdpr import BackgroundJob, AuditLogEntry, TTLPolicy
+from repos.bulk_delete import MAX_BATCH_OPERATIONS, BatchExecutor, DeletionMetrics, create_bulk_delete_engine
+from repos.cosmos_client import (
+    CosmosClientPool,
+    RequestChargeTracker,
+    current_request_charge,
+    decode_cursor,
+    encode_cursor,
+    get_cosmos_client_pool,
+    partition_key_field
+)
 from config import config
 
 logger = logging.getLogger(__name__)
 
+# Container caching per-collection (and per-engagement) item counts between recounts
+COUNTERS_CONTAINER = "counters"
+
+# Containers holding engagement data, in export order
+ENGAGEMENT_EXPORT_CONTAINERS = ("engagements", "memberships", "assessments", "documents", "runlogs", "embeddings")
+
+# Audit log batches (one engagement each) written concurrently
+AUDIT_BATCH_PARALLELISM = 4
+
+# Containers emptied by a hard delete, in deletion order (engagement last)
+ENGAGEMENT_PURGE_CONTAINERS = (
+    "embeddings", "runlogs", "documents", "assessments", "workshops", "memberships", "engagements"
+)
+
 
 class CosmosRepository(Repository):
     """Cosmos DB implementation of the repository interface with GDPR support"""
     
-    def __init__(self, correlation_id: Optional[str] = None):
+    def __init__(self, correlation_id: Optional[str] = None, client_pool: Optional[CosmosClientPool] = None):
         self.correlation_id = correlation_id or "unknown"
-        self.client = None
-        self.database = None
-        self.containers = {}
-        self._initialize_client()
-        self._initialize_containers()
+        # Shared per-process client; repositories are cheap to create per request
+        self.client_pool = client_pool or get_cosmos_client_pool()
+        self.query_page_size = config.cosmos.query_page_size
+        # Used when no request-scoped tracker exists (e.g. background work)
+        self._fallback_request_charge = RequestChargeTracker()
     
-    def _initialize_client(self):
-        """Initialize Cosmos DB client with managed identity authentication"""
-        try:
-            # Use managed identity for authentication
-            credential = DefaultAzureCredential()
-            
-            # Get Cosmos DB configuration
-            cosmos_endpoint = os.getenv("COSMOS_ENDPOINT")
-            cosmos_database = os.getenv("COSMOS_DATABASE", "cybermaturity")
-            
-            if not cosmos_endpoint:
-                raise ValueError("COSMOS_ENDPOINT environment variable is required")
-            
-            self.client = CosmosClient(
-                url=cosmos_endpoint,
-                credential=credential
-            )
-            
-            # Get or create database
-            self.database = self.client.get_database_client(cosmos_database)
-            
-            logger.info(
-                "Initialized Cosmos DB repository",
-                extra={
-                    "correlation_id": self.correlation_id,
-                    "endpoint": cosmos_endpoint,
-                    "database": cosmos_database
-                }
-            )
-            
-        except Exception as e:
-            logger.error(
-                "Failed to initialize Cosmos DB repository",
-                extra={
-                    "correlation_id": self.correlation_id,
-                    "error": str(e)
-                }
-            )
-            raise
+    @property
+    def request_charge(self) -> RequestChargeTracker:
+        """RU tracker for the current request, enforcing its budget if one is set"""
+        return current_request_charge() or self._fallback_request_charge
+    
+    # Helper methods for Cosmos DB operations
+    async def _container(self, container_name: str):
+        return await self.client_pool.get_container(container_name)
     
-    def _initialize_containers(self):
-        """Initialize all required containers with proper configuration"""
-        container_configs = {
-            "engagements": {
-                "partition_key": "/id",
-                "ttl": None  # No TTL for engagement data
-            },
-            "memberships": {
-                "partition_key": "/engagement_id",
-                "ttl": None  # No TTL for membership data
-            },
-            "assessments": {
-                "partition_key": "/engagement_id",
-                "ttl": None  # No TTL for assessment data
-            },
-            "questions": {
-                "partition_key": "/assessment_id",
-                "ttl": None  # No TTL for question data
-            },
-            "responses": {
-                "partition_key": "/assessment_id",
-                "ttl": None  # No TTL for response data
-            },
-            "findings": {
-                "partition_key": "/assessment_id",
-                "ttl": None  # No TTL for findings data
-            },
-            "recommendations": {
-                "partition_key": "/assessment_id",
-                "ttl": None  # No TTL for recommendations data
-            },
-            "documents": {
-                "partition_key": "/engagement_id",
-                "ttl": None  # No TTL for document metadata
-            },
-            "runlogs": {
-                "partition_key": "/assessment_id",
-                "ttl": 7776000  # 90 days TTL for run logs
-            },
-            "background_jobs": {
-                "partition_key": "/created_by",
-                "ttl": -1  # TTL per document
-            },
-            "audit_logs": {
-                "partition_key": "/engagement_id",
-                "ttl": 220752000  # 7 years TTL for audit logs
-            },
-            "embeddings": {
-                "partition_key": "/engagement_id",
-                "ttl": 31536000  # 1 year TTL for embeddings
-            },
-            "workshops": {
-                "partition_key": "/engagement_id",
-                "ttl": None  # No TTL for workshop data
-            },
-            "minutes": {
-                "partition_key": "/workshop_id",
-                "ttl": None  # No TTL for minutes data
+    def _record_charge(self, context: str, charge_before: float) -> None:
+        """Log the RU charge of an operation and enforce the request budget"""
+        logger.debug(
+            f"Cosmos DB request charge for {context}",
+            extra={
+                "correlation_id": self.correlation_id,
+                "context": context,
+                "request_charge": round(self.request_charge.total_ru - charge_before, 2),
+                "total_request_charge": round(self.request_charge.total_ru, 2)
             }
-        }
-        
-        for container_name, config_data in container_configs.items():
-            try:
-                self.containers[container_name] = self.database.get_container_client(container_name)
-            except CosmosResourceNotFoundError:
-                # Create container if it doesn't exist
-                container_config = {
-                    "id": container_name,
-                    "partition_key": PartitionKey(path=config_data["partition_key"]),
-                    "offer_throughput": 400
-                }
-                
-                # Add TTL settings if specified
-                if config_data["ttl"] is not None:
-                    container_config["default_ttl"] = config_data["ttl"]
-                
-                self.containers[container_name] = self.database.create_container(**container_config)
-                
-                logger.info(
-                    f"Created Cosmos DB container: {container_name}",
-                    extra={
-                        "correlation_id": self.correlation_id,
-                        "container": container_name,
-                        "partition_key": config_data["partition_key"],
-                        "ttl": config_data["ttl"]
-                    }
-                )
+        )
+        self.request_charge.check(context)
     
-    # Helper methods for Cosmos DB operations
     async def _upsert_item(self, container_name: str, item: Dict[str, Any]) -> Dict[str, Any]:
         """Upsert an item in the specified container with retry logic"""
+        context = f"upsert item in {container_name}"
+        
         async def operation():
-            return await asyncio.to_thread(
-                self.containers[container_name].upsert_item,
-                body=item
-            )
+            container = await self._container(container_name)
+            charge_before = self.request_charge.total_ru
+            result = await container.upsert_item(body=item, response_hook=self.request_charge.hook())
+            self._record_charge(context, charge_before)
+            return result
         
-        return await retry_database_operation(
-            operation,
-            context=f"upsert item in {container_name}"
-        )
+        return await retry_database_operation(operation, context=context)
     
     async def _get_item(self, container_name: str, item_id: str, partition_key: str) -> Optional[Dict[str, Any]]:
         """Get an item from the specified container with proper error handling"""
+        context = f"get item {item_id} from {container_name}"
         try:
             async def operation():
-                return await asyncio.to_thread(
-                    self.containers[container_name].read_item,
+                container = await self._container(container_name)
+                charge_before = self.request_charge.total_ru
+                result = await container.read_item(
                     item=item_id,
-                    partition_key=partition_key
+                    partition_key=partition_key,
+                    response_hook=self.request_charge.hook()
                 )
+                self._record_charge(context, charge_before)
+                return result
             
-            return await retry_database_operation(
-                operation,
-                context=f"get item {item_id} from {container_name}"
-            )
+            return await retry_database_operation(operation, context=context)
         except HTTPException as e:
             # Check if it's a 404 - return None for not found
             if e.status_code == 404:
                 return None
             raise
     
-    async def _query_items(
-        self, 
-        container_name: str, 
-        query: str, 
+    async def _query_page(
+        self,
+        container_name: str,
+        query: str,
         parameters: List[Dict[str, Any]] = None,
-        partition_key: str = None
-    ) -> List[Dict[str, Any]]:
-        """Query items from the specified container with retry logic"""
+        partition_key: str = None,
+        page_size: Optional[int] = None,
+        continuation_token: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Fetch one page of query results with retry logic
+        
+        Returns:
+            Tuple of (items, continuation token for the next page or None)
+        """
+        context = f"query items from {container_name}"
+        
         async def operation():
+            container = await self._container(container_name)
             query_args = {
                 "query": query,
-                "parameters": parameters or []
+                "parameters": parameters or [],
+                "max_item_count": page_size or self.query_page_size,
+                "response_hook": self.request_charge.hook()
             }
             if partition_key:
                 query_args["partition_key"] = partition_key
             
-            return await asyncio.to_thread(
-                lambda: list(self.containers[container_name].query_items(**query_args))
-            )
+            charge_before = self.request_charge.total_ru
+            pager = container.query_items(**query_args).by_page(continuation_token)
+            try:
+                page = await pager.__anext__()
+                items = [item async for item in page]
+            except StopAsyncIteration:
+                return [], None
+            self._record_charge(context, charge_before)
+            return items, pager.continuation_token
         
-        return await retry_database_operation(
-            operation,
-            context=f"query items from {container_name}"
-        )
+        return await retry_database_operation(operation, context=context)
+    
+    async def _iter_query(
+        self,
+        container_name: str,
+        query: str,
+        parameters: List[Dict[str, Any]] = None,
+        partition_key: str = None,
+        page_size: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream query results page by page
+        
+        Each page is fetched (and retried) on its own and resumes from the
+        previous continuation token, so callers can stop early without paying
+        for the rest of the result set.
+        """
+        continuation_token = None
+        while True:
+            items, continuation_token = await self._query_page(
+                container_name, query, parameters, partition_key, page_size, continuation_token
+            )
+            for item in items:
+                yield item
+            if not continuation_token:
+                break
+    
+    async def _query_items(
+        self, 
+        container_name: str, 
+        query: str, 
+        parameters: List[Dict[str, Any]] = None,
+        partition_key: str = None
+    ) -> List[Dict[str, Any]]:
+        """Query all matching items from the specified container with retry logic"""
+        return [
+            item async for item in self._iter_query(container_name, query, parameters, partition_key)
+        ]
     
     async def _delete_item(self, container_name: str, item_id: str, partition_key: str) -> bool:
         """Delete an item from the specified container with proper error handling"""
+        context = f"delete item {item_id} from {container_name}"
         try:
             async def operation():
-                await asyncio.to_thread(
-                    self.containers[container_name].delete_item,
+                container = await self._container(container_name)
+                charge_before = self.request_charge.total_ru
+                await container.delete_item(
                     item=item_id,
-                    partition_key=partition_key
+                    partition_key=partition_key,
+                    response_hook=self.request_charge.hook()
                 )
+                self._record_charge(context, charge_before)
                 return True
             
-            return await retry_database_operation(
-                operation,
-                context=f"delete item {item_id} from {container_name}"
-            )
+            return await retry_database_operation(operation, context=context)
         except HTTPException as e:
             # Check if it's a 404 - return False for not found
             if e.status_code == 404:
                 return False
             raise
     
+    async def _list_page(
+        self,
+        container_name: str,
+        where_clauses: List[str],
+        parameters: List[Dict[str, Any]],
+        order_by: str,
+        page_size: int,
+        cursor: Optional[str],
+        partition_key: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One newest-first page of a filtered listing
+        
+        Resumes from the Cosmos continuation token wrapped in cursor, so the
+        cost of a page does not grow with its depth the way OFFSET does.
+        
+        Returns:
+            Tuple of (items, cursor for the next page or None)
+        """
+        try:
+            continuation_token = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(400, "Invalid pagination cursor")
+        
+        where_clause = " AND ".join(where_clauses) if where_clauses else "1=1"
+        query = f"SELECT * FROM c WHERE {where_clause} ORDER BY c.{order_by} DESC"
+        items, continuation_token = await self._query_page(
+            container_name, query, parameters, partition_key, page_size, continuation_token
+        )
+        return items, encode_cursor(continuation_token)
+    
+    @staticmethod
+    def _counter_ids(collection: str, engagement_id: Optional[str] = None) -> List[str]:
+        counter_ids = [collection]
+        if engagement_id:
+            counter_ids.append(f"{collection}:engagement:{engagement_id}")
+        return counter_ids
+    
+    async def _approximate_count(self, collection: str, engagement_id: Optional[str] = None) -> int:
+        """
+        Approximate number of items in a collection, optionally for one engagement
+        
+        Served from a counter document that is recounted with COUNT(1) once
+        it is older than config.cosmos.counter_refresh_seconds. Writes never
+        touch the counters, and TTL expiry is picked up by the next recount.
+        If a recount fails the stale count is returned.
+        """
+        counter_id = self._counter_ids(collection, engagement_id)[-1]
+        item = await self._get_item(COUNTERS_CONTAINER, counter_id, counter_id)
+        if item and time.time() - item.get("counted_at", 0) < config.cosmos.counter_refresh_seconds:
+            return int(item.get("count", 0))
+        
+        query = "SELECT VALUE COUNT(1) FROM c"
+        parameters: List[Dict[str, Any]] = []
+        if engagement_id:
+            query += " WHERE c.engagement_id = @engagement_id"
+            parameters.append({"name": "@engagement_id", "value": engagement_id})
+        try:
+            partition_key = engagement_id if partition_key_field(collection) == "engagement_id" else None
+            results = await self._query_items(collection, query, parameters, partition_key)
+            count = int(results[0]) if results else 0
+            await self._upsert_item(COUNTERS_CONTAINER, {"id": counter_id, "count": count, "counted_at": time.time()})
+            return count
+        except Exception as e:
+            if not item:
+                raise
+            logger.warning(
+                f"Failed to recount {counter_id}, serving the previous count: {str(e)}",
+                extra={"correlation_id": self.correlation_id, "counter_id": counter_id}
+            )
+            return int(item.get("count", 0))
+    
     # Engagement & Membership methods
     def create_engagement(self, e: Engagement) -> Engagement:
         """Create a new engagement"""
@@ -376,46 +420,53 @@ class CosmosRepository(Repository):
         engagement_id: Optional[str] = None,
         job_type: Optional[str] = None,
         status: Optional[str] = None,
-        page: int = 1,
-        page_size: int = 50
-    ) -> tuple[List[BackgroundJob], int]:
-        """List background jobs with filtering"""
+        page_size: int = 50,
+        cursor: Optional[str] = None,
+        include_count: bool = False
+    ) -> Tuple[List[BackgroundJob], Optional[str], Optional[int]]:
+        """
+        List background jobs with filtering, newest first
+        
+        Args:
+            cursor: Cursor returned with the previous page, None for the first page
+            include_count: Also return the approximate total; only available
+                when filtering by nothing but engagement_id
+        
+        Returns:
+            Tuple of (jobs, cursor for the next page or None, approximate total or None)
+        """
+        where_clauses = []
+        parameters = []
+        
+        if user_email:
+            where_clauses.append("c.created_by = @user_email")
+            parameters.append({"name": "@user_email", "value": user_email})
+        
+        if engagement_id:
+            where_clauses.append("c.engagement_id = @engagement_id")
+            parameters.append({"name": "@engagement_id", "value": engagement_id})
+        
+        if job_type:
+            where_clauses.append("c.job_type = @job_type")
+            parameters.append({"name": "@job_type", "value": job_type})
+        
+        if status:
+            where_clauses.append("c.status = @status")
+            parameters.append({"name": "@status", "value": status})
+        
         try:
-            # Build query
-            where_clauses = []
-            parameters = []
-            
-            if user_email:
-                where_clauses.append("c.created_by = @user_email")
-                parameters.append({"name": "@user_email", "value": user_email})
-            
-            if engagement_id:
-                where_clauses.append("c.engagement_id = @engagement_id")
-                parameters.append({"name": "@engagement_id", "value": engagement_id})
-            
-            if job_type:
-                where_clauses.append("c.job_type = @job_type")
-                parameters.append({"name": "@job_type", "value": job_type})
-            
-            if status:
-                where_clauses.append("c.status = @status")
-                parameters.append({"name": "@status", "value": status})
-            
-            where_clause = " AND ".join(where_clauses) if where_clauses else "1=1"
-            
-            # Count query
-            count_query = f"SELECT VALUE COUNT(1) FROM c WHERE {where_clause}"
-            count_results = await self._query_items("background_jobs", count_query, parameters)
-            total_count = count_results[0] if count_results else 0
-            
-            # Data query with pagination
-            offset = (page - 1) * page_size
-            data_query = f"SELECT * FROM c WHERE {where_clause} ORDER BY c.created_at DESC OFFSET {offset} LIMIT {page_size}"
-            items = await self._query_items("background_jobs", data_query, parameters)
-            
+            # Jobs are partitioned by creator, so a user filter is a single-partition query
+            items, next_cursor = await self._list_page(
+                "background_jobs", where_clauses, parameters, "created_at",
+                page_size, cursor, partition_key=user_email
+            )
             jobs = [BackgroundJob(**item) for item in items]
             
-            return jobs, total_count
+            total_count = None
+            if include_count and not (user_email or job_type or status):
+                total_count = await self._approximate_count("background_jobs", engagement_id)
+            
+            return jobs, next_cursor, total_count
             
         except Exception as e:
             logger.error(
@@ -454,57 +505,116 @@ class CosmosRepository(Repository):
             )
             raise
     
+    async def store_audit_log_entries(self, entries: List[AuditLogEntry]) -> int:
+        """
+        Store many audit log entries with transactional batch upserts
+        
+        Entries are grouped by engagement (the partition key) into batches of
+        up to 100 upserts; entries without an engagement are upserted one by
+        one.
+        """
+        by_engagement: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for entry in entries:
+            entry_dict = entry.model_dump()
+            entry_dict["id"] = entry.id
+            if entry.ttl:
+                entry_dict["ttl"] = entry.ttl
+            by_engagement.setdefault(entry.engagement_id, []).append(entry_dict)
+        
+        execute_batch = self._batch_executor("audit_logs")
+        semaphore = asyncio.Semaphore(AUDIT_BATCH_PARALLELISM)
+        
+        async def store_engagement_entries(engagement_id: Optional[str], items: List[Dict[str, Any]]):
+            async with semaphore:
+                if engagement_id is None:
+                    for item in items:
+                        await self._upsert_item("audit_logs", item)
+                else:
+                    for start in range(0, len(items), MAX_BATCH_OPERATIONS):
+                        operations = [("upsert", (item,)) for item in items[start:start + MAX_BATCH_OPERATIONS]]
+                        await retry_database_operation(
+                            execute_batch, operations, engagement_id, context="upsert audit log batch"
+                        )
+        
+        try:
+            await asyncio.gather(*[
+                store_engagement_entries(engagement_id, items) for engagement_id, items in by_engagement.items()
+            ])
+            return len(entries)
+        except Exception as e:
+            logger.error(
+                f"Failed to store audit log entries: {str(e)}",
+                extra={
+                    "correlation_id": self.correlation_id,
+                    "entries": len(entries),
+                    "error": str(e)
+                }
+            )
+            raise
+    
     async def list_audit_log_entries(
         self,
         engagement_id: Optional[str] = None,
         user_email: Optional[str] = None,
         action_type: Optional[str] = None,
+        resource_type: Optional[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
-        page: int = 1,
-        page_size: int = 100
-    ) -> tuple[List[AuditLogEntry], int]:
-        """List audit log entries with filtering"""
+        page_size: int = 100,
+        cursor: Optional[str] = None,
+        include_count: bool = False
+    ) -> Tuple[List[AuditLogEntry], Optional[str], Optional[int]]:
+        """
+        List audit log entries with filtering, newest first
+        
+        Args:
+            cursor: Cursor returned with the previous page, None for the first page
+            include_count: Also return the approximate total; only available
+                when filtering by nothing but engagement_id
+        
+        Returns:
+            Tuple of (entries, cursor for the next page or None, approximate total or None)
+        """
+        where_clauses = []
+        parameters = []
+        
+        if engagement_id:
+            where_clauses.append("c.engagement_id = @engagement_id")
+            parameters.append({"name": "@engagement_id", "value": engagement_id})
+        
+        if user_email:
+            where_clauses.append("c.user_email = @user_email")
+            parameters.append({"name": "@user_email", "value": user_email})
+        
+        if action_type:
+            where_clauses.append("c.action_type = @action_type")
+            parameters.append({"name": "@action_type", "value": action_type})
+        
+        if resource_type:
+            where_clauses.append("c.resource_type = @resource_type")
+            parameters.append({"name": "@resource_type", "value": resource_type})
+        
+        if start_date:
+            where_clauses.append("c.timestamp >= @start_date")
+            parameters.append({"name": "@start_date", "value": start_date.isoformat()})
+        
+        if end_date:
+            where_clauses.append("c.timestamp <= @end_date")
+            parameters.append({"name": "@end_date", "value": end_date.isoformat()})
+        
         try:
-            # Build query
-            where_clauses = []
-            parameters = []
-            
-            if engagement_id:
-                where_clauses.append("c.engagement_id = @engagement_id")
-                parameters.append({"name": "@engagement_id", "value": engagement_id})
-            
-            if user_email:
-                where_clauses.append("c.user_email = @user_email")
-                parameters.append({"name": "@user_email", "value": user_email})
-            
-            if action_type:
-                where_clauses.append("c.action_type = @action_type")
-                parameters.append({"name": "@action_type", "value": action_type})
-            
-            if start_date:
-                where_clauses.append("c.timestamp >= @start_date")
-                parameters.append({"name": "@start_date", "value": start_date.isoformat()})
-            
-            if end_date:
-                where_clauses.append("c.timestamp <= @end_date")
-                parameters.append({"name": "@end_date", "value": end_date.isoformat()})
-            
-            where_clause = " AND ".join(where_clauses) if where_clauses else "1=1"
-            
-            # Count query
-            count_query = f"SELECT VALUE COUNT(1) FROM c WHERE {where_clause}"
-            count_results = await self._query_items("audit_logs", count_query, parameters)
-            total_count = count_results[0] if count_results else 0
-            
-            # Data query with pagination
-            offset = (page - 1) * page_size
-            data_query = f"SELECT * FROM c WHERE {where_clause} ORDER BY c.timestamp DESC OFFSET {offset} LIMIT {page_size}"
-            items = await self._query_items("audit_logs", data_query, parameters)
-            
+            # Audit logs are partitioned by engagement
+            items, next_cursor = await self._list_page(
+                "audit_logs", where_clauses, parameters, "timestamp",
+                page_size, cursor, partition_key=engagement_id
+            )
             entries = [AuditLogEntry(**item) for item in items]
             
-            return entries, total_count
+            total_count = None
+            if include_count and not (user_email or action_type or resource_type or start_date or end_date):
+                total_count = await self._approximate_count("audit_logs", engagement_id)
+            
+            return entries, next_cursor, total_count
             
         except Exception as e:
             logger.error(
@@ -518,8 +628,36 @@ class CosmosRepository(Repository):
             )
             raise
     
+    async def iter_engagement_data(
+        self,
+        engagement_id: str,
+        exclude: Iterable[str] = ()
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stream (container, item) pairs for everything stored for an engagement
+        
+        Containers are read one after another, a page at a time, so memory
+        use is bounded by the query page size rather than the engagement.
+        """
+        excluded = set(exclude)
+        parameters = [{"name": "@engagement_id", "value": engagement_id}]
+        for container_name in ENGAGEMENT_EXPORT_CONTAINERS:
+            if container_name in excluded:
+                continue
+            if container_name == "engagements":
+                query = "SELECT * FROM c WHERE c.id = @engagement_id"
+            else:
+                query = "SELECT * FROM c WHERE c.engagement_id = @engagement_id"
+            async for item in self._iter_query(container_name, query, parameters):
+                yield container_name, item
+    
     async def export_engagement_data(self, engagement_id: str) -> Dict[str, Any]:
-        """Export all data for an engagement"""
+        """
+        Export all data for an engagement as one dict
+        
+        Holds the whole engagement in memory; data_export jobs stream through
+        iter_engagement_data instead.
+        """
         try:
             logger.info(
                 f"Starting engagement data export for {engagement_id}",
@@ -529,46 +667,23 @@ class CosmosRepository(Repository):
                 }
             )
             
-            export_data = {}
-            
-            # Export engagements
-            engagement_query = "SELECT * FROM c WHERE c.id = @engagement_id"
-            engagement_items = await self._query_items(
-                "engagements", 
-                engagement_query, 
-                [{"name": "@engagement_id", "value": engagement_id}]
-            )
-            export_data["engagement"] = engagement_items[0] if engagement_items else {}
-            
-            # Export memberships
-            membership_query = "SELECT * FROM c WHERE c.engagement_id = @engagement_id"
-            export_data["memberships"] = await self._query_items(
-                "memberships",
-                membership_query,
-                [{"name": "@engagement_id", "value": engagement_id}]
-            )
-            
-            # Export assessments
-            export_data["assessments"] = await self._query_items(
-                "assessments",
-                membership_query,
-                [{"name": "@engagement_id", "value": engagement_id}]
-            )
-            
-            # Export documents
-            export_data["documents"] = await self._query_items(
-                "documents",
-                membership_query,
-                [{"name": "@engagement_id", "value": engagement_id}]
-            )
-            
-            # For other data types, we'd need to query by assessment_id
-            # This is a simplified version
-            export_data["questions"] = []
-            export_data["responses"] = []
-            export_data["findings"] = []
-            export_data["recommendations"] = []
-            export_data["runlogs"] = []
+            export_data = {
+                "engagement": {},
+                "memberships": [],
+                "assessments": [],
+                "documents": [],
+                # Stored per assessment; not exported from Cosmos yet
+                "questions": [],
+                "responses": [],
+                "findings": [],
+                "recommendations": [],
+                "runlogs": []
+            }
+            async for container_name, item in self.iter_engagement_data(engagement_id, exclude={"embeddings"}):
+                if container_name == "engagements":
+                    export_data["engagement"] = item
+                else:
+                    export_data[container_name].append(item)
             
             logger.info(
                 f"Completed engagement data export for {engagement_id}",
@@ -652,52 +767,96 @@ class CosmosRepository(Repository):
             )
             raise
     
-    async def hard_delete_engagement_data(self, engagement_id: str) -> Dict[str, int]:
-        """Hard delete all engagement data permanently"""
+    async def hard_delete_engagement_data(
+        self,
+        engagement_id: str,
+        checkpoint: Optional[Dict[str, Any]] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, int]:
+        """
+        Hard delete all engagement data permanently
+        
+        Items are removed in parallel transactional batches (see
+        repos.bulk_delete). on_progress receives a checkpoint with per-container
+        deletion metrics as work proceeds; passing the last one back resumes
+        the purge, skipping containers that were already emptied.
+        
+        Returns:
+            Items deleted per container
+        """
         try:
             logger.info(
                 f"Starting hard delete for engagement {engagement_id}",
                 extra={
                     "correlation_id": self.correlation_id,
-                    "engagement_id": engagement_id
+                    "engagement_id": engagement_id,
+                    "resuming": bool(checkpoint)
                 }
             )
             
-            deletion_stats = {}
+            engine = create_bulk_delete_engine()
+            containers = {
+                name: DeletionMetrics.from_dict(data)
+                for name, data in ((checkpoint or {}).get("containers") or {}).items()
+            }
             
-            # Delete from all containers
-            containers_to_clean = [
-                "engagements", "memberships", "assessments", "documents", 
-                "runlogs", "embeddings", "workshops"
-            ]
+            def current_checkpoint() -> Dict[str, Any]:
+                return {"containers": {name: metrics.to_dict() for name, metrics in containers.items()}}
             
-            for container_name in containers_to_clean:
-                if container_name == "engagements":
-                    # Delete by ID
-                    deleted = await self._delete_item(container_name, engagement_id, engagement_id)
-                    deletion_stats[container_name] = 1 if deleted else 0
-                else:
-                    # Query and delete by engagement_id
-                    items = await self._query_items(
-                        container_name,
-                        "SELECT c.id FROM c WHERE c.engagement_id = @engagement_id",
-                        [{"name": "@engagement_id", "value": engagement_id}]
+            async def report(_metrics: DeletionMetrics):
+                if on_progress is not None:
+                    await on_progress(current_checkpoint())
+            
+            # Children before the engagement itself, so an interrupted purge
+            # can still find everything that is left
+            for container_name in ENGAGEMENT_PURGE_CONTAINERS:
+                metrics = containers.setdefault(container_name, DeletionMetrics(container=container_name))
+                if metrics.completed:
+                    continue
+                
+                # Batch by each item's own partition key; runlogs, for one, are
+                # partitioned by assessment rather than engagement
+                owner_field = "id" if container_name == "engagements" else "engagement_id"
+                query = (
+                    f"SELECT c.id, c.{partition_key_field(container_name)} AS partition_key "
+                    f"FROM c WHERE c.{owner_field} = @engagement_id"
+                )
+                parameters = [{"name": "@engagement_id", "value": engagement_id}]
+                
+                async def items():
+                    async for item in self._iter_query(container_name, query, parameters):
+                        yield item["id"], item.get("partition_key")
+                
+                not_found_before = metrics.not_found
+                try:
+                    await engine.delete_items(
+                        items(),
+                        self._batch_executor(container_name),
+                        metrics,
+                        on_progress=report
                     )
-                    
-                    deleted_count = 0
-                    for item in items:
-                        deleted = await self._delete_item(container_name, item["id"], engagement_id)
-                        if deleted:
-                            deleted_count += 1
-                    
-                    deletion_stats[container_name] = deleted_count
+                    if metrics.not_found > not_found_before:
+                        # A 404 only means "already gone" if nothing is left behind
+                        async for _ in self._iter_query(container_name, query, parameters, page_size=1):
+                            raise HTTPException(
+                                500, f"Hard delete left items in {container_name} for engagement {engagement_id}"
+                            )
+                except Exception:
+                    # Keep the counts of batches that did commit
+                    await report(metrics)
+                    raise
+                metrics.completed = True
+                await report(metrics)
+            
+            deletion_stats = {name: metrics.deleted for name, metrics in containers.items()}
             
             logger.info(
                 f"Completed hard delete for engagement {engagement_id}",
                 extra={
                     "correlation_id": self.correlation_id,
                     "engagement_id": engagement_id,
-                    "deletion_stats": deletion_stats
+                    "deletion_stats": deletion_stats,
+                    "deletion_metrics": current_checkpoint()["containers"]
                 }
             )
             
@@ -714,6 +873,24 @@ class CosmosRepository(Repository):
             )
             raise
     
+    def _batch_executor(self, container_name: str) -> BatchExecutor:
+        """Run transactional batches against a container, returning each batch's RU charge"""
+        async def execute_batch(operations, partition_key) -> float:
+            container = await self._container(container_name)
+            charges = []
+            
+            def response_hook(headers, _result):
+                charges.append(self.request_charge.record(headers))
+            
+            await container.execute_item_batch(
+                batch_operations=operations,
+                partition_key=partition_key,
+                response_hook=response_hook
+            )
+            return sum(charges)
+        
+        return execute_batch
+    
     # Workshop methods
     async def create_workshop(self, workshop: Workshop) -> Workshop:
         """Create a new workshop"""
@@ -0,0 +1,298 @@
+"""
+In-process vector index for engagement-scoped embedding search.
+Keeps a pre-normalized float32 matrix per engagement so similarity queries
+are answered with a single matrix-vector product and a partial top-k. Each
+row's norm is kept alongside so hits return the stored (unnormalized) vector.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# numpy is an optional dependency in CI images; callers fall back to the
+# brute-force path when it is not installed.
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+
+logger = logging.getLogger(__name__)
+
+
+class EngagementVectorIndex:
+    """Dense, pre-normalized vector index for a single engagement"""
+
+    def __init__(self, engagement_id: str, initial_capacity: int = 1024):
+        if not HAS_NUMPY:
+            raise RuntimeError("numpy is required for the in-memory vector index")
+
+        self.engagement_id = engagement_id
+        self.dimensions: Optional[int] = None
+        self.loaded_at = time.monotonic()
+        self._initial_capacity = max(1, initial_capacity)
+        self._matrix = None
+        self._norms = None
+        self._ids: List[str] = []
+        self._payloads: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _ensure_capacity(self, required: int):
+        """Grow the backing matrix geometrically so appends stay amortized O(1)"""
+        capacity = self._matrix.shape[0]
+        if required <= capacity:
+            return
+        new_capacity = max(required, capacity * 2)
+        grown = np.zeros((new_capacity, self.dimensions), dtype=np.float32)
+        grown[:len(self._ids)] = self._matrix[:len(self._ids)]
+        self._matrix = grown
+        norms = np.zeros(new_capacity, dtype=np.float32)
+        norms[:len(self._ids)] = self._norms[:len(self._ids)]
+        self._norms = norms
+
+    def upsert(self, items: Iterable[Dict[str, Any]]) -> int:
+        """
+        Insert or replace embedding items.
+
+        Each item is an embedding document dict with at least ``id`` and
+        ``vector``. The vector is normalized into the matrix and the remaining
+        fields are kept as the payload returned with search hits.
+
+        Returns:
+            Number of items indexed
+        """
+        indexed = 0
+        with self._lock:
+            for item in items:
+                vector = item.get("vector")
+                item_id = item.get("id")
+                if not vector or item_id is None:
+                    continue
+
+                if self.dimensions is None:
+                    self.dimensions = len(vector)
+                    self._matrix = np.zeros((self._initial_capacity, self.dimensions), dtype=np.float32)
+                    self._norms = np.zeros(self._initial_capacity, dtype=np.float32)
+                elif len(vector) != self.dimensions:
+                    logger.warning(
+                        "Skipping embedding with mismatched dimensions",
+                        extra={
+                            "engagement_id": self.engagement_id,
+                            "item_id": item_id,
+                            "expected_dimensions": self.dimensions,
+                            "actual_dimensions": len(vector)
+                        }
+                    )
+                    continue
+
+                row = np.asarray(vector, dtype=np.float32)
+                norm = float(np.linalg.norm(row))
+                if norm > 0:
+                    row = row / norm
+
+                payload = {k: v for k, v in item.items() if k != "vector"}
+                position = self._positions.get(item_id)
+                if position is None:
+                    position = len(self._ids)
+                    self._ensure_capacity(position + 1)
+                    self._ids.append(item_id)
+                    self._payloads.append(payload)
+                    self._positions[item_id] = position
+                else:
+                    self._payloads[position] = payload
+
+                self._matrix[position] = row
+                self._norms[position] = norm
+                indexed += 1
+
+        return indexed
+
+    def remove(self, item_ids: Iterable[str]) -> int:
+        """Remove items by id using swap-with-last so the matrix stays dense"""
+        removed = 0
+        with self._lock:
+            for item_id in item_ids:
+                position = self._positions.pop(item_id, None)
+                if position is None:
+                    continue
+
+                last = len(self._ids) - 1
+                if position != last:
+                    moved_id = self._ids[last]
+                    self._matrix[position] = self._matrix[last]
+                    self._norms[position] = self._norms[last]
+                    self._ids[position] = moved_id
+                    self._payloads[position] = self._payloads[last]
+                    self._positions[moved_id] = position
+
+                self._ids.pop()
+                self._payloads.pop()
+                removed += 1
+
+        return removed
+
+    def remove_document(self, doc_id: str) -> int:
+        """Remove every chunk belonging to a source document"""
+        with self._lock:
+            item_ids = [
+                self._ids[i] for i, payload in enumerate(self._payloads)
+                if payload.get("doc_id") == doc_id
+            ]
+            return self.remove(item_ids)
+
+    def search(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        similarity_threshold: float
+    ) -> List[Tuple[Dict[str, Any], List[float], float]]:
+        """
+        Return the top_k most similar items above the threshold.
+
+        Returns:
+            List of (payload, vector, cosine_similarity) tuples sorted by
+            similarity descending. Vectors are the stored ones, to float32
+            precision.
+        """
+        with self._lock:
+            count = len(self._ids)
+            if count == 0 or top_k <= 0 or len(query_vector) != self.dimensions:
+                return []
+
+            query = np.asarray(query_vector, dtype=np.float32)
+            query_norm = float(np.linalg.norm(query))
+            if query_norm == 0:
+                return []
+            query = query / query_norm
+
+            scores = self._matrix[:count] @ query
+
+            k = min(top_k, count)
+            if k < count:
+                candidates = np.argpartition(scores, count - k)[count - k:]
+            else:
+                candidates = np.arange(count)
+            candidates = candidates[np.argsort(scores[candidates])[::-1]]
+
+            results = []
+            for position in candidates:
+                score = float(scores[position])
+                if score < similarity_threshold:
+                    break
+                results.append((
+                    dict(self._payloads[position]),
+                    (self._matrix[position] * self._norms[position]).tolist(),
+                    score
+                ))
+
+            return results
+
+
+class VectorIndexRegistry:
+    """Process-wide LRU of engagement vector indexes with a freshness TTL"""
+
+    def __init__(self, max_engagements: int = 32, ttl_seconds: float = 300.0):
+        self.max_engagements = max_engagements
+        self.ttl_seconds = ttl_seconds
+        self._indexes: "OrderedDict[str, EngagementVectorIndex]" = OrderedDict()
+        self._build_locks: Dict[str, asyncio.Lock] = {}
+        # Bumped by every embeddings write so a cold build that raced one is not registered
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, engagement_id: str) -> Optional[EngagementVectorIndex]:
+        """Get a warm index, or None if missing or older than the TTL"""
+        with self._lock:
+            index = self._indexes.get(engagement_id)
+            if index is None:
+                return None
+            if self.ttl_seconds > 0 and time.monotonic() - index.loaded_at > self.ttl_seconds:
+                del self._indexes[engagement_id]
+                return None
+            self._indexes.move_to_end(engagement_id)
+            return index
+
+    def generation(self, engagement_id: str) -> int:
+        """Write generation of an engagement, noted before a cold build queries Cosmos"""
+        with self._lock:
+            return self._generations.get(engagement_id, 0)
+
+    def record_write(self, engagement_id: str):
+        """Note that an engagement's embeddings changed in Cosmos"""
+        with self._lock:
+            self._generations[engagement_id] = self._generations.get(engagement_id, 0) + 1
+
+    def put(self, index: EngagementVectorIndex, expected_generation: Optional[int] = None) -> bool:
+        """
+        Register an index, evicting the least recently used engagements
+
+        With expected_generation the index is only registered if no write was
+        recorded for its engagement since; returns whether it was registered.
+        """
+        with self._lock:
+            if (expected_generation is not None
+                    and self._generations.get(index.engagement_id, 0) != expected_generation):
+                return False
+            self._indexes[index.engagement_id] = index
+            self._indexes.move_to_end(index.engagement_id)
+            while len(self._indexes) > self.max_engagements:
+                evicted_id, _ = self._indexes.popitem(last=False)
+                self._build_locks.pop(evicted_id, None)
+                logger.debug("Evicted engagement vector index", extra={"engagement_id": evicted_id})
+            return True
+
+    def invalidate(self, engagement_id: str):
+        """Drop the index for an engagement so the next search rebuilds it"""
+        with self._lock:
+            self._indexes.pop(engagement_id, None)
+
+    def clear(self):
+        """Drop all indexes"""
+        with self._lock:
+            self._indexes.clear()
+            self._build_locks.clear()
+
+    def build_lock(self, engagement_id: str) -> asyncio.Lock:
+        """Lock used to coalesce concurrent cold loads for one engagement"""
+        with self._lock:
+            lock = self._build_locks.get(engagement_id)
+            if lock is None:
+                lock = asyncio.Lock()
+                self._build_locks[engagement_id] = lock
+            return lock
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get registry statistics"""
+        with self._lock:
+            return {
+                "engagements": len(self._indexes),
+                "max_engagements": self.max_engagements,
+                "ttl_seconds": self.ttl_seconds,
+                "total_vectors": sum(len(index) for index in self._indexes.values())
+            }
+
+
+# Global registry instance
+_vector_index_registry: Optional[VectorIndexRegistry] = None
+
+
+def get_vector_index_registry(
+    max_engagements: int = 32,
+    ttl_seconds: float = 300.0
+) -> VectorIndexRegistry:
+    """Get or create the process-wide vector index registry"""
+    global _vector_index_registry
+    if _vector_index_registry is None:
+        _vector_index_registry = VectorIndexRegistry(
+            max_engagements=max_engagements,
+            ttl_seconds=ttl_seconds
+        )
+    return _vector_index_registry
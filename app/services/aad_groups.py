@@ -6,18 +6,20 @@ and role mapping. Includes caching and tenant isolation for security.
 """
 import sys
 sys.path.append("/app")
+import asyncio
 import json
 import logging
-import time
-from typing import Any, Dict, List, Optional, Set, Tuple
-from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+from datetime import datetime
 from dataclasses import dataclass
+from urllib.parse import quote
 
 import msal
 from cachetools import TTLCache
 
 from config import config
 from services.cache import get_cached, invalidate_cache_key, cache_manager
+from services.graph_client import AppTokenProvider, GraphClient
 
 
 logger = logging.getLogger(__name__)
@@ -43,26 +45,172 @@ class UserRoles:
     fetched_at: datetime
 
 
+def _parse_group_mapping() -> Dict[str, str]:
+    """Parse group ID to role mapping from configuration"""
+    try:
+        group_map = json.loads(config.aad_groups.group_map_json)
+        if not isinstance(group_map, dict):
+            logger.warning("AAD group mapping is not a dictionary, using empty mapping")
+            return {}
+        
+        logger.info("Loaded AAD group mapping", extra={"group_count": len(group_map)})
+        return group_map
+        
+    except json.JSONDecodeError as e:
+        logger.error(
+            "Failed to parse AAD group mapping JSON",
+            extra={"error": str(e), "raw_json": config.aad_groups.group_map_json}
+        )
+        return {}
+
+
+def _create_msal_client() -> Optional[msal.ConfidentialClientApplication]:
+    """Create MSAL client for Microsoft Graph API access"""
+    try:
+        authority = f"https://login.microsoftonline.com/{config.aad_groups.tenant_id}"
+        
+        client = msal.ConfidentialClientApplication(
+            client_id=config.aad_groups.client_id,
+            client_credential=config.aad_groups.client_secret,
+            authority=authority
+        )
+        
+        logger.info("MSAL client initialized", extra={"tenant_id": config.aad_groups.tenant_id})
+        return client
+        
+    except Exception as e:
+        logger.error("Failed to create MSAL client", extra={"error": str(e)})
+        return None
+
+
+def _memberships_from_graph(items: List[Dict[str, Any]]) -> List[GroupMembership]:
+    """Security groups among memberOf results (directory roles are skipped)"""
+    fetched_at = datetime.utcnow()
+    return [
+        GroupMembership(
+            group_id=item.get("id", ""),
+            group_name=item.get("displayName", ""),
+            tenant_id=config.aad_groups.tenant_id,
+            fetched_at=fetched_at
+        )
+        for item in items
+        if item.get("@odata.type") == "#microsoft.graph.group"
+    ]
+
+
+class AADRoleResolver:
+    """
+    Process-wide AAD state shared by every AADGroupsService
+    
+    Holds the MSAL client, the cached app token, the pooled Graph session,
+    the parsed group mapping and the legacy cache, and runs at most one
+    Graph lookup per user at a time.
+    """
+    
+    def __init__(self, msal_client=None, graph_client: Optional[GraphClient] = None):
+        self.group_roles_map = _parse_group_mapping()
+        self.legacy_cache: TTLCache = TTLCache(maxsize=1000, ttl=config.aad_groups.cache_ttl_minutes * 60)
+        
+        if msal_client is None and graph_client is None and config.is_aad_groups_enabled():
+            msal_client = _create_msal_client()
+        self.msal_client = msal_client
+        
+        if graph_client is None and msal_client is not None:
+            graph_client = GraphClient(
+                AppTokenProvider(msal_client, config.aad_groups.token_refresh_margin_seconds),
+                base_url=config.aad_groups.graph_base_url
+            )
+        self.graph = graph_client
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    @staticmethod
+    def member_of_path(user_email: str) -> str:
+        return f"users/{quote(user_email)}/memberOf?$top=999"
+    
+    async def fetch_user_groups(self, user_email: str) -> List[GroupMembership]:
+        """Group memberships from Graph; concurrent calls for one user share a lookup"""
+        task = self._inflight.get(user_email)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._fetch_user_groups(user_email))
+            self._inflight[user_email] = task
+            task.add_done_callback(lambda done: self._finish_fetch(user_email, done))
+        # Shield so a cancelled request does not cancel the lookup for other waiters
+        return await asyncio.shield(task)
+    
+    def _finish_fetch(self, user_email: str, task: asyncio.Task) -> None:
+        if self._inflight.get(user_email) is task:
+            del self._inflight[user_email]
+        if not task.cancelled():
+            task.exception()  # Marks the exception as retrieved
+    
+    async def _fetch_user_groups(self, user_email: str) -> List[GroupMembership]:
+        if self.graph is None:
+            raise Exception("Failed to get access token for Microsoft Graph")
+        
+        items = await self.graph.get_all(self.member_of_path(user_email))
+        if items is None:
+            logger.warning("User not found in Microsoft Graph", extra={"user_email": user_email})
+            return []
+        return _memberships_from_graph(items)
+    
+    async def fetch_many_user_groups(self, user_emails: Iterable[str]) -> Dict[str, List[GroupMembership]]:
+        """Group memberships for many users through Graph $batch (cold-start warmup)"""
+        if self.graph is None:
+            raise Exception("Failed to get access token for Microsoft Graph")
+        
+        results = await self.graph.batch_get_all({
+            user_email: self.member_of_path(user_email) for user_email in dict.fromkeys(user_emails)
+        })
+        return {
+            user_email: _memberships_from_graph(items) if items is not None else []
+            for user_email, items in results.items()
+        }
+    
+    async def close(self) -> None:
+        if self.graph is not None:
+            await self.graph.close()
+
+
+_resolver: Optional[AADRoleResolver] = None
+
+
+def get_aad_role_resolver() -> AADRoleResolver:
+    """Shared role resolver for this process"""
+    global _resolver
+    if _resolver is None:
+        _resolver = AADRoleResolver()
+    return _resolver
+
+
+async def close_aad_role_resolver() -> None:
+    """Close the shared Graph session (application shutdown)"""
+    global _resolver
+    if _resolver is not None:
+        resolver, _resolver = _resolver, None
+        await resolver.close()
+
+
 class AADGroupsService:
     """
     Service for querying Azure Active Directory group memberships
     and mapping them to application roles.
+    
+    Instances are cheap per-request views (they carry the correlation ID);
+    tokens, HTTP connections and caches live in the shared AADRoleResolver.
     """
     
-    def __init__(self, correlation_id: str = "aad-groups"):
+    def __init__(self, correlation_id: str = "aad-groups", resolver: Optional[AADRoleResolver] = None):
         """
         Initialize AAD Groups Service
         
         Args:
             correlation_id: Correlation ID for request tracking
+            resolver: Shared AAD state (defaults to the process-wide resolver)
         """
         self.correlation_id = correlation_id
+        self.resolver = resolver or get_aad_role_resolver()
         
-        # Legacy cache for backward compatibility (will be phased out)
-        cache_ttl_seconds = config.aad_groups.cache_ttl_minutes * 60
-        self._legacy_cache: TTLCache = TTLCache(maxsize=1000, ttl=cache_ttl_seconds)
-        
-        # New unified cache configuration
+        # Unified cache configuration
         self.cache_name = "user_roles"
         self.cache_config = {
             "max_size_mb": config.cache.user_roles_max_size_mb,
@@ -70,86 +218,19 @@ class AADGroupsService:
             "default_ttl_seconds": config.cache.user_roles_ttl_seconds,
             "cleanup_interval_seconds": config.cache.cleanup_interval_seconds
         }
-        
-        # Parse group mapping configuration
-        self._group_roles_map = self._parse_group_mapping()
-        
-        # Initialize MSAL client
-        self._msal_client = None
-        if config.is_aad_groups_enabled():
-            self._msal_client = self._create_msal_client()
-
-    def _parse_group_mapping(self) -> Dict[str, str]:
-        """Parse group ID to role mapping from configuration"""
-        try:
-            group_map = json.loads(config.aad_groups.group_map_json)
-            if not isinstance(group_map, dict):
-                logger.warning("AAD group mapping is not a dictionary, using empty mapping", extra={"correlation_id": self.correlation_id})
-                return {}
-            
-            logger.info(
-                "Loaded AAD group mapping",
-                extra={"group_count": len(group_map), "correlation_id": self.correlation_id}
-            )
-            return group_map
-            
-        except json.JSONDecodeError as e:
-            logger.error(
-                "Failed to parse AAD group mapping JSON",
-                extra={"error": str(e), "raw_json": config.aad_groups.group_map_json, "correlation_id": self.correlation_id}
-            )
-            return {}
-
-    def _create_msal_client(self) -> Optional[msal.ConfidentialClientApplication]:
-        """Create MSAL client for Microsoft Graph API access"""
-        try:
-            authority = f"https://login.microsoftonline.com/{config.aad_groups.tenant_id}"
-            
-            client = msal.ConfidentialClientApplication(
-                client_id=config.aad_groups.client_id,
-                client_credential=config.aad_groups.client_secret,
-                authority=authority
-            )
-            
-            logger.info(
-                "MSAL client initialized",
-                extra={"tenant_id": config.aad_groups.tenant_id, "correlation_id": self.correlation_id}
-            )
-            return client
-            
-        except Exception as e:
-            logger.error(
-                "Failed to create MSAL client",
-                extra={"error": str(e), "correlation_id": self.correlation_id}
-            )
-            return None
-
-    def _get_access_token(self) -> Optional[str]:
-        """Get access token for Microsoft Graph API"""
-        if not self._msal_client:
-            return None
-        
-        try:
-            # Use client credentials flow for app-only access
-            result = self._msal_client.acquire_token_for_client(
-                scopes=["https://graph.microsoft.com/.default"]
-            )
-            
-            if "access_token" in result:
-                return result["access_token"]
-            else:
-                logger.error(
-                    "Failed to acquire access token",
-                    extra={"error": result.get("error_description", "Unknown error"), "correlation_id": self.correlation_id}
-                )
-                return None
-                
-        except Exception as e:
-            logger.error(
-                "Exception acquiring access token",
-                extra={"error": str(e), "correlation_id": self.correlation_id}
-            )
-            return None
+    
+    @property
+    def _legacy_cache(self) -> TTLCache:
+        # Legacy cache for backward compatibility (will be phased out)
+        return self.resolver.legacy_cache
+    
+    @property
+    def _group_roles_map(self) -> Dict[str, str]:
+        return self.resolver.group_roles_map
+    
+    @property
+    def _msal_client(self):
+        return self.resolver.msal_client
 
     def validate_tenant_isolation(self, user_tenant_id: str) -> bool:
         """
@@ -220,15 +301,7 @@ class AADGroupsService:
         async def fetch_groups():
             groups = await self._fetch_user_groups_from_graph(user_email)
             # Convert to serializable format for caching
-            return [
-                {
-                    "group_id": g.group_id,
-                    "group_name": g.group_name,
-                    "tenant_id": g.tenant_id,
-                    "fetched_at": g.fetched_at.isoformat()
-                }
-                for g in groups
-            ]
+            return self._serialize_groups(groups)
         
         try:
             cached_data = await get_cached(
@@ -316,48 +389,56 @@ class AADGroupsService:
         Returns:
             List of group memberships
         """
-        access_token = self._get_access_token()
-        if not access_token:
-            raise Exception("Failed to get access token for Microsoft Graph")
+        return await self.resolver.fetch_user_groups(user_email)
+
+    @staticmethod
+    def _serialize_groups(groups: List[GroupMembership]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "group_id": g.group_id,
+                "group_name": g.group_name,
+                "tenant_id": g.tenant_id,
+                "fetched_at": g.fetched_at.isoformat()
+            }
+            for g in groups
+        ]
+
+    async def warm_up(self, user_emails: Iterable[str]) -> int:
+        """
+        Load group memberships for many users ahead of their first request
         
-        import aiohttp
+        Users are looked up 20 per Graph $batch call and stored in the same
+        cache that request-time lookups read.
         
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
+        Returns:
+            Number of users cached
+        """
+        if not config.is_aad_groups_enabled():
+            return 0
         
-        # Query user's group memberships
-        url = f"https://graph.microsoft.com/v1.0/users/{user_email}/memberOf"
-        
-        groups = []
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    for item in data.get("value", []):
-                        # Filter for security groups only
-                        if item.get("@odata.type") == "#microsoft.graph.group":
-                            group = GroupMembership(
-                                group_id=item.get("id", ""),
-                                group_name=item.get("displayName", ""),
-                                tenant_id=config.aad_groups.tenant_id,
-                                fetched_at=datetime.utcnow()
-                            )
-                            groups.append(group)
-                
-                elif response.status == 404:
-                    logger.warning(
-                        "User not found in Microsoft Graph",
-                        extra={"user_email": user_email, "correlation_id": self.correlation_id}
-                    )
-                else:
-                    error_text = await response.text()
-                    raise Exception(f"Microsoft Graph API error {response.status}: {error_text}")
-        
-        return groups
+        try:
+            memberships = await self.resolver.fetch_many_user_groups(user_emails)
+        except Exception as e:
+            logger.warning(
+                "AAD group warmup failed",
+                extra={"error": str(e), "correlation_id": self.correlation_id}
+            )
+            return 0
+        if config.cache.enabled:
+            cache = cache_manager.get_cache(self.cache_name, **self.cache_config)
+            for user_email, groups in memberships.items():
+                await cache.set(
+                    f"groups_{user_email}", self._serialize_groups(groups), self.cache_config["default_ttl_seconds"]
+                )
+        else:
+            for user_email, groups in memberships.items():
+                self._legacy_cache[f"groups:{user_email}"] = groups
+        
+        logger.info(
+            "Warmed AAD group cache",
+            extra={"user_count": len(memberships), "correlation_id": self.correlation_id}
+        )
+        return len(memberships)
 
     def map_groups_to_roles(self, groups: List[GroupMembership]) -> Set[str]:
         """
@@ -522,6 +603,9 @@ def create_aad_groups_service(correlation_id: str = "aad-groups") -> AADGroupsSe
     """
     Factory function to create AAD Groups Service instance
     
+    The instance shares the process-wide AADRoleResolver, so creating one
+    per request is cheap.
+    
     Args:
         correlation_id: Correlation ID for request tracking
         
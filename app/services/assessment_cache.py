@@ -11,7 +11,7 @@ Provides caching for assessment-related data including:
 import logging
 from typing import Any, Dict, List, Optional
 from api.schemas.assessment import AssessmentPreset
-from services.cache import get_cached, invalidate_cache_key, cache_manager
+from services.cache import get_cached, invalidate_cache_key, invalidate_cache_tag, cache_manager
 import sys
 sys.path.append("/app")
 from config import config
@@ -29,9 +29,19 @@ class AssessmentCacheService:
             "max_size_mb": config.cache.assessment_schemas_max_size_mb,
             "max_entries": config.cache.assessment_schemas_max_entries,
             "default_ttl_seconds": config.cache.assessment_schemas_ttl_seconds,
-            "cleanup_interval_seconds": config.cache.cleanup_interval_seconds
+            "cleanup_interval_seconds": config.cache.cleanup_interval_seconds,
+            "stale_while_revalidate_seconds": config.cache.stale_while_revalidate_seconds,
+            "negative_ttl_seconds": config.cache.negative_ttl_seconds
         }
     
+    @staticmethod
+    def _preset_tag(preset_id: str) -> str:
+        return f"preset:{preset_id}"
+    
+    @staticmethod
+    def _assessment_tag(assessment_id: str) -> str:
+        return f"assessment:{assessment_id}"
+    
     async def get_assessment_schema(self, preset_id: str) -> Optional[Dict[str, Any]]:
         """Get cached assessment schema for a specific preset"""
         if not config.cache.enabled:
@@ -43,6 +53,7 @@ class AssessmentCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"schema_{preset_id}",
+            tags=[self._preset_tag(preset_id)],
             factory=compute_schema,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -59,6 +70,7 @@ class AssessmentCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"questions_{preset_id}",
+            tags=[self._preset_tag(preset_id)],
             factory=compute_questions,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -75,6 +87,7 @@ class AssessmentCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"scoring_{preset_id}",
+            tags=[self._preset_tag(preset_id)],
             factory=compute_scoring,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -91,6 +104,7 @@ class AssessmentCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"validation_{preset_id}",
+            tags=[self._preset_tag(preset_id)],
             factory=compute_validation,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -107,6 +121,7 @@ class AssessmentCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"template_{preset_id}",
+            tags=[self._preset_tag(preset_id)],
             factory=compute_template,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -123,6 +138,7 @@ class AssessmentCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"metadata_{assessment_id}",
+            tags=[self._assessment_tag(assessment_id)],
             factory=compute_metadata,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -149,23 +165,16 @@ class AssessmentCacheService:
         if not config.cache.enabled:
             return
         
-        cache_keys = [
-            f"schema_{preset_id}",
-            f"questions_{preset_id}",
-            f"scoring_{preset_id}",
-            f"validation_{preset_id}",
-            f"template_{preset_id}",
-            "presets_list"  # List needs refresh when individual preset changes
-        ]
-        
-        for key in cache_keys:
-            await invalidate_cache_key(self.CACHE_NAME, key)
+        invalidated = await invalidate_cache_tag(self.CACHE_NAME, self._preset_tag(preset_id))
+        # List needs refresh when individual preset changes
+        if await invalidate_cache_key(self.CACHE_NAME, "presets_list"):
+            invalidated += 1
         
         logger.info(
             f"Invalidated assessment cache for preset {preset_id}",
             extra={
                 "preset_id": preset_id,
-                "invalidated_keys": len(cache_keys)
+                "invalidated_keys": invalidated
             }
         )
     
@@ -174,7 +183,7 @@ class AssessmentCacheService:
         if not config.cache.enabled:
             return
         
-        await invalidate_cache_key(self.CACHE_NAME, f"metadata_{assessment_id}")
+        await invalidate_cache_tag(self.CACHE_NAME, self._assessment_tag(assessment_id))
         
         logger.info(
             f"Invalidated assessment cache for {assessment_id}",
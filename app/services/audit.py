@@ -14,15 +14,42 @@ import hmac
 import json
 import logging
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Any, Dict, List, Optional, Tuple
 
 from api.schemas.gdpr import AuditLogEntry, AuditActionType, AuditLogResponse
 from domain.repository import Repository
 from config import config
+from services.audit_sink import BufferedAuditSink, create_audit_sink
 from util.logging import get_correlation_id
 
 logger = logging.getLogger(__name__)
 
+# Shared by every AuditService in the process; records are (repository, entry)
+_entry_sink: Optional[BufferedAuditSink] = None
+
+
+async def _write_audit_entries(records: List[Tuple[Any, AuditLogEntry]]) -> None:
+    """Store a batch of buffered entries, in bulk where the repository supports it"""
+    by_repository: Dict[int, Tuple[Any, List[AuditLogEntry]]] = {}
+    for repository, entry in records:
+        by_repository.setdefault(id(repository), (repository, []))[1].append(entry)
+    
+    for repository, entries in by_repository.values():
+        store_entries = getattr(repository, "store_audit_log_entries", None)
+        if store_entries is not None:
+            await store_entries(entries)
+        else:
+            for entry in entries:
+                await repository.store_audit_log_entry(entry)
+
+
+def get_audit_entry_sink() -> BufferedAuditSink:
+    """Get or create the process-wide sink for audit log entries"""
+    global _entry_sink
+    if _entry_sink is None:
+        _entry_sink = create_audit_sink("audit_log_entries", _write_audit_entries)
+    return _entry_sink
+
 
 class AuditService:
     """Service for managing GDPR audit logs and compliance tracking"""
@@ -131,8 +158,7 @@ class AuditService:
             # Generate digital signature for integrity
             audit_entry.signature = self._generate_signature(audit_entry)
             
-            # Store audit entry (implementation depends on repository)
-            # For now, we'll extend the repository interface
+            # Store audit entry in a batched write to the repository
             stored_entry = await self._store_audit_entry(audit_entry)
             
             # Log to application logs for additional tracking
@@ -165,18 +191,14 @@ class AuditService:
             raise
     
     async def _store_audit_entry(self, audit_entry: AuditLogEntry) -> AuditLogEntry:
-        """Store audit entry in repository"""
-        # This would need to be implemented in the repository layer
-        # For now, we'll create a basic storage mechanism
-        
-        # Convert to dict for storage
-        entry_dict = audit_entry.model_dump()
-        
-        # Store using a hypothetical audit repository method
-        # In a real implementation, this would be stored in Cosmos DB
-        # with proper TTL settings for 7-year retention
+        """
+        Store audit entry in the repository
         
-        # For now, just return the entry
+        The entry is group-committed with those of concurrent requests by the
+        shared audit sink; this returns once its batch is written.
+        """
+        if hasattr(self.repository, "store_audit_log_entries") or hasattr(self.repository, "store_audit_log_entry"):
+            await get_audit_entry_sink().put((self.repository, audit_entry), durable=True)
         return audit_entry
     
     async def get_audit_logs(
@@ -187,11 +209,12 @@ class AuditService:
         resource_type: Optional[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
-        page: int = 1,
-        page_size: int = 100
+        page_size: int = 100,
+        cursor: Optional[str] = None,
+        include_count: bool = False
     ) -> AuditLogResponse:
         """
-        Retrieve audit logs with filtering and pagination
+        Retrieve audit logs with filtering and cursor pagination
         
         Args:
             engagement_id: Filter by engagement ID
@@ -200,27 +223,41 @@ class AuditService:
             resource_type: Filter by resource type
             start_date: Filter by start date
             end_date: Filter by end date
-            page: Page number for pagination
             page_size: Number of entries per page
+            cursor: next_cursor from the previous page
+            include_count: Include the approximate total count
             
         Returns:
             Paginated audit log response
         """
         try:
-            # This would be implemented as a repository method
-            # For now, return empty response
-            entries: List[AuditLogEntry] = []
-            total_count = 0
-            
-            # Calculate pagination
-            has_more = total_count > (page * page_size)
+            list_audit_log_entries = getattr(self.repository, "list_audit_log_entries", None)
+            if list_audit_log_entries is None:
+                # Repository without audit storage
+                entries: List[AuditLogEntry] = []
+                next_cursor, total_count = None, None
+            else:
+                if _entry_sink is not None and _entry_sink.pending:
+                    # Read back entries still waiting in the buffer
+                    await _entry_sink.flush()
+                entries, next_cursor, total_count = await list_audit_log_entries(
+                    engagement_id=engagement_id,
+                    user_email=user_email,
+                    action_type=action_type,
+                    resource_type=resource_type,
+                    start_date=start_date,
+                    end_date=end_date,
+                    page_size=page_size,
+                    cursor=cursor,
+                    include_count=include_count
+                )
             
             return AuditLogResponse(
                 entries=entries,
                 total_count=total_count,
-                page=page,
                 page_size=page_size,
-                has_more=has_more
+                has_more=next_cursor is not None,
+                next_cursor=next_cursor
             )
             
         except Exception as e:
@@ -0,0 +1,228 @@
+"""
+Sidecar indexes for daily audit files
+
+Each audit_events_YYYYMMDD.jsonl gets an audit_events_YYYYMMDD.jsonl.idx
+JSON file that maps the event hour (UTC), event_type and engagement_id to
+the byte spans of the lines holding them. A query intersects the spans of
+its filters and reads only those, instead of parsing every line of every
+file in its range.
+
+Indexes are maintained at read time: when a file has grown since it was
+indexed, only its new complete lines are scanned, so lines from any writer
+process are covered. A file that shrank is reindexed from the start. Spans
+of one key closer than MERGE_GAP_BYTES are merged. That bounds the index
+size, at the cost of reading (and filtering out) a few extra lines.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+MERGE_GAP_BYTES = 4096
+READ_CHUNK_BYTES = 1024 * 1024
+
+Span = Tuple[int, int]
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an event timestamp; naive values are taken as UTC"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def hour_key(moment: datetime) -> str:
+    """Index key of the UTC hour containing moment, ordered like the hours"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime("%Y%m%d%H")
+
+
+def _union(span_lists: Iterable[Sequence[int]]) -> List[Span]:
+    spans = sorted(
+        (flat[position], flat[position + 1])
+        for flat in span_lists
+        for position in range(0, len(flat), 2)
+    )
+    merged: List[Span] = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _intersect(first: List[Span], second: List[Span]) -> List[Span]:
+    result: List[Span] = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            result.append((start, end))
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+@dataclass
+class AuditFileIndex:
+    """Byte spans per hour, event type and engagement of one audit file"""
+    # Bytes covered by the index; always ends on a line boundary
+    size: int = 0
+    # Spans are flat [start, end, start, end, ...] lists, in file order
+    hours: Dict[str, List[int]] = field(default_factory=dict)
+    event_types: Dict[str, List[int]] = field(default_factory=dict)
+    engagements: Dict[str, List[int]] = field(default_factory=dict)
+
+    def add(self, start: int, end: int, hour: str, event_type: Optional[str], engagement_id: Optional[str]) -> None:
+        for postings, key in ((self.hours, hour), (self.event_types, event_type), (self.engagements, engagement_id)):
+            if key is None:
+                continue
+            spans = postings.setdefault(str(key), [])
+            if spans and start - spans[-1] <= MERGE_GAP_BYTES:
+                spans[-1] = end
+            else:
+                spans.extend((start, end))
+
+    def candidate_spans(
+        self,
+        start_hour: str,
+        end_hour: str,
+        event_types: Optional[Sequence[str]] = None,
+        engagement_ids: Optional[Sequence[str]] = None
+    ) -> List[Span]:
+        """Spans that may hold events matching every filter (a superset)"""
+        spans = _union(flat for hour, flat in self.hours.items() if start_hour <= hour <= end_hour)
+        if event_types:
+            spans = _intersect(spans, _union(self.event_types.get(value, ()) for value in event_types))
+        if engagement_ids:
+            spans = _intersect(spans, _union(self.engagements.get(str(value), ()) for value in engagement_ids))
+        return spans
+
+    def scan(self, path: Path) -> None:
+        """Index the complete lines appended to path since the last scan"""
+        offset = self.size
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Still being written; indexed by a later scan
+                    break
+                end = offset + len(line)
+                try:
+                    event = json.loads(line)
+                    self.add(
+                        offset, end, hour_key(parse_timestamp(event["timestamp"])),
+                        event.get("event_type"), event.get("engagement_id")
+                    )
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    # Malformed lines are in no span, so queries never return them
+                    pass
+                offset = end
+        self.size = offset
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "version": INDEX_VERSION,
+            "size": self.size,
+            "hours": self.hours,
+            "event_types": self.event_types,
+            "engagements": self.engagements
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> Optional["AuditFileIndex"]:
+        if data.get("version") != INDEX_VERSION:
+            return None
+        return cls(
+            size=int(data["size"]),
+            hours=data["hours"],
+            event_types=data["event_types"],
+            engagements=data["engagements"]
+        )
+
+
+def read_span_lines(path: Path, spans: List[Span], chunk_bytes: int = READ_CHUNK_BYTES) -> Iterator[List[bytes]]:
+    """Lines of the given spans, a chunk of at most about chunk_bytes at a time"""
+    with open(path, "rb") as f:
+        for start, end in spans:
+            f.seek(start)
+            remaining = end - start
+            carry = b""
+            while remaining > 0:
+                data = f.read(min(chunk_bytes, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                lines = (carry + data).split(b"\n")
+                # The last piece is empty at a line end, else a partial line
+                carry = lines.pop()
+                if lines:
+                    yield lines
+            if carry:
+                yield [carry]
+
+
+class AuditLogIndex:
+    """Loads, refreshes and caches the sidecar indexes of audit files"""
+
+    def __init__(self, max_cached_files: int = 64):
+        self.max_cached_files = max_cached_files
+        self._indexes: "OrderedDict[Path, AuditFileIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def index_path(path: Path) -> Path:
+        return path.with_name(path.name + INDEX_SUFFIX)
+
+    def get(self, path: Path) -> AuditFileIndex:
+        """Up-to-date index of an audit file (blocking; run in a thread)"""
+        with self._lock:
+            index = self._indexes.pop(path, None) or self._load(path)
+            size = path.stat().st_size
+            if index is None or size < index.size:
+                index = AuditFileIndex()
+            if size > index.size:
+                covered = index.size
+                index.scan(path)
+                if index.size != covered:
+                    self._save(path, index)
+            self._indexes[path] = index
+            while len(self._indexes) > self.max_cached_files:
+                self._indexes.popitem(last=False)
+            return index
+
+    def _load(self, path: Path) -> Optional[AuditFileIndex]:
+        index_path = self.index_path(path)
+        if not index_path.exists():
+            return None
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                return AuditFileIndex.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Rebuilding unreadable audit index {index_path}: {e}")
+            return None
+
+    def _save(self, path: Path, index: AuditFileIndex) -> None:
+        index_path = self.index_path(path)
+        temp_path = index_path.with_name(index_path.name + ".tmp")
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(index.to_dict(), f, separators=(",", ":"))
+            os.replace(temp_path, index_path)
+        except OSError as e:
+            # The in-memory index still serves this process
+            logger.warning(f"Failed to save audit index {index_path}: {e}")
@@ -3,11 +3,13 @@ Audit logging service for Sprint v1.4 compliance and replay capabilities.
 Provides comprehensive logging, export, and replay functionality for MCP operations.
 """
 import os
+import io
+import csv
 import json
 import asyncio
 import logging
-from datetime import datetime, timezone
-from typing import Dict, Any, List, Optional, Union
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Union
 from pathlib import Path
 from dataclasses import dataclass, asdict
 from enum import Enum
@@ -16,6 +18,12 @@ import uuid
 import aiofiles
 from pydantic import BaseModel, Field
 
+from services.audit_index import AuditLogIndex, hour_key, parse_timestamp, read_span_lines
+from services.audit_sink import DailyJsonlWriter, create_audit_sink, today
+
+# Exports are written in pieces of about this size
+EXPORT_WRITE_BUFFER_BYTES = 256 * 1024
+
 
 class AuditEventType(str, Enum):
     """Audit event types for categorization."""
@@ -159,6 +167,12 @@ class AuditLogger:
         if self.enable_file_logging:
             self.log_directory.mkdir(parents=True, exist_ok=True)
         
+        # Events are group-committed to the daily JSONL file off the request path
+        self._file_writer = DailyJsonlWriter(self.log_directory, "audit_events_")
+        self._file_sink = create_audit_sink("audit_file", self._file_writer.write, on_close=self._file_writer.close)
+        # Sidecar indexes let queries read only the spans matching their filters
+        self._index = AuditLogIndex()
+        
         # Setup structured logger
         self.logger = logging.getLogger("audit")
         self.logger.setLevel(logging.INFO)
@@ -233,13 +247,17 @@ class AuditLogger:
         return event.event_id
     
     async def _write_audit_file(self, event: AuditEvent):
-        """Write audit event to dedicated audit file."""
-        audit_file = self.log_directory / f"audit_events_{datetime.now().strftime('%Y%m%d')}.jsonl"
-        
+        """Buffer audit event for the dedicated audit file, waiting if the buffer is full."""
         event_json = json.dumps(asdict(event), ensure_ascii=False, default=str)
-        
-        async with aiofiles.open(audit_file, 'a', encoding='utf-8') as f:
-            await f.write(event_json + '\n')
+        await self._file_sink.put((today(), event_json + '\n'))
+    
+    async def flush(self) -> int:
+        """Write buffered audit events to the audit file."""
+        return await self._file_sink.flush()
+    
+    async def close(self):
+        """Flush buffered audit events and close the audit file."""
+        await self._file_sink.close()
     
     async def log_mcp_call_start(self, 
                                 operation: str,
@@ -405,101 +423,183 @@ class AuditLogger:
         Returns:
             Path to exported file
         """
+        if format not in ("jsonl", "json", "csv"):
+            raise ValueError(f"Unsupported export format: {format}")
+        
         export_filename = f"audit_export_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.{format}"
         export_path = self.log_directory / "exports" / export_filename
         export_path.parent.mkdir(exist_ok=True)
         
-        events = await self._read_audit_events(start_date, end_date, event_types, engagement_ids)
+        def events():
+            return self.iter_audit_events(start_date, end_date, event_types, engagement_ids)
         
+        # Events stream from the audit files to the export; none are held in memory
         if format == "jsonl":
-            await self._export_jsonl(events, export_path)
+            count = await self._export_jsonl(events(), export_path)
         elif format == "json":
-            await self._export_json(events, export_path)
-        elif format == "csv":
-            await self._export_csv(events, export_path)
+            count = await self._export_json(events(), export_path)
         else:
-            raise ValueError(f"Unsupported export format: {format}")
+            count = await self._export_csv(events, export_path)
         
-        self.logger.info(f"Exported {len(events)} audit events to {export_path}")
+        self.logger.info(f"Exported {count} audit events to {export_path}")
         return export_path
     
-    async def _read_audit_events(self,
+    async def iter_audit_events(self,
                                 start_date: datetime,
                                 end_date: datetime,
                                 event_types: Optional[List[AuditEventType]] = None,
-                                engagement_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
-        """Read audit events from log files within date range."""
-        events = []
+                                engagement_ids: Optional[List[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream audit events within a date range, in file order.
+        
+        Naive dates are taken as UTC. Each daily file's sidecar index narrows
+        the read to the byte spans that can match the hour range and filters;
+        only lines in those spans are parsed and checked.
+        """
+        # Include events still waiting in the buffer
+        await self.flush()
+        
+        if start_date.tzinfo is None:
+            start_date = start_date.replace(tzinfo=timezone.utc)
+        if end_date.tzinfo is None:
+            end_date = end_date.replace(tzinfo=timezone.utc)
+        type_values = [getattr(et, "value", et) for et in event_types] if event_types else None
+        start_hour, end_hour = hour_key(start_date), hour_key(end_date)
         
-        current_date = start_date.date()
-        end_date_only = end_date.date()
+        # Files are named by local date and timestamps are UTC: look one day either side
+        current_date = start_date.date() - timedelta(days=1)
+        last_date = end_date.date() + timedelta(days=1)
         
-        while current_date <= end_date_only:
+        while current_date <= last_date:
             log_file = self.log_directory / f"audit_events_{current_date.strftime('%Y%m%d')}.jsonl"
+            current_date += timedelta(days=1)
+            if not log_file.exists():
+                continue
             
-            if log_file.exists():
-                async with aiofiles.open(log_file, 'r', encoding='utf-8') as f:
-                    async for line in f:
+            index = await asyncio.to_thread(self._index.get, log_file)
+            spans = index.candidate_spans(start_hour, end_hour, type_values, engagement_ids)
+            if not spans:
+                continue
+            
+            chunks = read_span_lines(log_file, spans)
+            try:
+                while True:
+                    lines = await asyncio.to_thread(next, chunks, None)
+                    if lines is None:
+                        break
+                    for line in lines:
+                        if not line.strip():
+                            continue
                         try:
-                            event = json.loads(line.strip())
-                            event_time = datetime.fromisoformat(event['timestamp'].replace('Z', '+00:00'))
-                            
-                            # Filter by date range
-                            if not (start_date <= event_time <= end_date):
-                                continue
-                            
-                            # Filter by event types
-                            if event_types and event['event_type'] not in [et.value for et in event_types]:
-                                continue
-                            
-                            # Filter by engagement IDs
-                            if engagement_ids and event.get('engagement_id') not in engagement_ids:
-                                continue
-                            
-                            events.append(event)
-                        except (json.JSONDecodeError, KeyError, ValueError) as e:
+                            event = json.loads(line)
+                            event_time = parse_timestamp(event['timestamp'])
+                        except (json.JSONDecodeError, KeyError, ValueError, TypeError, AttributeError) as e:
                             self.logger.warning(f"Skipping malformed audit event: {e}")
-            
-            current_date = current_date.replace(day=current_date.day + 1) if current_date.day < 28 else \
-                          current_date.replace(month=current_date.month + 1, day=1) if current_date.month < 12 else \
-                          current_date.replace(year=current_date.year + 1, month=1, day=1)
-        
-        return events
+                            continue
+                        
+                        # Filter by date range
+                        if not (start_date <= event_time <= end_date):
+                            continue
+                        
+                        # Filter by event types
+                        if type_values and event.get('event_type') not in type_values:
+                            continue
+                        
+                        # Filter by engagement IDs
+                        if engagement_ids and event.get('engagement_id') not in engagement_ids:
+                            continue
+                        
+                        yield event
+            finally:
+                chunks.close()
     
-    async def _export_jsonl(self, events: List[Dict[str, Any]], export_path: Path):
+    async def _read_audit_events(self,
+                                start_date: datetime,
+                                end_date: datetime,
+                                event_types: Optional[List[AuditEventType]] = None,
+                                engagement_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Read audit events from log files within date range."""
+        return [
+            event async for event in self.iter_audit_events(start_date, end_date, event_types, engagement_ids)
+        ]
+    
+    async def _write_export(self, pieces: AsyncIterator[str], export_path: Path):
+        """Write text pieces to an export file in buffered writes."""
+        async with aiofiles.open(export_path, 'w', encoding='utf-8', newline='') as f:
+            buffer: List[str] = []
+            buffered = 0
+            async for piece in pieces:
+                buffer.append(piece)
+                buffered += len(piece)
+                if buffered >= EXPORT_WRITE_BUFFER_BYTES:
+                    await f.write(''.join(buffer))
+                    buffer, buffered = [], 0
+            if buffer:
+                await f.write(''.join(buffer))
+    
+    async def _export_jsonl(self, events: AsyncIterator[Dict[str, Any]], export_path: Path) -> int:
         """Export events as JSON Lines format."""
-        async with aiofiles.open(export_path, 'w', encoding='utf-8') as f:
-            for event in events:
-                await f.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+        count = 0
+        
+        async def pieces():
+            nonlocal count
+            async for event in events:
+                count += 1
+                yield json.dumps(event, ensure_ascii=False, default=str) + '\n'
+        
+        await self._write_export(pieces(), export_path)
+        return count
     
-    async def _export_json(self, events: List[Dict[str, Any]], export_path: Path):
+    async def _export_json(self, events: AsyncIterator[Dict[str, Any]], export_path: Path) -> int:
         """Export events as JSON array."""
-        async with aiofiles.open(export_path, 'w', encoding='utf-8') as f:
-            await f.write(json.dumps(events, ensure_ascii=False, indent=2, default=str))
-    
-    async def _export_csv(self, events: List[Dict[str, Any]], export_path: Path):
-        """Export events as CSV format."""
-        import csv
-        
-        if not events:
-            return
+        count = 0
+        
+        async def pieces():
+            nonlocal count
+            yield '['
+            async for event in events:
+                yield (',\n' if count else '\n') + json.dumps(event, ensure_ascii=False, indent=2, default=str)
+                count += 1
+            yield '\n]' if count else ']'
+        
+        await self._write_export(pieces(), export_path)
+        return count
+    
+    async def _export_csv(self,
+                          events: Callable[[], AsyncIterator[Dict[str, Any]]],
+                          export_path: Path) -> int:
+        """
+        Export events as CSV format.
         
-        # Get all unique field names
+        The header needs every flattened field name, so events are streamed
+        twice: once to collect the names and once to write the rows.
+        """
         all_fields = set()
-        for event in events:
-            all_fields.update(event.keys())
+        async for event in events():
+            all_fields.update(self._flatten_dict(event).keys())
+        
+        if not all_fields:
+            return 0
         
         fieldnames = sorted(all_fields)
+        count = 0
         
-        # Write CSV using regular file I/O (aiofiles doesn't support csv module)
-        with open(export_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+        async def pieces():
+            nonlocal count
+            row_buffer = io.StringIO()
+            writer = csv.DictWriter(row_buffer, fieldnames=fieldnames)
             writer.writeheader()
-            
-            for event in events:
+            async for event in events():
                 # Flatten nested objects for CSV
-                flattened = self._flatten_dict(event)
-                writer.writerow(flattened)
+                writer.writerow(self._flatten_dict(event))
+                count += 1
+                yield row_buffer.getvalue()
+                row_buffer.seek(0)
+                row_buffer.truncate()
+            yield row_buffer.getvalue()
+        
+        await self._write_export(pieces(), export_path)
+        return count
     
     def _flatten_dict(self, d: Dict[str, Any], prefix: str = '') -> Dict[str, str]:
         """Flatten nested dictionary for CSV export."""
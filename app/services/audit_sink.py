@@ -0,0 +1,357 @@
+"""
+Buffered audit sink
+
+Takes audit writes off the request path. Callers put records into a bounded
+in-memory buffer; a short-lived flush task group-commits them through a
+batch writer:
+- a flush starts as soon as flush_batch_size records are waiting, as soon
+  as a caller waits on the buffer, or flush_interval_seconds after the
+  first unflushed record
+- put() waits for space when the buffer is full, so a stalled backend slows
+  writers down instead of losing records; put(record, durable=True) also
+  waits until the record's batch is written and raises if it never is
+- submit() is for callers without an event loop; it cannot wait, so when
+  the buffer is full it drops the oldest record, counting and logging it
+- a failed batch goes back to the front of the buffer and is retried by the
+  next flush, up to write_attempts times before it is dropped and counted
+- flush() drains everything buffered so far (before reading the audit trail
+  back); close_audit_sinks() drains every sink on shutdown
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+import weakref
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+BatchWriter = Callable[[List[Any]], Awaitable[None]]
+
+# Every live sink, so shutdown can drain them without the owners' help
+_sinks: "weakref.WeakSet[BufferedAuditSink]" = weakref.WeakSet()
+
+
+@dataclass
+class AuditSinkMetrics:
+    """Backpressure and throughput accounting for one sink"""
+    enqueued: int = 0
+    flushed: int = 0
+    batches: int = 0
+    dropped: int = 0        # Evicted from a full buffer by submit()
+    blocked: int = 0        # put() calls that waited for buffer space
+    failed: int = 0         # Given up on after write_attempts failed writes
+    write_errors: int = 0
+    pending: int = 0
+    high_water: int = 0     # Largest number of buffered records seen
+    last_batch_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "last_batch_ms": round(self.last_batch_ms, 2)}
+
+
+class BufferedAuditSink:
+    """Bounded buffer of audit records, flushed in batches by size or time"""
+
+    def __init__(
+        self,
+        name: str,
+        writer: BatchWriter,
+        max_events: int = 10000,
+        flush_batch_size: int = 500,
+        flush_interval_seconds: float = 1.0,
+        write_attempts: int = 3,
+        on_close: Optional[Callable[[], Any]] = None
+    ):
+        self.name = name
+        self.writer = writer
+        self.max_events = max(1, max_events)
+        self.flush_batch_size = max(1, flush_batch_size)
+        self.flush_interval_seconds = flush_interval_seconds
+        self.write_attempts = max(1, write_attempts)
+        self._on_close = on_close
+        # (record, future) pairs; the future is set once a durable put's record is written
+        self._buffer: Deque[Tuple[Any, Optional[asyncio.Future]]] = deque()
+        self._metrics = AuditSinkMetrics()
+        self._consecutive_failures = 0
+        self._waiters = 0
+        # Timers, tasks, locks and events belong to the loop that created them
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._space: Optional[asyncio.Event] = None
+        _sinks.add(self)
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    @property
+    def metrics(self) -> AuditSinkMetrics:
+        self._metrics.pending = len(self._buffer)
+        return self._metrics
+
+    async def put(self, record: Any, durable: bool = False) -> None:
+        """
+        Buffer a record for the next flush, waiting for space if the buffer is full
+
+        With durable=True, return only once the record is written; raises the
+        writer's error if its batch is given up on.
+        """
+        self._bind_loop()
+        self._waiters += 1
+        try:
+            while len(self._buffer) >= self.max_events:
+                self._metrics.blocked += 1
+                self._space.clear()
+                self._schedule()
+                await self._space.wait()
+            written = self._loop.create_future() if durable else None
+            self._append(record, written)
+            if written is not None:
+                await written
+        finally:
+            self._waiters -= 1
+
+    def submit(self, record: Any) -> None:
+        """Buffer a record without waiting; drops the oldest record when the buffer is full"""
+        if len(self._buffer) >= self.max_events:
+            _, written = self._buffer.popleft()
+            self._metrics.dropped += 1
+            if written is not None and not written.done():
+                written.set_exception(RuntimeError(f"Audit sink {self.name} is full"))
+            if self._metrics.dropped == 1 or self._metrics.dropped % 100 == 0:
+                logger.warning(
+                    f"Audit sink {self.name} is full, dropped oldest records",
+                    extra={"sink": self.name, "dropped": self._metrics.dropped, "max_events": self.max_events}
+                )
+        self._append(record, None)
+
+    def _append(self, record: Any, written: Optional[asyncio.Future]) -> None:
+        self._buffer.append((record, written))
+        self._metrics.enqueued += 1
+        if len(self._buffer) > self._metrics.high_water:
+            self._metrics.high_water = len(self._buffer)
+        self._schedule()
+
+    def _bind_loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop (sync caller): records wait for the next flush()
+            return None
+        if loop is not self._loop:
+            self._loop = loop
+            self._timer = None
+            self._flush_task = None
+            self._lock = asyncio.Lock()
+            self._space = asyncio.Event()
+        return loop
+
+    def _schedule(self) -> None:
+        loop = self._bind_loop()
+        if loop is None or (self._flush_task is not None and not self._flush_task.done()):
+            # A running flush reschedules itself for whatever arrives meanwhile
+            return
+        if self._consecutive_failures:
+            if self._timer is None and self._buffer:
+                # Back off before retrying a failed batch
+                self._timer = loop.call_later(self.flush_interval_seconds, self._start_flush)
+        elif len(self._buffer) >= self.flush_batch_size or self._waiters:
+            # Group-commit whatever is buffered as soon as a caller waits on it
+            self._start_flush()
+        elif self._timer is None and self._buffer:
+            self._timer = loop.call_later(self.flush_interval_seconds, self._start_flush)
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._loop is not None and (self._flush_task is None or self._flush_task.done()):
+            # A fresh context, so the flush is not charged to the request that filled the buffer
+            self._flush_task = self._loop.create_task(self._background_flush(), context=contextvars.Context())
+
+    async def _background_flush(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Audit sink {self.name} flush failed: {str(e)}", extra={"sink": self.name})
+        finally:
+            self._flush_task = None
+            if self._buffer:
+                self._schedule()
+
+    async def flush(self) -> int:
+        """
+        Write the records buffered so far in batches
+
+        Stops at the first failed batch, which is requeued for a later flush
+        unless it has failed write_attempts times in a row. Returns the
+        number of records written.
+        """
+        self._bind_loop()
+        written = 0
+        async with self._lock:
+            remaining = len(self._buffer)
+            while remaining > 0 and self._buffer:
+                size = min(self.flush_batch_size, remaining, len(self._buffer))
+                batch = [self._buffer.popleft() for _ in range(size)]
+                remaining -= size
+                started = time.perf_counter()
+                try:
+                    await self.writer([record for record, _ in batch])
+                except Exception as e:
+                    self._metrics.write_errors += 1
+                    self._consecutive_failures += 1
+                    if self._consecutive_failures >= self.write_attempts:
+                        self._consecutive_failures = 0
+                        self._metrics.failed += len(batch)
+                        logger.error(
+                            f"Audit sink {self.name} dropped a batch after repeated write failures: {str(e)}",
+                            extra={"sink": self.name, "records": len(batch), "error": str(e)}
+                        )
+                        self._settle(batch, e)
+                    else:
+                        self._buffer.extendleft(reversed(batch))
+                        logger.warning(
+                            f"Audit sink {self.name} write failed, batch requeued: {str(e)}",
+                            extra={"sink": self.name, "records": len(batch), "error": str(e)}
+                        )
+                    break
+                self._consecutive_failures = 0
+                self._metrics.flushed += len(batch)
+                self._metrics.batches += 1
+                self._metrics.last_batch_ms = (time.perf_counter() - started) * 1000
+                written += len(batch)
+                self._settle(batch)
+        return written
+
+    def _settle(self, batch: List[Tuple[Any, Optional[asyncio.Future]]], error: Optional[Exception] = None) -> None:
+        """Resolve durable puts of a batch that left the buffer for good and wake waiting writers"""
+        for _, written in batch:
+            if written is not None and not written.done():
+                if error is None:
+                    written.set_result(None)
+                else:
+                    written.set_exception(error)
+        self._space.set()
+
+    async def close(self) -> None:
+        """Drain the buffer (retrying failed batches) and release the writer"""
+        self._bind_loop()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flush_task is not None and not self._flush_task.done():
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        for _ in range(self.write_attempts):
+            await self.flush()
+            if not self._buffer:
+                break
+        if self._on_close is not None:
+            result = self._on_close()
+            if asyncio.iscoroutine(result):
+                await result
+
+
+class DailyJsonlWriter:
+    """
+    Appends JSON lines to {prefix}{YYYYmmdd}.jsonl through one kept-open handle
+
+    Records are (day, line) pairs so an event lands in the file of the day it
+    was logged even when its batch is flushed after midnight. Writes run in a
+    worker thread; the sink's flush lock keeps them sequential. Each batch is
+    fsynced before the write returns, so a flushed event survives a crash.
+    """
+
+    def __init__(self, directory: Path, prefix: str = "audit_events_"):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self._day: Optional[str] = None
+        self._handle: Optional[IO[str]] = None
+
+    def path_for(self, day: str) -> Path:
+        return self.directory / f"{self.prefix}{day}.jsonl"
+
+    async def write(self, records: List[Tuple[str, str]]) -> None:
+        await asyncio.to_thread(self._write, records)
+
+    def _write(self, records: List[Tuple[str, str]]) -> None:
+        start = 0
+        while start < len(records):
+            day = records[start][0]
+            end = start
+            while end < len(records) and records[end][0] == day:
+                end += 1
+            handle = self._open(day)
+            handle.write("".join(line for _, line in records[start:end]))
+            handle.flush()
+            os.fsync(handle.fileno())
+            start = end
+
+    def _open(self, day: str) -> IO[str]:
+        if self._handle is None or self._handle.closed or day != self._day:
+            self.close()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._handle = open(self.path_for(day), "a", encoding="utf-8")
+            self._day = day
+        return self._handle
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+def today() -> str:
+    """Day key of the audit file an event logged now belongs to"""
+    return datetime.now().strftime("%Y%m%d")
+
+
+def create_audit_sink(
+    name: str, writer: BatchWriter, on_close: Optional[Callable[[], Any]] = None
+) -> BufferedAuditSink:
+    """Create a sink sized from configuration"""
+    return BufferedAuditSink(
+        name,
+        writer,
+        max_events=config.audit.buffer_max_events,
+        flush_batch_size=config.audit.flush_batch_size,
+        flush_interval_seconds=config.audit.flush_interval_seconds,
+        write_attempts=config.audit.write_attempts,
+        on_close=on_close
+    )
+
+
+def get_audit_sink_metrics() -> Dict[str, Dict[str, Any]]:
+    """Metrics of every live sink, keyed by name"""
+    metrics: Dict[str, Dict[str, Any]] = {}
+    for sink in list(_sinks):
+        current = sink.metrics.to_dict()
+        if sink.name in metrics:
+            # Same-named sinks (one per AuditLogger) report combined counts
+            previous = metrics[sink.name]
+            current = {
+                key: max(previous[key], value) if key in ("high_water", "last_batch_ms") else previous[key] + value
+                for key, value in current.items()
+            }
+        metrics[sink.name] = current
+    return metrics
+
+
+async def close_audit_sinks() -> None:
+    """Drain every sink; called on application shutdown"""
+    for sink in list(_sinks):
+        try:
+            await sink.close()
+        except Exception as e:
+            logger.error(f"Error closing audit sink {sink.name}: {str(e)}", extra={"sink": sink.name})
@@ -8,19 +8,33 @@ Provides async job processing for:
 - Audit log retention
 - System maintenance
 
-Uses Cosmos DB as task store for simplicity and consistency.
+Uses Cosmos DB as task store for simplicity and consistency. Jobs waiting
+to run are held in a persisted priority queue (services.job_queue) and run
+by a JobScheduler, which bounds concurrency per worker and per job type and
+leases each job so a crashed worker's jobs are picked up by another.
 """
 
 import asyncio
+import contextvars
 import json
 import logging
+import os
+import socket
+import time
+import uuid
+from collections import deque
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional, Any, Callable
+from typing import Deque, Dict, List, Optional, Any, Callable
 from enum import Enum
 
+from ai.response_cache import get_llm_response_cache
 from api.schemas.gdpr import BackgroundJob, JobType, JobStatus, BackgroundJobResponse, BackgroundJobListResponse
+from config import config
 from domain.repository import Repository
+from repos.cosmos_repository import ENGAGEMENT_PURGE_CONTAINERS
 from services.audit import AuditService
+from services.gdpr_export import EXPORT_COLLECTIONS, create_export_sink, export_download_url, stream_engagement_export
+from services.job_queue import ClaimedJob, SQLiteJobQueue
 from util.logging import get_correlation_id
 
 logger = logging.getLogger(__name__)
@@ -31,15 +45,287 @@ class JobExecutionError(Exception):
     pass
 
 
+class JobLeaseLostError(JobExecutionError):
+    """Raised when a job's lease expired and another worker may be running it"""
+    pass
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+
+class JobScheduler:
+    """
+    Runs queued background jobs with bounded concurrency
+    
+    Each worker process runs at most max_concurrent_jobs at once, and each
+    job type at most its concurrency limit across all workers sharing the
+    queue. Jobs are claimed highest priority first under a lease that is
+    renewed while the job runs; if the lease is lost the job is cancelled
+    here because another worker may already have reclaimed it.
+    """
+    
+    def __init__(
+        self,
+        queue: SQLiteJobQueue,
+        max_concurrent_jobs: int = 4,
+        concurrency_limits: Optional[Dict[str, int]] = None,
+        lease_seconds: float = 60,
+        poll_interval_seconds: float = 1.0,
+        owner: Optional[str] = None
+    ):
+        self.queue = queue
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self.concurrency_limits = dict(concurrency_limits or {})
+        self.lease_seconds = lease_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        
+        self._service: Optional["BackgroundJobService"] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._active_jobs: Dict[str, BackgroundJob] = {}
+        self._lost_leases: set = set()
+        
+        # Metrics
+        self._wait_seconds: Deque[float] = deque(maxlen=1000)
+        self._run_seconds: Deque[float] = deque(maxlen=1000)
+        self._counters: Dict[str, int] = {
+            "started": 0, "completed": 0, "failed": 0, "retried": 0,
+            "lease_renewals": 0, "leases_lost": 0
+        }
+    
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    async def start(self, service: "BackgroundJobService"):
+        """Start claiming and running jobs with the given service's handlers"""
+        if self.is_running:
+            return
+        self._service = service
+        self._wake = asyncio.Event()
+        # Jobs run in a fresh context, never under the RU budget of the request that started us
+        self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+        logger.info(
+            "Background job scheduler started",
+            extra={
+                'owner': self.owner,
+                'max_concurrent_jobs': self.max_concurrent_jobs,
+                'concurrency_limits': self.concurrency_limits
+            }
+        )
+    
+    async def stop(self):
+        """Stop claiming and cancel running jobs; their leases expire and another worker reruns them"""
+        tasks = list(self._running.values())
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._running.clear()
+        self._active_jobs.clear()
+        logger.info("Background job scheduler stopped", extra={'owner': self.owner})
+    
+    async def enqueue(self, job: BackgroundJob, delay_seconds: float = 0) -> bool:
+        """Persist a job to the queue and wake the scheduler"""
+        queued = await asyncio.to_thread(self.queue.enqueue, job, job.priority, delay_seconds)
+        if not self.is_running:
+            # Another worker may still claim it, but nothing here will
+            logger.warning(
+                "Background job queued but no job scheduler is running in this worker",
+                extra={'job_id': job.id, 'job_type': job.job_type, 'owner': self.owner}
+            )
+        self.notify()
+        return queued
+    
+    def notify(self):
+        """Claim now rather than at the next poll (e.g. after an enqueue)"""
+        if self._wake is not None:
+            self._wake.set()
+    
+    def lease_lost(self, job_id: str) -> bool:
+        """Whether this worker lost the lease of a job it was running"""
+        return job_id in self._lost_leases
+    
+    def get_active_job(self, job_id: str) -> Optional[BackgroundJob]:
+        """In-memory state of a job running on this worker"""
+        return self._active_jobs.get(job_id)
+    
+    async def checkpoint(self, job: BackgroundJob):
+        """
+        Persist a running job's progress and renew its lease
+        
+        Raises:
+            JobLeaseLostError: the lease expired and the job must stop
+        """
+        if job.id not in self._active_jobs:
+            return
+        renewed = not self.lease_lost(job.id) and await asyncio.to_thread(
+            self.queue.renew_lease, job.id, self.owner, self.lease_seconds, job
+        )
+        if not renewed:
+            self._lost_lease(job)
+            raise JobLeaseLostError(f"Lease lost for job {job.id}")
+        self._counters["lease_renewals"] += 1
+    
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            capacity = self.max_concurrent_jobs - len(self._running)
+            if capacity > 0:
+                try:
+                    claimed = await asyncio.to_thread(
+                        self.queue.claim,
+                        self.owner,
+                        self.lease_seconds,
+                        self.concurrency_limits,
+                        self.max_concurrent_jobs,
+                        capacity
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to claim background jobs: {str(e)}", extra={'error': str(e)})
+                    claimed = []
+                for item in claimed:
+                    self._active_jobs[item.job.id] = item.job
+                    self._running[item.job.id] = asyncio.create_task(self._execute(item))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _execute(self, claimed: ClaimedJob):
+        job = claimed.job
+        self._wait_seconds.append(claimed.wait_seconds)
+        self._counters["started"] += 1
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        started = time.perf_counter()
+        try:
+            retry_delay = await self._service._execute_job_with_error_handling(job)
+            heartbeat.cancel()
+            if self.lease_lost(job.id):
+                return
+            if retry_delay is not None:
+                self._counters["retried"] += 1
+                await asyncio.to_thread(self.queue.release, job, self.owner, retry_delay)
+            else:
+                await asyncio.to_thread(self.queue.complete, job.id, self.owner)
+                self._counters["completed" if job.status == "completed" else "failed"] += 1
+        except JobLeaseLostError:
+            pass
+        except Exception as e:
+            logger.error(
+                f"Failed to settle background job: {str(e)}",
+                extra={'job_id': job.id, 'job_type': job.job_type, 'error': str(e)}
+            )
+        finally:
+            heartbeat.cancel()
+            self._run_seconds.append(time.perf_counter() - started)
+            self._running.pop(job.id, None)
+            self._active_jobs.pop(job.id, None)
+            self._lost_leases.discard(job.id)
+            self.notify()
+    
+    async def _heartbeat(self, job: BackgroundJob):
+        """Renew the lease of a running job until it finishes"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(self.queue.renew_lease, job.id, self.owner, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"Lease renewal failed: {str(e)}", extra={'job_id': job.id, 'error': str(e)})
+                continue
+            if not renewed:
+                self._lost_lease(job)
+                task = self._running.get(job.id)
+                if task is not None:
+                    task.cancel()
+                return
+            self._counters["lease_renewals"] += 1
+    
+    def _lost_lease(self, job: BackgroundJob):
+        if job.id in self._lost_leases:
+            return
+        self._lost_leases.add(job.id)
+        self._counters["leases_lost"] += 1
+        logger.warning(
+            "Background job lease lost; stopping job",
+            extra={'job_id': job.id, 'job_type': job.job_type, 'owner': self.owner}
+        )
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth, wait and run latency and outcome counters"""
+        waits = list(self._wait_seconds)
+        runs = list(self._run_seconds)
+        return {
+            "owner": self.owner,
+            "running": len(self._running),
+            "max_concurrent_jobs": self.max_concurrent_jobs,
+            "concurrency_limits": self.concurrency_limits,
+            "queue": self.queue.stats(),
+            "wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p95": round(_percentile(waits, 0.95), 3),
+                "max": round(max(waits), 3) if waits else 0.0
+            },
+            "run_seconds": {
+                "avg": round(sum(runs) / len(runs), 3) if runs else 0.0,
+                "p95": round(_percentile(runs, 0.95), 3),
+                "max": round(max(runs), 3) if runs else 0.0
+            },
+            **self._counters
+        }
+
+
+_job_scheduler: Optional[JobScheduler] = None
+
+
+def get_job_scheduler() -> JobScheduler:
+    """Process-wide scheduler over the configured job queue"""
+    global _job_scheduler
+    if _job_scheduler is None:
+        _job_scheduler = JobScheduler(
+            SQLiteJobQueue(config.jobs.queue_path),
+            max_concurrent_jobs=config.jobs.max_concurrent_jobs,
+            concurrency_limits=config.jobs.concurrency_limits,
+            lease_seconds=config.jobs.lease_seconds,
+            poll_interval_seconds=config.jobs.poll_interval_seconds
+        )
+    return _job_scheduler
+
+
+async def stop_job_scheduler():
+    """Stop the process-wide scheduler, if one was started"""
+    if _job_scheduler is not None:
+        await _job_scheduler.stop()
+
+
 class BackgroundJobService:
     """Service for managing background jobs and async task processing"""
     
-    def __init__(self, repository: Repository, audit_service: AuditService):
+    def __init__(
+        self,
+        repository: Repository,
+        audit_service: AuditService,
+        scheduler: Optional[JobScheduler] = None
+    ):
         self.repository = repository
         self.audit_service = audit_service
+        self._scheduler = scheduler
         self._job_handlers: Dict[JobType, Callable] = {}
         self._register_default_handlers()
-        self._running_jobs: Dict[str, asyncio.Task] = {}
+    
+    @property
+    def scheduler(self) -> JobScheduler:
+        if self._scheduler is None:
+            self._scheduler = get_job_scheduler()
+        return self._scheduler
     
     def _register_default_handlers(self):
         """Register default job handlers"""
@@ -81,14 +367,15 @@ class BackgroundJobService:
                 job_type=job_type,
                 created_by=created_by.lower().strip(),
                 engagement_id=engagement_id,
-                parameters=parameters
+                parameters=parameters,
+                priority=priority
             )
             
             # Set TTL based on job type
             job.ttl = self._get_job_ttl(job_type)
             
-            # Store job (would be implemented in repository)
             stored_job = await self._store_job(job)
+            await self.scheduler.enqueue(stored_job)
             
             # Log audit event
             await self.audit_service.log_audit_event(
@@ -107,7 +394,8 @@ class BackgroundJobService:
                     'job_id': job.id,
                     'job_type': job_type,
                     'created_by': created_by,
-                    'engagement_id': engagement_id
+                    'engagement_id': engagement_id,
+                    'priority': priority
                 }
             )
             
@@ -137,14 +425,17 @@ class BackgroundJobService:
     
     async def _store_job(self, job: BackgroundJob) -> BackgroundJob:
         """Store job in repository"""
-        # This would be implemented as a repository method
-        # For now, just return the job
-        return job
+        store_background_job = getattr(self.repository, "store_background_job", None)
+        if store_background_job is None:
+            return job
+        return await store_background_job(job)
     
     async def get_job(self, job_id: str) -> Optional[BackgroundJob]:
-        """Get job by ID"""
-        # This would be implemented as a repository method
-        return None
+        """Get a queued or running job by ID"""
+        job = self.scheduler.get_active_job(job_id)
+        if job is None:
+            job = await asyncio.to_thread(self.scheduler.queue.get, job_id)
+        return job
     
     async def list_jobs(
         self,
@@ -152,36 +443,48 @@ class BackgroundJobService:
         engagement_id: Optional[str] = None,
         job_type: Optional[JobType] = None,
         status: Optional[JobStatus] = None,
-        page: int = 1,
-        page_size: int = 50
+        page_size: int = 50,
+        cursor: Optional[str] = None,
+        include_count: bool = False
     ) -> BackgroundJobListResponse:
         """
-        List background jobs with filtering and pagination
+        List background jobs with filtering and cursor pagination
         
         Args:
             user_email: Filter by creator email
             engagement_id: Filter by engagement ID
             job_type: Filter by job type
             status: Filter by job status
-            page: Page number
             page_size: Number of jobs per page
+            cursor: next_cursor from the previous page
+            include_count: Include the approximate total count
             
         Returns:
             Paginated job list response
         """
         try:
-            # This would be implemented as a repository method
-            jobs: List[BackgroundJob] = []
-            total_count = 0
-            
-            has_more = total_count > (page * page_size)
+            list_background_jobs = getattr(self.repository, "list_background_jobs", None)
+            if list_background_jobs is None:
+                # Repository without job storage
+                jobs: List[BackgroundJob] = []
+                next_cursor, total_count = None, None
+            else:
+                jobs, next_cursor, total_count = await list_background_jobs(
+                    user_email=user_email,
+                    engagement_id=engagement_id,
+                    job_type=job_type,
+                    status=status,
+                    page_size=page_size,
+                    cursor=cursor,
+                    include_count=include_count
+                )
             
             return BackgroundJobListResponse(
                 jobs=jobs,
                 total_count=total_count,
-                page=page,
                 page_size=page_size,
-                has_more=has_more
+                has_more=next_cursor is not None,
+                next_cursor=next_cursor
             )
             
         except Exception as e:
@@ -199,13 +502,15 @@ class BackgroundJobService:
     
     async def execute_job(self, job_id: str) -> bool:
         """
-        Execute a background job
+        Ask the scheduler to run a queued job as soon as a slot is free
+        
+        Jobs are queued when created; this only wakes the scheduler.
         
         Args:
             job_id: ID of job to execute
             
         Returns:
-            True if job was started successfully
+            True if the job is queued to run
         """
         try:
             job = await self.get_job(job_id)
@@ -217,24 +522,14 @@ class BackgroundJobService:
                 logger.warning(f"Job {job_id} is not in pending status: {job.status}")
                 return False
             
-            # Check if job is already running
-            if job_id in self._running_jobs:
-                logger.warning(f"Job {job_id} is already running")
-                return False
-            
-            # Get job handler
-            handler = self._job_handlers.get(job.job_type)
-            if not handler:
+            if job.job_type not in self._job_handlers:
                 logger.error(f"No handler registered for job type: {job.job_type}")
-                await self._mark_job_failed(job, "No handler registered for job type")
                 return False
             
-            # Start job execution in background
-            task = asyncio.create_task(self._execute_job_with_error_handling(job, handler))
-            self._running_jobs[job_id] = task
+            self.scheduler.notify()
             
             logger.info(
-                f"Background job execution started: {job.job_type}",
+                f"Background job execution requested: {job.job_type}",
                 extra={
                     'job_id': job_id,
                     'job_type': job.job_type,
@@ -251,12 +546,20 @@ class BackgroundJobService:
             )
             return False
     
-    async def _execute_job_with_error_handling(
-        self,
-        job: BackgroundJob,
-        handler: Callable
-    ):
-        """Execute job with comprehensive error handling and retry logic"""
+    async def _execute_job_with_error_handling(self, job: BackgroundJob) -> Optional[float]:
+        """
+        Execute job with comprehensive error handling and retry logic
+        
+        Returns:
+            Seconds to wait before the job is retried, or None once it has
+            completed or failed for good
+        """
+        handler = self._job_handlers.get(job.job_type)
+        if not handler:
+            logger.error(f"No handler registered for job type: {job.job_type}")
+            await self._mark_job_failed(job, "No handler registered for job type")
+            return None
+        
         try:
             # Mark job as processing
             await self._mark_job_processing(job)
@@ -266,8 +569,12 @@ class BackgroundJobService:
             
             # Mark job as completed
             await self._mark_job_completed(job, result)
+            return None
             
         except Exception as e:
+            if self.scheduler.lease_lost(job.id):
+                # Another worker owns the job now; leave its state alone
+                raise JobLeaseLostError(f"Lease lost for job {job.id}") from e
             logger.error(
                 f"Job execution failed: {str(e)}",
                 extra={
@@ -280,13 +587,9 @@ class BackgroundJobService:
             
             # Handle retry logic
             if job.retry_count < job.max_retries:
-                await self._schedule_retry(job, str(e))
-            else:
-                await self._mark_job_failed(job, str(e))
-        
-        finally:
-            # Remove from running jobs
-            self._running_jobs.pop(job.id, None)
+                return await self._schedule_retry(job, str(e))
+            await self._mark_job_failed(job, str(e))
+            return None
     
     async def _mark_job_processing(self, job: BackgroundJob):
         """Mark job as processing"""
@@ -332,87 +635,181 @@ class BackgroundJobService:
             metadata={"job_type": job.job_type, "error": error_message}
         )
     
-    async def _schedule_retry(self, job: BackgroundJob, error_message: str):
-        """Schedule job retry"""
+    async def _schedule_retry(self, job: BackgroundJob, error_message: str) -> float:
+        """Mark job for retry and return the backoff delay before it is requeued"""
         job.retry_count += 1
         job.status = "pending"
         job.error_message = f"Retry {job.retry_count}/{job.max_retries}: {error_message}"
         job.last_heartbeat = datetime.now(timezone.utc)
         await self._update_job(job)
         
-        # Schedule retry after exponential backoff
-        retry_delay = min(300, 30 * (2 ** job.retry_count))  # Max 5 minutes
-        await asyncio.sleep(retry_delay)
-        await self.execute_job(job.id)
+        # Exponential backoff; the scheduler's slot is freed while waiting
+        return min(300, 30 * (2 ** job.retry_count))  # Max 5 minutes
     
     async def _update_job(self, job: BackgroundJob):
         """Update job in repository"""
-        # This would be implemented as a repository method
-        pass
+        store_background_job = getattr(self.repository, "store_background_job", None)
+        if store_background_job is not None:
+            await store_background_job(job)
     
     async def update_job_progress(
         self,
         job_id: str,
         progress_percent: int,
-        progress_message: Optional[str] = None
+        progress_message: Optional[str] = None,
+        checkpoint: Optional[Dict[str, Any]] = None
     ):
-        """Update job progress"""
+        """
+        Update job progress and save a resumable checkpoint
+        
+        Handlers should call this between units of work: it renews the job's
+        lease, persists checkpoint so a retry or another worker can resume
+        from it (job.checkpoint), and yields to other tasks.
+        
+        Raises:
+            JobLeaseLostError: the job's lease was lost and the handler must stop
+        """
         job = await self.get_job(job_id)
         if job:
             job.progress_percent = max(0, min(100, progress_percent))
             job.progress_message = progress_message
+            if checkpoint is not None:
+                job.checkpoint = checkpoint
             job.last_heartbeat = datetime.now(timezone.utc)
+            await self.scheduler.checkpoint(job)
             await self._update_job(job)
+        await asyncio.sleep(0)
     
     # Job Handlers
     async def _handle_data_export(self, job: BackgroundJob) -> Dict[str, Any]:
-        """Handle data export job"""
+        """
+        Handle data export job
+        
+        Streams the engagement to an NDJSON file and returns its manifest
+        (the download handle) rather than the data itself.
+        """
         try:
             engagement_id = job.parameters.get("engagement_id")
-            export_format = job.parameters.get("export_format", "json")
             include_documents = job.parameters.get("include_documents", True)
             include_embeddings = job.parameters.get("include_embeddings", False)
+            export_id = job.parameters.get("export_id", job.id)
+            compress = job.parameters.get("compress", config.storage.gdpr_export_compress)
             
             if not engagement_id:
                 raise JobExecutionError("Missing engagement_id parameter")
             
-            await self.update_job_progress(job.id, 10, "Starting data export")
-            
-            # This would call the GDPR service to perform the actual export
-            # For now, return a mock result
-            result = {
-                "engagement_id": engagement_id,
-                "export_format": export_format,
-                "records_exported": 0,
-                "export_size_bytes": 0,
-                "export_completed_at": datetime.now(timezone.utc).isoformat()
-            }
+            await self.update_job_progress(job.id, 5, "Starting data export")
+            
+            collections = [
+                name for name in EXPORT_COLLECTIONS
+                if (include_documents or name != "documents") and (include_embeddings or name != "embeddings")
+            ]
+            done = []
+            
+            async def on_progress(collection: str, records: int, total_records: int):
+                done.append(collection)
+                percent = 5 + int(90 * len(done) / max(len(collections), len(done)))
+                await self.update_job_progress(
+                    job.id,
+                    percent,
+                    f"Exported {records} {collection} ({total_records} records)",
+                    checkpoint={"export_id": export_id, "completed_collections": list(done)}
+                )
+            
+            manifest = await stream_engagement_export(
+                self.repository,
+                engagement_id,
+                export_id,
+                create_export_sink(engagement_id, export_id, compress),
+                compress=compress,
+                include_documents=include_documents,
+                include_embeddings=include_embeddings,
+                chunk_size_bytes=config.storage.gdpr_export_chunk_kb * 1024,
+                on_progress=on_progress
+            )
             
+            await self.audit_service.log_audit_event(
+                action_type="data_export_completed",
+                user_email=job.created_by,
+                action_description=f"GDPR data export completed for engagement {engagement_id}",
+                engagement_id=engagement_id,
+                resource_type="engagement",
+                resource_id=engagement_id,
+                data_subject_email=job.created_by,
+                legal_basis="GDPR Article 15 - Right of access",
+                correlation_id=job.parameters.get("correlation_id"),
+                metadata={
+                    "export_id": export_id,
+                    "record_count": manifest.record_count,
+                    "size_bytes": manifest.size_bytes
+                }
+            )
             await self.update_job_progress(job.id, 100, "Data export completed")
             
-            return result
+            return {
+                **manifest.to_dict(),
+                "download_url": export_download_url(engagement_id, export_id)
+            }
             
+        except JobExecutionError:
+            raise
         except Exception as e:
             raise JobExecutionError(f"Data export failed: {str(e)}")
     
     async def _handle_data_purge(self, job: BackgroundJob) -> Dict[str, Any]:
-        """Handle data purge job"""
+        """
+        Handle data purge job
+        
+        Hard deletes checkpoint per container, so a retried or reclaimed job
+        resumes where the previous attempt stopped.
+        """
         try:
             engagement_id = job.parameters.get("engagement_id")
             purge_type = job.parameters.get("purge_type", "soft_delete")
+            retention_days = job.parameters.get("retention_days", 30)
             
             if not engagement_id:
                 raise JobExecutionError("Missing engagement_id parameter")
             
-            await self.update_job_progress(job.id, 10, "Starting data purge")
+            await self.update_job_progress(job.id, 10, "Starting data purge", checkpoint=job.checkpoint)
+            
+            deletion_metrics: Dict[str, Any] = {}
+            if purge_type == "hard_delete":
+                hard_delete = getattr(self.repository, "hard_delete_engagement_data", None)
+                
+                async def on_progress(checkpoint: Dict[str, Any]):
+                    containers = checkpoint["containers"]
+                    deleted = sum(metrics["deleted"] for metrics in containers.values())
+                    done = sum(1 for metrics in containers.values() if metrics["completed"])
+                    deletion_metrics.update(containers)
+                    await self.update_job_progress(
+                        job.id,
+                        10 + int(85 * done / len(ENGAGEMENT_PURGE_CONTAINERS)),
+                        f"Deleted {deleted} items",
+                        checkpoint=checkpoint
+                    )
+                
+                deletion_stats = await hard_delete(
+                    engagement_id, checkpoint=job.checkpoint, on_progress=on_progress
+                ) if hard_delete else {}
+            else:
+                soft_delete = getattr(self.repository, "soft_delete_engagement_data", None)
+                deletion_stats = await soft_delete(engagement_id, retention_days) if soft_delete else {}
+            
+            # Cached model output contains engagement content too
+            response_cache = get_llm_response_cache()
+            if response_cache:
+                deletion_stats = {
+                    **deletion_stats,
+                    "llm_responses": await response_cache.delete_engagement(engagement_id)
+                }
             
-            # This would call the GDPR service to perform the actual purge
-            # For now, return a mock result
             result = {
                 "engagement_id": engagement_id,
                 "purge_type": purge_type,
-                "records_purged": 0,
-                "storage_freed_bytes": 0,
+                "records_purged": sum(deletion_stats.values()),
+                "deletion_stats": deletion_stats,
+                "deletion_metrics": deletion_metrics,
                 "purge_completed_at": datetime.now(timezone.utc).isoformat()
             }
             
@@ -420,6 +817,8 @@ class BackgroundJobService:
             
             return result
             
+        except JobExecutionError:
+            raise
         except Exception as e:
             raise JobExecutionError(f"Data purge failed: {str(e)}")
     
@@ -494,7 +893,8 @@ class BackgroundJobService:
 # Factory function for background job service
 def create_background_job_service(
     repository: Repository,
-    audit_service: AuditService
+    audit_service: AuditService,
+    scheduler: Optional[JobScheduler] = None
 ) -> BackgroundJobService:
     """Create background job service with dependencies"""
-    return BackgroundJobService(repository, audit_service)
\ No newline at end of file
+    return BackgroundJobService(repository, audit_service, scheduler)
\ No newline at end of file
@@ -7,21 +7,115 @@ Provides TTL-based async caching with memory-efficient operations:
 - Thread-safe operations for async FastAPI applications
 - Performance metrics collection for monitoring
 - Cache invalidation strategies
+- Single-flight loading with optional stale-while-revalidate
+- Pluggable size estimation and heap-ordered TTL expiry
+- Tag-indexed invalidation (e.g. all entries for an engagement)
+- Optional shared L2 tier with cross-worker invalidation (services.shared_cache)
 """
 
 import asyncio
+import contextvars
+import heapq
+import itertools
 import logging
 import time
 from dataclasses import dataclass, field
-from typing import Any, Dict, Optional, Set, Union, Callable, Awaitable
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union, Callable, Awaitable
 from collections import OrderedDict
 from threading import RLock
 import weakref
 import sys
 import json
 
+from services.shared_cache import (
+    INVALIDATE_ALL,
+    INVALIDATE_KEY,
+    INVALIDATE_TAG,
+    SharedCacheBackend,
+)
+
 logger = logging.getLogger(__name__)
 
+# Sentinel distinguishing a cache miss from a cached None
+_MISSING = object()
+
+# Estimates the memory footprint of a cached value in bytes
+SizeEstimator = Callable[[Any], int]
+
+# Expired entries removed per lock acquisition during cleanup
+EXPIRY_BATCH_SIZE = 1000
+
+
+def json_size_estimator(value: Any) -> int:
+    """Estimate size by JSON-serializing containers (exact but O(value))"""
+    try:
+        if isinstance(value, (str, bytes)):
+            return len(value)
+        elif isinstance(value, (int, float, bool)):
+            return sys.getsizeof(value)
+        elif isinstance(value, (list, tuple, dict)):
+            # Approximate size using JSON serialization
+            return len(json.dumps(value, default=str).encode('utf-8'))
+        else:
+            # Fallback to sys.getsizeof
+            return sys.getsizeof(value)
+    except Exception:
+        # Conservative estimate if calculation fails
+        return 1024
+
+
+def sizeof_size_estimator(value: Any) -> int:
+    """Estimate size with a shallow sys.getsizeof (O(1), undercounts containers)"""
+    try:
+        return sys.getsizeof(value)
+    except Exception:
+        return 1024
+
+
+def sampling_size_estimator(value: Any, sample_size: int = 16) -> int:
+    """
+    Estimate JSON size by sampling large containers and extrapolating.
+    
+    Small values are measured exactly like json_size_estimator. Containers
+    with more than sample_size elements are estimated from evenly spaced
+    samples, so the cost of sizing big preset schemas and search indexes is
+    bounded instead of proportional to the value.
+    """
+    try:
+        if not isinstance(value, (list, tuple, dict)):
+            return json_size_estimator(value)
+        
+        children = value.values() if isinstance(value, dict) else value
+        count = len(value)
+        
+        if count <= sample_size:
+            if not any(isinstance(child, (list, tuple, dict)) and len(child) > sample_size for child in children):
+                return json_size_estimator(value)
+            # Recurse so a large nested container is sampled rather than serialized
+            keys_size = sum(len(str(k)) + 4 for k in value) if isinstance(value, dict) else 0
+            return 2 + count + keys_size + sum(sampling_size_estimator(child, sample_size) for child in children)
+        
+        step = count // sample_size
+        if isinstance(value, dict):
+            keys = list(itertools.islice(value, 0, count, step))[:sample_size]
+            sampled = sum(len(str(k)) + 4 + sampling_size_estimator(value[k], sample_size) for k in keys)
+            sampled_count = len(keys)
+        else:
+            sampled = sum(sampling_size_estimator(value[i], sample_size) for i in range(0, step * sample_size, step))
+            sampled_count = sample_size
+        
+        return 2 + count + int(sampled / sampled_count * count)
+    except Exception:
+        # Conservative estimate if calculation fails
+        return 1024
+
+
+SIZE_ESTIMATORS: Dict[str, SizeEstimator] = {
+    "json": json_size_estimator,
+    "sizeof": sizeof_size_estimator,
+    "sampling": sampling_size_estimator,
+}
+
 
 @dataclass
 class CacheEntry:
@@ -32,11 +126,23 @@ class CacheEntry:
     access_count: int = 0
     last_accessed: float = field(default_factory=time.time)
     size_bytes: int = 0
+    stale_seconds: float = 0.0
+    expiry_token: int = 0
+    tags: FrozenSet[str] = frozenset()
+    
+    @property
+    def removal_at(self) -> float:
+        """Time after which the entry can no longer be served at all"""
+        return self.created_at + self.ttl_seconds + self.stale_seconds
     
     def is_expired(self) -> bool:
         """Check if entry has exceeded its TTL"""
         return time.time() > (self.created_at + self.ttl_seconds)
     
+    def is_servable(self) -> bool:
+        """Check if entry can still be served, possibly stale, while refreshing"""
+        return time.time() <= (self.created_at + self.ttl_seconds + self.stale_seconds)
+    
     def touch(self) -> None:
         """Update access metadata"""
         self.access_count += 1
@@ -52,6 +158,12 @@ class CacheMetrics:
     expirations: int = 0
     total_size_bytes: int = 0
     entry_count: int = 0
+    stale_hits: int = 0
+    coalesced_loads: int = 0
+    background_refreshes: int = 0
+    refresh_failures: int = 0
+    shared_hits: int = 0
+    remote_invalidations: int = 0
     
     @property
     def hit_rate(self) -> float:
@@ -68,6 +180,12 @@ class CacheMetrics:
             "expirations": self.expirations,
             "total_size_bytes": self.total_size_bytes,
             "entry_count": self.entry_count,
+            "stale_hits": self.stale_hits,
+            "coalesced_loads": self.coalesced_loads,
+            "background_refreshes": self.background_refreshes,
+            "refresh_failures": self.refresh_failures,
+            "shared_hits": self.shared_hits,
+            "remote_invalidations": self.remote_invalidations,
             "hit_rate_percent": round(self.hit_rate, 2)
         }
 
@@ -82,6 +200,14 @@ class InProcessCache:
     - Memory usage tracking
     - Performance metrics
     - Async-safe operations
+    - Single-flight loading: one factory call per key at a time
+    - Stale-while-revalidate and negative (None) caching in get_or_set
+    - Pluggable size estimation (sampling by default, or caller-supplied)
+    - Min-heap expiry so cleanup is O(expired) rather than O(entries)
+    - Tag reverse index so invalidate_by_tag is O(matching entries)
+    - Optional shared backend consulted on L1 misses; invalidations are
+      published to it so other workers drop their copies too. L1 hits never
+      touch the shared tier and do not take the lock.
     """
     
     def __init__(
@@ -90,19 +216,47 @@ class InProcessCache:
         max_size_mb: int = 100,
         max_entries: int = 1000,
         default_ttl_seconds: int = 3600,
-        cleanup_interval_seconds: int = 300
+        cleanup_interval_seconds: int = 300,
+        stale_while_revalidate_seconds: int = 0,
+        negative_ttl_seconds: Optional[int] = None,
+        size_estimator: Union[str, SizeEstimator] = "sampling",
+        shared_backend: Optional[SharedCacheBackend] = None
     ):
         self.name = name
         self.max_size_bytes = max_size_mb * 1024 * 1024
         self.max_entries = max_entries
         self.default_ttl_seconds = default_ttl_seconds
         self.cleanup_interval_seconds = cleanup_interval_seconds
+        self.stale_while_revalidate_seconds = stale_while_revalidate_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        if isinstance(size_estimator, str):
+            if size_estimator not in SIZE_ESTIMATORS:
+                raise ValueError(f"Unknown cache size estimator: {size_estimator}")
+            size_estimator = SIZE_ESTIMATORS[size_estimator]
+        self._size_estimator = size_estimator
+        self.shared_backend = shared_backend
         
         # Thread-safe storage
         self._cache: OrderedDict[str, CacheEntry] = OrderedDict()
         self._lock = RLock()
         self._metrics = CacheMetrics()
         
+        # In-flight loads per key, shared by concurrent get_or_set callers
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Tags of each running load, and the keys whose running load was
+        # covered by a delete, tag invalidation or clear and must not cache
+        # its result; other loads are unaffected
+        self._loading: Dict[str, FrozenSet[str]] = {}
+        self._invalidated_loads: Set[str] = set()
+        
+        # (removal_at, token, key) min-heap; entries whose token no longer
+        # matches the live entry are skipped lazily
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+        self._expiry_tokens = itertools.count(1)
+        
+        # Reverse index of tag -> keys carrying that tag
+        self._tag_index: Dict[str, Set[str]] = {}
+        
         # Background cleanup task
         self._cleanup_task: Optional[asyncio.Task] = None
         self._shutdown_event = asyncio.Event()
@@ -119,20 +273,36 @@ class InProcessCache:
     
     def _calculate_size(self, value: Any) -> int:
         """Estimate memory size of cached value"""
-        try:
-            if isinstance(value, (str, bytes)):
-                return len(value)
-            elif isinstance(value, (int, float, bool)):
-                return sys.getsizeof(value)
-            elif isinstance(value, (list, tuple, dict)):
-                # Approximate size using JSON serialization
-                return len(json.dumps(value, default=str).encode('utf-8'))
-            else:
-                # Fallback to sys.getsizeof
-                return sys.getsizeof(value)
-        except Exception:
-            # Conservative estimate if calculation fails
-            return 1024
+        return self._size_estimator(value)
+    
+    def _is_cacheable(self, value: Any) -> bool:
+        """None results are not cached at all when negative_ttl_seconds is 0"""
+        return value is not None or self.negative_ttl_seconds != 0
+    
+    def _resolve_ttl(self, value: Any, ttl_seconds: Optional[float]) -> float:
+        """TTL for value, capped by negative_ttl_seconds for None results"""
+        ttl = ttl_seconds if ttl_seconds is not None else self.default_ttl_seconds
+        if value is None and self.negative_ttl_seconds is not None:
+            ttl = min(ttl, self.negative_ttl_seconds)
+        return ttl
+    
+    def _remove_entry(self, key: str) -> Optional[CacheEntry]:
+        """Remove an entry and its tag index links; caller holds the lock"""
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._unlink_entry(key, entry)
+        return entry
+    
+    def _unlink_entry(self, key: str, entry: CacheEntry) -> None:
+        """Drop a removed entry's size and tag index links; caller holds the lock"""
+        self._metrics.total_size_bytes -= entry.size_bytes
+        self._metrics.entry_count -= 1
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
     
     def _evict_lru(self) -> None:
         """Evict least recently used entries to free space"""
@@ -143,10 +313,10 @@ class InProcessCache:
             if not self._cache:
                 break
                 
-            # Remove oldest entry (LRU)
+            # Remove oldest entry (LRU); popitem is atomic, whereas
+            # iterating could race with an unlocked hit's move_to_end
             key, entry = self._cache.popitem(last=False)
-            self._metrics.total_size_bytes -= entry.size_bytes
-            self._metrics.entry_count -= 1
+            self._unlink_entry(key, entry)
             self._metrics.evictions += 1
             
             logger.debug(
@@ -159,23 +329,43 @@ class InProcessCache:
                 }
             )
     
-    def _expire_entries(self) -> int:
-        """Remove expired entries and return count removed"""
-        expired_keys = []
-        current_time = time.time()
+    def _push_expiry(self, key: str, entry: CacheEntry) -> None:
+        """Schedule an entry for removal once it is no longer servable"""
+        entry.expiry_token = next(self._expiry_tokens)
+        heapq.heappush(self._expiry_heap, (entry.removal_at, entry.expiry_token, key))
         
-        for key, entry in self._cache.items():
-            if entry.is_expired():
-                expired_keys.append(key)
+        # Overwritten and deleted keys leave dead heap nodes; rebuild when
+        # they dominate so the heap stays O(entries)
+        if len(self._expiry_heap) > 2 * len(self._cache) + 1024:
+            self._expiry_heap = [
+                (live.removal_at, live.expiry_token, live_key)
+                for live_key, live in list(self._cache.items())
+            ]
+            heapq.heapify(self._expiry_heap)
+    
+    def _expire_entries(self, max_entries: Optional[int] = None) -> int:
+        """Remove expired entries and return count removed
         
+        Pops the expiry heap only while its head is due, so the cost is
+        proportional to the number of expired entries. max_entries bounds
+        the work done under one lock acquisition.
+        """
+        current_time = time.time()
+        heap = self._expiry_heap
         expired_count = 0
-        for key in expired_keys:
-            if key in self._cache:
-                entry = self._cache.pop(key)
-                self._metrics.total_size_bytes -= entry.size_bytes
-                self._metrics.entry_count -= 1
-                self._metrics.expirations += 1
-                expired_count += 1
+        
+        while heap and heap[0][0] < current_time:
+            if max_entries is not None and expired_count >= max_entries:
+                break
+            
+            _, token, key = heapq.heappop(heap)
+            entry = self._cache.get(key)
+            if entry is None or entry.expiry_token != token:
+                continue
+            
+            self._remove_entry(key)
+            self._metrics.expirations += 1
+            expired_count += 1
         
         if expired_count > 0:
             logger.debug(
@@ -189,102 +379,320 @@ class InProcessCache:
         
         return expired_count
     
-    async def get(self, key: str) -> Optional[Any]:
-        """Get value from cache, returning None if not found or expired"""
+    def _has_due_expiries(self) -> bool:
+        heap = self._expiry_heap
+        return bool(heap) and heap[0][0] < time.time()
+    
+    def _lookup(self, key: str, allow_stale: bool = False) -> Tuple[Any, bool]:
+        """
+        Look up an entry; fresh hits do not take the lock.
+        
+        Returns:
+            Tuple of (value or _MISSING, is_stale). Stale values are only
+            returned when allow_stale is set and the entry is within its
+            stale-while-revalidate window.
+        """
+        # dict.get and move_to_end are each atomic under the GIL; a racing
+        # writer can at worst cost this hit its recency bump or metric
+        entry = self._cache.get(key)
+        if entry is not None and not entry.is_expired():
+            entry.touch()
+            try:
+                self._cache.move_to_end(key)
+            except KeyError:
+                pass  # Removed meanwhile; the value read is still returned
+            self._metrics.hits += 1
+            return entry.value, False
+        
         with self._lock:
             entry = self._cache.get(key)
             
             if entry is None:
                 self._metrics.misses += 1
-                return None
+                return _MISSING, False
             
-            if entry.is_expired():
+            stale = entry.is_expired()
+            if stale and not entry.is_servable():
                 # Remove expired entry
-                self._cache.pop(key)
-                self._metrics.total_size_bytes -= entry.size_bytes
-                self._metrics.entry_count -= 1
+                self._remove_entry(key)
                 self._metrics.expirations += 1
                 self._metrics.misses += 1
-                return None
+                return _MISSING, False
+            
+            if stale and not allow_stale:
+                # Keep the entry for stale-while-revalidate callers
+                self._metrics.misses += 1
+                return _MISSING, False
             
             # Move to end (most recently used)
             entry.touch()
             self._cache.move_to_end(key)
-            self._metrics.hits += 1
+            if stale:
+                self._metrics.stale_hits += 1
+            else:
+                self._metrics.hits += 1
             
-            return entry.value
+            return entry.value, stale
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Get value from cache, returning None if not found or expired"""
+        value, _ = self._lookup(key)
+        return None if value is _MISSING else value
     
     async def set(
         self,
         key: str,
         value: Any,
-        ttl_seconds: Optional[int] = None
+        ttl_seconds: Optional[int] = None,
+        size_bytes: Optional[int] = None,
+        tags: Optional[Iterable[str]] = None
     ) -> None:
-        """Set value in cache with optional TTL override"""
-        ttl = ttl_seconds if ttl_seconds is not None else self.default_ttl_seconds
-        size_bytes = self._calculate_size(value)
+        """Set value in cache with optional TTL override
+        
+        Callers that already know the value's footprint can pass size_bytes
+        to skip estimation. Tags (e.g. "engagement:<id>") register the entry
+        for invalidate_by_tag.
+        """
+        if not self._is_cacheable(value):
+            with self._lock:
+                self._remove_entry(key)
+            return
+        
+        ttl = self._resolve_ttl(value, ttl_seconds)
+        if size_bytes is None:
+            size_bytes = self._calculate_size(value)
         
         with self._lock:
             # Remove existing entry if present
-            if key in self._cache:
-                old_entry = self._cache.pop(key)
-                self._metrics.total_size_bytes -= old_entry.size_bytes
-                self._metrics.entry_count -= 1
+            self._remove_entry(key)
             
             # Create new entry
             entry = CacheEntry(
                 value=value,
                 created_at=time.time(),
                 ttl_seconds=ttl,
-                size_bytes=size_bytes
+                size_bytes=size_bytes,
+                stale_seconds=self.stale_while_revalidate_seconds,
+                tags=frozenset(tags) if tags else frozenset()
             )
             
             # Add to cache
             self._cache[key] = entry
+            for tag in entry.tags:
+                self._tag_index.setdefault(tag, set()).add(key)
             self._metrics.total_size_bytes += size_bytes
             self._metrics.entry_count += 1
+            self._push_expiry(key, entry)
             
             # Evict if necessary
             self._evict_lru()
     
     async def delete(self, key: str) -> bool:
         """Delete entry from cache, returning True if it existed"""
-        with self._lock:
-            entry = self._cache.pop(key, None)
-            if entry:
-                self._metrics.total_size_bytes -= entry.size_bytes
-                self._metrics.entry_count -= 1
-                return True
-            return False
+        removed = self._invalidate_local(INVALIDATE_KEY, key)
+        await self._publish_invalidation(INVALIDATE_KEY, key)
+        return removed > 0
+    
+    async def invalidate_by_tag(self, tag: str) -> int:
+        """Delete every entry carrying tag, returning the number removed"""
+        removed = self._invalidate_local(INVALIDATE_TAG, tag)
+        await self._publish_invalidation(INVALIDATE_TAG, tag)
+        
+        if removed:
+            logger.debug(
+                f"Invalidated {removed} entries tagged '{tag}' from cache '{self.name}'",
+                extra={"cache_name": self.name, "tag": tag, "invalidated_count": removed}
+            )
+        return removed
     
     async def clear(self) -> None:
         """Clear all entries from cache"""
+        self._invalidate_local(INVALIDATE_ALL)
+        await self._publish_invalidation(INVALIDATE_ALL)
+        
+        logger.info(f"Cleared all entries from cache '{self.name}'")
+    
+    def apply_remote_invalidation(self, kind: str, target: Optional[str] = None) -> int:
+        """Apply an invalidation published by another worker to this L1 only"""
+        removed = self._invalidate_local(kind, target)
         with self._lock:
+            self._metrics.remote_invalidations += 1
+        return removed
+    
+    def _invalidate_local(self, kind: str, target: Optional[str] = None) -> int:
+        """Remove matching L1 entries and stop matching in-flight loads from caching their result"""
+        with self._lock:
+            if kind == INVALIDATE_KEY:
+                covered = [target] if target in self._loading else []
+            elif kind == INVALIDATE_TAG:
+                covered = [key for key, tags in self._loading.items() if target in tags]
+            else:
+                covered = list(self._loading)
+            self._invalidated_loads.update(covered)
+            
+            if kind == INVALIDATE_KEY:
+                return 1 if self._remove_entry(target) is not None else 0
+            
+            if kind == INVALIDATE_TAG:
+                keys = list(self._tag_index.get(target, ()))
+                for key in keys:
+                    self._remove_entry(key)
+                return len(keys)
+            
+            removed = len(self._cache)
             self._cache.clear()
+            self._expiry_heap.clear()
+            self._tag_index.clear()
             self._metrics = CacheMetrics()
-        
-        logger.info(f"Cleared all entries from cache '{self.name}'")
+            return removed
+    
+    async def _publish_invalidation(self, kind: str, target: Optional[str] = None) -> None:
+        """Remove matching shared entries and notify other workers"""
+        if self.shared_backend is not None:
+            await self._call_shared(self.shared_backend.invalidate, self.name, kind, target)
+    
+    async def _call_shared(self, method: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking shared-tier call off the event loop; failures degrade to L1-only"""
+        try:
+            return await asyncio.to_thread(method, *args)
+        except Exception as e:
+            logger.warning(
+                f"Shared cache call failed for '{self.name}'",
+                extra={"cache_name": self.name, "operation": method.__name__, "error": str(e)}
+            )
+            return None
     
     async def get_or_set(
         self,
         key: str,
         factory: Callable[[], Awaitable[Any]],
-        ttl_seconds: Optional[int] = None
+        ttl_seconds: Optional[int] = None,
+        tags: Optional[Iterable[str]] = None
     ) -> Any:
-        """Get value from cache or compute and cache it if not found"""
-        # Try to get from cache first
-        value = await self.get(key)
-        if value is not None:
+        """
+        Get value from cache or compute and cache it if not found
+        
+        Concurrent callers for the same key share a single factory call. A
+        cached None is returned as a hit rather than recomputed. Within the
+        stale-while-revalidate window an expired value is returned at once
+        while one background refresh runs.
+        """
+        value, stale = self._lookup(key, allow_stale=True)
+        if value is not _MISSING:
+            if stale:
+                self._start_load(key, factory, ttl_seconds, tags, background=True)
             return value
         
-        # Compute value
-        value = await factory()
+        task = self._start_load(key, factory, ttl_seconds, tags)
+        # Shield so a cancelled caller does not cancel the load for other waiters
+        return await asyncio.shield(task)
+    
+    def _start_load(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        ttl_seconds: Optional[int],
+        tags: Optional[Iterable[str]] = None,
+        background: bool = False
+    ) -> asyncio.Task:
+        """Start a load for key or join the one already in flight"""
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            if not background:
+                with self._lock:
+                    self._metrics.coalesced_loads += 1
+            return task
         
-        # Cache the computed value
-        await self.set(key, value, ttl_seconds)
+        coro = self._load(key, factory, ttl_seconds, tags, background)
+        if background:
+            # Nobody waits on a refresh; keep it off the triggering request's RU budget
+            task = asyncio.get_running_loop().create_task(coro, context=contextvars.Context())
+        else:
+            task = asyncio.ensure_future(coro)
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finish_load(key, done, background))
+        return task
+    
+    async def _load(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        ttl_seconds: Optional[int],
+        tags: Optional[Iterable[str]],
+        background: bool
+    ) -> Any:
+        """Run the factory and cache its result unless the key was invalidated meanwhile
         
+        With a shared backend the shared tier is read before the factory runs,
+        and a computed value is written back only if no worker invalidated the
+        key (or one of its tags) since the load started.
+        """
+        tags = frozenset(tags) if tags else frozenset()
+        with self._lock:
+            self._loading[key] = tags
+            self._invalidated_loads.discard(key)
+        try:
+            return await self._run_load(key, factory, ttl_seconds, tags, background)
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+                self._invalidated_loads.discard(key)
+    
+    def _load_invalidated(self, key: str) -> bool:
+        with self._lock:
+            return key in self._invalidated_loads
+    
+    async def _run_load(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        ttl_seconds: Optional[int],
+        tags: FrozenSet[str],
+        background: bool
+    ) -> Any:
+        if background:
+            with self._lock:
+                self._metrics.background_refreshes += 1
+        
+        shared = self.shared_backend
+        generation = None
+        if shared is not None:
+            generation = await self._call_shared(shared.generation, self.name)
+            entry = await self._call_shared(shared.get, self.name, key)
+            if entry is not None:
+                with self._lock:
+                    self._metrics.shared_hits += 1
+                    self._loading[key] = tags | frozenset(entry.tags)
+                if not self._load_invalidated(key):
+                    await self.set(key, entry.value, entry.remaining_ttl, tags=entry.tags)
+                return entry.value
+        
+        value = await factory()
+        
+        if not self._load_invalidated(key):
+            await self.set(key, value, ttl_seconds, tags=tags)
+            if generation is not None and self._is_cacheable(value):
+                ttl = self._resolve_ttl(value, ttl_seconds)
+                await self._call_shared(shared.put, self.name, key, value, ttl, tags, generation)
         return value
     
+    def _finish_load(self, key: str, task: asyncio.Task, background: bool) -> None:
+        """Clear the in-flight slot and record refresh failures"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        
+        if task.cancelled():
+            return
+        error = task.exception()  # Marks the exception as retrieved
+        if error is not None and background:
+            # Foreground failures propagate to the callers instead
+            with self._lock:
+                self._metrics.refresh_failures += 1
+            logger.warning(
+                f"Cache refresh failed for key in '{self.name}'",
+                extra={"cache_name": self.name, "key": key, "error": str(error)}
+            )
+    
     def get_metrics(self) -> Dict[str, Any]:
         """Get current cache metrics"""
         with self._lock:
@@ -293,6 +701,7 @@ class InProcessCache:
                 "max_size_mb": self.max_size_bytes // (1024 * 1024),
                 "max_entries": self.max_entries,
                 "current_size_mb": round(self._metrics.total_size_bytes / (1024 * 1024), 2),
+                "tag_count": len(self._tag_index),
                 **self._metrics.to_dict()
             }
     
@@ -300,8 +709,17 @@ class InProcessCache:
         """Background cleanup task for expired entries"""
         while not self._shutdown_event.is_set():
             try:
-                with self._lock:
-                    expired_count = self._expire_entries()
+                # Expire in bounded batches so lock hold time does not grow
+                # with cache size
+                expired_count = 0
+                while True:
+                    with self._lock:
+                        batch = self._expire_entries(max_entries=EXPIRY_BATCH_SIZE)
+                        more = batch == EXPIRY_BATCH_SIZE and self._has_due_expiries()
+                    expired_count += batch
+                    if not more:
+                        break
+                    await asyncio.sleep(0)
                 
                 if expired_count > 0:
                     logger.debug(
@@ -332,7 +750,7 @@ class InProcessCache:
     async def start_cleanup(self) -> None:
         """Start background cleanup task"""
         if self._cleanup_task is None:
-            self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+            self._cleanup_task = asyncio.create_task(self._cleanup_loop(), context=contextvars.Context())
             logger.info(f"Started background cleanup for cache '{self.name}'")
     
     async def stop_cleanup(self) -> None:
@@ -359,6 +777,96 @@ class CacheManager:
     def __init__(self):
         self._caches: Dict[str, InProcessCache] = {}
         self._lock = RLock()
+        
+        # Optional shared tier and the invalidation channel cursor
+        self._shared_backend: Optional[SharedCacheBackend] = None
+        self._shared_poll_interval_seconds = 1.0
+        self._last_invalidation_seq = 0
+        self._sync_task: Optional[asyncio.Task] = None
+        self._sync_shutdown = asyncio.Event()
+    
+    def configure_shared_backend(
+        self,
+        backend: Optional[SharedCacheBackend],
+        poll_interval_seconds: float = 1.0
+    ) -> None:
+        """
+        Attach a shared L2 tier to all current and future caches
+        
+        Invalidations already published before this call are skipped; the
+        local caches cannot hold anything they would apply to.
+        """
+        with self._lock:
+            self._shared_backend = backend
+            self._shared_poll_interval_seconds = poll_interval_seconds
+            self._last_invalidation_seq = backend.last_seq() if backend is not None else 0
+            for cache in self._caches.values():
+                cache.shared_backend = backend
+        
+        if backend is not None:
+            logger.info(
+                "Shared cache tier configured",
+                extra={
+                    "backend": type(backend).__name__,
+                    "poll_interval_seconds": poll_interval_seconds
+                }
+            )
+    
+    async def sync_invalidations(self) -> int:
+        """Apply invalidations published by other workers, returning the count applied"""
+        backend = self._shared_backend
+        if backend is None:
+            return 0
+        
+        last_seq, events = await asyncio.to_thread(backend.poll, self._last_invalidation_seq)
+        self._last_invalidation_seq = last_seq
+        
+        applied = 0
+        for event in events:
+            cache = self._caches.get(event.cache_name)
+            if cache is not None:
+                cache.apply_remote_invalidation(event.kind, event.target)
+                applied += 1
+        return applied
+    
+    async def invalidate(self, cache_name: str, kind: str, target: Optional[str] = None) -> int:
+        """
+        Invalidate entries of a named cache, returning the number removed locally
+        
+        The shared tier is invalidated and other workers notified even when
+        this worker has not created the cache, since they may still hold it.
+        """
+        cache = self._caches.get(cache_name)
+        if cache is not None:
+            if kind == INVALIDATE_TAG:
+                return await cache.invalidate_by_tag(target)
+            return 1 if await cache.delete(target) else 0
+        
+        backend = self._shared_backend
+        if backend is not None:
+            try:
+                await asyncio.to_thread(backend.invalidate, cache_name, kind, target)
+            except Exception as e:
+                logger.warning(
+                    f"Shared cache invalidation failed for '{cache_name}'",
+                    extra={"cache_name": cache_name, "kind": kind, "error": str(e)}
+                )
+        return 0
+    
+    async def _sync_loop(self) -> None:
+        """Background poll of the shared invalidation channel"""
+        while not self._sync_shutdown.is_set():
+            try:
+                await self.sync_invalidations()
+                await asyncio.wait_for(
+                    self._sync_shutdown.wait(),
+                    timeout=self._shared_poll_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                continue
+            except Exception as e:
+                logger.error(f"Error syncing shared cache invalidations: {e}", extra={"error": str(e)})
+                await asyncio.sleep(self._shared_poll_interval_seconds * 10)
     
     def get_cache(
         self,
@@ -366,7 +874,10 @@ class CacheManager:
         max_size_mb: int = 100,
         max_entries: int = 1000,
         default_ttl_seconds: int = 3600,
-        cleanup_interval_seconds: int = 300
+        cleanup_interval_seconds: int = 300,
+        stale_while_revalidate_seconds: int = 0,
+        negative_ttl_seconds: Optional[int] = None,
+        size_estimator: Union[str, SizeEstimator] = "sampling"
     ) -> InProcessCache:
         """Get or create a named cache with specified configuration"""
         with self._lock:
@@ -376,19 +887,35 @@ class CacheManager:
                     max_size_mb=max_size_mb,
                     max_entries=max_entries,
                     default_ttl_seconds=default_ttl_seconds,
-                    cleanup_interval_seconds=cleanup_interval_seconds
+                    cleanup_interval_seconds=cleanup_interval_seconds,
+                    stale_while_revalidate_seconds=stale_while_revalidate_seconds,
+                    negative_ttl_seconds=negative_ttl_seconds,
+                    size_estimator=size_estimator,
+                    shared_backend=self._shared_backend
                 )
             return self._caches[name]
     
     async def start_all_cleanup(self) -> None:
-        """Start cleanup tasks for all caches"""
+        """Start cleanup tasks for all caches and the shared invalidation poller"""
         for cache in self._caches.values():
             await cache.start_cleanup()
+        
+        if self._shared_backend is not None and self._sync_task is None:
+            self._sync_shutdown.clear()
+            self._sync_task = asyncio.create_task(self._sync_loop(), context=contextvars.Context())
     
     async def stop_all_cleanup(self) -> None:
-        """Stop cleanup tasks for all caches"""
+        """Stop cleanup tasks for all caches and the shared invalidation poller"""
         for cache in self._caches.values():
             await cache.stop_cleanup()
+        
+        if self._sync_task:
+            self._sync_shutdown.set()
+            try:
+                await asyncio.wait_for(self._sync_task, timeout=5.0)
+            except asyncio.TimeoutError:
+                self._sync_task.cancel()
+            self._sync_task = None
     
     def get_all_metrics(self) -> Dict[str, Dict[str, Any]]:
         """Get metrics for all caches"""
@@ -411,6 +938,7 @@ async def get_cached(
     key: str,
     factory: Callable[[], Awaitable[Any]],
     ttl_seconds: Optional[int] = None,
+    tags: Optional[Iterable[str]] = None,
     **cache_config
 ) -> Any:
     """
@@ -421,15 +949,16 @@ async def get_cached(
         key: Cache key
         factory: Async function to compute value if not cached
         ttl_seconds: TTL override for this entry
+        tags: Tags to register the entry under for invalidate_cache_tag
         **cache_config: Configuration for cache creation if it doesn't exist
     """
     cache = cache_manager.get_cache(cache_name, **cache_config)
-    return await cache.get_or_set(key, factory, ttl_seconds)
+    return await cache.get_or_set(key, factory, ttl_seconds, tags=tags)
 
 
 async def invalidate_cache_key(cache_name: str, key: str) -> bool:
     """
-    Invalidate a specific cache key
+    Invalidate a specific cache key in this worker and the shared tier
     
     Args:
         cache_name: Name of the cache
@@ -438,16 +967,29 @@ async def invalidate_cache_key(cache_name: str, key: str) -> bool:
     Returns:
         True if key existed and was removed
     """
-    if cache_name in cache_manager._caches:
-        cache = cache_manager._caches[cache_name]
-        return await cache.delete(key)
-    return False
+    return await cache_manager.invalidate(cache_name, INVALIDATE_KEY, key) > 0
+
+
+async def invalidate_cache_tag(cache_name: str, tag: str) -> int:
+    """
+    Invalidate all cache entries registered under a tag, here and in the shared tier
+    
+    Args:
+        cache_name: Name of the cache
+        tag: Tag to invalidate, e.g. "engagement:<id>"
+        
+    Returns:
+        Number of keys invalidated
+    """
+    return await cache_manager.invalidate(cache_name, INVALIDATE_TAG, tag)
 
 
 async def invalidate_cache_pattern(cache_name: str, pattern: str) -> int:
     """
     Invalidate cache keys matching a pattern (simple string contains)
     
+    This scans every key; prefer tagging entries and invalidate_cache_tag.
+    
     Args:
         cache_name: Name of the cache
         pattern: Pattern to match keys against
@@ -463,10 +1005,10 @@ async def invalidate_cache_pattern(cache_name: str, pattern: str) -> int:
     
     with cache._lock:
         keys_to_remove = [key for key in cache._cache.keys() if pattern in key]
-        
-        for key in keys_to_remove:
-            if await cache.delete(key):
-                invalidated_count += 1
+    
+    for key in keys_to_remove:
+        if await cache.delete(key):
+            invalidated_count += 1
     
     return invalidated_count
 
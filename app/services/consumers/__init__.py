@@ -5,9 +5,9 @@ Provides base consumer class and topic-specific implementations.
 
 import sys
 sys.path.append("/app")
-from api.base_consumer import BaseConsumer
-from api.ingest_consumer import IngestConsumer
-from api.minutes_consumer import MinutesConsumer
-from api.score_consumer import ScoreConsumer
+from services.consumers.base_consumer import BaseConsumer
+from services.consumers.ingest_consumer import IngestConsumer
+from services.consumers.minutes_consumer import MinutesConsumer
+from services.consumers.score_consumer import ScoreConsumer
 
 __all__ = ["BaseConsumer", "IngestConsumer", "MinutesConsumer", "ScoreConsumer"]
\ No newline at end of file
@@ -10,9 +10,9 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional
 from datetime import datetime, timezone
 
-from ...domain.models import ServiceBusMessage
-from ...util.logging import get_correlated_logger
-from service_bus import ServiceBusConsumer
+from domain.models import ServiceBusMessage
+from util.logging import get_correlated_logger
+from services.service_bus import ServiceBusConsumer
 
 
 class BaseConsumer(ABC):
@@ -30,10 +30,10 @@ class BaseConsumer(ABC):
             "started_at": datetime.now(timezone.utc)
         }
     
-    async def start(self, max_concurrent_calls: int = 1):
-        """Start the consumer"""
+    async def start(self, max_concurrent_calls: Optional[int] = None, prefetch_count: Optional[int] = None):
+        """Start the consumer; limits default to the Service Bus configuration"""
         self.logger.info(f"Starting {self.__class__.__name__} for topic: {self.topic}")
-        await self.consumer.start_listening(self._handle_message, max_concurrent_calls)
+        await self.consumer.start_listening(self._handle_message, max_concurrent_calls, prefetch_count)
     
     def stop(self):
         """Stop the consumer"""
@@ -42,11 +42,11 @@ class BaseConsumer(ABC):
     
     async def _handle_message(self, message: ServiceBusMessage) -> bool:
         """Handle incoming message with correlation ID propagation"""
-        # Update logger correlation ID to match message
-        self.logger.correlation_id = message.correlation_id
+        # Messages are handled concurrently, so log with a per-message logger
+        logger = get_correlated_logger(f"consumer.{self.topic}", message.correlation_id)
         
         try:
-            self.logger.info(
+            logger.info(
                 f"Processing message",
                 message_id=message.id,
                 message_type=message.type,
@@ -60,14 +60,14 @@ class BaseConsumer(ABC):
             if success:
                 self._stats["messages_processed"] += 1
                 self._stats["last_processed"] = datetime.now(timezone.utc)
-                self.logger.info(
+                logger.info(
                     f"Message processed successfully",
                     message_id=message.id,
                     total_processed=self._stats["messages_processed"]
                 )
             else:
                 self._stats["messages_failed"] += 1
-                self.logger.warning(
+                logger.warning(
                     f"Message processing returned false",
                     message_id=message.id,
                     total_failed=self._stats["messages_failed"]
@@ -77,7 +77,7 @@ class BaseConsumer(ABC):
             
         except Exception as e:
             self._stats["messages_failed"] += 1
-            self.logger.error(
+            logger.error(
                 f"Error processing message",
                 message_id=message.id,
                 error=str(e),
@@ -104,5 +104,6 @@ class BaseConsumer(ABC):
         return {
             "topic": self.topic,
             "consumer_class": self.__class__.__name__,
-            "statistics": self._stats.copy()
+            "statistics": self._stats.copy(),
+            "runtime": self.consumer.metrics.to_dict()
         }
\ No newline at end of file
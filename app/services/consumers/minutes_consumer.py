@@ -6,8 +6,8 @@ import sys
 sys.path.append("/app")
 from typing import Dict, Any
 
-from ...domain.models import ServiceBusMessage
-from api.base_consumer import BaseConsumer
+from domain.models import ServiceBusMessage
+from services.consumers.base_consumer import BaseConsumer
 
 
 class MinutesConsumer(BaseConsumer):
@@ -11,7 +11,7 @@ Provides caching for document-related data including:
 import logging
 from typing import Any, Dict, List, Optional
 from datetime import datetime
-from services.cache import get_cached, invalidate_cache_key, cache_manager
+from services.cache import get_cached, invalidate_cache_key, invalidate_cache_tag, cache_manager
 import sys
 sys.path.append("/app")
 from config import config
@@ -29,9 +29,19 @@ class DocumentCacheService:
             "max_size_mb": config.cache.document_metadata_max_size_mb,
             "max_entries": config.cache.document_metadata_max_entries,
             "default_ttl_seconds": config.cache.document_metadata_ttl_seconds,
-            "cleanup_interval_seconds": config.cache.cleanup_interval_seconds
+            "cleanup_interval_seconds": config.cache.cleanup_interval_seconds,
+            "stale_while_revalidate_seconds": config.cache.stale_while_revalidate_seconds,
+            "negative_ttl_seconds": config.cache.negative_ttl_seconds
         }
     
+    @staticmethod
+    def _engagement_tag(engagement_id: str) -> str:
+        return f"engagement:{engagement_id}"
+    
+    @staticmethod
+    def _document_tag(engagement_id: str, doc_id: str) -> str:
+        return f"document:{engagement_id}:{doc_id}"
+    
     async def get_document_metadata(self, engagement_id: str, doc_id: str) -> Optional[Dict[str, Any]]:
         """Get cached document metadata"""
         if not config.cache.enabled:
@@ -43,6 +53,7 @@ class DocumentCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"doc_{engagement_id}_{doc_id}",
+            tags=[self._engagement_tag(engagement_id), self._document_tag(engagement_id, doc_id)],
             factory=compute_metadata,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -59,6 +70,7 @@ class DocumentCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"engagement_docs_{engagement_id}",
+            tags=[self._engagement_tag(engagement_id)],
             factory=compute_documents,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -75,6 +87,7 @@ class DocumentCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"permissions_{engagement_id}_{doc_id}",
+            tags=[self._engagement_tag(engagement_id), self._document_tag(engagement_id, doc_id)],
             factory=compute_permissions,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -91,6 +104,7 @@ class DocumentCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"processing_{engagement_id}_{doc_id}",
+            tags=[self._engagement_tag(engagement_id), self._document_tag(engagement_id, doc_id)],
             factory=compute_status,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -107,6 +121,7 @@ class DocumentCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"search_index_{engagement_id}",
+            tags=[self._engagement_tag(engagement_id)],
             factory=compute_index,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -123,6 +138,7 @@ class DocumentCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"tags_{engagement_id}_{doc_id}",
+            tags=[self._engagement_tag(engagement_id), self._document_tag(engagement_id, doc_id)],
             factory=compute_tags,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -133,24 +149,21 @@ class DocumentCacheService:
         if not config.cache.enabled:
             return
         
-        cache_keys = [
-            f"doc_{engagement_id}_{doc_id}",
-            f"permissions_{engagement_id}_{doc_id}",
-            f"processing_{engagement_id}_{doc_id}",
-            f"tags_{engagement_id}_{doc_id}",
+        # Per-document entries share a tag; engagement-level aggregates are keyed directly
+        invalidated = await invalidate_cache_tag(self.CACHE_NAME, self._document_tag(engagement_id, doc_id))
+        for key in [
             f"engagement_docs_{engagement_id}",  # List needs refresh
             f"search_index_{engagement_id}"  # Search index needs refresh
-        ]
-        
-        for key in cache_keys:
-            await invalidate_cache_key(self.CACHE_NAME, key)
+        ]:
+            if await invalidate_cache_key(self.CACHE_NAME, key):
+                invalidated += 1
         
         logger.info(
             f"Invalidated document cache for {doc_id} in engagement {engagement_id}",
             extra={
                 "engagement_id": engagement_id,
                 "doc_id": doc_id,
-                "invalidated_keys": len(cache_keys)
+                "invalidated_keys": invalidated
             }
         )
     
@@ -159,19 +172,7 @@ class DocumentCacheService:
         if not config.cache.enabled:
             return
         
-        # Use pattern invalidation to clear all cache entries for this engagement
-        from services.cache import invalidate_cache_pattern
-        
-        patterns = [
-            f"_{engagement_id}_",  # Matches doc_ENGAGEMENT_ID_DOCID
-            f"engagement_docs_{engagement_id}",
-            f"search_index_{engagement_id}"
-        ]
-        
-        total_invalidated = 0
-        for pattern in patterns:
-            count = await invalidate_cache_pattern(self.CACHE_NAME, pattern)
-            total_invalidated += count
+        total_invalidated = await invalidate_cache_tag(self.CACHE_NAME, self._engagement_tag(engagement_id))
         
         logger.info(
             f"Invalidated engagement document cache for {engagement_id}",
@@ -0,0 +1,245 @@
+"""
+Content-addressed cache of chunk and query embeddings
+
+Re-uploading an unchanged document, reindexing an engagement or repeating a
+search query used to embed the same text again. Vectors are cached under a
+SHA-256 of the embedding model, deployment, dimensions and the
+whitespace-normalized text, so a reindex only pays for chunks whose text
+changed.
+
+Two tiers: an in-process LRU of float32 arrays for hot entries (queries,
+chunks of a document being reprocessed) over a WAL-mode SQLite database on
+local disk, shared by every worker on the host. Only hashes and vectors are
+stored, never the text. The database is kept under max_size_mb by evicting
+least recently used rows; entries for an old deployment simply age out.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import config
+from util.sqlite import ProcessConnection
+
+logger = logging.getLogger(__name__)
+
+# Eviction trims the database to this fraction of its size limit
+EVICTION_TARGET_RATIO = 0.9
+
+# SQLite's default limit on bound parameters is 999
+LOOKUP_BATCH_SIZE = 500
+
+
+@dataclass
+class EmbeddingCacheMetrics:
+    """Hit, miss and saving counters for this process"""
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    saved_tokens: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """Memory LRU over a SQLite store of float32 vectors, safe to share between workers"""
+
+    def __init__(self, path: str, memory_entries: int = 4096, max_size_mb: float = 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.memory_entries = memory_entries
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.metrics = EmbeddingCacheMetrics()
+        # key -> (vector, tokens); vectors as float32 arrays, a quarter the size of a list
+        self._memory: "OrderedDict[str, Tuple[array, int]]" = OrderedDict()
+        self._db = ProcessConnection(self.path)
+
+        with self._db.connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_embeddings_access
+                    ON embeddings (last_access);
+            """)
+
+    @staticmethod
+    def make_key(model: str, deployment: str, dimensions: int, text: str) -> str:
+        text_hash = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        payload = json.dumps([model, deployment, dimensions, text_hash], separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # Memory tier
+    def _remember(self, key: str, vector: array, tokens: int) -> None:
+        self._memory[key] = (vector, tokens)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # Reads
+    def _load(self, keys: List[str]) -> Dict[str, Tuple[array, int]]:
+        found: Dict[str, Tuple[array, int]] = {}
+        now = time.time()
+        with self._db.connection() as conn:
+            for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+                batch = keys[start:start + LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector, tokens FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob, tokens in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = (vector, tokens)
+            conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in found]
+            )
+        return found
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Tuple[List[float], int]]:
+        """Cached (vector, tokens) by key for whichever keys are present"""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Tuple[array, int]] = {}
+        missing = []
+        for key in keys:
+            entry = self._memory.get(key)
+            if entry is None:
+                missing.append(key)
+            else:
+                self._memory.move_to_end(key)
+                found[key] = entry
+        self.metrics.memory_hits += len(found)
+
+        if missing:
+            try:
+                loaded = await asyncio.to_thread(self._load, missing)
+            except sqlite3.Error as e:
+                logger.warning("Embedding cache read failed", extra={"error": str(e)})
+                loaded = {}
+            for key, entry in loaded.items():
+                self._remember(key, *entry)
+            found.update(loaded)
+            self.metrics.disk_hits += len(loaded)
+            self.metrics.misses += len(missing) - len(loaded)
+
+        self.metrics.saved_tokens += sum(tokens for _, tokens in found.values())
+        return {key: (vector.tolist(), tokens) for key, (vector, tokens) in found.items()}
+
+    # Writes
+    def _store(self, entries: List[Tuple[str, array, int]]) -> None:
+        now = time.time()
+        rows = []
+        for key, vector, tokens in entries:
+            blob = vector.tobytes()
+            rows.append((key, blob, tokens, len(key) + len(blob), now, now))
+        with self._db.connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, tokens, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict(conn)
+        self.metrics.writes += len(rows)
+
+    async def put_many(self, entries: Iterable[Tuple[str, List[float], int]]) -> None:
+        """Store (key, vector, tokens) entries; tokens is what a later hit saves"""
+        packed = [(key, array("f", vector), tokens) for key, vector, tokens in entries]
+        if not packed:
+            return
+        for key, vector, tokens in packed:
+            self._remember(key, vector, tokens)
+        try:
+            await asyncio.to_thread(self._store, packed)
+        except sqlite3.Error as e:
+            logger.warning("Embedding cache write failed", extra={"error": str(e)})
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+        target = int(self.max_size_bytes * EVICTION_TARGET_RATIO)
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM embeddings ORDER BY last_access"):
+            if total <= target:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM embeddings WHERE key = ?", stale)
+        self.metrics.evictions += len(stale)
+
+    def _stats(self) -> Dict[str, int]:
+        with self._db.connection() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()
+        return {"entries": entries, "size_bytes": size}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        metrics: Dict[str, Any] = asdict(self.metrics)
+        metrics["hits"] = self.metrics.hits
+        metrics["hit_rate"] = round(self.metrics.hit_rate, 4)
+        metrics["memory_entries"] = len(self._memory)
+        metrics["max_size_bytes"] = self.max_size_bytes
+        try:
+            metrics.update(self._stats())
+        except sqlite3.Error as e:
+            logger.warning("Embedding cache stats failed", extra={"error": str(e)})
+        return metrics
+
+    def close(self) -> None:
+        self._db.close()
+
+
+# Process-wide cache, created on first use when enabled
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """The configured embedding cache, or None when caching is disabled"""
+    global _embedding_cache
+    settings = config.embeddings
+    if not settings.cache_enabled:
+        return None
+    if _embedding_cache is None:
+        try:
+            _embedding_cache = EmbeddingCache(
+                settings.cache_path,
+                memory_entries=settings.cache_memory_entries,
+                max_size_mb=settings.cache_max_size_mb
+            )
+        except (OSError, sqlite3.Error) as e:
+            # e.g. a read-only filesystem; embed without caching
+            logger.warning("Embedding cache unavailable", extra={"path": settings.cache_path, "error": str(e)})
+            return None
+    return _embedding_cache
+
+
+def get_embedding_cache_metrics() -> Optional[Dict[str, Any]]:
+    cache = get_embedding_cache()
+    return cache.get_metrics() if cache else None
@@ -1,6 +1,6 @@
 """
 Embeddings service for generating vector embeddings using Azure OpenAI.
-Handles text chunking, batch processing, and error handling with retries.
+Handles text chunking, batch processing, caching and error handling with retries.
 """
 import asyncio
 import logging
@@ -13,6 +13,8 @@ from azure.identity import DefaultAzureCredential
 import sys
 sys.path.append('/app')
 from config import config
+from services.embedding_cache import EmbeddingCache, get_embedding_cache
+from util.logging import get_rag_metrics_logger
 
 
 logger = logging.getLogger(__name__)
@@ -43,6 +45,8 @@ class EmbeddingsService:
     def __init__(self, correlation_id: Optional[str] = None):
         self.correlation_id = correlation_id or "unknown"
         self.client = None
+        self.cache = get_embedding_cache()
+        self.metrics_logger = get_rag_metrics_logger(self.correlation_id)
         self._initialize_client()
     
     def _initialize_client(self):
@@ -236,12 +240,16 @@ class EmbeddingsService:
             return []
         
         try:
+            # Only chunks whose text has not been embedded before cost a request
+            cached = await self.get_cached(chunks, document_id)
+            misses = [chunk for chunk, result in zip(chunks, cached) if result is None]
+            
             # Process chunks in batches
-            results = []
-            total_batches = (len(chunks) + config.embeddings.batch_size - 1) // config.embeddings.batch_size
+            fresh = []
+            total_batches = (len(misses) + config.embeddings.batch_size - 1) // config.embeddings.batch_size
             
-            for batch_idx in range(0, len(chunks), config.embeddings.batch_size):
-                batch_chunks = chunks[batch_idx:batch_idx + config.embeddings.batch_size]
+            for batch_idx in range(0, len(misses), config.embeddings.batch_size):
+                batch_chunks = misses[batch_idx:batch_idx + config.embeddings.batch_size]
                 batch_num = (batch_idx // config.embeddings.batch_size) + 1
                 
                 logger.info(
@@ -255,12 +263,16 @@ class EmbeddingsService:
                 )
                 
                 batch_results = await self._generate_batch_embeddings(batch_chunks, document_id)
-                results.extend(batch_results)
+                fresh.extend(batch_results)
                 
                 # Add small delay between batches to avoid rate limiting
-                if batch_idx + config.embeddings.batch_size < len(chunks):
+                if batch_idx + config.embeddings.batch_size < len(misses):
                     await asyncio.sleep(0.1)
             
+            await self.store_cached(fresh)
+            fresh_results = iter(fresh)
+            results = [result if result is not None else next(fresh_results) for result in cached]
+            
             logger.info(
                 "Embeddings generated successfully",
                 extra={
@@ -268,6 +280,7 @@ class EmbeddingsService:
                     "document_id": document_id,
                     "total_chunks": len(chunks),
                     "total_embeddings": len(results),
+                    "cached_embeddings": len(chunks) - len(misses),
                     "total_batches": total_batches
                 }
             )
@@ -286,36 +299,100 @@ class EmbeddingsService:
             )
             raise
     
+    def _cache_key(self, chunk: TextChunk) -> str:
+        settings = config.azure_openai
+        return EmbeddingCache.make_key(
+            settings.embedding_model,
+            f"{settings.endpoint}|{settings.embedding_deployment}",
+            settings.embedding_dimensions,
+            chunk.text
+        )
+    
+    async def get_cached(self, chunks: List[TextChunk], document_id: str) -> List[Optional[EmbeddingResult]]:
+        """
+        Cached embedding for each chunk, or None where the text is not cached.
+        
+        Args:
+            chunks: Chunks to look up
+            document_id: Identifier for the document (for metrics)
+            
+        Returns:
+            One entry per chunk, in order
+        """
+        if self.cache is None or not chunks:
+            return [None] * len(chunks)
+        
+        keys = [self._cache_key(chunk) for chunk in chunks]
+        found = await self.cache.get_many(keys)
+        results: List[Optional[EmbeddingResult]] = []
+        for chunk, key in zip(chunks, keys):
+            entry = found.get(key)
+            results.append(EmbeddingResult(
+                chunk=chunk,
+                embedding=entry[0],
+                model=config.azure_openai.embedding_model,
+                usage_tokens=entry[1]
+            ) if entry else None)
+        
+        hits = [result for result in results if result is not None]
+        self.metrics_logger.log_embedding_cache_operation(
+            document_id=document_id,
+            lookups=len(chunks),
+            hits=len(hits),
+            saved_tokens=sum(result.usage_tokens for result in hits),
+            cache_hit_rate=self.cache.metrics.hit_rate,
+            cache_saved_tokens=self.cache.metrics.saved_tokens
+        )
+        return results
+    
+    async def store_cached(self, results: List[EmbeddingResult]) -> None:
+        """Cache freshly generated embeddings"""
+        if self.cache is None or not results:
+            return
+        await self.cache.put_many(
+            (self._cache_key(result.chunk), result.embedding, result.usage_tokens) for result in results
+        )
+    
+    async def embed_chunks(self, chunks: List[TextChunk]) -> List[EmbeddingResult]:
+        """
+        Embed a batch of chunks in a single request, without retries.
+        
+        Chunks may come from different documents; results keep their order.
+        Callers that pace requests themselves (the ingestion pipeline) handle
+        errors and throttling.
+        """
+        texts = [chunk.text for chunk in chunks]
+        response = await self.client.embeddings.create(
+            model=config.azure_openai.embedding_deployment,
+            input=texts,
+            dimensions=None  # Use default dimensions for text-embedding-3-large
+        )
+        
+        # Process results
+        results = []
+        for i, embedding_data in enumerate(response.data):
+            results.append(EmbeddingResult(
+                chunk=chunks[i],
+                embedding=embedding_data.embedding,
+                model=response.model,
+                usage_tokens=response.usage.total_tokens // len(texts) if response.usage else 0
+            ))
+        return results
+    
     async def _generate_batch_embeddings(
         self, 
         chunks: List[TextChunk], 
         document_id: str
     ) -> List[EmbeddingResult]:
         """Generate embeddings for a batch of chunks with retry logic"""
-        texts = [chunk.text for chunk in chunks]
-        
         for attempt in range(config.embeddings.max_retries + 1):
             try:
                 start_time = time.time()
                 
-                response = await self.client.embeddings.create(
-                    model=config.azure_openai.embedding_deployment,
-                    input=texts,
-                    dimensions=None  # Use default dimensions for text-embedding-3-large
-                )
+                results = await self.embed_chunks(chunks)
                 
                 duration = time.time() - start_time
                 
-                # Process results
-                results = []
-                for i, embedding_data in enumerate(response.data):
-                    results.append(EmbeddingResult(
-                        chunk=chunks[i],
-                        embedding=embedding_data.embedding,
-                        model=response.model,
-                        usage_tokens=response.usage.total_tokens // len(texts) if response.usage else 0
-                    ))
-                
                 logger.info(
                     "Batch embeddings generated successfully",
                     extra={
@@ -324,8 +401,8 @@ class EmbeddingsService:
                         "batch_size": len(chunks),
                         "attempt": attempt + 1,
                         "duration_seconds": round(duration, 2),
-                        "total_tokens": response.usage.total_tokens if response.usage else 0,
-                        "model": response.model
+                        "total_tokens": sum(r.usage_tokens for r in results),
+                        "model": results[0].model if results else None
                     }
                 )
                 
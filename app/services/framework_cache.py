@@ -10,7 +10,7 @@ Provides caching for framework metadata including:
 
 import logging
 from typing import Any, Dict, List, Optional
-from services.cache import get_cached, invalidate_cache_key, cache_manager
+from services.cache import get_cached, invalidate_cache_key, invalidate_cache_tag, cache_manager
 import sys
 sys.path.append("/app")
 from config import config
@@ -28,9 +28,15 @@ class FrameworkCacheService:
             "max_size_mb": config.cache.framework_max_size_mb,
             "max_entries": config.cache.framework_max_entries,
             "default_ttl_seconds": config.cache.framework_ttl_seconds,
-            "cleanup_interval_seconds": config.cache.cleanup_interval_seconds
+            "cleanup_interval_seconds": config.cache.cleanup_interval_seconds,
+            "stale_while_revalidate_seconds": config.cache.stale_while_revalidate_seconds,
+            "negative_ttl_seconds": config.cache.negative_ttl_seconds
         }
     
+    @staticmethod
+    def _framework_tag(framework_id: str) -> str:
+        return f"framework:{framework_id}"
+    
     async def get_framework_metadata(self, framework_id: str) -> Optional[Dict[str, Any]]:
         """Get cached framework metadata"""
         if not config.cache.enabled:
@@ -42,6 +48,7 @@ class FrameworkCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"framework_{framework_id}",
+            tags=[self._framework_tag(framework_id)],
             factory=compute_metadata,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -58,6 +65,7 @@ class FrameworkCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"schemas_{framework_id}",
+            tags=[self._framework_tag(framework_id)],
             factory=compute_schemas,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -74,6 +82,7 @@ class FrameworkCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"scoring_{framework_id}",
+            tags=[self._framework_tag(framework_id)],
             factory=compute_matrix,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -106,6 +115,7 @@ class FrameworkCacheService:
         return await get_cached(
             cache_name=self.CACHE_NAME,
             key=f"capabilities_{framework_id}",
+            tags=[self._framework_tag(framework_id)],
             factory=compute_capabilities,
             ttl_seconds=self.cache_config["default_ttl_seconds"],
             **self.cache_config
@@ -116,22 +126,16 @@ class FrameworkCacheService:
         if not config.cache.enabled:
             return
         
-        cache_keys = [
-            f"framework_{framework_id}",
-            f"schemas_{framework_id}",
-            f"scoring_{framework_id}",
-            f"capabilities_{framework_id}",
-            "frameworks_list"  # List needs refresh when individual framework changes
-        ]
-        
-        for key in cache_keys:
-            await invalidate_cache_key(self.CACHE_NAME, key)
+        invalidated = await invalidate_cache_tag(self.CACHE_NAME, self._framework_tag(framework_id))
+        # List needs refresh when individual framework changes
+        if await invalidate_cache_key(self.CACHE_NAME, "frameworks_list"):
+            invalidated += 1
         
         logger.info(
             f"Invalidated framework cache for {framework_id}",
             extra={
                 "framework_id": framework_id,
-                "invalidated_keys": len(cache_keys)
+                "invalidated_keys": invalidated
             }
         )
     
@@ -9,13 +9,13 @@ Comprehensive GDPR compliance service providing:
 - Integration with background job system for async operations
 """
 
-import json
 import logging
+import uuid
 from datetime import datetime, timezone, timedelta
 from typing import Dict, List, Optional, Any, Union
 
 from api.schemas.gdpr import (
-    GDPRDataExportRequest, GDPRDataExportResponse, GDPRDataBundle,
+    GDPRDataExportRequest, GDPRDataExportResponse,
     GDPRDataPurgeRequest, GDPRDataPurgeResponse,
     TTLPolicy, TTLPolicyResponse,
     DataRetentionReport, DataRetentionReportResponse,
@@ -28,6 +28,7 @@ from domain.models import (
 )
 from services.audit import AuditService
 from services.background_jobs import BackgroundJobService
+from services.gdpr_export import export_download_url
 from util.logging import get_correlation_id
 
 logger = logging.getLogger(__name__)
@@ -90,7 +91,7 @@ class GDPRService:
         correlation_id: Optional[str] = None
     ) -> GDPRDataExportResponse:
         """
-        Export complete engagement data for GDPR compliance
+        Queue a streaming export of all engagement data for GDPR compliance
         
         Args:
             request: Data export request parameters
@@ -98,7 +99,7 @@ class GDPRService:
             correlation_id: Request correlation ID for tracking
             
         Returns:
-            Complete data export response with all engagement data
+            Pending export response with the job ID and download URL
         """
         try:
             correlation_id = correlation_id or get_correlation_id()
@@ -131,57 +132,45 @@ class GDPRService:
                 }
             )
             
-            # Collect all engagement data
-            data_bundle = await self._collect_engagement_data(
-                request.engagement_id,
-                request.include_documents,
-                request.include_embeddings
-            )
-            
-            # Calculate metrics
-            record_count = self._calculate_record_count(data_bundle)
-            size_bytes = self._calculate_bundle_size(data_bundle)
-            
-            # Create export response
-            export_response = GDPRDataExportResponse(
+            # Stream the export to a file in a background job; the caller
+            # downloads it once the job completes
+            export_id = str(uuid.uuid4())
+            job = await self.background_job_service.create_job(
+                job_type="data_export",
+                created_by=user_email,
                 engagement_id=request.engagement_id,
-                requested_by=user_email,
-                data_bundle=data_bundle,
-                record_count=record_count,
-                size_bytes=size_bytes,
-                metadata={
-                    "export_format": request.export_format,
+                parameters={
+                    "engagement_id": request.engagement_id,
+                    "export_id": export_id,
+                    "export_format": "ndjson",
                     "include_documents": request.include_documents,
                     "include_embeddings": request.include_embeddings,
                     "correlation_id": correlation_id
                 }
             )
             
-            # Log successful export
-            await self.audit_service.log_audit_event(
-                action_type="data_export_completed",
-                user_email=user_email,
-                action_description=f"GDPR data export completed for engagement {request.engagement_id}",
+            export_response = GDPRDataExportResponse(
+                export_id=export_id,
                 engagement_id=request.engagement_id,
-                resource_type="engagement",
-                resource_id=request.engagement_id,
-                data_subject_email=user_email,
-                legal_basis="GDPR Article 15 - Right of access",
-                correlation_id=correlation_id,
+                requested_by=user_email,
+                status="pending",
+                job_id=job.id,
+                download_url=export_download_url(request.engagement_id, export_id),
                 metadata={
-                    "export_id": export_response.export_id,
-                    "record_count": record_count,
-                    "size_bytes": size_bytes
+                    "export_format": "ndjson",
+                    "requested_format": request.export_format,
+                    "include_documents": request.include_documents,
+                    "include_embeddings": request.include_embeddings,
+                    "correlation_id": correlation_id
                 }
             )
             
             logger.info(
-                f"GDPR data export completed for engagement {request.engagement_id}",
+                f"GDPR data export queued for engagement {request.engagement_id}",
                 extra={
                     'engagement_id': request.engagement_id,
-                    'export_id': export_response.export_id,
-                    'record_count': record_count,
-                    'size_bytes': size_bytes,
+                    'export_id': export_id,
+                    'job_id': job.id,
                     'correlation_id': correlation_id
                 }
             )
@@ -213,93 +202,6 @@ class GDPRService:
             )
             raise
     
-    async def _collect_engagement_data(
-        self,
-        engagement_id: str,
-        include_documents: bool = True,
-        include_embeddings: bool = False
-    ) -> GDPRDataBundle:
-        """Collect all data associated with an engagement"""
-        try:
-            # Get engagement
-            engagement_data = {}
-            
-            # Get assessments
-            assessments = self.repository.list_assessments(engagement_id)
-            assessments_data = [a.model_dump() for a in assessments]
-            
-            # Get questions, responses, findings, recommendations, runlogs for all assessments
-            questions_data = []
-            responses_data = []
-            findings_data = []
-            recommendations_data = []
-            runlogs_data = []
-            
-            for assessment in assessments:
-                # This would need proper repository methods
-                # For now, use placeholder data
-                pass
-            
-            # Get documents
-            documents_data = []
-            if include_documents:
-                documents = self.repository.list_documents(engagement_id)
-                documents_data = [d.model_dump() for d in documents]
-            
-            # Get embeddings
-            embeddings_data = None
-            if include_embeddings:
-                # This would get embeddings from the embedding repository
-                embeddings_data = []
-            
-            # Get memberships
-            memberships_data = []
-            # This would need a repository method to get all memberships for an engagement
-            
-            return GDPRDataBundle(
-                engagement=engagement_data,
-                assessments=assessments_data,
-                questions=questions_data,
-                responses=responses_data,
-                findings=findings_data,
-                recommendations=recommendations_data,
-                documents=documents_data,
-                runlogs=runlogs_data,
-                memberships=memberships_data,
-                embeddings=embeddings_data
-            )
-            
-        except Exception as e:
-            logger.error(
-                f"Failed to collect engagement data: {str(e)}",
-                extra={'engagement_id': engagement_id, 'error': str(e)}
-            )
-            raise
-    
-    def _calculate_record_count(self, data_bundle: GDPRDataBundle) -> int:
-        """Calculate total number of records in data bundle"""
-        count = 0
-        count += 1 if data_bundle.engagement else 0
-        count += len(data_bundle.assessments)
-        count += len(data_bundle.questions)
-        count += len(data_bundle.responses)
-        count += len(data_bundle.findings)
-        count += len(data_bundle.recommendations)
-        count += len(data_bundle.documents)
-        count += len(data_bundle.runlogs)
-        count += len(data_bundle.memberships)
-        if data_bundle.embeddings:
-            count += len(data_bundle.embeddings)
-        return count
-    
-    def _calculate_bundle_size(self, data_bundle: GDPRDataBundle) -> int:
-        """Calculate approximate size of data bundle in bytes"""
-        try:
-            json_str = json.dumps(data_bundle.model_dump(), default=str)
-            return len(json_str.encode('utf-8'))
-        except Exception:
-            return 0
-    
     async def initiate_data_purge(
         self,
         request: GDPRDataPurgeRequest,
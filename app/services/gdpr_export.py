@@ -0,0 +1,404 @@
+"""
+Streaming GDPR engagement export
+
+Engagement data is paged out of the repository one container at a time and
+written as NDJSON (one {"collection": ..., "record": ...} object per line),
+optionally gzip-compressed, to a local file or an Azure blob. Output is
+flushed in bounded chunks, so worker memory stays flat regardless of the
+engagement's size. The file only becomes visible once it is complete: local
+exports are renamed into place and blob exports commit their staged blocks
+on close.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Containers in export order; engagements first so readers see the root record
+EXPORT_COLLECTIONS = (
+    "engagements", "memberships", "assessments", "documents",
+    "findings", "recommendations", "runlogs", "embeddings"
+)
+
+ProgressCallback = Callable[[str, int, int], Awaitable[None]]
+
+
+def export_download_url(engagement_id: str, export_id: str) -> str:
+    return f"/api/gdpr/engagements/{engagement_id}/export/{export_id}/download"
+
+
+def export_file_name(export_id: str, compress: bool) -> str:
+    return f"{export_id}.ndjson.gz" if compress else f"{export_id}.ndjson"
+
+
+@dataclass
+class ExportManifest:
+    """Download handle and summary of a finished export"""
+    export_id: str
+    engagement_id: str
+    location: str
+    compressed: bool
+    record_counts: Dict[str, int] = field(default_factory=dict)
+    size_bytes: int = 0
+    sha256: str = ""
+    completed_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    format: str = "ndjson"
+
+    @property
+    def record_count(self) -> int:
+        return sum(self.record_counts.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "record_count": self.record_count}
+
+
+class ExportSink(ABC):
+    """Destination for export chunks; the export is only visible after close()"""
+
+    @abstractmethod
+    async def write(self, chunk: bytes) -> None:
+        ...
+
+    @abstractmethod
+    async def close(self) -> str:
+        """Finish the export and return its location"""
+        ...
+
+    @abstractmethod
+    async def abort(self) -> None:
+        """Discard a partially written export"""
+        ...
+
+
+class LocalExportSink(ExportSink):
+    """Writes to a temporary file that is renamed into place on close"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.path.with_name(self.path.name + ".part")
+        self._file = open(self._tmp_path, "wb")
+
+    async def write(self, chunk: bytes) -> None:
+        await asyncio.to_thread(self._file.write, chunk)
+
+    async def close(self) -> str:
+        def finish():
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        await asyncio.to_thread(finish)
+        return str(self.path)
+
+    async def abort(self) -> None:
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+
+class BlobExportSink(ExportSink):
+    """
+    Stages each chunk as a block of a block blob and commits them on close
+
+    release, if given, closes the clients behind blob_client once the export
+    is committed or aborted.
+    """
+
+    def __init__(self, blob_client, release: Optional[Callable[[], Awaitable[None]]] = None):
+        self._blob = blob_client
+        self._block_ids: List[str] = []
+        self._release = release
+
+    async def write(self, chunk: bytes) -> None:
+        block_id = base64.b64encode(f"{len(self._block_ids):08d}".encode()).decode()
+        await self._blob.stage_block(block_id=block_id, data=chunk, length=len(chunk))
+        self._block_ids.append(block_id)
+
+    async def close(self) -> str:
+        from azure.storage.blob import BlobBlock
+
+        try:
+            await self._blob.commit_block_list([BlobBlock(block_id=block_id) for block_id in self._block_ids])
+            return self._blob.url
+        finally:
+            await self._release_clients()
+
+    async def abort(self) -> None:
+        # Uncommitted blocks are garbage collected by the storage service
+        self._block_ids.clear()
+        await self._release_clients()
+
+    async def _release_clients(self) -> None:
+        release, self._release = self._release, None
+        if release is not None:
+            await release()
+
+
+class NDJSONExportWriter:
+    """Encodes records as NDJSON and hands the sink chunks of about chunk_size_bytes"""
+
+    def __init__(self, sink: ExportSink, compress: bool = True, chunk_size_bytes: int = 1024 * 1024):
+        self.sink = sink
+        self.compress = compress
+        self.chunk_size_bytes = max(1, chunk_size_bytes)
+        self.bytes_written = 0
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._digest = hashlib.sha256()
+        # wbits=31 writes a gzip container rather than a raw zlib stream
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    async def write_record(self, collection: str, record: Dict[str, Any]) -> None:
+        line = json.dumps({"collection": collection, "record": record}, default=str, separators=(",", ":"))
+        data = line.encode("utf-8") + b"\n"
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.chunk_size_bytes:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        await self._emit(data)
+
+    async def close(self) -> Tuple[int, str]:
+        """Flush remaining output; returns (bytes written, sha256 of the file)"""
+        await self.flush()
+        if self._compressor is not None:
+            await self._emit(self._compressor.flush())
+        return self.bytes_written, self._digest.hexdigest()
+
+    async def _emit(self, data: bytes) -> None:
+        if data:
+            self._digest.update(data)
+            self.bytes_written += len(data)
+            await self.sink.write(data)
+
+
+async def iter_engagement_records(
+    repository: Any,
+    engagement_id: str,
+    include_documents: bool = True,
+    include_embeddings: bool = False
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield (collection, record) pairs for an engagement
+
+    Repositories with iter_engagement_data (Cosmos) are paged container by
+    container; the local repositories already hold everything in memory and
+    are read through their engagement-scoped list methods.
+    """
+    skip = set()
+    if not include_documents:
+        skip.add("documents")
+    if not include_embeddings:
+        skip.add("embeddings")
+
+    iter_engagement_data = getattr(repository, "iter_engagement_data", None)
+    if iter_engagement_data is not None:
+        async for collection, record in iter_engagement_data(engagement_id, exclude=skip):
+            yield collection, record
+        return
+
+    # The domain Repository interface has no per-engagement engagement or
+    # membership reads, so local exports cover the engagement-scoped lists
+    sources: Dict[str, Callable[[], Iterable[Any]]] = {
+        "assessments": lambda: repository.list_assessments(engagement_id),
+        "documents": lambda: repository.list_documents(engagement_id),
+        "findings": lambda: repository.get_findings(engagement_id),
+        "recommendations": lambda: repository.get_recommendations(engagement_id),
+        "runlogs": lambda: repository.get_runlogs(engagement_id),
+    }
+    for collection in EXPORT_COLLECTIONS:
+        if collection in skip or collection not in sources:
+            continue
+        for item in sources[collection]():
+            yield collection, item.model_dump(mode="json") if hasattr(item, "model_dump") else item
+        # Let other tasks run between containers
+        await asyncio.sleep(0)
+
+
+async def stream_engagement_export(
+    repository: Any,
+    engagement_id: str,
+    export_id: str,
+    sink: ExportSink,
+    compress: bool = True,
+    include_documents: bool = True,
+    include_embeddings: bool = False,
+    chunk_size_bytes: int = 1024 * 1024,
+    on_progress: Optional[ProgressCallback] = None
+) -> ExportManifest:
+    """
+    Write an engagement export to sink and return its manifest
+
+    on_progress(collection, records_in_collection, total_records) is called
+    as each container finishes.
+    """
+    writer = NDJSONExportWriter(sink, compress=compress, chunk_size_bytes=chunk_size_bytes)
+    counts: Dict[str, int] = {}
+    current: Optional[str] = None
+
+    async def finish_collection():
+        if current is not None and on_progress is not None:
+            await on_progress(current, counts[current], sum(counts.values()))
+
+    try:
+        async for collection, record in iter_engagement_records(
+            repository, engagement_id, include_documents, include_embeddings
+        ):
+            if collection != current:
+                await finish_collection()
+                current = collection
+                counts.setdefault(collection, 0)
+            await writer.write_record(collection, record)
+            counts[collection] += 1
+        await finish_collection()
+        size_bytes, sha256 = await writer.close()
+        location = await sink.close()
+    except BaseException:
+        await sink.abort()
+        raise
+
+    manifest = ExportManifest(
+        export_id=export_id,
+        engagement_id=engagement_id,
+        location=location,
+        compressed=compress,
+        record_counts=counts,
+        size_bytes=size_bytes,
+        sha256=sha256
+    )
+    logger.info(
+        "Engagement export written",
+        extra={
+            'engagement_id': engagement_id,
+            'export_id': export_id,
+            'record_count': manifest.record_count,
+            'size_bytes': size_bytes
+        }
+    )
+    return manifest
+
+
+def _blob_container_client() -> Optional[Tuple[Any, Any]]:
+    """
+    Async container client for exports and its credential, or None when blob
+    storage is not configured
+
+    Both hold HTTP sessions; the caller closes them with _close_blob_clients.
+    """
+    if not (config.storage.use_blob_storage and config.storage.azure_storage_account):
+        return None
+    from azure.identity.aio import DefaultAzureCredential
+    from azure.storage.blob.aio import ContainerClient
+
+    credential = DefaultAzureCredential()
+    container = ContainerClient(
+        account_url=f"https://{config.storage.azure_storage_account}.blob.core.windows.net",
+        container_name=config.storage.gdpr_export_container,
+        credential=credential
+    )
+    return container, credential
+
+
+async def _close_blob_clients(container: Any, credential: Any) -> None:
+    try:
+        await container.close()
+    finally:
+        await credential.close()
+
+
+def _blob_name(engagement_id: str, export_id: str, compress: bool) -> str:
+    return f"{engagement_id}/{export_file_name(export_id, compress)}"
+
+
+def _local_path(engagement_id: str, export_id: str, compress: bool) -> Path:
+    return Path(config.storage.gdpr_export_dir) / engagement_id / export_file_name(export_id, compress)
+
+
+def create_export_sink(engagement_id: str, export_id: str, compress: bool) -> ExportSink:
+    """Blob sink when blob storage is configured, otherwise a local file"""
+    clients = _blob_container_client()
+    if clients is not None:
+        container, credential = clients
+        return BlobExportSink(
+            container.get_blob_client(_blob_name(engagement_id, export_id, compress)),
+            release=lambda: _close_blob_clients(container, credential)
+        )
+    return LocalExportSink(str(_local_path(engagement_id, export_id, compress)))
+
+
+async def open_export(engagement_id: str, export_id: str) -> Optional[Tuple[str, AsyncIterator[bytes]]]:
+    """
+    Find a finished export and return (file name, chunk iterator)
+
+    Returns None if the export does not exist or is still being written.
+    """
+    try:
+        # Export IDs are UUIDs; anything else never names an export file
+        uuid.UUID(export_id)
+    except ValueError:
+        return None
+    for compress in (True, False):
+        name = export_file_name(export_id, compress)
+        path = _local_path(engagement_id, export_id, compress)
+        if path.exists():
+            return name, _iter_file(path, config.storage.gdpr_export_chunk_kb * 1024)
+
+    clients = _blob_container_client()
+    if clients is not None:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        container, _ = clients
+        streaming = False
+        try:
+            for compress in (True, False):
+                blob = container.get_blob_client(_blob_name(engagement_id, export_id, compress))
+                try:
+                    downloader = await blob.download_blob()
+                except ResourceNotFoundError:
+                    continue
+                streaming = True
+                return export_file_name(export_id, compress), _iter_blob(downloader, clients)
+        finally:
+            # Once streaming, the clients are closed when the download ends
+            if not streaming:
+                await _close_blob_clients(*clients)
+    return None
+
+
+async def _iter_blob(downloader: Any, clients: Tuple[Any, Any]) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in downloader.chunks():
+            yield chunk
+    finally:
+        await _close_blob_clients(*clients)
+
+
+async def _iter_file(path: Path, chunk_size: int) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
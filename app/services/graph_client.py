@@ -0,0 +1,197 @@
+"""
+Microsoft Graph client
+
+Shared by every AAD lookup in a process:
+- AppTokenProvider caches the app-only (client credentials) token and
+  refreshes it a margin before it expires, so requests rarely wait on MSAL
+- GraphClient keeps one pooled aiohttp session per event loop, follows
+  @odata.nextLink paging and sends many reads in one round trip through the $batch endpoint
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+GRAPH_SCOPES = ["https://graph.microsoft.com/.default"]
+
+# Graph accepts at most 20 requests per $batch call
+MAX_BATCH_REQUESTS = 20
+
+
+class GraphError(Exception):
+    """A Microsoft Graph request failed"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Microsoft Graph API error {status}: {message}")
+        self.status = status
+
+
+class AppTokenProvider:
+    """Caches an app-only Graph token and refreshes it before expiry"""
+
+    def __init__(self, msal_client, refresh_margin_seconds: float = 300, scopes: List[str] = GRAPH_SCOPES):
+        self._msal_client = msal_client
+        self._scopes = scopes
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self.acquisitions = 0
+
+    async def get_token(self) -> str:
+        if self._token and time.monotonic() < self._expires_at - self.refresh_margin_seconds:
+            return self._token
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another caller may have refreshed while we waited
+            if self._token and time.monotonic() < self._expires_at - self.refresh_margin_seconds:
+                return self._token
+
+            # MSAL makes a blocking HTTP call on a cache miss
+            result = await asyncio.to_thread(self._msal_client.acquire_token_for_client, scopes=self._scopes)
+            if "access_token" not in result:
+                raise GraphError(401, result.get("error_description", "Failed to acquire access token"))
+
+            self.acquisitions += 1
+            self._token = result["access_token"]
+            self._expires_at = time.monotonic() + float(result.get("expires_in", 3600))
+            return self._token
+
+    def invalidate(self) -> None:
+        """Force a new token on the next request (e.g. after a 401)"""
+        self._token = None
+
+
+class GraphClient:
+    """Microsoft Graph requests over a pooled HTTP session per event loop"""
+
+    def __init__(
+        self,
+        token_provider: AppTokenProvider,
+        base_url: str = "https://graph.microsoft.com/v1.0",
+        max_connections: int = 20,
+        timeout_seconds: float = 30
+    ):
+        self.token_provider = token_provider
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.timeout_seconds = timeout_seconds
+        # A session's connections belong to the loop that opened them
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        The session for the running event loop
+
+        Sessions of loops that have since closed (asyncio.run in sync
+        callers) are closed here instead of leaking their connectors.
+        """
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = self._sessions[loop] = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds)
+            )
+            for stale_loop in [l for l in list(self._sessions) if l.is_closed()]:
+                stale = self._sessions.pop(stale_loop, None)
+                if stale is not None:
+                    await _close_session(stale)
+        return session
+
+    async def _request(self, method: str, url: str, json_body: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+        if not url.startswith("http"):
+            url = f"{self.base_url}/{url.lstrip('/')}"
+        for attempt in range(2):
+            token = await self.token_provider.get_token()
+            headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+            session = await self._get_session()
+            async with session.request(method, url, headers=headers, json=json_body) as response:
+                if response.status == 200:
+                    return response.status, await response.json()
+                if response.status == 401 and attempt == 0:
+                    # Token revoked or rotated early: fetch a new one and retry once
+                    self.token_provider.invalidate()
+                    continue
+                return response.status, await response.text()
+
+    async def get_all(self, path: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Every item of a collection, following @odata.nextLink
+
+        Returns None when the resource does not exist (404).
+        """
+        items: List[Dict[str, Any]] = []
+        url: Optional[str] = path
+        while url:
+            status, body = await self._request("GET", url)
+            if status == 404:
+                return None
+            if status != 200:
+                raise GraphError(status, str(body))
+            items.extend(body.get("value", []))
+            url = body.get("@odata.nextLink")
+        return items
+
+    async def batch_get_all(self, paths: Dict[str, str]) -> Dict[str, Optional[List[Dict[str, Any]]]]:
+        """
+        get_all for many paths, keyed by caller-chosen IDs
+
+        First pages are fetched 20 at a time through $batch; the rare
+        collections with more pages continue with individual requests.
+        """
+        results: Dict[str, Optional[List[Dict[str, Any]]]] = {}
+        keys = list(paths)
+        for start in range(0, len(keys), MAX_BATCH_REQUESTS):
+            chunk = keys[start:start + MAX_BATCH_REQUESTS]
+            status, body = await self._request("POST", "$batch", {
+                "requests": [
+                    {"id": str(position), "method": "GET", "url": "/" + paths[key].lstrip("/")}
+                    for position, key in enumerate(chunk)
+                ]
+            })
+            if status != 200:
+                raise GraphError(status, str(body))
+
+            for response in body.get("responses", []):
+                key = chunk[int(response["id"])]
+                if response.get("status") == 404:
+                    results[key] = None
+                    continue
+                if response.get("status") != 200:
+                    # Throttled or failed sub-request: fall back to a direct read
+                    results[key] = await self.get_all(paths[key])
+                    continue
+                page = response.get("body") or {}
+                items = list(page.get("value", []))
+                next_link = page.get("@odata.nextLink")
+                if next_link:
+                    items.extend(await self.get_all(next_link) or [])
+                results[key] = items
+        return results
+
+    async def close(self) -> None:
+        """Close every loop's session"""
+        loop = asyncio.get_running_loop()
+        sessions = list(self._sessions.items())
+        self._sessions.clear()
+        for session_loop, session in sessions:
+            if session_loop is not loop and session_loop.is_running():
+                # Still serving another thread; close it there
+                asyncio.run_coroutine_threadsafe(session.close(), session_loop)
+            else:
+                await _close_session(session)
+
+
+async def _close_session(session: aiohttp.ClientSession) -> None:
+    try:
+        await session.close()
+    except Exception as e:
+        logger.warning(f"Error closing Graph session: {e}")
@@ -0,0 +1,569 @@
+"""
+Staged ingestion pipeline for engagement reindexing
+
+Documents flow through four stages joined by bounded queues:
+
+    extract -> chunk -> embed -> upload
+
+Extraction and chunking run in worker threads so they overlap with network
+calls. The embed stage packs chunks from *different* documents into each
+request, up to the embedding batch size and a token budget, so a reindex of
+many small documents makes a few full requests instead of one small request
+per document. Embedding concurrency is adaptive: it grows by one after a
+window of successful requests and halves on HTTP 429, honouring Retry-After.
+Chunks with a cached embedding skip the embed stage entirely. The upload
+stage likewise fills search index batches across documents.
+
+Each document completes once all of its chunks are in the index; completed
+documents are recorded in a per-engagement checkpoint file so an interrupted
+reindex resumes where it stopped instead of starting over.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from ai.llm import retry_after_seconds
+from config import config
+from util.files import extract_text
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("extract", "chunk", "embed", "upload")
+
+# How long a partly filled batch waits for more chunks before it is sent
+BATCH_LINGER_SECONDS = 0.05
+
+# Rough characters per token when a chunk has no token count
+CHARS_PER_TOKEN = 4
+
+_DONE = object()
+
+
+@dataclass
+class StageMetrics:
+    """Work done by one pipeline stage"""
+    items_in: int = 0
+    items_out: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    queue_peak: int = 0  # Deepest the queue feeding this stage got
+
+
+@dataclass
+class EmbeddingRequestMetrics:
+    """Embedding requests made by the embed stage"""
+    requests: int = 0
+    chunks: int = 0
+    tokens: int = 0
+    retries: int = 0
+    throttled: int = 0
+    cache_hits: int = 0
+    cached_tokens: int = 0
+    concurrency_limit: int = 0
+    peak_concurrency: int = 0
+
+
+@dataclass
+class IngestionMetrics:
+    """Per-stage throughput for one pipeline run"""
+    documents: int = 0
+    skipped_from_checkpoint: int = 0
+    stages: Dict[str, StageMetrics] = field(default_factory=lambda: {name: StageMetrics() for name in STAGES})
+    embedding: EmbeddingRequestMetrics = field(default_factory=EmbeddingRequestMetrics)
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = self.elapsed_seconds
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = asdict(stage)
+            stages[name]["busy_seconds"] = round(stage.busy_seconds, 3)
+            stages[name]["throughput_per_second"] = round(stage.items_out / elapsed, 2) if elapsed else 0.0
+        embedding = asdict(self.embedding)
+        requests = self.embedding.requests
+        embedding["avg_chunks_per_request"] = round(self.embedding.chunks / requests, 2) if requests else 0.0
+        embedding["avg_tokens_per_request"] = round(self.embedding.tokens / requests) if requests else 0
+        return {
+            "documents": self.documents,
+            "skipped_from_checkpoint": self.skipped_from_checkpoint,
+            "elapsed_seconds": round(elapsed, 3),
+            "stages": stages,
+            "embedding": embedding
+        }
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on in-flight requests.
+
+    The limit grows by one after `limit` consecutive successes and halves on
+    a throttled response. Requests started before the last decrease cannot
+    decrease it again, so one burst of 429s halves the limit once rather
+    than collapsing it to the minimum. A Retry-After pauses every caller.
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.in_flight = 0
+        self.peak = 0
+        self.throttled = 0
+        self._successes = 0
+        self._epoch = 0
+        self._resume_at = 0.0
+        self._changed = asyncio.Condition()
+
+    async def acquire(self) -> int:
+        """Wait for a slot; returns a token to hand back to release()"""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            epoch = self._epoch
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return epoch
+
+    async def release(self, epoch: int, throttled: bool = False, retry_after: Optional[float] = None) -> None:
+        async with self._changed:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self._successes = 0
+                if epoch == self._epoch:
+                    self.limit = max(self.minimum, self.limit // 2)
+                    self._epoch += 1
+                if retry_after:
+                    self._resume_at = max(self._resume_at, time.monotonic() + retry_after)
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+            self._changed.notify_all()
+
+
+def _is_throttled(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+class IngestionCheckpoint:
+    """Documents already indexed by an unfinished reindex of one engagement"""
+
+    def __init__(self, directory: str, engagement_id: str):
+        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", engagement_id)
+        self.path = Path(directory) / f"{safe_id}.json"
+        self.engagement_id = engagement_id
+        # document id -> content key when indexed; a changed key means re-ingest
+        self.completed: Dict[str, str] = {}
+        self._keys: Dict[str, Optional[str]] = {}
+
+    def load(self) -> bool:
+        """Read an existing checkpoint; False when there is none to resume"""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(
+                "Ignoring unreadable ingestion checkpoint",
+                extra={"path": str(self.path), "error": str(e)}
+            )
+            return False
+        self.completed = dict(data.get("completed", {}))
+        return True
+
+    @staticmethod
+    def content_key(document, text_content: Optional[str] = None) -> Optional[str]:
+        """Size and SHA-256 of the document's text if given, else of its file; None if unreadable"""
+        digest = hashlib.sha256()
+        if text_content is not None:
+            digest.update(text_content.encode("utf-8"))
+        else:
+            try:
+                with open(document.path, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(block)
+            except OSError:
+                return None
+        return f"{document.size}:{digest.hexdigest()}"
+
+    async def is_completed(self, document, text_content: Optional[str] = None) -> bool:
+        """Whether this content of the document was already indexed; notes its key for mark_completed"""
+        key = await asyncio.to_thread(self.content_key, document, text_content)
+        self._keys[document.id] = key
+        return key is not None and self.completed.get(document.id) == key
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({"engagement_id": self.engagement_id, "completed": self.completed}),
+            encoding="utf-8"
+        )
+        os.replace(tmp_path, self.path)
+
+    async def save(self) -> None:
+        await asyncio.to_thread(self._save)
+
+    async def mark_completed(self, document) -> None:
+        if document.id in self._keys:
+            key = self._keys[document.id]
+        else:
+            key = await asyncio.to_thread(self.content_key, document)
+        if key is None:
+            # Content could not be fingerprinted; a rerun ingests it again
+            return
+        self.completed[document.id] = key
+        await self.save()
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+class _DocumentState:
+    """A document moving through the pipeline"""
+
+    def __init__(self, document, text: Optional[str], status):
+        self.document = document
+        self.text = text
+        self.status = status
+        self.uploaded = 0
+
+    @property
+    def failed(self) -> bool:
+        return self.status.status == "failed"
+
+
+class IngestionPipeline:
+    """
+    Runs extract, chunk, embed and upload concurrently over many documents.
+
+    The embeddings service provides chunk_text(), a single-attempt
+    embed_chunks() and its cache lookups; build_search_document turns a document and an embedding
+    result into an index record; upload_batch writes records with retries.
+    """
+
+    def __init__(
+        self,
+        embeddings_service,
+        build_search_document: Callable[[Any, Any], Dict[str, Any]],
+        upload_batch: Callable[[List[Dict[str, Any]], str], Awaitable[None]],
+        engagement_id: str,
+        checkpoint: Optional[IngestionCheckpoint] = None,
+        correlation_id: Optional[str] = None
+    ):
+        self.embeddings_service = embeddings_service
+        self.build_search_document = build_search_document
+        self.upload_batch = upload_batch
+        self.engagement_id = engagement_id
+        self.checkpoint = checkpoint
+        self.correlation_id = correlation_id or "unknown"
+        self.metrics = IngestionMetrics()
+        # Failures a rerun could fix, as opposed to files with no text
+        self.retryable_failures = 0
+        self.limiter = AdaptiveConcurrencyLimiter(
+            config.embeddings.initial_concurrency,
+            config.embeddings.max_concurrency
+        )
+
+    async def run(self, documents: List[Tuple[Any, Optional[str], Any]]) -> None:
+        """
+        Ingest (document, text, status) triples; text None means extract it
+        from the document file. Each status is updated in place.
+        """
+        self.metrics = IngestionMetrics(documents=len(documents))
+        size = config.rag.ingestion_queue_size
+        extract_q: asyncio.Queue = asyncio.Queue(size)
+        chunk_q: asyncio.Queue = asyncio.Queue(size)
+        embed_q: asyncio.Queue = asyncio.Queue(size)
+        upload_q: asyncio.Queue = asyncio.Queue(size)
+
+        async def feed():
+            for document, text, status in documents:
+                await self._put(extract_q, _DocumentState(document, text, status), "extract")
+            await extract_q.put(_DONE)
+
+        tasks = [
+            asyncio.create_task(feed()),
+            asyncio.create_task(self._run_workers(
+                config.rag.ingestion_extract_workers, self._extract, extract_q, chunk_q, "chunk"
+            )),
+            asyncio.create_task(self._run_workers(1, self._chunk, chunk_q, embed_q, "embed")),
+            asyncio.create_task(self._embed_stage(embed_q, upload_q)),
+            asyncio.create_task(self._upload_stage(upload_q))
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.metrics.finished_at = time.perf_counter()
+            self.metrics.embedding.concurrency_limit = self.limiter.limit
+            self.metrics.embedding.peak_concurrency = self.limiter.peak
+            self.metrics.embedding.throttled = self.limiter.throttled
+
+        logger.info(
+            "Ingestion pipeline finished",
+            extra={
+                "correlation_id": self.correlation_id,
+                "engagement_id": self.engagement_id,
+                "metrics": self.metrics.as_dict()
+            }
+        )
+
+    # Queue helpers
+    async def _put(self, queue: asyncio.Queue, item: Any, stage: str) -> None:
+        await queue.put(item)
+        metrics = self.metrics.stages[stage]
+        metrics.queue_peak = max(metrics.queue_peak, queue.qsize())
+
+    @staticmethod
+    async def _get(queue: asyncio.Queue, timeout: Optional[float]) -> Any:
+        """Next item, or None when timeout passes first"""
+        if timeout is None:
+            return await queue.get()
+        try:
+            return await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def _fail(self, state: _DocumentState, stage: str, error: str, retryable: bool = True) -> None:
+        if state.failed:
+            return
+        if retryable:
+            self.retryable_failures += 1
+        state.status.status = "failed"
+        state.status.error = error
+        state.status.completed_at = datetime.now(timezone.utc)
+        self.metrics.stages[stage].errors += 1
+        logger.warning(
+            "Document ingestion failed",
+            extra={
+                "correlation_id": self.correlation_id,
+                "engagement_id": self.engagement_id,
+                "document_id": state.document.id,
+                "stage": stage,
+                "error": error
+            }
+        )
+
+    async def _run_workers(self, count: int, work, in_q: asyncio.Queue, out_q: asyncio.Queue, out_stage: str) -> None:
+        """Run `count` workers over in_q, then pass the end marker on"""
+        async def worker():
+            while True:
+                state = await in_q.get()
+                if state is _DONE:
+                    await in_q.put(_DONE)  # Let the other workers see it
+                    return
+                for item in await work(state):
+                    await self._put(out_q, item, out_stage)
+
+        await asyncio.gather(*[worker() for _ in range(max(1, count))])
+        await out_q.put(_DONE)
+
+    # Stages
+    async def _extract(self, state: _DocumentState) -> List[_DocumentState]:
+        metrics = self.metrics.stages["extract"]
+        metrics.items_in += 1
+        state.status.status = "processing"
+        state.status.started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        try:
+            if state.text is None:
+                path = state.document.path
+                if not path or not os.path.exists(path):
+                    self._fail(state, "extract", "Document file not found", retryable=False)
+                    return []
+                result = await asyncio.to_thread(extract_text, path, state.document.content_type)
+                state.text = result.text
+            if not state.text:
+                self._fail(state, "extract", "No extractable text", retryable=False)
+                return []
+            state.text = state.text[:config.rag.max_document_length]
+        except Exception as e:
+            self._fail(state, "extract", str(e))
+            return []
+        finally:
+            metrics.busy_seconds += time.perf_counter() - start
+        metrics.items_out += 1
+        return [state]
+
+    async def _chunk(self, state: _DocumentState) -> List[Tuple[_DocumentState, Any, Any]]:
+        """Chunk a document and attach any cached embeddings"""
+        metrics = self.metrics.stages["chunk"]
+        metrics.items_in += 1
+        start = time.perf_counter()
+        try:
+            chunks = await asyncio.to_thread(self.embeddings_service.chunk_text, state.text, state.document.id)
+            state.text = None  # Chunks carry the text from here on
+            if not chunks:
+                self._fail(state, "chunk", "No valid chunks generated from document", retryable=False)
+                return []
+            cached = await self.embeddings_service.get_cached(chunks, state.document.id)
+        except Exception as e:
+            self._fail(state, "chunk", str(e))
+            return []
+        finally:
+            metrics.busy_seconds += time.perf_counter() - start
+        hits = [result for result in cached if result is not None]
+        self.metrics.embedding.cache_hits += len(hits)
+        self.metrics.embedding.cached_tokens += sum(result.usage_tokens for result in hits)
+        state.status.total_chunks = len(chunks)
+        metrics.items_out += len(chunks)
+        return [(state, chunk, result) for chunk, result in zip(chunks, cached)]
+
+    async def _embed_stage(self, in_q: asyncio.Queue, out_q: asyncio.Queue) -> None:
+        """Pack chunks across documents into requests and embed them concurrently"""
+        metrics = self.metrics.stages["embed"]
+        max_chunks = max(1, config.embeddings.batch_size)
+        max_tokens = config.embeddings.max_batch_tokens
+        # Bounds batches waiting for a limiter slot, so the queue applies backpressure
+        dispatch_slots = asyncio.Semaphore(self.limiter.maximum)
+        running: Set[asyncio.Task] = set()
+        batch: List[Tuple[_DocumentState, Any]] = []
+        batch_tokens = 0
+
+        async def dispatch():
+            nonlocal batch, batch_tokens
+            batch = [item for item in batch if not item[0].failed]
+            if batch:
+                await dispatch_slots.acquire()
+                task = asyncio.create_task(self._embed_batch(batch, out_q))
+                task.add_done_callback(lambda _: dispatch_slots.release())
+                running.add(task)
+                task.add_done_callback(running.discard)
+            batch, batch_tokens = [], 0
+
+        while True:
+            item = await self._get(in_q, BATCH_LINGER_SECONDS if batch else None)
+            if item is None:
+                await dispatch()
+                continue
+            if item is _DONE:
+                await dispatch()
+                break
+            metrics.items_in += 1
+            state, chunk, cached = item
+            if cached is not None:
+                metrics.items_out += 1
+                await self._put(out_q, (state, cached), "upload")
+                continue
+            tokens = chunk.token_count or len(chunk.text) // CHARS_PER_TOKEN
+            if batch and batch_tokens + tokens > max_tokens:
+                await dispatch()
+            batch.append((state, chunk))
+            batch_tokens += tokens
+            if len(batch) >= max_chunks:
+                await dispatch()
+
+        await asyncio.gather(*running)
+        await out_q.put(_DONE)
+
+    async def _embed_batch(self, batch: List[Tuple[_DocumentState, Any]], out_q: asyncio.Queue) -> None:
+        metrics = self.metrics.stages["embed"]
+        requests = self.metrics.embedding
+        chunks = [chunk for _, chunk in batch]
+        max_retries = config.embeddings.max_retries
+
+        for attempt in range(max_retries + 1):
+            epoch = await self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                results = await self.embeddings_service.embed_chunks(chunks)
+            except Exception as e:
+                metrics.busy_seconds += time.perf_counter() - start
+                throttled = _is_throttled(e)
+                retry_after = retry_after_seconds(e) if throttled else None
+                await self.limiter.release(epoch, throttled, retry_after)
+                if attempt >= max_retries:
+                    for state in {id(state): state for state, _ in batch}.values():
+                        self._fail(state, "embed", f"Embedding failed: {e}")
+                    return
+                requests.retries += 1
+                if retry_after is None:
+                    await asyncio.sleep(config.embeddings.retry_delay * (2 ** attempt))
+                continue
+            metrics.busy_seconds += time.perf_counter() - start
+            await self.limiter.release(epoch)
+            break
+
+        await self.embeddings_service.store_cached(results)
+        requests.requests += 1
+        requests.chunks += len(results)
+        requests.tokens += sum(result.usage_tokens for result in results)
+        metrics.items_out += len(results)
+        for (state, _), result in zip(batch, results):
+            await self._put(out_q, (state, result), "upload")
+
+    async def _upload_stage(self, in_q: asyncio.Queue) -> None:
+        """Fill index batches across documents and mark documents complete"""
+        metrics = self.metrics.stages["upload"]
+        batch_size = max(1, config.rag.ingestion_upload_batch_size)
+        pending: List[Tuple[_DocumentState, Dict[str, Any]]] = []
+
+        async def flush():
+            nonlocal pending
+            batch = [(state, record) for state, record in pending if not state.failed]
+            pending = []
+            if not batch:
+                return
+            start = time.perf_counter()
+            try:
+                await self.upload_batch([record for _, record in batch], self.engagement_id)
+            except Exception as e:
+                for state, _ in batch:
+                    self._fail(state, "upload", f"Upload failed: {e}")
+                return
+            finally:
+                metrics.busy_seconds += time.perf_counter() - start
+            metrics.items_out += len(batch)
+            for state, _ in batch:
+                state.uploaded += 1
+                state.status.chunks_processed = state.uploaded
+                if state.uploaded == state.status.total_chunks and not state.failed:
+                    await self._complete(state)
+
+        while True:
+            item = await self._get(in_q, BATCH_LINGER_SECONDS if pending else None)
+            if item is None:
+                await flush()
+                continue
+            if item is _DONE:
+                await flush()
+                return
+            metrics.items_in += 1
+            state, result = item
+            if state.failed:
+                continue
+            pending.append((state, self.build_search_document(state.document, result)))
+            if len(pending) >= batch_size:
+                await flush()
+
+    async def _complete(self, state: _DocumentState) -> None:
+        state.status.status = "completed"
+        state.status.completed_at = datetime.now(timezone.utc)
+        if self.checkpoint is not None:
+            try:
+                await self.checkpoint.mark_completed(state.document)
+            except OSError as e:
+                logger.warning(
+                    "Failed to update ingestion checkpoint",
+                    extra={"correlation_id": self.correlation_id, "error": str(e)}
+                )
@@ -0,0 +1,201 @@
+"""
+Persisted priority queue for background jobs
+
+Jobs waiting to run (or running) live in a WAL-mode SQLite table shared by
+every worker process on the host. Workers claim the highest-priority
+available job under a time-limited lease; a worker that dies simply stops
+renewing its lease and the job becomes claimable again. Per-job-type
+concurrency limits are enforced inside the claim transaction, so they hold
+across all workers rather than per process.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from api.schemas.gdpr import BackgroundJob
+from util.sqlite import ProcessConnection
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ClaimedJob:
+    """A job leased to one worker"""
+    job: BackgroundJob
+    priority: int
+    enqueued_at: float
+    claimed_at: float
+
+    @property
+    def wait_seconds(self) -> float:
+        """Time the job spent queued before this claim"""
+        return max(0.0, self.claimed_at - self.enqueued_at)
+
+
+class SQLiteJobQueue:
+    """Priority queue of background jobs with lease-based claiming"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = ProcessConnection(self.path)
+
+        with self._db.connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS job_queue (
+                    job_id TEXT PRIMARY KEY,
+                    job_type TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    body TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    available_at REAL NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_job_queue_ready
+                    ON job_queue (priority DESC, available_at, enqueued_at);
+            """)
+
+    def enqueue(self, job: BackgroundJob, priority: int = 0, delay_seconds: float = 0) -> bool:
+        """
+        Queue a job; returns False if it is already queued
+
+        Re-enqueueing a queued job keeps its place so a duplicate request
+        cannot jump the queue or reset a running job's lease.
+        """
+        now = time.time()
+        with self._db.connection() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO job_queue "
+                "(job_id, job_type, priority, body, enqueued_at, available_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, job.job_type, priority, job.model_dump_json(), now, now + max(0.0, delay_seconds))
+            )
+        return cursor.rowcount > 0
+
+    def claim(
+        self,
+        owner: str,
+        lease_seconds: float,
+        concurrency_limits: Dict[str, int],
+        default_limit: int,
+        max_count: int = 1
+    ) -> List[ClaimedJob]:
+        """
+        Lease up to max_count available jobs, highest priority first
+
+        A job type already running at its limit (counting unexpired leases
+        held by any worker) is skipped, so lower-priority jobs of other
+        types can still run.
+        """
+        now = time.time()
+        claimed: List[ClaimedJob] = []
+        with self._db.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                running = dict(conn.execute(
+                    "SELECT job_type, COUNT(*) FROM job_queue WHERE lease_expires_at > ? GROUP BY job_type",
+                    (now,)
+                ).fetchall())
+                rows = conn.execute(
+                    "SELECT job_id, job_type, priority, body, enqueued_at FROM job_queue "
+                    "WHERE available_at <= ? AND (lease_expires_at IS NULL OR lease_expires_at <= ?) "
+                    "ORDER BY priority DESC, available_at, enqueued_at",
+                    (now, now)
+                )
+                for job_id, job_type, priority, body, enqueued_at in rows:
+                    if len(claimed) >= max_count:
+                        break
+                    if running.get(job_type, 0) >= concurrency_limits.get(job_type, default_limit):
+                        continue
+                    running[job_type] = running.get(job_type, 0) + 1
+                    claimed.append(ClaimedJob(
+                        job=BackgroundJob.model_validate_json(body),
+                        priority=priority,
+                        enqueued_at=enqueued_at,
+                        claimed_at=now
+                    ))
+                conn.executemany(
+                    "UPDATE job_queue SET lease_owner = ?, lease_expires_at = ? WHERE job_id = ?",
+                    [(owner, now + lease_seconds, item.job.id) for item in claimed]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def renew_lease(self, job_id: str, owner: str, lease_seconds: float, job: Optional[BackgroundJob] = None) -> bool:
+        """Extend a lease (optionally saving the job's progress); False if the lease was lost"""
+        now = time.time()
+        with self._db.connection() as conn:
+            if job is None:
+                cursor = conn.execute(
+                    "UPDATE job_queue SET lease_expires_at = ? "
+                    "WHERE job_id = ? AND lease_owner = ? AND lease_expires_at > ?",
+                    (now + lease_seconds, job_id, owner, now)
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE job_queue SET lease_expires_at = ?, body = ? "
+                    "WHERE job_id = ? AND lease_owner = ? AND lease_expires_at > ?",
+                    (now + lease_seconds, job.model_dump_json(), job_id, owner, now)
+                )
+        return cursor.rowcount > 0
+
+    def complete(self, job_id: str, owner: str) -> bool:
+        """Remove a finished job from the queue"""
+        with self._db.connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM job_queue WHERE job_id = ? AND lease_owner = ?", (job_id, owner)
+            )
+        return cursor.rowcount > 0
+
+    def release(self, job: BackgroundJob, owner: str, delay_seconds: float = 0) -> bool:
+        """Return a leased job to the queue (e.g. for a retry) with its updated state"""
+        now = time.time()
+        with self._db.connection() as conn:
+            cursor = conn.execute(
+                "UPDATE job_queue SET body = ?, available_at = ?, lease_owner = NULL, lease_expires_at = NULL "
+                "WHERE job_id = ? AND lease_owner = ?",
+                (job.model_dump_json(), now + max(0.0, delay_seconds), job.id, owner)
+            )
+        return cursor.rowcount > 0
+
+    def get(self, job_id: str) -> Optional[BackgroundJob]:
+        """Latest saved state of a queued or running job"""
+        with self._db.connection() as conn:
+            row = conn.execute("SELECT body FROM job_queue WHERE job_id = ?", (job_id,)).fetchone()
+        return BackgroundJob.model_validate_json(row[0]) if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth by job type and age of the oldest waiting job"""
+        now = time.time()
+        with self._db.connection() as conn:
+            rows = conn.execute(
+                "SELECT job_type, "
+                "SUM(lease_expires_at IS NULL OR lease_expires_at <= ?), "
+                "SUM(lease_expires_at > ?), "
+                "MIN(CASE WHEN (lease_expires_at IS NULL OR lease_expires_at <= ?) AND available_at <= ? "
+                "THEN available_at END) "
+                "FROM job_queue GROUP BY job_type",
+                (now, now, now, now)
+            ).fetchall()
+
+        by_type = {}
+        oldest = None
+        for job_type, queued, leased, oldest_available in rows:
+            by_type[job_type] = {"queued": queued or 0, "running": leased or 0}
+            if oldest_available is not None:
+                oldest = oldest_available if oldest is None else min(oldest, oldest_available)
+        return {
+            "queued": sum(item["queued"] for item in by_type.values()),
+            "running": sum(item["running"] for item in by_type.values()),
+            "by_type": by_type,
+            "oldest_wait_seconds": round(now - oldest, 3) if oldest is not None else 0.0
+        }
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,653 @@
+"""
+Local queue backends for the Service Bus fallback
+
+The Azure Service Bus path falls back to a local queue, so the local queue
+has to behave like Service Bus: peek-lock delivery with lock renewal,
+at-least-once redelivery when a lock expires, scheduled (delayed) messages
+and a dead-letter queue.
+
+- InMemoryQueue: per-process deques for development and tests.
+- SQLiteQueue: WAL-mode SQLite database shared by every worker process on
+  the host. Messages survive restarts, locks are visibility timeouts, acks
+  are group-committed in batches and dead letters are pruned after a
+  retention period.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from domain.models import ServiceBusMessage
+from util.sqlite import ProcessConnection
+
+logger = logging.getLogger(__name__)
+
+LOCAL_QUEUE_MEMORY = "memory"
+LOCAL_QUEUE_SQLITE = "sqlite"
+
+# Lock duration for received messages (Service Bus default is 60s)
+DEFAULT_LOCK_DURATION_SECONDS = 60.0
+
+# Deliveries after which a message whose lock keeps expiring is dead-lettered
+# (Service Bus MaxDeliveryCount default)
+MAX_DELIVERY_COUNT = 10
+
+# Bound on the in-memory dead-letter queue per topic
+DEFAULT_DLQ_MAX_MESSAGES = 10000
+
+
+class ThroughputMeter:
+    """Event count over a sliding window of one-second buckets"""
+
+    def __init__(self, window_seconds: int = 60):
+        self.window_seconds = window_seconds
+        self.total = 0
+        self._buckets: deque = deque()
+
+    def record(self, count: int = 1) -> None:
+        if count <= 0:
+            return
+        now = int(time.monotonic())
+        self.total += count
+        if self._buckets and self._buckets[-1][0] == now:
+            self._buckets[-1][1] += count
+        else:
+            self._buckets.append([now, count])
+        self._trim(now)
+
+    def _trim(self, now: int) -> None:
+        while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+            self._buckets.popleft()
+
+    def rate(self) -> float:
+        """Events per second over the window"""
+        self._trim(int(time.monotonic()))
+        return sum(count for _, count in self._buckets) / self.window_seconds
+
+
+class LocalQueue(ABC):
+    """
+    Interface for local queue backends
+
+    receive_messages locks messages for lock_duration_seconds; a received
+    message must be settled with complete_message, requeue_message or
+    dead_letter_message, or it becomes visible again when its lock expires.
+    """
+
+    mode: str = ""
+
+    def __init__(self):
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._throughput: Dict[str, Dict[str, ThroughputMeter]] = {}
+
+    # Throughput metrics
+    def _record(self, topic: str, event: str, count: int = 1) -> None:
+        meters = self._throughput.setdefault(topic, {})
+        meters.setdefault(event, ThroughputMeter()).record(count)
+
+    def get_throughput(self, topic: str) -> Dict[str, Any]:
+        """Totals and per-second rates over the last minute for a topic"""
+        stats: Dict[str, Any] = {}
+        for event in ("sent", "received", "completed", "dead_lettered"):
+            meter = self._throughput.get(topic, {}).get(event)
+            stats[event] = meter.total if meter else 0
+            stats[f"{event}_per_second"] = round(meter.rate(), 3) if meter else 0.0
+        return stats
+
+    # Wake-on-enqueue
+    def notify(self, topic: str) -> None:
+        """Wake consumers in this process waiting on topic"""
+        for waiter in self._waiters.pop(topic, []):
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(self._resolve_waiter, waiter)
+
+    @staticmethod
+    def _resolve_waiter(waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def _has_ready_messages(self, topic: str) -> bool:
+        """Cheap in-process check used before waiting"""
+        return False
+
+    def _max_wait_seconds(self, timeout: Optional[float]) -> Optional[float]:
+        return timeout
+
+    async def wait_for_messages(self, topic: str, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until topic may have a message or notify() is called
+
+        Returns:
+            True if woken before the timeout
+        """
+        if self._has_ready_messages(topic):
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(topic, []).append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self._max_wait_seconds(timeout))
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            waiters = self._waiters.get(topic)
+            if waiters and waiter in waiters:
+                waiters.remove(waiter)
+
+    @abstractmethod
+    async def send_message(self, topic: str, message: ServiceBusMessage, delay_seconds: float = 0) -> bool:
+        """Send message to queue, optionally visible only after delay_seconds"""
+
+    @abstractmethod
+    async def receive_messages(
+        self,
+        topic: str,
+        max_count: int = 10,
+        lock_duration_seconds: float = DEFAULT_LOCK_DURATION_SECONDS
+    ) -> List[ServiceBusMessage]:
+        """Receive and lock up to max_count visible messages"""
+
+    @abstractmethod
+    async def complete_message(self, topic: str, message: ServiceBusMessage) -> bool:
+        """Settle a received message; False if its lock was already lost"""
+
+    @abstractmethod
+    async def renew_message_lock(
+        self,
+        topic: str,
+        message: ServiceBusMessage,
+        lock_duration_seconds: float = DEFAULT_LOCK_DURATION_SECONDS
+    ) -> bool:
+        """Extend the lock on a received message; False if it was already lost"""
+
+    @abstractmethod
+    async def requeue_message(self, topic: str, message: ServiceBusMessage, delay_seconds: float = 0) -> None:
+        """Atomically release a received message for redelivery with its updated state"""
+
+    @abstractmethod
+    async def dead_letter_message(self, topic: str, message: ServiceBusMessage, reason: str):
+        """Move message (settling its lock, if held) to the dead letter queue"""
+
+    @abstractmethod
+    def get_queue_stats(self, topic: str) -> Dict[str, int]:
+        """Get queue statistics"""
+
+    def close(self) -> None:
+        """Release backend resources"""
+
+
+class InMemoryQueue(LocalQueue):
+    """
+    Thread-safe in-memory queue implementation
+
+    Mirrors Service Bus peek-lock delivery: received messages stay locked
+    until completed, and are redelivered if their lock expires first.
+    """
+
+    mode = "in_memory"
+
+    def __init__(self, dlq_max_messages: int = DEFAULT_DLQ_MAX_MESSAGES):
+        super().__init__()
+        self._queues: Dict[str, deque] = {}
+        self._dlq: Dict[str, deque] = {}
+        self._dlq_max_messages = dlq_max_messages
+        # topic -> message id -> (message, lock expiry on the monotonic clock)
+        self._locked: Dict[str, Dict[str, tuple]] = {}
+        self._scheduled: Dict[str, int] = {}
+
+    async def send_message(self, topic: str, message: ServiceBusMessage, delay_seconds: float = 0) -> bool:
+        """Send message to queue, optionally visible only after delay_seconds"""
+        self._record(topic, "sent")
+        if delay_seconds > 0:
+            self._scheduled[topic] = self._scheduled.get(topic, 0) + 1
+            asyncio.get_running_loop().call_later(delay_seconds, self._enqueue_scheduled, topic, message)
+            return True
+        self._enqueue(topic, message)
+        return True
+
+    def _enqueue(self, topic: str, message: ServiceBusMessage) -> None:
+        if topic not in self._queues:
+            self._queues[topic] = deque()
+        self._queues[topic].append(message)
+        self.notify(topic)
+
+    def _enqueue_scheduled(self, topic: str, message: ServiceBusMessage) -> None:
+        self._scheduled[topic] -= 1
+        self._enqueue(topic, message)
+
+    def _has_ready_messages(self, topic: str) -> bool:
+        return bool(self._queues.get(topic))
+
+    async def receive_messages(
+        self,
+        topic: str,
+        max_count: int = 10,
+        lock_duration_seconds: float = DEFAULT_LOCK_DURATION_SECONDS
+    ) -> List[ServiceBusMessage]:
+        """Receive and lock messages from queue"""
+        self._release_expired_locks(topic)
+        if topic not in self._queues:
+            return []
+
+        locked = self._locked.setdefault(topic, {})
+        locked_until = time.monotonic() + lock_duration_seconds
+        messages = []
+        for _ in range(min(max_count, len(self._queues[topic]))):
+            if self._queues[topic]:
+                message = self._queues[topic].popleft()
+                locked[message.id] = (message, locked_until)
+                messages.append(message)
+        self._record(topic, "received", len(messages))
+        return messages
+
+    async def complete_message(self, topic: str, message: ServiceBusMessage) -> bool:
+        """Settle a received message; False if its lock was already lost"""
+        completed = self._locked.get(topic, {}).pop(message.id, None) is not None
+        if completed:
+            self._record(topic, "completed")
+        return completed
+
+    async def renew_message_lock(
+        self,
+        topic: str,
+        message: ServiceBusMessage,
+        lock_duration_seconds: float = DEFAULT_LOCK_DURATION_SECONDS
+    ) -> bool:
+        """Extend the lock on a received message; False if it was already lost"""
+        locked = self._locked.get(topic, {})
+        if message.id not in locked:
+            return False
+        locked[message.id] = (message, time.monotonic() + lock_duration_seconds)
+        return True
+
+    async def requeue_message(self, topic: str, message: ServiceBusMessage, delay_seconds: float = 0) -> None:
+        """Release a received message for redelivery after delay_seconds"""
+        self._locked.get(topic, {}).pop(message.id, None)
+        await self.send_message(topic, message, delay_seconds=delay_seconds)
+
+    def _release_expired_locks(self, topic: str) -> None:
+        """Return messages whose lock expired to the front of the queue"""
+        locked = self._locked.get(topic)
+        if not locked:
+            return
+        now = time.monotonic()
+        expired = [message_id for message_id, (_, until) in locked.items() if until <= now]
+        for message_id in reversed(expired):
+            message, _ = locked.pop(message_id)
+            self._queues.setdefault(topic, deque()).appendleft(message)
+
+    async def dead_letter_message(self, topic: str, message: ServiceBusMessage, reason: str):
+        """Move message to dead letter queue"""
+        self._locked.get(topic, {}).pop(message.id, None)
+        dlq_topic = f"{topic}-dlq"
+        if dlq_topic not in self._dlq:
+            self._dlq[dlq_topic] = deque(maxlen=self._dlq_max_messages)
+
+        message.is_dead_lettered = True
+        message.dead_letter_reason = reason
+        self._dlq[dlq_topic].append(message)
+        self._record(topic, "dead_lettered")
+
+    def get_queue_stats(self, topic: str) -> Dict[str, int]:
+        """Get queue statistics"""
+        return {
+            "active_messages": len(self._queues.get(topic, [])),
+            "locked_messages": len(self._locked.get(topic, {})),
+            "scheduled_messages": self._scheduled.get(topic, 0),
+            "dead_letter_messages": len(self._dlq.get(f"{topic}-dlq", []))
+        }
+
+
+class SQLiteQueue(LocalQueue):
+    """
+    Durable queue in a WAL-mode SQLite database
+
+    A message row is visible when visible_at has passed; receiving sets
+    visible_at to the lock expiry and stamps a lock token, so a consumer
+    that dies mid-message releases it simply by not renewing. Other worker
+    processes cannot notify this one, so idle waits are capped at
+    poll_interval_seconds.
+    """
+
+    mode = LOCAL_QUEUE_SQLITE
+
+    def __init__(
+        self,
+        path: str,
+        dlq_retention_seconds: float = 7 * 24 * 3600,
+        poll_interval_seconds: float = 0.5,
+        prune_interval_seconds: float = 300
+    ):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.dlq_retention_seconds = dlq_retention_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.prune_interval_seconds = prune_interval_seconds
+        self._db = ProcessConnection(self.path, on_open=self._forget_held)
+        self._last_prune = time.time()
+        # (topic, message id) -> (row seq, lock token) for messages this process holds
+        self._held: Dict[Tuple[str, str], Tuple[int, str]] = {}
+        self._pending_acks: List[Tuple[str, ServiceBusMessage, asyncio.Future]] = []
+        self._ack_flush: Optional[asyncio.Task] = None
+
+        with self._db.connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS queue_messages (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    topic TEXT NOT NULL,
+                    message_id TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    visible_at REAL NOT NULL,
+                    lock_token TEXT,
+                    delivery_count INTEGER NOT NULL DEFAULT 0,
+                    enqueued_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_queue_messages_visible
+                    ON queue_messages (topic, visible_at);
+                CREATE TABLE IF NOT EXISTS queue_dead_letters (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    topic TEXT NOT NULL,
+                    message_id TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    reason TEXT,
+                    dead_lettered_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_queue_dead_letters_topic
+                    ON queue_dead_letters (topic, dead_lettered_at);
+            """)
+
+    def _forget_held(self) -> None:
+        # Messages held through the parent's connection are not this process's to settle
+        self._held = {}
+
+    def _max_wait_seconds(self, timeout: Optional[float]) -> Optional[float]:
+        if timeout is None:
+            return self.poll_interval_seconds
+        return min(timeout, self.poll_interval_seconds)
+
+    # Send
+    def _insert(self, topic: str, message: ServiceBusMessage, delay_seconds: float) -> None:
+        now = time.time()
+        with self._db.connection() as conn:
+            conn.execute(
+                "INSERT INTO queue_messages (topic, message_id, body, visible_at, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (topic, message.id, message.model_dump_json(), now + max(0.0, delay_seconds), now)
+            )
+
+    async def send_message(self, topic: str, message: ServiceBusMessage, delay_seconds: float = 0) -> bool:
+        await asyncio.to_thread(self._insert, topic, message, delay_seconds)
+        self._record(topic, "sent")
+        if delay_seconds <= 0:
+            self.notify(topic)
+        return True
+
+    # Receive
+    def _receive(
+        self, topic: str, max_count: int, lock_duration_seconds: float
+    ) -> Tuple[List[Tuple[int, str, str]], List[Tuple[str, str]]]:
+        now = time.time()
+        lock_token = uuid.uuid4().hex
+        with self._db.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT seq, message_id, body, delivery_count FROM queue_messages "
+                    "WHERE topic = ? AND visible_at <= ? ORDER BY visible_at, seq LIMIT ?",
+                    (topic, now, max_count)
+                ).fetchall()
+
+                # Messages whose locks kept expiring are poison: dead-letter them
+                poisoned = [row for row in rows if row[3] >= MAX_DELIVERY_COUNT]
+                deliverable = [row for row in rows if row[3] < MAX_DELIVERY_COUNT]
+                if poisoned:
+                    conn.executemany(
+                        "INSERT INTO queue_dead_letters (topic, message_id, body, reason, dead_lettered_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [(topic, message_id, body, "MaxDeliveryCountExceeded", now)
+                         for _, message_id, body, _ in poisoned]
+                    )
+                    conn.executemany(
+                        "DELETE FROM queue_messages WHERE seq = ?", [(row[0],) for row in poisoned]
+                    )
+                conn.executemany(
+                    "UPDATE queue_messages SET visible_at = ?, lock_token = ?, "
+                    "delivery_count = delivery_count + 1 WHERE seq = ?",
+                    [(now + lock_duration_seconds, lock_token, row[0]) for row in deliverable]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        received = [(seq, lock_token, body) for seq, _, body, _ in deliverable]
+        return received, [(message_id, body) for _, message_id, body, _ in poisoned]
+
+    async def receive_messages(
+        self,
+        topic: str,
+        max_count: int = 10,
+        lock_duration_seconds: float = DEFAULT_LOCK_DURATION_SECONDS
+    ) -> List[ServiceBusMessage]:
+        """Receive and lock a batch of visible messages in one transaction"""
+        if time.time() - self._last_prune >= self.prune_interval_seconds:
+            await asyncio.to_thread(self._prune)
+
+        received, poisoned = await asyncio.to_thread(self._receive, topic, max_count, lock_duration_seconds)
+        if poisoned:
+            self._record(topic, "dead_lettered", len(poisoned))
+            logger.warning(
+                f"Dead-lettered {len(poisoned)} message(s) that exceeded the max delivery count",
+                extra={"topic": topic, "message_ids": [message_id for message_id, _ in poisoned]}
+            )
+
+        messages = []
+        for seq, lock_token, body in received:
+            try:
+                message = ServiceBusMessage.model_validate_json(body)
+            except Exception as e:
+                logger.error(
+                    "Dead-lettering unreadable queue message",
+                    extra={"topic": topic, "seq": seq, "error": str(e)}
+                )
+                await asyncio.to_thread(self._dead_letter_row, topic, seq, lock_token, body, "UnreadableMessage")
+                continue
+            self._held[(topic, message.id)] = (seq, lock_token)
+            messages.append(message)
+        self._record(topic, "received", len(messages))
+        return messages
+
+    # Settle
+    def _complete_batch(self, handles: List[Optional[Tuple[int, str]]]) -> List[bool]:
+        results = []
+        with self._db.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for handle in handles:
+                    if handle is None:
+                        results.append(False)
+                        continue
+                    cursor = conn.execute(
+                        "DELETE FROM queue_messages WHERE seq = ? AND lock_token = ?", handle
+                    )
+                    results.append(cursor.rowcount > 0)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return results
+
+    async def complete_message(self, topic: str, message: ServiceBusMessage) -> bool:
+        """
+        Settle a received message
+
+        Acks issued while a batch is being committed are coalesced into the
+        next transaction, so concurrent handlers share commits.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        self._pending_acks.append((topic, message, waiter))
+        if self._ack_flush is None or self._ack_flush.done():
+            self._ack_flush = asyncio.create_task(self._flush_acks())
+        return await waiter
+
+    async def _flush_acks(self) -> None:
+        while self._pending_acks:
+            batch, self._pending_acks = self._pending_acks, []
+            handles = [self._held.pop((topic, message.id), None) for topic, message, _ in batch]
+            try:
+                results = await asyncio.to_thread(self._complete_batch, handles)
+            except Exception as e:
+                for _, _, waiter in batch:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                continue
+            for (topic, _, waiter), completed in zip(batch, results):
+                if completed:
+                    self._record(topic, "completed")
+                if not waiter.done():
+                    waiter.set_result(completed)
+
+    def _renew(self, handle: Tuple[int, str], lock_duration_seconds: float) -> bool:
+        with self._db.connection() as conn:
+            cursor = conn.execute(
+                "UPDATE queue_messages SET visible_at = ? WHERE seq = ? AND lock_token = ?",
+                (time.time() + lock_duration_seconds, *handle)
+            )
+        return cursor.rowcount > 0
+
+    async def renew_message_lock(
+        self,
+        topic: str,
+        message: ServiceBusMessage,
+        lock_duration_seconds: float = DEFAULT_LOCK_DURATION_SECONDS
+    ) -> bool:
+        handle = self._held.get((topic, message.id))
+        if handle is None:
+            return False
+        return await asyncio.to_thread(self._renew, handle, lock_duration_seconds)
+
+    def _requeue(self, handle: Tuple[int, str], message: ServiceBusMessage, delay_seconds: float) -> bool:
+        with self._db.connection() as conn:
+            cursor = conn.execute(
+                "UPDATE queue_messages SET body = ?, visible_at = ?, lock_token = NULL, delivery_count = 0 "
+                "WHERE seq = ? AND lock_token = ?",
+                (message.model_dump_json(), time.time() + max(0.0, delay_seconds), *handle)
+            )
+        return cursor.rowcount > 0
+
+    async def requeue_message(self, topic: str, message: ServiceBusMessage, delay_seconds: float = 0) -> None:
+        """Release a received message for redelivery, updating its stored state in place"""
+        handle = self._held.pop((topic, message.id), None)
+        if handle is None or not await asyncio.to_thread(self._requeue, handle, message, delay_seconds):
+            # Lock already lost: the stored copy will be redelivered as it was
+            logger.warning(
+                "Message lock lost before requeue",
+                extra={"topic": topic, "message_id": message.id}
+            )
+            return
+        if delay_seconds <= 0:
+            self.notify(topic)
+
+    def _dead_letter_row(self, topic: str, seq: Optional[int], lock_token: Optional[str], body: str, reason: str) -> None:
+        with self._db.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if seq is not None:
+                    conn.execute(
+                        "DELETE FROM queue_messages WHERE seq = ? AND lock_token = ?", (seq, lock_token)
+                    )
+                conn.execute(
+                    "INSERT INTO queue_dead_letters (topic, message_id, body, reason, dead_lettered_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (topic, _message_id(body), body, reason, time.time())
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def dead_letter_message(self, topic: str, message: ServiceBusMessage, reason: str):
+        """Move message to the dead letter table, settling its lock in the same transaction"""
+        message.is_dead_lettered = True
+        message.dead_letter_reason = reason
+        seq, lock_token = self._held.pop((topic, message.id), (None, None))
+        await asyncio.to_thread(self._dead_letter_row, topic, seq, lock_token, message.model_dump_json(), reason)
+        self._record(topic, "dead_lettered")
+
+    def get_dead_letters(self, topic: str, limit: int = 100) -> List[ServiceBusMessage]:
+        """Most recent dead-lettered messages for a topic"""
+        with self._db.connection() as conn:
+            rows = conn.execute(
+                "SELECT body FROM queue_dead_letters WHERE topic = ? ORDER BY seq DESC LIMIT ?",
+                (topic, limit)
+            ).fetchall()
+        return [ServiceBusMessage.model_validate_json(row[0]) for row in rows]
+
+    def get_queue_stats(self, topic: str) -> Dict[str, int]:
+        now = time.time()
+        with self._db.connection() as conn:
+            active, locked, scheduled = conn.execute(
+                "SELECT "
+                "COALESCE(SUM(visible_at <= ?), 0), "
+                "COALESCE(SUM(visible_at > ? AND lock_token IS NOT NULL), 0), "
+                "COALESCE(SUM(visible_at > ? AND lock_token IS NULL), 0) "
+                "FROM queue_messages WHERE topic = ?",
+                (now, now, now, topic)
+            ).fetchone()
+            dead_letters = conn.execute(
+                "SELECT COUNT(*) FROM queue_dead_letters WHERE topic = ?", (topic,)
+            ).fetchone()[0]
+        return {
+            "active_messages": active,
+            "locked_messages": locked,
+            "scheduled_messages": scheduled,
+            "dead_letter_messages": dead_letters
+        }
+
+    def _prune(self) -> None:
+        """Drop dead letters past retention"""
+        self._last_prune = time.time()
+        with self._db.connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM queue_dead_letters WHERE dead_lettered_at < ?",
+                (self._last_prune - self.dlq_retention_seconds,)
+            )
+        if cursor.rowcount:
+            logger.info(
+                f"Pruned {cursor.rowcount} dead-lettered message(s) past retention",
+                extra={"path": str(self.path)}
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def _message_id(body: str) -> str:
+    try:
+        return ServiceBusMessage.model_validate_json(body).id
+    except Exception:
+        return ""
+
+
+def create_local_queue(
+    backend: str,
+    path: str,
+    dlq_retention_seconds: float = 7 * 24 * 3600,
+    poll_interval_seconds: float = 0.5
+) -> LocalQueue:
+    """Create the configured local queue backend"""
+    if backend == LOCAL_QUEUE_MEMORY:
+        return InMemoryQueue()
+    if backend == LOCAL_QUEUE_SQLITE:
+        return SQLiteQueue(
+            path,
+            dlq_retention_seconds=dlq_retention_seconds,
+            poll_interval_seconds=poll_interval_seconds
+        )
+    raise ValueError(f"Unknown local queue backend: {backend}")
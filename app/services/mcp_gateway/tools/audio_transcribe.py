@@ -291,7 +291,7 @@ class AudioTranscriptionTool:
                     logger.debug(f"Failed to clean up temp file {path}: {cleanup_error}")
             raise ValueError(f"Transcription failed: {str(e)}")
     
-    def _chunk_audio(self, audio: AudioSegment) -> List[AudioSegment]:
+    def _chunk_audio(self, audio: "AudioSegment") -> List["AudioSegment"]:
         """Split audio into chunks for processing."""
         chunks = []
         for i in range(0, len(audio), self.chunk_size_ms):
@@ -299,7 +299,7 @@ class AudioTranscriptionTool:
             chunks.append(chunk)
         return chunks
     
-    def _transcribe_chunk(self, recognizer: sr.Recognizer, chunk: AudioSegment, start_time: float) -> Optional[Dict[str, Any]]:
+    def _transcribe_chunk(self, recognizer: "sr.Recognizer", chunk: "AudioSegment", start_time: float) -> Optional[Dict[str, Any]]:
         """Transcribe a single audio chunk."""
         try:
             # Export chunk to temporary WAV
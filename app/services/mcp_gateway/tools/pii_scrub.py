@@ -6,7 +6,8 @@ import sys
 sys.path.append("/app")
 import re
 import logging
-from typing import Dict, Any, List, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Pattern, Tuple
 from datetime import datetime, timezone
 import json
 
@@ -15,6 +16,191 @@ from services.mcp_gateway.config import MCPConfig, MCPOperationContext
 
 logger = logging.getLogger(__name__)
 
+# Streaming scrubs hold back this much text so matches across chunk
+# boundaries are found whole; longer matches may be split
+STREAM_HOLDBACK_CHARS = 1024
+# Already emitted text kept visible to \b and lookbehinds at the next chunk
+STREAM_CONTEXT_CHARS = 64
+
+# Backreferences would point at the wrong group inside a combined pattern
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+# (name, pattern, replacement, ignore_case) for each enabled pattern, in order
+ScrubKey = Tuple[Tuple[str, str, str, bool], ...]
+
+
+class CompiledScrubber:
+    """
+    Every enabled pattern of one scrub configuration, applied in one pass.
+    
+    Patterns are alternatives of a single regex with one named group each,
+    so each match is counted and replaced by the same scan instead of a
+    findall and a sub per pattern. Where several patterns match at the same
+    position, the earlier enabled pattern wins. Custom patterns that cannot
+    share a regex (backreferences, replacement templates, global inline
+    flags) are applied afterwards, one subn each.
+    """
+    
+    def __init__(self, key: ScrubKey):
+        self._names: Dict[str, str] = {}
+        self._replacements: Dict[str, str] = {}
+        self.fallback: List[Tuple[str, Pattern, str]] = []
+        
+        alternatives = []
+        for position, (name, pattern, replacement, ignore_case) in enumerate(key):
+            flags = re.IGNORECASE if ignore_case else 0
+            try:
+                regex = re.compile(pattern, flags)
+            except re.error as e:
+                logger.warning(f"Error applying custom pattern '{name}': {e}")
+                continue
+            if _BACKREFERENCE.search(pattern) or '\\' in replacement:
+                self.fallback.append((name, regex, replacement))
+                continue
+            group = f"_p{position}"
+            self._names[group] = name
+            self._replacements[group] = replacement
+            alternatives.append((name, regex, replacement, ignore_case, group, pattern))
+        
+        try:
+            self.combined: Optional[Pattern] = _combine(alternatives) if alternatives else None
+        except re.error:
+            # e.g. a pattern starting with a global flag such as (?i)
+            self.combined = None
+            self.fallback = [alternative[:3] for alternative in alternatives] + self.fallback
+    
+    def _replace(self, counts: Dict[str, int]):
+        names, replacements = self._names, self._replacements
+        
+        def replace(match):
+            group = match.lastgroup
+            name = names[group]
+            counts[name] = counts.get(name, 0) + 1
+            return replacements[group]
+        return replace
+    
+    def _apply_fallback(self, text: str, counts: Dict[str, int]) -> str:
+        for name, regex, replacement in self.fallback:
+            text, count = regex.subn(replacement, text)
+            if count:
+                counts[name] = counts.get(name, 0) + count
+        return text
+    
+    def scrub(self, text: str, counts: Dict[str, int]) -> str:
+        """Redact text, adding the matches of each pattern to counts"""
+        if self.combined is not None:
+            text = self.combined.sub(self._replace(counts), text)
+        return self._apply_fallback(text, counts)
+    
+    def scrub_chunks(self,
+                     chunks: Iterable[str],
+                     counts: Dict[str, int],
+                     holdback: int = STREAM_HOLDBACK_CHARS) -> Iterator[str]:
+        """
+        Redact a stream of text chunks, yielding redacted pieces.
+        
+        The last holdback characters are kept until more text arrives, and a
+        match running past the emitted part is left for the next round, so
+        the output equals scrub() on the joined text for matches shorter
+        than holdback. Fallback patterns apply to each emitted piece.
+        """
+        context = ""
+        pending = ""
+        for chunk in chunks:
+            pending += chunk
+            if len(pending) >= 2 * holdback:
+                piece, context, pending = self._scrub_prefix(context, pending, len(pending) - holdback, counts)
+                if piece:
+                    yield piece
+        if pending:
+            piece, _, _ = self._scrub_prefix(context, pending, len(pending), counts)
+            yield piece
+    
+    def _scrub_prefix(self, context: str, pending: str, cut: int, counts: Dict[str, int]) -> Tuple[str, str, str]:
+        text = context + pending
+        start = len(context)
+        cut += start
+        pieces = []
+        position = start
+        if self.combined is not None:
+            replace = self._replace(counts)
+            for match in self.combined.finditer(text, start):
+                if match.start() >= cut:
+                    break
+                if match.end() > cut and cut < len(text):
+                    # May continue past the cut: decide once more text arrives
+                    cut = match.start()
+                    break
+                pieces.append(text[position:match.start()])
+                pieces.append(replace(match))
+                position = match.end()
+        pieces.append(text[position:cut])
+        piece = self._apply_fallback("".join(pieces), counts)
+        return piece, text[max(start, cut - STREAM_CONTEXT_CHARS):cut], text[cut:]
+
+
+def _word_start_body(pattern: str) -> Optional[str]:
+    """pattern without its leading \\b, if that \\b applies to the whole pattern"""
+    if not pattern.startswith('\\b') or pattern[2:3] in ('', '{', '*', '+', '?'):
+        return None
+    depth = 0
+    class_start = None
+    escaped = False
+    body = pattern[2:]
+    for index, char in enumerate(body):
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif class_start is not None:
+            # A ] right after [ or [^ is a literal
+            first = class_start + (2 if body[class_start + 1:class_start + 2] == '^' else 1)
+            if char == ']' and index > first:
+                class_start = None
+        elif char == '[':
+            class_start = index
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            return None
+    return body
+
+
+def _combine(alternatives: List[Tuple[str, Pattern, str, bool, str, str]]) -> Pattern:
+    """
+    One regex trying the alternatives in order at each position.
+    
+    Consecutive patterns starting with \\b share a single \\b, so positions
+    inside words are rejected with one check instead of one per pattern.
+    """
+    global_ignore_case = all(alternative[3] for alternative in alternatives)
+    parts: List[str] = []
+    word_start: List[str] = []
+    for _, _, _, ignore_case, group, pattern in alternatives:
+        body = _word_start_body(pattern)
+        text = body if body is not None else pattern
+        if not global_ignore_case:
+            text = f"(?i:{text})" if ignore_case else f"(?:{text})"
+        if body is not None:
+            word_start.append(f"(?P<{group}>{text})")
+            continue
+        if word_start:
+            parts.append("\\b(?:" + "|".join(word_start) + ")")
+            word_start = []
+        parts.append(f"(?P<{group}>{text})")
+    if word_start:
+        parts.append("\\b(?:" + "|".join(word_start) + ")")
+    return re.compile("|".join(parts), re.IGNORECASE if global_ignore_case else 0)
+
+
+@lru_cache(maxsize=64)
+def compile_scrubber(key: ScrubKey) -> CompiledScrubber:
+    """Compiled scrubber for a configuration, shared by every call using it"""
+    return CompiledScrubber(key)
+
+
 class PIIScrubberTool:
     """
     MCP tool for PII (Personally Identifiable Information) scrubbing.
@@ -166,6 +352,21 @@ class PIIScrubberTool:
         
         return validated_config
     
+    def _scrubber_for(self, config: Dict[str, Any]) -> CompiledScrubber:
+        """Cached single-pass scrubber for the enabled default and custom patterns."""
+        enabled = config["enabled_patterns"]
+        ignore_case = not config.get("case_sensitive", False)
+        key = tuple(
+            (name, pattern_config["pattern"], pattern_config["replacement"], True)
+            for name, pattern_config in ((name, self.DEFAULT_PII_PATTERNS.get(name)) for name in enabled)
+            if pattern_config is not None and name in self.compiled_patterns
+        ) + tuple(
+            (name, custom_config["pattern"], custom_config["replacement"], ignore_case)
+            for name, custom_config in config.get("custom_patterns", {}).items()
+            if name in enabled
+        )
+        return compile_scrubber(key)
+    
     def scrub_text(self, text: str, config: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
         """
         Scrub PII from text content.
@@ -180,40 +381,27 @@ class PIIScrubberTool:
         if not text or not isinstance(text, str):
             return text, {}
         
-        scrubbed_text = text
         redaction_counts = {}
-        
-        # Process default patterns
-        for pattern_name in config["enabled_patterns"]:
-            if pattern_name in self.compiled_patterns:
-                pattern_info = self.compiled_patterns[pattern_name]
-                regex = pattern_info["regex"]
-                replacement = pattern_info["replacement"]
-                
-                # Count matches before replacement
-                matches = regex.findall(scrubbed_text)
-                if matches:
-                    redaction_counts[pattern_name] = len(matches)
-                    scrubbed_text = regex.sub(replacement, scrubbed_text)
-        
-        # Process custom patterns
-        for custom_name, custom_config in config["custom_patterns"].items():
-            if custom_name in config["enabled_patterns"]:
-                pattern = custom_config["pattern"]
-                replacement = custom_config["replacement"]
-                
-                flags = 0 if config["case_sensitive"] else re.IGNORECASE
-                
-                try:
-                    matches = re.findall(pattern, scrubbed_text, flags)
-                    if matches:
-                        redaction_counts[custom_name] = len(matches)
-                        scrubbed_text = re.sub(pattern, replacement, scrubbed_text, flags=flags)
-                except re.error as e:
-                    logger.warning(f"Error applying custom pattern '{custom_name}': {e}")
-        
+        scrubbed_text = self._scrubber_for(config).scrub(text, redaction_counts)
         return scrubbed_text, redaction_counts
     
+    def scrub_text_chunks(self,
+                          chunks: Iterable[str],
+                          config: Dict[str, Any],
+                          redaction_counts: Dict[str, int]) -> Iterator[str]:
+        """
+        Scrub PII from text arriving in chunks (e.g. a long transcript).
+        
+        Args:
+            chunks: Text chunks, in order
+            config: Validated scrub configuration
+            redaction_counts: Updated with the redactions as chunks are scrubbed
+            
+        Returns:
+            Iterator of scrubbed text pieces
+        """
+        return self._scrubber_for(config).scrub_chunks(chunks, redaction_counts)
+    
     def scrub_structured_data(self, data: Dict[str, Any], config: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, int]]:
         """
         Scrub PII from structured data (JSON-like objects).
@@ -227,15 +415,12 @@ class PIIScrubberTool:
         """
         scrubbed_data = {}
         total_redaction_counts = {}
+        scrubber = self._scrubber_for(config)
         
         def scrub_value(value):
             """Recursively scrub values."""
             if isinstance(value, str):
-                scrubbed_str, counts = self.scrub_text(value, config)
-                # Aggregate counts
-                for pattern, count in counts.items():
-                    total_redaction_counts[pattern] = total_redaction_counts.get(pattern, 0) + count
-                return scrubbed_str
+                return scrubber.scrub(value, total_redaction_counts) if value else value
             elif isinstance(value, dict):
                 return {k: scrub_value(v) for k, v in value.items()}
             elif isinstance(value, list):
@@ -288,8 +473,8 @@ class PIIScrubberTool:
             "patterns_used": list(redaction_counts.keys()),
             "config_applied": {
                 "enabled_patterns": config["enabled_patterns"],
-                "case_sensitive": config["case_sensitive"],
-                "custom_patterns_count": len(config["custom_patterns"])
+                "case_sensitive": config.get("case_sensitive", False),
+                "custom_patterns_count": len(config.get("custom_patterns", {}))
             },
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
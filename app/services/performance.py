@@ -19,12 +19,18 @@ from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Callable, Awaitable
 from contextlib import asynccontextmanager
-import statistics
 
 import sys
 sys.path.append("/app")
 from config import config
 from services.cache import get_cache_metrics
+from services.streaming_metrics import (
+    HistogramFamily,
+    LatencyHistogram,
+    RollingCounter,
+    RollingHistogram,
+    render_prometheus_summary
+)
 
 logger = logging.getLogger(__name__)
 
@@ -84,6 +90,29 @@ class PerformanceStatistics:
     cpu_usage_percent: float = 0.0
 
 
+@dataclass
+class LatencySummary:
+    """Windowed latency percentiles for one route or query type"""
+    count: int
+    avg_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+    @classmethod
+    def from_histogram(cls, histogram: LatencyHistogram) -> "LatencySummary":
+        p50, p95, p99 = histogram.quantiles((0.5, 0.95, 0.99))
+        return cls(
+            count=histogram.count,
+            avg_ms=round(histogram.mean, 2),
+            p50_ms=round(p50, 2),
+            p95_ms=round(p95, 2),
+            p99_ms=round(p99, 2),
+            max_ms=round(histogram.max, 2)
+        )
+
+
 class PerformanceMonitor:
     """
     Comprehensive performance monitoring service
@@ -99,15 +128,34 @@ class PerformanceMonitor:
     def __init__(self):
         self.config = config.performance
         
-        # In-memory storage for recent metrics (configurable retention)
-        self.request_metrics: deque = deque(maxlen=10000)
-        self.query_metrics: deque = deque(maxlen=50000)
+        # Streaming aggregates in rotating time buckets: fixed memory, O(1)
+        # to record and O(buckets) to query, however busy the service is
+        bucket_seconds = self.config.metrics_bucket_seconds
+        bucket_count = max(1, -(-self.config.metrics_retention_minutes * 60 // bucket_seconds))
+        self.request_latency = HistogramFamily(
+            "http_request_duration_seconds",
+            "HTTP request latency per normalized route",
+            ("method", "route"),
+            bucket_seconds, bucket_count, self.config.metrics_max_series
+        )
+        self.query_latency = HistogramFamily(
+            "db_query_duration_seconds",
+            "Database query latency per query type",
+            ("query_type",),
+            bucket_seconds, bucket_count, self.config.metrics_max_series
+        )
+        self.all_requests = RollingHistogram(bucket_seconds, bucket_count)
+        self.all_queries = RollingHistogram(bucket_seconds, bucket_count)
+        self.counters = RollingCounter(bucket_seconds, bucket_count)
+        self.total_queries = 0
+        
+        # Recent slow operations and alerts, for inspection
+        self.slow_request_metrics: deque = deque(maxlen=1000)
+        self.slow_query_metrics: deque = deque(maxlen=1000)
         self.performance_alerts: deque = deque(maxlen=1000)
         
         # Real-time statistics tracking
         self.current_requests = 0
-        self.response_times: deque = deque(maxlen=1000)
-        self.query_times: deque = deque(maxlen=5000)
         
         # Alert tracking
         self.slow_request_window = deque(maxlen=self.config.alert_slow_request_count_threshold)
@@ -281,11 +329,17 @@ class PerformanceMonitor:
     
     def record_request_metrics(self, metrics: RequestMetrics) -> None:
         """Record HTTP request performance metrics"""
-        self.request_metrics.append(metrics)
-        self.response_times.append(metrics.execution_time_ms)
+        self.request_latency.record((metrics.method, metrics.path), metrics.execution_time_ms)
+        self.all_requests.record(metrics.execution_time_ms)
+        if metrics.cache_hits:
+            self.counters.add("cache_hits", metrics.cache_hits)
+        if metrics.cache_misses:
+            self.counters.add("cache_misses", metrics.cache_misses)
         
         # Track slow requests for alerting
         if metrics.execution_time_ms > self.config.slow_request_threshold_ms:
+            self.counters.add("slow_requests")
+            self.slow_request_metrics.append(metrics)
             self.slow_request_window.append(datetime.utcnow())
         
         # Log slow requests
@@ -305,8 +359,12 @@ class PerformanceMonitor:
     
     def record_query_metrics(self, metrics: QueryMetrics) -> None:
         """Record database query performance metrics"""
-        self.query_metrics.append(metrics)
-        self.query_times.append(metrics.execution_time_ms)
+        self.query_latency.record((metrics.query_type,), metrics.execution_time_ms)
+        self.all_queries.record(metrics.execution_time_ms)
+        self.total_queries += 1
+        if metrics.execution_time_ms > self.config.slow_query_threshold_ms:
+            self.counters.add("slow_queries")
+            self.slow_query_metrics.append(metrics)
         
         # Log slow queries
         if (self.config.enable_query_timing and 
@@ -338,7 +396,7 @@ class PerformanceMonitor:
         
         cache_hits_start = 0
         cache_misses_start = 0
-        db_queries_start = len(self.query_metrics)
+        db_queries_start = self.total_queries
         
         # Get initial cache metrics if enabled
         if self.config.enable_cache_metrics:
@@ -364,7 +422,7 @@ class PerformanceMonitor:
                 cache_misses_delta = cache_misses_end - cache_misses_start
             
             # Calculate database queries delta
-            db_queries_delta = len(self.query_metrics) - db_queries_start
+            db_queries_delta = self.total_queries - db_queries_start
             
             # Create request metrics (status_code will be set by middleware)
             request_metrics = RequestMetrics(
@@ -409,29 +467,14 @@ class PerformanceMonitor:
     
     def get_performance_statistics(self, time_window_minutes: int = 60) -> PerformanceStatistics:
         """Get aggregated performance statistics for the specified time window"""
-        cutoff_time = datetime.utcnow() - timedelta(minutes=time_window_minutes)
-        
-        # Filter metrics by time window
-        recent_requests = [
-            m for m in self.request_metrics
-            if m.timestamp >= cutoff_time
-        ]
-        recent_queries = [
-            m for m in self.query_metrics
-            if m.timestamp >= cutoff_time
-        ]
-        
-        # Calculate request statistics
-        request_times = [m.execution_time_ms for m in recent_requests]
-        slow_requests = [m for m in recent_requests if m.execution_time_ms > self.config.slow_request_threshold_ms]
-        
-        # Calculate query statistics
-        query_times = [m.execution_time_ms for m in recent_queries]
-        slow_queries = [m for m in recent_queries if m.execution_time_ms > self.config.slow_query_threshold_ms]
+        window_seconds = time_window_minutes * 60
+        requests = self.all_requests.snapshot(window_seconds)
+        queries = self.all_queries.snapshot(window_seconds)
+        counters = self.counters.totals(window_seconds)
         
         # Calculate cache statistics
-        total_cache_hits = sum(m.cache_hits for m in recent_requests)
-        total_cache_misses = sum(m.cache_misses for m in recent_requests)
+        total_cache_hits = counters.get("cache_hits", 0)
+        total_cache_misses = counters.get("cache_misses", 0)
         cache_hit_rate = (
             total_cache_hits / (total_cache_hits + total_cache_misses) * 100
             if (total_cache_hits + total_cache_misses) > 0 else 0
@@ -447,47 +490,68 @@ class PerformanceMonitor:
         except Exception:
             pass
         
+        p95, p99 = requests.quantiles((0.95, 0.99))
         return PerformanceStatistics(
-            total_requests=len(recent_requests),
-            avg_response_time_ms=statistics.mean(request_times) if request_times else 0.0,
-            p95_response_time_ms=statistics.quantiles(request_times, n=20)[18] if len(request_times) >= 20 else 0.0,
-            p99_response_time_ms=statistics.quantiles(request_times, n=100)[98] if len(request_times) >= 100 else 0.0,
-            slow_requests_count=len(slow_requests),
-            total_db_queries=len(recent_queries),
-            avg_query_time_ms=statistics.mean(query_times) if query_times else 0.0,
-            slow_queries_count=len(slow_queries),
+            total_requests=requests.count,
+            avg_response_time_ms=requests.mean,
+            p95_response_time_ms=p95,
+            p99_response_time_ms=p99,
+            slow_requests_count=int(counters.get("slow_requests", 0)),
+            total_db_queries=queries.count,
+            avg_query_time_ms=queries.mean,
+            slow_queries_count=int(counters.get("slow_queries", 0)),
             cache_hit_rate=cache_hit_rate,
             memory_usage_mb=memory_usage_mb,
             cpu_usage_percent=cpu_usage_percent
         )
     
+    def get_latency_percentiles(self, time_window_minutes: int = 60) -> Dict[str, Dict[str, LatencySummary]]:
+        """p50/p95/p99 per normalized route ("GET /path") and per query type"""
+        window_seconds = time_window_minutes * 60
+        return {
+            "routes": {
+                f"{method} {route}": LatencySummary.from_histogram(histogram)
+                for (method, route), histogram in sorted(self.request_latency.snapshot(window_seconds).items())
+            },
+            "queries": {
+                query_type: LatencySummary.from_histogram(histogram)
+                for (query_type,), histogram in sorted(self.query_latency.snapshot(window_seconds).items())
+            }
+        }
+    
+    def export_prometheus(self, time_window_minutes: int = 5) -> str:
+        """Latency summaries in Prometheus text format (quantiles over the window)"""
+        window_seconds = time_window_minutes * 60
+        return "".join([
+            render_prometheus_summary(self.request_latency, window_seconds, scale=0.001),
+            render_prometheus_summary(self.query_latency, window_seconds, scale=0.001),
+            "# HELP http_requests_in_progress Requests currently being handled\n",
+            "# TYPE http_requests_in_progress gauge\n",
+            f"http_requests_in_progress {self.current_requests}\n"
+        ])
+    
     def get_recent_alerts(self, limit: int = 50) -> List[PerformanceAlert]:
         """Get recent performance alerts"""
         return list(self.performance_alerts)[-limit:]
     
     def get_slow_requests(self, limit: int = 100) -> List[RequestMetrics]:
         """Get recent slow requests"""
-        slow_requests = [
-            m for m in self.request_metrics
-            if m.execution_time_ms > self.config.slow_request_threshold_ms
-        ]
-        return sorted(slow_requests, key=lambda x: x.timestamp, reverse=True)[:limit]
+        return sorted(self.slow_request_metrics, key=lambda x: x.timestamp, reverse=True)[:limit]
     
     def get_slow_queries(self, limit: int = 100) -> List[QueryMetrics]:
         """Get recent slow queries"""
-        slow_queries = [
-            m for m in self.query_metrics
-            if m.execution_time_ms > self.config.slow_query_threshold_ms
-        ]
-        return sorted(slow_queries, key=lambda x: x.timestamp, reverse=True)[:limit]
+        return sorted(self.slow_query_metrics, key=lambda x: x.timestamp, reverse=True)[:limit]
     
     def clear_metrics(self) -> None:
         """Clear all stored metrics"""
-        self.request_metrics.clear()
-        self.query_metrics.clear()
+        self.request_latency.clear()
+        self.query_latency.clear()
+        self.all_requests.clear()
+        self.all_queries.clear()
+        self.counters.clear()
+        self.slow_request_metrics.clear()
+        self.slow_query_metrics.clear()
         self.performance_alerts.clear()
-        self.response_times.clear()
-        self.query_times.clear()
         self.slow_request_window.clear()
         
         logger.info("Cleared all performance metrics")
@@ -523,6 +587,16 @@ def get_performance_statistics(time_window_minutes: int = 60) -> PerformanceStat
     return performance_monitor.get_performance_statistics(time_window_minutes)
 
 
+def get_latency_percentiles(time_window_minutes: int = 60) -> Dict[str, Dict[str, LatencySummary]]:
+    """Get latency percentiles per route and query type"""
+    return performance_monitor.get_latency_percentiles(time_window_minutes)
+
+
+def export_prometheus_metrics(time_window_minutes: int = 5) -> str:
+    """Get latency metrics in Prometheus text format"""
+    return performance_monitor.export_prometheus(time_window_minutes)
+
+
 def get_recent_alerts(limit: int = 50) -> List[PerformanceAlert]:
     """Get recent performance alerts"""
     return performance_monitor.get_recent_alerts(limit)
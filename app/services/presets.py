@@ -90,7 +90,9 @@ async def list_presets() -> List[Dict[str, Any]]:
         ttl_seconds=config.cache.presets_ttl_seconds,
         max_size_mb=config.cache.presets_max_size_mb,
         max_entries=config.cache.presets_max_entries,
-        cleanup_interval_seconds=config.cache.cleanup_interval_seconds
+        cleanup_interval_seconds=config.cache.cleanup_interval_seconds,
+        stale_while_revalidate_seconds=config.cache.stale_while_revalidate_seconds,
+        negative_ttl_seconds=config.cache.negative_ttl_seconds
     )
 
 
@@ -152,7 +154,9 @@ async def get_preset(preset_id: str) -> AssessmentPreset:
         ttl_seconds=config.cache.presets_ttl_seconds,
         max_size_mb=config.cache.presets_max_size_mb,
         max_entries=config.cache.presets_max_entries,
-        cleanup_interval_seconds=config.cache.cleanup_interval_seconds
+        cleanup_interval_seconds=config.cache.cleanup_interval_seconds,
+        stale_while_revalidate_seconds=config.cache.stale_while_revalidate_seconds,
+        negative_ttl_seconds=config.cache.negative_ttl_seconds
     )
     
     return AssessmentPreset(**cached_preset) if isinstance(cached_preset, dict) else cached_preset
@@ -32,6 +32,7 @@ except ImportError as e:
     class DefaultAzureCredential: pass
 
 from services.embeddings import EmbeddingResult, create_embeddings_service
+from services.ingestion_pipeline import IngestionCheckpoint, IngestionPipeline
 from domain.models import Document, EmbeddingDocument
 from repos.cosmos_embeddings_repository import create_cosmos_embeddings_repository, VectorSearchResult
 import sys
@@ -92,6 +93,8 @@ class RAGService:
         self.index_client = None
         self.embeddings_service = create_embeddings_service(correlation_id)
         self._ingestion_status: Dict[str, IngestionStatus] = {}
+        # Per-stage metrics of the most recent reindex pipeline run
+        self.last_ingestion_metrics: Optional[Dict[str, Any]] = None
         self._initialize_clients()
     
     def _initialize_clients(self):
@@ -184,29 +187,7 @@ class RAGService:
                 raise ValueError("No embeddings generated for document")
             
             # Prepare search documents
-            search_docs = []
-            for embedding_result in embeddings:
-                search_doc = SearchDocument(
-                    id=f"{doc_id}_{embedding_result.chunk.chunk_index}",
-                    engagement_id=document.engagement_id,
-                    document_id=doc_id,
-                    chunk_index=embedding_result.chunk.chunk_index,
-                    content=embedding_result.chunk.text,
-                    content_vector=embedding_result.embedding,
-                    filename=document.filename,
-                    uploaded_by=document.uploaded_by,
-                    uploaded_at=document.uploaded_at.isoformat(),
-                    chunk_start=embedding_result.chunk.start_index,
-                    chunk_end=embedding_result.chunk.end_index,
-                    token_count=embedding_result.usage_tokens,
-                    metadata={
-                        "content_type": document.content_type,
-                        "size": document.size,
-                        "model": embedding_result.model,
-                        "chunk_token_count": embedding_result.chunk.token_count or 0
-                    }
-                )
-                search_docs.append(asdict(search_doc))
+            search_docs = [self._to_search_document(document, result) for result in embeddings]
             
             # Upload to search index in batches
             batch_size = 50  # Azure AI Search recommendation
@@ -271,6 +252,31 @@ class RAGService:
             )
             raise
     
+    @staticmethod
+    def _to_search_document(document: Document, embedding_result: EmbeddingResult) -> Dict[str, Any]:
+        """Index record for one embedded chunk of a document"""
+        search_doc = SearchDocument(
+            id=f"{document.id}_{embedding_result.chunk.chunk_index}",
+            engagement_id=document.engagement_id,
+            document_id=document.id,
+            chunk_index=embedding_result.chunk.chunk_index,
+            content=embedding_result.chunk.text,
+            content_vector=embedding_result.embedding,
+            filename=document.filename,
+            uploaded_by=document.uploaded_by,
+            uploaded_at=document.uploaded_at.isoformat(),
+            chunk_start=embedding_result.chunk.start_index,
+            chunk_end=embedding_result.chunk.end_index,
+            token_count=embedding_result.usage_tokens,
+            metadata={
+                "content_type": document.content_type,
+                "size": document.size,
+                "model": embedding_result.model,
+                "chunk_token_count": embedding_result.chunk.token_count or 0
+            }
+        )
+        return asdict(search_doc)
+    
     async def _upload_batch_with_retry(self, batch_docs: List[Dict], doc_id: str):
         """Upload a batch of documents with retry logic"""
         max_retries = 3
@@ -445,63 +451,84 @@ class RAGService:
     async def reindex_engagement_documents(
         self, 
         engagement_id: str, 
-        documents: List[Tuple[Document, str]]
+        documents: List[Tuple[Document, Optional[str]]]
     ) -> Dict[str, IngestionStatus]:
         """
         Reindex all documents for an engagement.
         
+        Documents go through the staged ingestion pipeline, which batches
+        embedding requests and index uploads across documents. Progress is
+        checkpointed per engagement: if a previous reindex did not finish,
+        the index is not cleared again and documents it already indexed with
+        the same content are skipped.
+        
         Args:
             engagement_id: The engagement ID
-            documents: List of (Document, text_content) tuples
+            documents: List of (Document, text_content) tuples; text_content
+                None means extract it from the document file
             
         Returns:
             Dict mapping document_id to IngestionStatus
         """
         try:
+            checkpoint = IngestionCheckpoint(config.rag.ingestion_checkpoint_dir, engagement_id)
+            resuming = await asyncio.to_thread(checkpoint.load)
+            
             logger.info(
                 "Starting engagement reindexing",
                 extra={
                     "correlation_id": self.correlation_id,
                     "engagement_id": engagement_id,
-                    "document_count": len(documents)
+                    "document_count": len(documents),
+                    "resuming": resuming,
+                    "already_indexed": len(checkpoint.completed)
                 }
             )
             
-            # Delete existing documents for this engagement
-            await self._delete_engagement_documents(engagement_id)
-            
-            # Process documents concurrently (with limit)
-            max_concurrent = 3  # Limit concurrent ingestion to avoid rate limits
-            semaphore = asyncio.Semaphore(max_concurrent)
-            
-            async def process_document(doc_tuple):
-                document, text_content = doc_tuple
-                async with semaphore:
-                    return await self.ingest_document(document, text_content)
+            if not resuming:
+                # Delete existing documents for this engagement
+                await self._delete_engagement_documents(engagement_id)
+                await checkpoint.save()
             
-            # Start all tasks
-            tasks = [process_document(doc_tuple) for doc_tuple in documents]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Collect results
             status_map = {}
-            for i, result in enumerate(results):
-                document = documents[i][0]
-                if isinstance(result, Exception):
+            pending = []
+            for document, text_content in documents:
+                if await checkpoint.is_completed(document, text_content):
                     status = IngestionStatus(
                         document_id=document.id,
-                        status="failed",
+                        status="completed",
                         chunks_processed=0,
                         total_chunks=0,
-                        error=str(result),
                         completed_at=datetime.now(timezone.utc)
                     )
                 else:
-                    status = result
+                    status = IngestionStatus(
+                        document_id=document.id,
+                        status="pending",
+                        chunks_processed=0,
+                        total_chunks=0
+                    )
+                    pending.append((document, text_content, status))
+                self._ingestion_status[document.id] = status
                 status_map[document.id] = status
             
+            pipeline = IngestionPipeline(
+                self.embeddings_service,
+                self._to_search_document,
+                self._upload_batch_with_retry,
+                engagement_id,
+                checkpoint,
+                self.correlation_id
+            )
+            await pipeline.run(pending)
+            pipeline.metrics.skipped_from_checkpoint = len(documents) - len(pending)
+            self.last_ingestion_metrics = pipeline.metrics.as_dict()
+            
             successful = sum(1 for s in status_map.values() if s.status == "completed")
             failed = len(status_map) - successful
+            if not pipeline.retryable_failures:
+                # Keep the checkpoint otherwise, so a rerun only retries failures
+                await asyncio.to_thread(checkpoint.clear)
             
             logger.info(
                 "Engagement reindexing completed",
@@ -510,7 +537,9 @@ class RAGService:
                     "engagement_id": engagement_id,
                     "total_documents": len(documents),
                     "successful": successful,
-                    "failed": failed
+                    "failed": failed,
+                    "skipped_from_checkpoint": len(documents) - len(pending),
+                    "elapsed_seconds": self.last_ingestion_metrics["elapsed_seconds"]
                 }
             )
             
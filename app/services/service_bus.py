@@ -1,17 +1,29 @@
 """
 Azure Service Bus integration for message queuing with in-memory fallback.
 Provides producer and consumer interfaces with retry logic and correlation ID propagation.
+
+Consumers run a bounded worker pool: up to max_concurrent_calls handlers run
+at once, up to prefetch_count further messages are held locked and ready,
+and the receive loop stops pulling (backpressure) when both are full. With
+local queues, idle consumers wake as soon as a message is enqueued.
+
+Without Azure Service Bus, messages go to a local queue backend selected by
+SERVICE_BUS_LOCAL_BACKEND: per-process memory, or a durable SQLite queue
+shared by all workers on the host (see services.local_queue).
 """
 import asyncio
+import inspect
 import json
 import logging
 import time
-from typing import Dict, List, Optional, Any, Callable, TypeVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Callable, Set, TypeVar
 from datetime import datetime, timezone
 from collections import deque
 import uuid
 
 from domain.models import ServiceBusMessage, QueueConfig
+from services.local_queue import InMemoryQueue, LocalQueue, create_local_queue
 import sys
 sys.path.append("/app")
 from config import config
@@ -19,51 +31,22 @@ from util.logging import get_correlated_logger
 
 T = TypeVar('T')
 
-# In-memory queue implementation for local development
-class InMemoryQueue:
-    """Thread-safe in-memory queue implementation"""
-    def __init__(self):
-        self._queues: Dict[str, deque] = {}
-        self._dlq: Dict[str, deque] = {}
-        
-    async def send_message(self, topic: str, message: ServiceBusMessage) -> bool:
-        """Send message to queue"""
-        if topic not in self._queues:
-            self._queues[topic] = deque()
-        self._queues[topic].append(message)
-        return True
-    
-    async def receive_messages(self, topic: str, max_count: int = 10) -> List[ServiceBusMessage]:
-        """Receive messages from queue"""
-        if topic not in self._queues:
-            return []
-        
-        messages = []
-        for _ in range(min(max_count, len(self._queues[topic]))):
-            if self._queues[topic]:
-                messages.append(self._queues[topic].popleft())
-        return messages
-    
-    async def dead_letter_message(self, topic: str, message: ServiceBusMessage, reason: str):
-        """Move message to dead letter queue"""
-        dlq_topic = f"{topic}-dlq"
-        if dlq_topic not in self._dlq:
-            self._dlq[dlq_topic] = deque()
-        
-        message.is_dead_lettered = True
-        message.dead_letter_reason = reason
-        self._dlq[dlq_topic].append(message)
-    
-    def get_queue_stats(self, topic: str) -> Dict[str, int]:
-        """Get queue statistics"""
-        return {
-            "active_messages": len(self._queues.get(topic, [])),
-            "dead_letter_messages": len(self._dlq.get(f"{topic}-dlq", []))
-        }
+# Local queue used when Azure Service Bus is not configured (and by its
+# placeholder paths), created on first use from the Service Bus configuration
+_local_queue: Optional[LocalQueue] = None
 
 
-# Global in-memory queue instance
-_in_memory_queue = InMemoryQueue()
+def get_local_queue() -> LocalQueue:
+    """Process-wide local queue backend"""
+    global _local_queue
+    if _local_queue is None:
+        _local_queue = create_local_queue(
+            config.service_bus.local_backend,
+            config.service_bus.local_path,
+            dlq_retention_seconds=config.service_bus.dlq_retention_seconds,
+            poll_interval_seconds=config.service_bus.local_poll_interval_seconds
+        )
+    return _local_queue
 
 
 def retry(max_attempts: int = 3, delay_seconds: int = 1, backoff_multiplier: float = 2.0):
@@ -153,7 +136,7 @@ class ServiceBusProducer:
             if self._use_cloud:
                 success = await self._send_to_azure_service_bus(topic, message)
             else:
-                success = await _in_memory_queue.send_message(topic, message)
+                success = await get_local_queue().send_message(topic, message)
             
             if success:
                 self.logger.info(
@@ -185,7 +168,51 @@ class ServiceBusProducer:
         #     await sender.send_messages(message.model_dump_json())
         
         self.logger.warning("Azure Service Bus integration not implemented - using in-memory fallback")
-        return await _in_memory_queue.send_message(topic, message)
+        return await get_local_queue().send_message(topic, message)
+
+
+@dataclass
+class ConsumerMetrics:
+    """Runtime metrics for one consumer"""
+    max_concurrent_calls: int = 1
+    prefetch_count: int = 0
+    in_flight: int = 0
+    active_handlers: int = 0
+    messages_received: int = 0
+    messages_completed: int = 0
+    messages_retried: int = 0
+    messages_dead_lettered: int = 0
+    lock_renewals: int = 0
+    lock_renewal_failures: int = 0
+    backpressure_waits: int = 0
+    backpressure_seconds: float = 0.0
+    
+    @property
+    def prefetched(self) -> int:
+        """Received messages waiting for a free handler slot"""
+        return self.in_flight - self.active_handlers
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert metrics to dictionary for monitoring"""
+        return {
+            "max_concurrent_calls": self.max_concurrent_calls,
+            "prefetch_count": self.prefetch_count,
+            "in_flight": self.in_flight,
+            "active_handlers": self.active_handlers,
+            "prefetched": self.prefetched,
+            "messages_received": self.messages_received,
+            "messages_completed": self.messages_completed,
+            "messages_retried": self.messages_retried,
+            "messages_dead_lettered": self.messages_dead_lettered,
+            "lock_renewals": self.lock_renewals,
+            "lock_renewal_failures": self.lock_renewal_failures,
+            "backpressure_waits": self.backpressure_waits,
+            "backpressure_seconds": round(self.backpressure_seconds, 3)
+        }
+
+
+# Running consumers by topic, reported by get_queue_statistics
+_consumers: Dict[str, List["ServiceBusConsumer"]] = {}
 
 
 class ServiceBusConsumer:
@@ -197,6 +224,8 @@ class ServiceBusConsumer:
         self.logger = get_correlated_logger(f"service_bus.consumer.{topic}", self.correlation_id)
         self._use_cloud = config.service_bus.is_configured()
         self._running = False
+        self.lock_duration_seconds = config.service_bus.lock_duration_seconds
+        self.metrics = ConsumerMetrics()
         
         if self._use_cloud:
             self.logger.info(f"Initializing Azure Service Bus consumer for topic: {topic}")
@@ -205,49 +234,158 @@ class ServiceBusConsumer:
     
     async def start_listening(
         self, 
-        message_handler: Callable[[ServiceBusMessage], bool],
-        max_concurrent_calls: int = 1
+        message_handler: Callable[[ServiceBusMessage], Any],
+        max_concurrent_calls: Optional[int] = None,
+        prefetch_count: Optional[int] = None
     ):
-        """Start listening for messages and processing them"""
+        """
+        Receive and process messages until stop() is called
+        
+        Args:
+            message_handler: Sync or async callable returning True on success.
+                Sync handlers run in a worker thread so they cannot block the loop.
+            max_concurrent_calls: Handlers allowed to run at once
+            prefetch_count: Extra messages to hold locked while all handlers are busy
+        """
+        if max_concurrent_calls is None:
+            max_concurrent_calls = config.service_bus.max_concurrent_calls
+        if prefetch_count is None:
+            prefetch_count = config.service_bus.prefetch_count
+        max_concurrent_calls = max(1, max_concurrent_calls)
+        prefetch_count = max(0, prefetch_count)
+        capacity = max_concurrent_calls + prefetch_count
+        
+        self.metrics = ConsumerMetrics(max_concurrent_calls=max_concurrent_calls, prefetch_count=prefetch_count)
+        handler_slots = asyncio.Semaphore(max_concurrent_calls)
+        capacity_freed = asyncio.Event()
+        tasks: Set[asyncio.Task] = set()
+        
+        def settled(task: asyncio.Task) -> None:
+            tasks.discard(task)
+            self.metrics.in_flight -= 1
+            capacity_freed.set()
+        
         self._running = True
-        self.logger.info(f"Starting message consumer for topic: {self.topic}")
+        _consumers.setdefault(self.topic, []).append(self)
+        self.logger.info(
+            f"Starting message consumer for topic: {self.topic}",
+            max_concurrent_calls=max_concurrent_calls,
+            prefetch_count=prefetch_count
+        )
         
-        while self._running:
-            try:
-                messages = await self._receive_messages()
-                
-                for message in messages:
-                    await self._process_message(message, message_handler)
-                
-                # Polling delay to prevent tight loop
-                if not messages:
-                    await asyncio.sleep(1)
+        try:
+            while self._running:
+                try:
+                    free = capacity - self.metrics.in_flight
+                    if free <= 0:
+                        # Backpressure: every handler is busy and the prefetch buffer is full
+                        self.metrics.backpressure_waits += 1
+                        waited_from = time.perf_counter()
+                        capacity_freed.clear()
+                        await capacity_freed.wait()
+                        self.metrics.backpressure_seconds += time.perf_counter() - waited_from
+                        continue
+                    
+                    messages = await self._receive_messages(max_count=free)
+                    if not messages:
+                        await self._wait_for_messages()
+                        continue
                     
-            except Exception as e:
-                self.logger.error(f"Error in message consumer loop: {str(e)}")
-                await asyncio.sleep(5)  # Back off on errors
+                    for message in messages:
+                        self.metrics.messages_received += 1
+                        self.metrics.in_flight += 1
+                        task = asyncio.create_task(self._run_handler(message, message_handler, handler_slots))
+                        tasks.add(task)
+                        task.add_done_callback(settled)
+                        
+                except Exception as e:
+                    self.logger.error(f"Error in message consumer loop: {str(e)}")
+                    await asyncio.sleep(5)  # Back off on errors
+            
+            # Let in-flight handlers finish before returning
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            registered = _consumers.get(self.topic, [])
+            if self in registered:
+                registered.remove(self)
+    
+    async def _run_handler(
+        self,
+        message: ServiceBusMessage,
+        handler: Callable[[ServiceBusMessage], Any],
+        handler_slots: asyncio.Semaphore
+    ):
+        """Wait for a handler slot, then process the message while keeping its lock alive"""
+        async with handler_slots:
+            self.metrics.active_handlers += 1
+            renewer = asyncio.create_task(self._keep_lock_alive(message))
+            try:
+                await self._process_message(message, handler)
+            finally:
+                renewer.cancel()
+                self.metrics.active_handlers -= 1
+    
+    async def _keep_lock_alive(self, message: ServiceBusMessage):
+        """Renew the message lock at half its duration while the handler runs"""
+        while True:
+            await asyncio.sleep(self.lock_duration_seconds / 2)
+            if await self._renew_message_lock(message):
+                self.metrics.lock_renewals += 1
+            else:
+                self.metrics.lock_renewal_failures += 1
+                self.logger.warning("Message lock lost during processing", message_id=message.id)
+                return
     
-    async def _receive_messages(self) -> List[ServiceBusMessage]:
+    async def _receive_messages(self, max_count: int = 10) -> List[ServiceBusMessage]:
         """Receive messages from queue"""
         if self._use_cloud:
-            return await self._receive_from_azure_service_bus()
+            return await self._receive_from_azure_service_bus(max_count)
         else:
-            return await _in_memory_queue.receive_messages(self.topic, max_count=10)
+            return await get_local_queue().receive_messages(
+                self.topic, max_count=max_count, lock_duration_seconds=self.lock_duration_seconds
+            )
     
-    async def _receive_from_azure_service_bus(self) -> List[ServiceBusMessage]:
+    async def _receive_from_azure_service_bus(self, max_count: int = 10) -> List[ServiceBusMessage]:
         """Receive messages from Azure Service Bus (placeholder)"""
         # TODO: Implement Azure Service Bus SDK integration
         self.logger.warning("Azure Service Bus integration not implemented - using in-memory fallback")
-        return await _in_memory_queue.receive_messages(self.topic, max_count=10)
+        return await get_local_queue().receive_messages(
+            self.topic, max_count=max_count, lock_duration_seconds=self.lock_duration_seconds
+        )
+    
+    async def _wait_for_messages(self):
+        """Block until a message is enqueued (or the consumer is stopped)"""
+        # Azure receivers would long-poll with max_wait_time; the fallback is event driven
+        await get_local_queue().wait_for_messages(self.topic, timeout=config.service_bus.max_wait_seconds)
+    
+    async def _renew_message_lock(self, message: ServiceBusMessage) -> bool:
+        # Would call receiver.renew_message_lock with Azure Service Bus
+        return await get_local_queue().renew_message_lock(self.topic, message, self.lock_duration_seconds)
     
-    async def _process_message(self, message: ServiceBusMessage, handler: Callable[[ServiceBusMessage], bool]):
+    async def _complete_message(self, message: ServiceBusMessage):
+        # Would call receiver.complete_message with Azure Service Bus
+        await get_local_queue().complete_message(self.topic, message)
+        self.metrics.messages_completed += 1
+    
+    @staticmethod
+    async def _call_handler(handler: Callable[[ServiceBusMessage], Any], message: ServiceBusMessage) -> Any:
+        if inspect.iscoroutinefunction(handler):
+            return await handler(message)
+        result = await asyncio.to_thread(handler, message)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+    
+    async def _process_message(self, message: ServiceBusMessage, handler: Callable[[ServiceBusMessage], Any]):
         """Process individual message with retry logic"""
         try:
-            success = handler(message)
+            success = await self._call_handler(handler, message)
             
             if success:
                 message.processed_at = datetime.now(timezone.utc)
                 message.processed_by = self.topic
+                await self._complete_message(message)
                 self.logger.info(
                     f"Message processed successfully",
                     message_id=message.id,
@@ -274,23 +412,18 @@ class ServiceBusConsumer:
             # Move to dead letter queue
             await self._dead_letter_message(message, error_reason)
         else:
-            # Requeue for retry
+            # Requeue for retry after a backoff, without holding a handler slot.
+            # Azure Service Bus would schedule a copy and complete the original;
+            # until then messages come from the local queue, so settle them there.
             delay = config.service_bus.retry_delay_seconds * (2 ** (message.retry_count - 1))
-            await asyncio.sleep(delay)
-            
-            if self._use_cloud:
-                # Would requeue in Azure Service Bus
-                pass
-            else:
-                await _in_memory_queue.send_message(self.topic, message)
+            self.metrics.messages_retried += 1
+            await get_local_queue().requeue_message(self.topic, message, delay_seconds=delay)
     
     async def _dead_letter_message(self, message: ServiceBusMessage, reason: str):
         """Move message to dead letter queue"""
-        if self._use_cloud:
-            # Would use Azure Service Bus DLQ
-            pass
-        else:
-            await _in_memory_queue.dead_letter_message(self.topic, message, reason)
+        # Would use the Azure Service Bus DLQ; messages currently come from the local queue
+        await get_local_queue().dead_letter_message(self.topic, message, reason)
+        self.metrics.messages_dead_lettered += 1
         
         self.logger.warning(
             f"Message moved to dead letter queue",
@@ -300,21 +433,31 @@ class ServiceBusConsumer:
         )
     
     def stop(self):
-        """Stop the consumer"""
+        """Stop the consumer after its in-flight messages are processed"""
         self._running = False
+        get_local_queue().notify(self.topic)
         self.logger.info(f"Stopping consumer for topic: {self.topic}")
 
 
+def _consumer_statistics(topic: str) -> List[Dict[str, Any]]:
+    return [consumer.metrics.to_dict() for consumer in _consumers.get(topic, [])]
+
+
 def get_queue_statistics() -> Dict[str, Any]:
-    """Get queue statistics for monitoring"""
+    """Get queue and consumer statistics for monitoring"""
+    topics = ["ingest", "minutes", "score"]
     if config.service_bus.is_configured():
         # TODO: Implement Azure Service Bus statistics
-        return {"mode": "azure_service_bus", "status": "not_implemented"}
+        stats = {"mode": "azure_service_bus", "status": "not_implemented"}
+        stats["consumers"] = {topic: _consumer_statistics(topic) for topic in topics}
+        return stats
     else:
-        topics = ["ingest", "minutes", "score"]
-        stats = {"mode": "in_memory"}
+        queue = get_local_queue()
+        stats = {"mode": queue.mode}
         
         for topic in topics:
-            stats[topic] = _in_memory_queue.get_queue_stats(topic)
+            stats[topic] = queue.get_queue_stats(topic)
+            stats[topic]["throughput"] = queue.get_throughput(topic)
+            stats[topic]["consumers"] = _consumer_statistics(topic)
         
-        return stats
\ No newline at end of file
+        return stats
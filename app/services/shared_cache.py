@@ -0,0 +1,340 @@
+"""
+Shared Second-Tier Cache
+
+Optional L2 tier for the in-process caches in services.cache. Gunicorn runs
+several workers, each with its own CacheManager; the shared tier lets a
+value computed by one worker be reused by the others and carries an
+invalidation channel so a delete, tag invalidation or clear in one worker
+reaches every worker's L1.
+
+The SQLite backend stores JSON values in a WAL-mode database on local disk
+and records invalidations in an append-only table that workers poll by
+sequence number. A load notes the newest sequence number before it starts
+and cannot write its result back into the shared tier if an invalidation
+covering its key or tags was published since.
+
+Values are JSON rather than pickle so that whoever can write the database
+file cannot run code in the workers; values that do not survive a JSON
+round trip unchanged (tuples, datetimes, models) stay in the local tier.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple
+
+from util.sqlite import ProcessConnection
+
+logger = logging.getLogger(__name__)
+
+SHARED_BACKEND_NONE = "none"
+SHARED_BACKEND_SQLITE = "sqlite"
+
+# Invalidation kinds carried on the channel
+INVALIDATE_KEY = "key"
+INVALIDATE_TAG = "tag"
+INVALIDATE_ALL = "all"
+
+# Invalidation records are kept this long so slow pollers can catch up
+INVALIDATION_RETENTION_SECONDS = 3600
+
+
+@dataclass
+class SharedEntry:
+    """Value read from the shared tier"""
+    value: Any
+    expires_at: float
+    tags: Tuple[str, ...]
+
+    @property
+    def remaining_ttl(self) -> float:
+        return max(0.0, self.expires_at - time.time())
+
+
+@dataclass
+class InvalidationEvent:
+    """Invalidation published by another worker"""
+    seq: int
+    cache_name: str
+    kind: str
+    target: Optional[str]
+
+
+class SharedCacheBackend(ABC):
+    """
+    Interface for a cache tier shared between worker processes
+
+    Implementations must be safe to call from worker threads; the cache
+    layer calls them via asyncio.to_thread so event loops never block on
+    shared-tier I/O.
+    """
+
+    def __init__(self):
+        self._instance_id = uuid.uuid4().hex[:8]
+
+    @property
+    def origin(self) -> str:
+        """Identifies this process so it skips its own invalidations"""
+        return f"{os.getpid()}-{self._instance_id}"
+
+    @abstractmethod
+    def get(self, cache_name: str, key: str) -> Optional[SharedEntry]:
+        """Return the live entry for key, or None"""
+
+    @abstractmethod
+    def put(
+        self,
+        cache_name: str,
+        key: str,
+        value: Any,
+        ttl_seconds: float,
+        tags: Iterable[str],
+        expected_generation: int
+    ) -> bool:
+        """Store value unless key or one of tags was invalidated since expected_generation"""
+
+    @abstractmethod
+    def generation(self, cache_name: str) -> int:
+        """Current invalidation generation, noted by a load before it starts"""
+
+    @abstractmethod
+    def invalidate(self, cache_name: str, kind: str, target: Optional[str] = None) -> None:
+        """Remove matching shared entries and publish the invalidation"""
+
+    @abstractmethod
+    def last_seq(self) -> int:
+        """Sequence number of the newest published invalidation"""
+
+    @abstractmethod
+    def poll(self, after_seq: int) -> Tuple[int, List[InvalidationEvent]]:
+        """
+        Invalidations published by other processes after after_seq
+
+        Returns:
+            Tuple of (newest sequence seen, events from other processes)
+        """
+
+    def close(self) -> None:
+        """Release backend resources"""
+
+
+class SQLiteSharedCache(SharedCacheBackend):
+    """SQLite-backed shared cache for workers on the same host"""
+
+    def __init__(self, path: str, prune_interval_seconds: int = 300):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.prune_interval_seconds = prune_interval_seconds
+        self._db = ProcessConnection(self.path)
+        self._last_prune = time.time()
+
+        with self._db.connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS shared_entries (
+                    cache_name TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL,
+                    tags TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (cache_name, key)
+                );
+                CREATE TABLE IF NOT EXISTS shared_entry_tags (
+                    cache_name TEXT NOT NULL,
+                    tag TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    PRIMARY KEY (cache_name, tag, key)
+                );
+                CREATE TABLE IF NOT EXISTS shared_invalidations (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    cache_name TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    target TEXT,
+                    origin TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+            """)
+
+    def get(self, cache_name: str, key: str) -> Optional[SharedEntry]:
+        with self._db.connection() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at, tags FROM shared_entries WHERE cache_name = ? AND key = ?",
+                (cache_name, key)
+            ).fetchone()
+
+        if row is None or row[1] <= time.time():
+            return None
+        try:
+            value = json.loads(row[0])
+        except (TypeError, ValueError) as e:
+            logger.warning(
+                f"Discarding unreadable shared cache entry in '{cache_name}'",
+                extra={"cache_name": cache_name, "key": key, "error": str(e)}
+            )
+            return None
+        tags = tuple(tag for tag in row[2].split("\n") if tag)
+        return SharedEntry(value=value, expires_at=row[1], tags=tags)
+
+    def put(
+        self,
+        cache_name: str,
+        key: str,
+        value: Any,
+        ttl_seconds: float,
+        tags: Iterable[str],
+        expected_generation: int
+    ) -> bool:
+        data = _encode(value)
+        if data is None:
+            logger.debug(
+                f"Value not shareable for cache '{cache_name}'",
+                extra={"cache_name": cache_name, "key": key}
+            )
+            return False
+        tags = sorted(set(tags))
+
+        with self._db.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._invalidated_since(conn, cache_name, key, tags, expected_generation):
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.execute(
+                    "DELETE FROM shared_entry_tags WHERE cache_name = ? AND key = ?",
+                    (cache_name, key)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO shared_entries (cache_name, key, value, expires_at, tags) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (cache_name, key, data, time.time() + ttl_seconds, "\n".join(tags))
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO shared_entry_tags (cache_name, tag, key) VALUES (?, ?, ?)",
+                    [(cache_name, tag, key) for tag in tags]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    @staticmethod
+    def _invalidated_since(
+        conn: sqlite3.Connection,
+        cache_name: str,
+        key: str,
+        tags: List[str],
+        seq: int
+    ) -> bool:
+        """Whether an invalidation covering key or tags was published after seq"""
+        tag_placeholders = ",".join("?" * len(tags)) or "NULL"
+        row = conn.execute(
+            "SELECT 1 FROM shared_invalidations WHERE seq > ? AND cache_name = ? AND ("
+            "kind = ? OR (kind = ? AND target = ?) "
+            f"OR (kind = ? AND target IN ({tag_placeholders}))) LIMIT 1",
+            (seq, cache_name, INVALIDATE_ALL, INVALIDATE_KEY, key, INVALIDATE_TAG, *tags)
+        ).fetchone()
+        return row is not None
+
+    def generation(self, cache_name: str) -> int:
+        # Invalidations of every cache share one sequence; put filters by name
+        return self.last_seq()
+
+    def invalidate(self, cache_name: str, kind: str, target: Optional[str] = None) -> None:
+        with self._db.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if kind == INVALIDATE_KEY:
+                    keys = [target]
+                elif kind == INVALIDATE_TAG:
+                    keys = [row[0] for row in conn.execute(
+                        "SELECT key FROM shared_entry_tags WHERE cache_name = ? AND tag = ?",
+                        (cache_name, target)
+                    )]
+                else:
+                    keys = None
+
+                if keys is None:
+                    conn.execute("DELETE FROM shared_entries WHERE cache_name = ?", (cache_name,))
+                    conn.execute("DELETE FROM shared_entry_tags WHERE cache_name = ?", (cache_name,))
+                else:
+                    params = [(cache_name, key) for key in keys]
+                    conn.executemany("DELETE FROM shared_entries WHERE cache_name = ? AND key = ?", params)
+                    conn.executemany("DELETE FROM shared_entry_tags WHERE cache_name = ? AND key = ?", params)
+
+                conn.execute(
+                    "INSERT INTO shared_invalidations (cache_name, kind, target, origin, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (cache_name, kind, target, self.origin, time.time())
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def last_seq(self) -> int:
+        with self._db.connection() as conn:
+            row = conn.execute("SELECT MAX(seq) FROM shared_invalidations").fetchone()
+        return row[0] or 0
+
+    def poll(self, after_seq: int) -> Tuple[int, List[InvalidationEvent]]:
+        with self._db.connection() as conn:
+            rows = conn.execute(
+                "SELECT seq, cache_name, kind, target, origin FROM shared_invalidations "
+                "WHERE seq > ? ORDER BY seq",
+                (after_seq,)
+            ).fetchall()
+
+        if time.time() - self._last_prune >= self.prune_interval_seconds:
+            self._prune()
+
+        origin = self.origin
+        events = [
+            InvalidationEvent(seq=seq, cache_name=cache_name, kind=kind, target=target)
+            for seq, cache_name, kind, target, event_origin in rows
+            if event_origin != origin
+        ]
+        return (rows[-1][0] if rows else after_seq), events
+
+    def _prune(self) -> None:
+        """Drop expired entries and invalidation records past retention"""
+        now = time.time()
+        self._last_prune = now
+        with self._db.connection() as conn:
+            conn.execute(
+                "DELETE FROM shared_entry_tags WHERE (cache_name, key) IN "
+                "(SELECT cache_name, key FROM shared_entries WHERE expires_at <= ?)",
+                (now,)
+            )
+            conn.execute("DELETE FROM shared_entries WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM shared_invalidations WHERE created_at < ?",
+                (now - INVALIDATION_RETENTION_SECONDS,)
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def _encode(value: Any) -> Optional[str]:
+    """JSON for value, or None unless it reads back equal to value"""
+    try:
+        data = json.dumps(value, separators=(",", ":"), allow_nan=False)
+    except (TypeError, ValueError):
+        return None
+    return data if json.loads(data) == value else None
+
+
+def create_shared_backend(backend: str, path: str) -> Optional[SharedCacheBackend]:
+    """Create the configured shared cache backend, or None when disabled"""
+    if backend == SHARED_BACKEND_NONE:
+        return None
+    if backend == SHARED_BACKEND_SQLITE:
+        return SQLiteSharedCache(path)
+    raise ValueError(f"Unknown shared cache backend: {backend}")
@@ -0,0 +1,250 @@
+"""
+Streaming latency aggregates
+
+Fixed-memory replacements for keeping raw samples around:
+- LatencyHistogram: log-spaced bins (HDR-style) with ~2% relative error,
+  stored sparsely so a histogram only holds the bins it has seen
+- RollingHistogram: a ring of time buckets, each with its own histogram;
+  recording is O(1) and a windowed query merges O(buckets) histograms
+- RollingCounter: named counters over the same kind of time buckets
+- HistogramFamily: one rolling histogram per label set (normalized route,
+  query type, ...) with a cap on the number of series
+- Prometheus text exposition of a family as a summary
+"""
+
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Bin boundaries grow by 4%, so a bin's midpoint is within 2% of any value in it
+GROWTH_FACTOR = 1.04
+MIN_TRACKABLE_VALUE = 0.01
+_LOG_GROWTH = math.log(GROWTH_FACTOR)
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+OVERFLOW_LABEL = "__other__"
+
+
+def _bin_index(value: float) -> int:
+    if value <= MIN_TRACKABLE_VALUE:
+        return 0
+    return int(math.log(value / MIN_TRACKABLE_VALUE) / _LOG_GROWTH) + 1
+
+
+def _bin_value(index: int) -> float:
+    if index == 0:
+        return MIN_TRACKABLE_VALUE
+    lower = MIN_TRACKABLE_VALUE * GROWTH_FACTOR ** (index - 1)
+    return lower * (1 + GROWTH_FACTOR) / 2
+
+
+@dataclass
+class LatencyHistogram:
+    """Count, sum, extremes and log-spaced bins of recorded values"""
+    count: int = 0
+    total: float = 0.0
+    min: float = math.inf
+    max: float = 0.0
+    bins: Dict[int, int] = field(default_factory=dict)
+
+    def record(self, value: float) -> None:
+        index = _bin_index(value)
+        self.bins[index] = self.bins.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantiles(self, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> List[float]:
+        """Approximate values at each quantile (0-1), clamped to the observed range"""
+        if not self.count:
+            return [0.0 for _ in quantiles]
+        targets = sorted((max(1, math.ceil(q * self.count)), position) for position, q in enumerate(quantiles))
+        results = [0.0] * len(quantiles)
+        seen = 0
+        pending = iter(targets)
+        rank, position = next(pending)
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            while seen >= rank:
+                results[position] = min(self.max, max(self.min, _bin_value(index)))
+                try:
+                    rank, position = next(pending)
+                except StopIteration:
+                    return results
+        return results
+
+
+class _TimeBucket:
+    __slots__ = ("epoch", "histogram")
+
+    def __init__(self):
+        self.epoch = -1
+        self.histogram = LatencyHistogram()
+
+
+class RollingHistogram:
+    """Histogram over a sliding window made of bucket_count buckets of bucket_seconds"""
+
+    def __init__(self, bucket_seconds: float = 60, bucket_count: int = 60):
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = max(1, bucket_count)
+        self.clear()
+
+    def clear(self) -> None:
+        self._buckets = [_TimeBucket() for _ in range(self.bucket_count)]
+        # Lifetime totals, for counters that must never go backwards
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, value: float, now: Optional[float] = None) -> None:
+        epoch = int((time.time() if now is None else now) // self.bucket_seconds)
+        bucket = self._buckets[epoch % len(self._buckets)]
+        if bucket.epoch != epoch:
+            bucket.epoch = epoch
+            bucket.histogram = LatencyHistogram()
+        bucket.histogram.record(value)
+        self.count += 1
+        self.total += value
+
+    def snapshot(self, window_seconds: float, now: Optional[float] = None) -> LatencyHistogram:
+        """Merged histogram of the buckets overlapping the last window_seconds"""
+        current = int((time.time() if now is None else now) // self.bucket_seconds)
+        oldest = current - min(len(self._buckets), max(1, math.ceil(window_seconds / self.bucket_seconds))) + 1
+        merged = LatencyHistogram()
+        for bucket in self._buckets:
+            if oldest <= bucket.epoch <= current:
+                merged.merge(bucket.histogram)
+        return merged
+
+
+class RollingCounter:
+    """Named counters over the same kind of sliding window as RollingHistogram"""
+
+    def __init__(self, bucket_seconds: float = 60, bucket_count: int = 60):
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = max(1, bucket_count)
+        self.clear()
+
+    def clear(self) -> None:
+        self._epochs = [-1] * self.bucket_count
+        self._counts: List[Dict[str, float]] = [{} for _ in self._epochs]
+
+    def add(self, name: str, amount: float = 1, now: Optional[float] = None) -> None:
+        epoch = int((time.time() if now is None else now) // self.bucket_seconds)
+        position = epoch % len(self._epochs)
+        if self._epochs[position] != epoch:
+            self._epochs[position] = epoch
+            self._counts[position] = {}
+        counts = self._counts[position]
+        counts[name] = counts.get(name, 0) + amount
+
+    def totals(self, window_seconds: float, now: Optional[float] = None) -> Dict[str, float]:
+        current = int((time.time() if now is None else now) // self.bucket_seconds)
+        oldest = current - min(len(self._epochs), max(1, math.ceil(window_seconds / self.bucket_seconds))) + 1
+        totals: Dict[str, float] = {}
+        for epoch, counts in zip(self._epochs, self._counts):
+            if oldest <= epoch <= current:
+                for name, amount in counts.items():
+                    totals[name] = totals.get(name, 0) + amount
+        return totals
+
+
+class HistogramFamily:
+    """Rolling histograms keyed by label values, e.g. (method, route)"""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str],
+        bucket_seconds: float = 60,
+        bucket_count: int = 60,
+        max_series: int = 500
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = bucket_count
+        self.max_series = max_series
+        self._series: Dict[Tuple[str, ...], RollingHistogram] = {}
+
+    def record(self, labels: Tuple[str, ...], value: float, now: Optional[float] = None) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            if len(self._series) >= self.max_series:
+                # Unbounded label values (odd paths) share one series
+                labels = (OVERFLOW_LABEL,) * len(self.label_names)
+                series = self._series.get(labels)
+            if series is None:
+                series = RollingHistogram(self.bucket_seconds, self.bucket_count)
+                self._series[labels] = series
+        series.record(value, now)
+
+    def snapshot(
+        self, window_seconds: float, now: Optional[float] = None
+    ) -> Dict[Tuple[str, ...], LatencyHistogram]:
+        """Windowed histogram per label set, skipping series idle in the window"""
+        snapshots = {}
+        for labels, series in list(self._series.items()):
+            histogram = series.snapshot(window_seconds, now)
+            if histogram.count:
+                snapshots[labels] = histogram
+        return snapshots
+
+    def series(self) -> Iterable[Tuple[Tuple[str, ...], RollingHistogram]]:
+        return list(self._series.items())
+
+    def clear(self) -> None:
+        self._series.clear()
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape_label(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+def render_prometheus_summary(
+    family: HistogramFamily,
+    window_seconds: float,
+    scale: float = 1.0,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    now: Optional[float] = None
+) -> str:
+    """
+    Prometheus text exposition of a family as a summary
+
+    Quantiles cover the last window_seconds; _sum and _count are lifetime
+    totals as Prometheus expects. scale converts recorded units (e.g. 0.001
+    for milliseconds to seconds).
+    """
+    lines = [f"# HELP {family.name} {family.help_text}", f"# TYPE {family.name} summary"]
+    for labels, series in sorted(family.series()):
+        histogram = series.snapshot(window_seconds, now)
+        for q, value in zip(quantiles, histogram.quantiles(quantiles)):
+            quantile_labels = _format_labels(family.label_names + ("quantile",), labels + (str(q),))
+            lines.append(f"{family.name}{quantile_labels} {value * scale:.6g}")
+        series_labels = _format_labels(family.label_names, labels)
+        lines.append(f"{family.name}_sum{series_labels} {series.total * scale:.6g}")
+        lines.append(f"{family.name}_count{series_labels} {series.count}")
+    return "\n".join(lines) + "\n"
@@ -10,6 +10,15 @@ os.environ["RAG_MODE"] = "none"  # Disable RAG by default in tests
 os.environ["LOG_LEVEL"] = "DEBUG"
 
 
+def pytest_configure(config):
+    """Register the slow marker and deselect slow tests unless -m is given"""
+    # The repository pytest.ini keeps its options under [tool:pytest], a
+    # section pytest only reads from setup.cfg, so they do not apply here
+    config.addinivalue_line("markers", "slow: benchmarks; run with -m slow")
+    if not config.option.markexpr:
+        config.option.markexpr = "not slow"
+
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_environment():
     """Setup test environment configuration"""
@@ -0,0 +1,94 @@
+"""
+In-process mock of the Microsoft Graph endpoints used for AAD group lookups.
+
+Serves /users/{id}/memberOf with @odata.nextLink paging and /$batch, checks
+the bearer token and counts requests so tests can assert on round trips.
+"""
+import asyncio
+from collections import Counter
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+
+def group(group_id: str, name: Optional[str] = None) -> Dict[str, str]:
+    return {"@odata.type": "#microsoft.graph.group", "id": group_id, "displayName": name or group_id}
+
+
+class MockGraphServer:
+    """Microsoft Graph stand-in; use as an async context manager"""
+
+    def __init__(
+        self,
+        memberships: Dict[str, List[Dict[str, str]]],
+        page_size: int = 100,
+        latency_seconds: float = 0.0,
+        valid_tokens=("token-1",)
+    ):
+        self.memberships = memberships
+        self.page_size = page_size
+        self.latency_seconds = latency_seconds
+        self.valid_tokens = set(valid_tokens)
+        self.requests: Counter = Counter()
+        self.batch_sizes: List[int] = []
+        self._server: Optional[TestServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return str(self._server.make_url("/v1.0"))
+
+    async def __aenter__(self) -> "MockGraphServer":
+        app = web.Application()
+        app.router.add_get("/v1.0/users/{user}/memberOf", self._member_of)
+        app.router.add_post("/v1.0/$batch", self._batch)
+        self._server = TestServer(app)
+        await self._server.start_server()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._server.close()
+
+    def _authorized(self, request: web.Request) -> bool:
+        return request.headers.get("Authorization", "").removeprefix("Bearer ") in self.valid_tokens
+
+    def _member_of_page(self, user: str, skip: int) -> Optional[dict]:
+        if user not in self.memberships:
+            return None
+        items = self.memberships[user]
+        page = {"value": items[skip:skip + self.page_size]}
+        if skip + self.page_size < len(items):
+            page["@odata.nextLink"] = f"{self.base_url}/users/{user}/memberOf?$skiptoken={skip + self.page_size}"
+        return page
+
+    async def _member_of(self, request: web.Request) -> web.Response:
+        if not self._authorized(request):
+            return web.json_response({"error": {"code": "InvalidAuthenticationToken"}}, status=401)
+        user = request.match_info["user"]
+        self.requests[f"memberOf:{user}"] += 1
+        await asyncio.sleep(self.latency_seconds)
+        page = self._member_of_page(user, int(request.query.get("$skiptoken", 0)))
+        if page is None:
+            return web.json_response({"error": {"code": "Request_ResourceNotFound"}}, status=404)
+        return web.json_response(page)
+
+    async def _batch(self, request: web.Request) -> web.Response:
+        if not self._authorized(request):
+            return web.json_response({"error": {"code": "InvalidAuthenticationToken"}}, status=401)
+        body = await request.json()
+        if len(body["requests"]) > 20:
+            return web.json_response({"error": {"code": "BadRequest"}}, status=400)
+        self.requests["$batch"] += 1
+        self.batch_sizes.append(len(body["requests"]))
+        await asyncio.sleep(self.latency_seconds)
+
+        responses = []
+        for sub_request in body["requests"]:
+            user = unquote(sub_request["url"].split("/")[2])
+            page = self._member_of_page(user, 0)
+            if page is None:
+                responses.append({"id": sub_request["id"], "status": 404, "body": {}})
+            else:
+                responses.append({"id": sub_request["id"], "status": 200, "body": page})
+        return web.json_response({"responses": responses})
@@ -0,0 +1,105 @@
+"""
+In-process mock of the Azure OpenAI chat completions endpoint.
+
+Serves /openai/deployments/{deployment}/chat/completions with optional
+server-sent-event streaming, a configurable latency and a number of leading
+429 responses carrying Retry-After, and tracks peak concurrency.
+"""
+import asyncio
+import json
+import time
+from typing import List, Optional
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+
+class MockOpenAIServer:
+    """Azure OpenAI stand-in; use as an async context manager"""
+
+    def __init__(
+        self,
+        content: str = "- [high] Identity: MFA not enforced for admins.\n",
+        latency_seconds: float = 0.0,
+        rate_limited_requests: int = 0,
+        retry_after_seconds: float = 0.1
+    ):
+        self.content = content
+        self.latency_seconds = latency_seconds
+        self.rate_limited_requests = rate_limited_requests
+        self.retry_after_seconds = retry_after_seconds
+        self.requests = 0
+        self.request_times: List[float] = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._server: Optional[TestServer] = None
+
+    @property
+    def endpoint(self) -> str:
+        return str(self._server.make_url("/")).rstrip("/")
+
+    async def __aenter__(self) -> "MockOpenAIServer":
+        app = web.Application()
+        app.router.add_post("/openai/deployments/{deployment}/chat/completions", self._chat_completions)
+        self._server = TestServer(app)
+        await self._server.start_server()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._server.close()
+
+    def _completion(self, deployment: str) -> dict:
+        return {
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": self.content},
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+        }
+
+    def _chunk(self, deployment: str, delta: dict, finish_reason: Optional[str] = None) -> bytes:
+        chunk = {
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    async def _chat_completions(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        self.request_times.append(time.monotonic())
+        if self.requests <= self.rate_limited_requests:
+            return web.json_response(
+                {"error": {"code": "429", "message": "Rate limit is exceeded"}},
+                status=429,
+                headers={"Retry-After": str(self.retry_after_seconds)}
+            )
+
+        body = await request.json()
+        deployment = request.match_info["deployment"]
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency_seconds)
+            if not body.get("stream"):
+                return web.json_response(self._completion(deployment))
+
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            # Split mid-line so clients have to reassemble lines themselves
+            pieces = [self.content[i:i + 7] for i in range(0, len(self.content), 7)]
+            for piece in pieces:
+                await response.write(self._chunk(deployment, {"content": piece}))
+            await response.write(self._chunk(deployment, {}, "stop"))
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+        finally:
+            self.in_flight -= 1
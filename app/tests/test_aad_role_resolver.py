@@ -0,0 +1,158 @@
+"""
+Unit tests for the shared AAD role resolver.
+Tests app token caching and refresh, the pooled Graph session, memberOf
+paging, deduplicated concurrent lookups and $batch warmups against a mock
+Graph server.
+"""
+import asyncio
+
+import pytest
+
+import services.aad_groups as aad_groups
+from config import config
+from services.aad_groups import AADGroupsService, AADRoleResolver
+from services.cache import cache_manager
+from services.graph_client import AppTokenProvider, GraphClient
+from tests.mock_graph_server import MockGraphServer, group
+
+
+class FakeMSALClient:
+    def __init__(self, tokens=("token-1",), expires_in=3600):
+        self.tokens = list(tokens)
+        self.expires_in = expires_in
+        self.calls = 0
+
+    def acquire_token_for_client(self, scopes):
+        token = self.tokens[min(self.calls, len(self.tokens) - 1)]
+        self.calls += 1
+        return {"access_token": token, "expires_in": self.expires_in}
+
+
+@pytest.fixture
+def aad_enabled(monkeypatch):
+    monkeypatch.setattr(config.aad_groups, "enabled", True)
+    monkeypatch.setattr(config.aad_groups, "mode", "enabled")
+    monkeypatch.setattr(config.aad_groups, "tenant_id", "tenant-1")
+    monkeypatch.setattr(config.aad_groups, "client_id", "client-1")
+    monkeypatch.setattr(config.aad_groups, "client_secret", "secret")
+    monkeypatch.setattr(config.aad_groups, "group_map_json", '{"g-admin": "admin", "g-lead": "lead"}')
+    monkeypatch.setattr(config.aad_groups, "require_tenant_isolation", False)
+    cache_manager._caches.pop("user_roles", None)
+    yield
+    cache_manager._caches.pop("user_roles", None)
+
+
+def make_resolver(server, msal_client=None, refresh_margin_seconds=300):
+    msal_client = msal_client or FakeMSALClient()
+    graph = GraphClient(AppTokenProvider(msal_client, refresh_margin_seconds), base_url=server.base_url)
+    return AADRoleResolver(msal_client=msal_client, graph_client=graph), msal_client
+
+
+class TestGraphAccess:
+    """Test token reuse, paging and the pooled session"""
+
+    @pytest.mark.asyncio
+    async def test_token_and_session_are_reused(self, aad_enabled):
+        async with MockGraphServer({"a@example.com": [group("g-lead")], "b@example.com": []}) as server:
+            resolver, msal_client = make_resolver(server)
+            await resolver.fetch_user_groups("a@example.com")
+            session = await resolver.graph._get_session()
+            await resolver.fetch_user_groups("b@example.com")
+
+            assert msal_client.calls == 1
+            assert await resolver.graph._get_session() is session
+            await resolver.close()
+            assert session.closed
+
+    def test_session_from_closed_event_loop_is_closed(self):
+        graph = GraphClient(AppTokenProvider(FakeMSALClient()))
+
+        # Each asyncio.run is a new loop, as with sync callers
+        first = asyncio.run(graph._get_session())
+        second = asyncio.run(graph._get_session())
+
+        assert second is not first
+        assert first.closed and not second.closed
+        assert list(graph._sessions.values()) == [second]
+        asyncio.run(graph.close())
+
+    @pytest.mark.asyncio
+    async def test_token_refreshed_before_expiry(self, aad_enabled):
+        async with MockGraphServer({"a@example.com": []}, valid_tokens=("token-1", "token-2")) as server:
+            # Valid for 200s but renewed 300s early: every call refreshes
+            msal_client = FakeMSALClient(tokens=("token-1", "token-2"), expires_in=200)
+            resolver, _ = make_resolver(server, msal_client)
+            await resolver.fetch_user_groups("a@example.com")
+            await resolver.fetch_user_groups("a@example.com")
+
+            assert msal_client.calls == 2
+            await resolver.close()
+
+    @pytest.mark.asyncio
+    async def test_rejected_token_is_replaced_once(self, aad_enabled):
+        async with MockGraphServer({"a@example.com": [group("g-lead")]}, valid_tokens=("token-2",)) as server:
+            resolver, msal_client = make_resolver(server, FakeMSALClient(tokens=("token-1", "token-2")))
+            groups = await resolver.fetch_user_groups("a@example.com")
+
+            assert [g.group_id for g in groups] == ["g-lead"]
+            assert msal_client.calls == 2
+            await resolver.close()
+
+    @pytest.mark.asyncio
+    async def test_member_of_follows_next_link(self, aad_enabled):
+        memberships = {"a@example.com": [group(f"g-{i}") for i in range(250)] + [
+            {"@odata.type": "#microsoft.graph.directoryRole", "id": "role-1"}
+        ]}
+        async with MockGraphServer(memberships, page_size=100) as server:
+            resolver, _ = make_resolver(server)
+            groups = await resolver.fetch_user_groups("a@example.com")
+
+            assert len(groups) == 250
+            assert server.requests["memberOf:a@example.com"] == 3
+            assert await resolver.fetch_user_groups("missing@example.com") == []
+            await resolver.close()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_share_one_request(self, aad_enabled):
+        async with MockGraphServer({"a@example.com": [group("g-admin")]}, latency_seconds=0.05) as server:
+            resolver, _ = make_resolver(server)
+            results = await asyncio.gather(*[resolver.fetch_user_groups("a@example.com") for _ in range(10)])
+
+            assert all(result[0].group_id == "g-admin" for result in results)
+            assert server.requests["memberOf:a@example.com"] == 1
+            await resolver.close()
+
+
+class TestRoleResolution:
+    """Test services built on the shared resolver"""
+
+    @pytest.mark.asyncio
+    async def test_warm_up_batches_and_fills_cache(self, aad_enabled):
+        users = {f"user{i}@example.com": [group("g-lead")] for i in range(45)}
+        users["boss@example.com"] = [group("g-admin"), group("g-other")]
+        async with MockGraphServer(users) as server:
+            resolver, _ = make_resolver(server)
+            service = AADGroupsService("test", resolver)
+
+            assert await service.warm_up(list(users) + ["boss@example.com"]) == 46
+            assert server.batch_sizes == [20, 20, 6]
+
+            roles = await AADGroupsService("request", resolver).get_user_roles("boss@example.com")
+            assert roles.roles == {"admin"}
+            assert roles.is_admin
+            # Served from the warmed cache, not a per-user Graph call
+            assert not any(key.startswith("memberOf") for key in server.requests)
+            await resolver.close()
+
+    @pytest.mark.asyncio
+    async def test_services_share_the_process_resolver(self, aad_enabled, monkeypatch):
+        monkeypatch.setattr(aad_groups, "_resolver", None)
+        monkeypatch.setattr(aad_groups, "_create_msal_client", lambda: FakeMSALClient())
+
+        first = aad_groups.create_aad_groups_service("request-1")
+        second = aad_groups.create_aad_groups_service("request-2")
+
+        assert first.resolver is second.resolver
+        assert first._group_roles_map == {"g-admin": "admin", "g-lead": "lead"}
+        await aad_groups.close_aad_role_resolver()
+        assert aad_groups._resolver is None
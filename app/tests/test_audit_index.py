@@ -0,0 +1,240 @@
+"""
+Unit tests for indexed audit queries.
+Tests month-end date ranges, sidecar index maintenance, span narrowing by
+hour, event type and engagement, streamed exports, and a benchmark over a
+month of synthetic audit logs.
+"""
+import csv
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api.routes.audit import get_audit_event_detail
+from services.audit_index import AuditFileIndex, INDEX_SUFFIX
+from services.audit_logger import AuditEventType, AuditLogger
+
+# Events per day in the month benchmark; FULL_BENCHMARKS=1 runs the full 124k-event month
+BENCHMARK_EVENTS_PER_DAY = 4000 if os.getenv("FULL_BENCHMARKS") else 500
+
+
+def make_event(event_id, timestamp, engagement_id="e1", event_type="mcp_call_start", **fields):
+    return {
+        "event_id": event_id,
+        "event_type": event_type,
+        "timestamp": timestamp.isoformat(),
+        "correlation_id": f"corr-{event_id}",
+        "engagement_id": engagement_id,
+        "severity": "info",
+        "operation": "test",
+        "status": "started",
+        **fields
+    }
+
+
+def write_events(directory, day, events):
+    path = directory / f"audit_events_{day.strftime('%Y%m%d')}.jsonl"
+    with open(path, "a", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+    return path
+
+
+@pytest.fixture
+def audit_logger(tmp_path):
+    return AuditLogger(log_directory=str(tmp_path), enable_structured_logging=False)
+
+
+class TestAuditQueries:
+    """Test reading events through the sidecar indexes"""
+
+    @pytest.mark.asyncio
+    async def test_range_covers_month_end_days(self, audit_logger, tmp_path):
+        for day in range(27, 32):
+            moment = datetime(2024, 1, day, 12, tzinfo=timezone.utc)
+            write_events(tmp_path, moment, [make_event(f"jan-{day}", moment)])
+        february = datetime(2024, 2, 1, 12, tzinfo=timezone.utc)
+        write_events(tmp_path, february, [make_event("feb-1", february)])
+
+        events = await audit_logger._read_audit_events(datetime(2024, 1, 28), datetime(2024, 2, 1, 23))
+
+        assert [e["event_id"] for e in events] == ["jan-28", "jan-29", "jan-30", "jan-31", "feb-1"]
+
+    @pytest.mark.asyncio
+    async def test_filters_read_only_matching_spans(self, audit_logger, tmp_path):
+        day = datetime(2024, 3, 5, tzinfo=timezone.utc)
+        events = [
+            make_event(f"event-{i}", day + timedelta(hours=i // 100), engagement_id=f"e{i % 3}",
+                       event_type="mcp_call_failure" if i % 50 == 0 else "mcp_call_start", padding="x" * 100)
+            for i in range(1000)
+        ]
+        path = write_events(tmp_path, day, events)
+
+        found = await audit_logger._read_audit_events(
+            day + timedelta(hours=2), day + timedelta(hours=4, minutes=59),
+            event_types=[AuditEventType.MCP_CALL_FAILURE], engagement_ids=["e0"]
+        )
+
+        assert [e["event_id"] for e in found] == ["event-300", "event-450"]
+        index = audit_logger._index.get(path)
+        spans = index.candidate_spans("2024030502", "2024030504", ["mcp_call_failure"], ["e0"])
+        assert sum(end - start for start, end in spans) < path.stat().st_size / 20
+        assert (tmp_path / (path.name + INDEX_SUFFIX)).exists()
+
+    @pytest.mark.asyncio
+    async def test_appended_lines_are_indexed_incrementally(self, audit_logger, tmp_path):
+        day = datetime(2024, 3, 5, 9, tzinfo=timezone.utc)
+        path = write_events(tmp_path, day, [make_event("first", day)])
+        assert len(await audit_logger._read_audit_events(day, day + timedelta(hours=1))) == 1
+        indexed = audit_logger._index.get(path).size
+
+        write_events(tmp_path, day, [make_event("second", day + timedelta(minutes=5), engagement_id="e2")])
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("not json\n" + json.dumps(make_event("partial", day))[:20])
+
+        found = await audit_logger._read_audit_events(day, day + timedelta(hours=1), engagement_ids=["e2"])
+        assert [e["event_id"] for e in found] == ["second"]
+        index = audit_logger._index.get(path)
+        assert indexed < index.size < path.stat().st_size
+        assert index.hours["2024030509"][0] == 0
+
+        # A fresh process loads the saved index; a rewritten file is reindexed
+        path.write_text(json.dumps(make_event("rewritten", day)) + "\n")
+        found = await AuditLogger(log_directory=str(tmp_path))._read_audit_events(day, day + timedelta(hours=1))
+        assert [e["event_id"] for e in found] == ["rewritten"]
+
+    @pytest.mark.asyncio
+    async def test_event_detail_closes_the_event_stream(self, audit_logger, tmp_path, monkeypatch):
+        now = datetime.now(timezone.utc)
+        write_events(tmp_path, now, [make_event("first", now), make_event("second", now)])
+        iter_audit_events = audit_logger.iter_audit_events
+        closed = []
+
+        async def tracked(*args, **kwargs):
+            try:
+                async for event in iter_audit_events(*args, **kwargs):
+                    yield event
+            finally:
+                closed.append(True)
+
+        monkeypatch.setattr(audit_logger, "iter_audit_events", tracked)
+        event = await get_audit_event_detail(
+            "first", current_user={"permissions": ["audit:read"]}, audit_logger=audit_logger
+        )
+
+        assert event["event_id"] == "first"
+        # Stopping at the match closes the stream (and its file) right away
+        assert closed == [True]
+
+    def test_nearby_spans_are_merged(self):
+        index = AuditFileIndex()
+        index.add(0, 100, "2024010100", "a", "e1")
+        index.add(100, 200, "2024010100", "b", "e2")
+        index.add(200, 300, "2024010100", "a", "e1")
+        index.add(10000, 10100, "2024010100", "a", "e1")
+
+        assert index.engagements["e1"] == [0, 300, 10000, 10100]
+        assert index.candidate_spans("2024010100", "2024010100", ["b"], ["e1"]) == [(100, 200)]
+
+
+class TestStreamedExports:
+    """Test exports written straight from the event stream"""
+
+    @pytest.mark.asyncio
+    async def test_csv_and_json_exports(self, audit_logger, tmp_path):
+        now = datetime.now(timezone.utc)
+        write_events(tmp_path, now, [
+            make_event("a", now, request_data={"mime_type": "audio/wav"}),
+            make_event("b", now, engagement_id="e2")
+        ])
+        window = (now - timedelta(hours=1), now + timedelta(hours=1))
+
+        csv_path = await audit_logger.export_audit_logs(*window, format="csv")
+        with open(csv_path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert [row["event_id"] for row in rows] == ["a", "b"]
+        assert rows[0]["request_data.mime_type"] == "audio/wav"
+
+        json_path = await audit_logger.export_audit_logs(*window, engagement_ids=["e2"], format="json")
+        assert [e["event_id"] for e in json.loads(json_path.read_text())] == ["b"]
+
+        empty_path = await audit_logger.export_audit_logs(*window, engagement_ids=["none"], format="json")
+        assert json.loads(empty_path.read_text()) == []
+
+        with pytest.raises(ValueError):
+            await audit_logger.export_audit_logs(*window, format="xml")
+
+
+def full_scan(directory, start, end, engagement_id):
+    """The unindexed approach: parse every line of every file in range"""
+    matches = 0
+    for path in sorted(directory.glob("audit_events_*.jsonl")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                event = json.loads(line)
+                moment = datetime.fromisoformat(event["timestamp"])
+                if start <= moment <= end and event["engagement_id"] == engagement_id:
+                    matches += 1
+    return matches
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_month_query_benchmark(tmp_path):
+    rng = random.Random(3)
+    first_day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    event_types = ["mcp_call_start", "mcp_call_success", "mcp_call_failure"]
+    for day in range(31):
+        start = first_day + timedelta(days=day)
+        write_events(tmp_path, start, [
+            make_event(
+                f"{day}-{i}", start + timedelta(seconds=i * 86400 // BENCHMARK_EVENTS_PER_DAY),
+                engagement_id=f"eng-{rng.randrange(200)}", event_type=rng.choice(event_types),
+                request_data={"tool": "pptx.render", "args": "x" * 200}
+            )
+            for i in range(BENCHMARK_EVENTS_PER_DAY)
+        ])
+    event_count = 31 * BENCHMARK_EVENTS_PER_DAY
+    month = (first_day, first_day + timedelta(days=31) - timedelta(seconds=1))
+
+    started = time.perf_counter()
+    expected = full_scan(tmp_path, *month, "eng-7")
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    audit_logger = AuditLogger(log_directory=str(tmp_path), enable_structured_logging=False)
+    started = time.perf_counter()
+    cold = await audit_logger._read_audit_events(*month, engagement_ids=["eng-7"])
+    cold_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    warm = await audit_logger._read_audit_events(*month, engagement_ids=["eng-7"])
+    warm_ms = (time.perf_counter() - started) * 1000
+
+    # Index files persist: a new process skips the scan
+    restarted = AuditLogger(log_directory=str(tmp_path), enable_structured_logging=False)
+    started = time.perf_counter()
+    await restarted._read_audit_events(*month, engagement_ids=["eng-7"])
+    reload_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    hour = await audit_logger._read_audit_events(
+        first_day + timedelta(days=14, hours=10), first_day + timedelta(days=14, hours=11)
+    )
+    hour_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    export_path = await audit_logger.export_audit_logs(*month, format="jsonl")
+    export_ms = (time.perf_counter() - started) * 1000
+
+    print(
+        f"\n{event_count} events: full scan {scan_ms:.0f}ms, engagement query cold {cold_ms:.0f}ms, "
+        f"warm {warm_ms:.0f}ms, after restart {reload_ms:.0f}ms, one hour {hour_ms:.0f}ms, "
+        f"full export {export_ms:.0f}ms"
+    )
+    assert len(cold) == len(warm) == expected
+    assert len(hour) > 0
+    assert sum(1 for _ in open(export_path)) == event_count
+    assert warm_ms < scan_ms
@@ -69,6 +69,7 @@ class TestAuditLogger:
         assert event_id == sample_audit_event.event_id
         
         # Verify file was created
+        await audit_logger.flush()
         log_date = datetime.now().strftime('%Y%m%d')
         audit_file = Path(audit_logger.log_directory) / f"audit_events_{log_date}.jsonl"
         assert audit_file.exists()
@@ -123,6 +124,7 @@ class TestAuditLogger:
         assert event_id is not None
         
         # Verify logged data
+        await audit_logger.flush()
         log_date = datetime.now().strftime('%Y%m%d')
         audit_file = Path(audit_logger.log_directory) / f"audit_events_{log_date}.jsonl"
         
@@ -161,6 +163,7 @@ class TestAuditLogger:
         assert event_id is not None
         
         # Verify logged data
+        await audit_logger.flush()
         log_date = datetime.now().strftime('%Y%m%d')
         audit_file = Path(audit_logger.log_directory) / f"audit_events_{log_date}.jsonl"
         
@@ -193,6 +196,7 @@ class TestAuditLogger:
         assert event_id is not None
         
         # Verify logged data
+        await audit_logger.flush()
         log_date = datetime.now().strftime('%Y%m%d')
         audit_file = Path(audit_logger.log_directory) / f"audit_events_{log_date}.jsonl"
         
@@ -235,6 +239,7 @@ class TestAuditLogger:
         assert event_id is not None
         
         # Verify logged data
+        await audit_logger.flush()
         log_date = datetime.now().strftime('%Y%m%d')
         audit_file = Path(audit_logger.log_directory) / f"audit_events_{log_date}.jsonl"
         
@@ -276,6 +281,7 @@ class TestAuditLogger:
         assert event_id is not None
         
         # Verify logged data
+        await audit_logger.flush()
         log_date = datetime.now().strftime('%Y%m%d')
         audit_file = Path(audit_logger.log_directory) / f"audit_events_{log_date}.jsonl"
         
@@ -487,6 +493,7 @@ class TestAuditLogger:
             ctx.context['response_data'] = {"result": "success"}
         
         # Assert - Check that both start and success events were logged
+        await audit_logger.flush()
         log_date = datetime.now().strftime('%Y%m%d')
         audit_file = Path(audit_logger.log_directory) / f"audit_events_{log_date}.jsonl"
         
@@ -523,6 +530,7 @@ class TestAuditLogger:
                 raise ValueError("Test error for context")
         
         # Verify failure event was logged
+        await audit_logger.flush()
         log_date = datetime.now().strftime('%Y%m%d')
         audit_file = Path(audit_logger.log_directory) / f"audit_events_{log_date}.jsonl"
         
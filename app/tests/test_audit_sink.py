@@ -0,0 +1,285 @@
+"""
+Unit tests for the buffered audit sink.
+Tests size- and time-driven flushes, ring buffer backpressure, retrying
+failed batches, daily files written through one handle, and batched audit
+storage from AuditLogger, AuditService and the Cosmos repository.
+"""
+import asyncio
+import json
+import time
+
+import pytest
+
+import api.database_errors as database_errors
+import services.audit as audit
+import services.audit_sink as audit_sink
+from api.schemas.gdpr import AuditLogEntry
+from repos.cosmos_client import CosmosClientPool
+from repos.cosmos_repository import CosmosRepository
+from services.audit_logger import AuditEvent, AuditEventType, AuditLogger, AuditSeverity
+from services.audit_sink import BufferedAuditSink, DailyJsonlWriter, close_audit_sinks
+
+
+class RecordingWriter:
+    def __init__(self, fail_times=0, delay=0.0):
+        self.batches = []
+        self.fail_times = fail_times
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, batch):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.calls <= self.fail_times:
+            raise RuntimeError("backend unavailable")
+        self.batches.append(list(batch))
+
+
+class TestBufferedAuditSink:
+    """Test buffering, flushing and backpressure"""
+
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_without_waiting_for_the_interval(self):
+        writer = RecordingWriter()
+        sink = BufferedAuditSink("test", writer, flush_batch_size=10, flush_interval_seconds=60)
+
+        for i in range(25):
+            sink.submit(i)
+        await asyncio.sleep(0.01)
+
+        # Records that arrived before the flush ran are committed with it
+        assert [len(batch) for batch in writer.batches] == [10, 10, 5]
+        assert sum(writer.batches, []) == list(range(25))
+        assert sink.metrics.flushed == 25
+        assert sink.pending == 0
+
+    @pytest.mark.asyncio
+    async def test_interval_flushes_a_partial_batch(self):
+        writer = RecordingWriter()
+        sink = BufferedAuditSink("test", writer, flush_batch_size=100, flush_interval_seconds=0.05)
+
+        for i in range(3):
+            sink.submit(i)
+        await asyncio.sleep(0.01)
+        assert writer.batches == []
+
+        await asyncio.sleep(0.1)
+        assert writer.batches == [[0, 1, 2]]
+
+    @pytest.mark.asyncio
+    async def test_full_buffer_drops_oldest_records(self):
+        writer = RecordingWriter()
+        sink = BufferedAuditSink("test", writer, max_events=5, flush_batch_size=100, flush_interval_seconds=60)
+
+        for i in range(8):
+            sink.submit(i)
+        await sink.flush()
+
+        assert writer.batches == [[3, 4, 5, 6, 7]]
+        metrics = sink.metrics
+        assert (metrics.enqueued, metrics.dropped, metrics.high_water) == (8, 3, 5)
+
+    @pytest.mark.asyncio
+    async def test_put_waits_for_space_instead_of_dropping(self):
+        writer = RecordingWriter(delay=0.05)
+        sink = BufferedAuditSink("test", writer, max_events=5, flush_batch_size=100, flush_interval_seconds=60)
+
+        for i in range(12):
+            await sink.put(i)
+        await sink.close()
+
+        assert sum(writer.batches, []) == list(range(12))
+        metrics = sink.metrics
+        assert metrics.dropped == 0
+        assert metrics.blocked > 0
+        assert metrics.high_water <= 5
+
+    @pytest.mark.asyncio
+    async def test_durable_puts_return_once_written(self):
+        writer = RecordingWriter(delay=0.01)
+        sink = BufferedAuditSink("test", writer, flush_batch_size=100, flush_interval_seconds=60)
+
+        await asyncio.gather(*[sink.put(i, durable=True) for i in range(5)])
+
+        # Concurrent callers share one batch, written without waiting for the interval
+        assert writer.batches == [[0, 1, 2, 3, 4]]
+        assert sink.pending == 0
+
+    @pytest.mark.asyncio
+    async def test_durable_put_raises_when_its_batch_is_given_up(self):
+        sink = BufferedAuditSink(
+            "test", RecordingWriter(fail_times=10), flush_interval_seconds=0.01, write_attempts=2
+        )
+
+        with pytest.raises(RuntimeError, match="backend unavailable"):
+            await asyncio.wait_for(sink.put("a", durable=True), 2)
+        assert sink.metrics.failed == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_batches_are_retried_then_given_up(self):
+        writer = RecordingWriter(fail_times=2)
+        sink = BufferedAuditSink("test", writer, flush_batch_size=100, flush_interval_seconds=60, write_attempts=3)
+        sink.submit("a")
+
+        assert await sink.flush() == 0
+        assert sink.pending == 1
+        await sink.close()
+        assert writer.batches == [["a"]]
+        assert sink.metrics.write_errors == 2
+
+        failing = BufferedAuditSink(
+            "test", RecordingWriter(fail_times=10), flush_interval_seconds=60, write_attempts=3
+        )
+        failing.submit("b")
+        await failing.close()
+        assert failing.pending == 0
+        assert failing.metrics.failed == 1
+
+    @pytest.mark.asyncio
+    async def test_submit_does_not_wait_for_slow_writes(self):
+        writer = RecordingWriter(delay=0.2)
+        sink = BufferedAuditSink("test", writer, flush_batch_size=50, flush_interval_seconds=60)
+
+        started = time.perf_counter()
+        for i in range(100):
+            sink.submit(i)
+        assert time.perf_counter() - started < 0.1
+
+        await close_audit_sinks()
+        assert sum(writer.batches, []) == list(range(100))
+        assert len(writer.batches) == 2
+
+
+class TestDailyJsonlWriter:
+    """Test grouped appends to daily files"""
+
+    @pytest.mark.asyncio
+    async def test_rotates_by_day_and_keeps_the_handle_open(self, tmp_path):
+        writer = DailyJsonlWriter(tmp_path, "audit_events_")
+        await writer.write([("20240131", "a\n"), ("20240131", "b\n"), ("20240201", "c\n")])
+        handle = writer._handle
+        await writer.write([("20240201", "d\n")])
+
+        assert writer._handle is handle
+        writer.close()
+        assert (tmp_path / "audit_events_20240131.jsonl").read_text() == "a\nb\n"
+        assert (tmp_path / "audit_events_20240201.jsonl").read_text() == "c\nd\n"
+
+    @pytest.mark.asyncio
+    async def test_each_batch_is_fsynced(self, tmp_path, monkeypatch):
+        synced = []
+        monkeypatch.setattr(audit_sink.os, "fsync", synced.append)
+        writer = DailyJsonlWriter(tmp_path, "audit_events_")
+        await writer.write([("20240131", "a\n"), ("20240201", "b\n")])
+
+        assert len(synced) == 2
+        writer.close()
+
+
+class TestBufferedAuditStorage:
+    """Test the audit services on top of the sink"""
+
+    @pytest.mark.asyncio
+    async def test_audit_logger_group_commits_events(self, tmp_path):
+        logger = AuditLogger(log_directory=str(tmp_path), enable_structured_logging=False)
+        for i in range(20):
+            await logger.log_event(AuditEvent(
+                event_id=f"event-{i}", event_type=AuditEventType.MCP_CALL_START, timestamp="",
+                correlation_id="corr", engagement_id="e1", severity=AuditSeverity.INFO,
+                operation="test", status="started"
+            ))
+
+        await logger.close()
+        lines = next(tmp_path.glob("audit_events_*.jsonl")).read_text().splitlines()
+        assert [json.loads(line)["event_id"] for line in lines] == [f"event-{i}" for i in range(20)]
+        assert logger._file_sink.metrics.batches == 1
+
+    @pytest.mark.asyncio
+    async def test_audit_service_stores_entries_in_bulk(self, monkeypatch):
+        monkeypatch.setattr(audit, "_entry_sink", None)
+
+        class BulkRepository:
+            def __init__(self):
+                self.batches = []
+
+            async def store_audit_log_entries(self, entries):
+                self.batches.append(entries)
+
+            async def list_audit_log_entries(self, **kwargs):
+                return [entry for batch in self.batches for entry in batch], None, None
+
+        repository = BulkRepository()
+        service = audit.AuditService(repository)
+        await asyncio.gather(*[
+            service.log_audit_event(
+                action_type="data_access", user_email="User@Example.com",
+                action_description=f"read {i}", engagement_id="e1"
+            )
+            for i in range(5)
+        ])
+
+        # Entries are stored before log_audit_event returns, concurrent ones in one batch
+        assert len(repository.batches) == 1
+        response = await service.get_audit_logs(engagement_id="e1")
+        assert [entry.action_description for entry in response.entries] == [f"read {i}" for i in range(5)]
+
+
+class FakeAuditContainer:
+    def __init__(self):
+        self.batches = []
+        self.items = {}
+        self.counters = {}
+
+    async def execute_item_batch(self, batch_operations, partition_key, response_hook):
+        self.batches.append((partition_key, len(batch_operations)))
+        for operation, (item,) in batch_operations:
+            assert operation == "upsert"
+            self.items[item["id"]] = item
+        response_hook({"x-ms-request-charge": str(len(batch_operations))}, None)
+        return []
+
+    async def upsert_item(self, body, response_hook):
+        self.items[body["id"]] = body
+        return body
+
+    async def patch_item(self, item, partition_key, patch_operations, response_hook):
+        self.counters[item] = self.counters.get(item, 0) + patch_operations[0]["value"]
+
+
+class FakeClient:
+    def __init__(self, container):
+        self.container = container
+
+    def get_database_client(self, name):
+        return self
+
+    def get_container_client(self, name):
+        return self.container
+
+    async def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_repository_upserts_audit_entries_in_partition_batches(monkeypatch):
+    monkeypatch.setattr(database_errors, "calculate_retry_delay", lambda attempt: 0)
+    container = FakeAuditContainer()
+    pool = CosmosClientPool(
+        endpoint="https://fake.documents.azure.com", database_name="test",
+        client_factory=lambda: FakeClient(container)
+    )
+    repo = CosmosRepository(correlation_id="test", client_pool=pool)
+    entries = [
+        AuditLogEntry(
+            action_type="data_access", user_email="a@example.com",
+            action_description="read", engagement_id="e1" if i < 150 else "e2"
+        )
+        for i in range(160)
+    ] + [AuditLogEntry(action_type="data_access", user_email="a@example.com", action_description="x")]
+
+    assert await repo.store_audit_log_entries(entries) == 161
+
+    assert sorted(container.batches) == [("e1", 50), ("e1", 100), ("e2", 10)]
+    assert len(container.items) == 161
+    # Counts are recounted on read, not maintained per write
+    assert container.counters == {}
@@ -0,0 +1,359 @@
+"""
+Unit tests for the bulk deletion engine.
+Tests batching, bounded parallelism, throttling back-off, items already
+deleted, RU pacing, resuming an engagement purge from a checkpoint and
+the data_purge job handler.
+"""
+import asyncio
+import time
+
+import pytest
+from azure.cosmos.exceptions import CosmosBatchOperationError
+from fastapi import HTTPException
+
+import api.database_errors as database_errors
+from api.schemas.gdpr import BackgroundJob
+from domain.repository import InMemoryRepository
+from repos.bulk_delete import BulkDeleteEngine, DeletionMetrics
+from repos.cosmos_client import CosmosClientPool
+from repos.cosmos_repository import ENGAGEMENT_PURGE_CONTAINERS, CosmosRepository
+from services.background_jobs import BackgroundJobService, JobScheduler
+from services.job_queue import SQLiteJobQueue
+
+
+class FakeStore:
+    """Executes delete batches against a set of IDs, each in partition "e1" unless mapped otherwise"""
+
+    def __init__(self, ids=(), charge_per_item=1.0, delay=0.0, partition_keys=None):
+        self.ids = set(ids)
+        self.partition_keys = partition_keys or {}
+        self.charge_per_item = charge_per_item
+        self.delay = delay
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.throttle_next = 0
+
+    async def execute_batch(self, operations, partition_key):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.throttle_next:
+                self.throttle_next -= 1
+                raise CosmosBatchOperationError(
+                    status_code=429, message="Too many requests", headers={"x-ms-retry-after-ms": "1"}
+                )
+            ids = [args[0] for _, args in operations]
+            for index, item_id in enumerate(ids):
+                if item_id not in self.ids or self.partition_keys.get(item_id, "e1") != partition_key:
+                    responses = [{"statusCode": 424}] * len(ids)
+                    responses[index] = {"statusCode": 404}
+                    raise CosmosBatchOperationError(
+                        error_index=index, status_code=404, message="Not found",
+                        headers={}, operation_responses=responses
+                    )
+            self.ids.difference_update(ids)
+            self.batches.append(ids)
+            return self.charge_per_item * len(ids)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(database_errors, "calculate_retry_delay", lambda attempt: 0)
+
+
+class TestBulkDeleteEngine:
+    """Test deleting one partition"""
+
+    @pytest.mark.asyncio
+    async def test_deletes_in_batches_of_100_with_bounded_parallelism(self):
+        ids = [f"item-{i}" for i in range(1050)]
+        store = FakeStore(ids, delay=0.01)
+        engine = BulkDeleteEngine(max_parallel_batches=3)
+
+        metrics = await engine.delete(ids, "e1", store.execute_batch, DeletionMetrics(container="documents"))
+
+        assert store.ids == set()
+        assert sorted(len(batch) for batch in store.batches) == [50] + [100] * 10
+        assert store.max_in_flight == 3
+        assert metrics.deleted == 1050
+        assert metrics.batches == 11
+        assert metrics.request_charge == 1050
+        assert metrics.items_per_second > 0
+
+    @pytest.mark.asyncio
+    async def test_throttled_batches_are_retried(self):
+        ids = [f"item-{i}" for i in range(200)]
+        store = FakeStore(ids)
+        store.throttle_next = 2
+
+        metrics = await BulkDeleteEngine().delete(
+            ids, "e1", store.execute_batch, DeletionMetrics(container="documents")
+        )
+
+        assert store.ids == set()
+        assert metrics.throttled == 2
+        assert metrics.deleted == 200
+
+    @pytest.mark.asyncio
+    async def test_items_already_deleted_are_skipped(self):
+        ids = [f"item-{i}" for i in range(10)]
+        store = FakeStore(ids[2:])
+
+        metrics = await BulkDeleteEngine().delete(
+            ids, "e1", store.execute_batch, DeletionMetrics(container="documents")
+        )
+
+        assert store.ids == set()
+        assert metrics.not_found == 2
+        assert metrics.deleted == 8
+
+    @pytest.mark.asyncio
+    async def test_persistent_throttling_gives_up(self):
+        store = FakeStore(["a"])
+        store.throttle_next = 10
+
+        with pytest.raises(CosmosBatchOperationError):
+            await BulkDeleteEngine(max_retries=2).delete(
+                ["a"], "e1", store.execute_batch, DeletionMetrics(container="documents")
+            )
+
+    @pytest.mark.asyncio
+    async def test_request_units_are_paced(self):
+        ids = [f"item-{i}" for i in range(300)]
+        store = FakeStore(ids, charge_per_item=1.0)
+        engine = BulkDeleteEngine(max_parallel_batches=1, max_ru_per_second=1000)
+
+        started = time.monotonic()
+        await engine.delete(ids, "e1", store.execute_batch, DeletionMetrics(container="documents"))
+
+        # 300 RU at 1000 RU/s: the last two batches wait for the first 200 RU
+        assert time.monotonic() - started >= 0.18
+
+
+class FakeQueryPager:
+    """Pages sorted IDs; like Cosmos, the continuation token is a position, not an offset"""
+
+    def __init__(self, ids, page_size, start_token, partition_keys):
+        self._ids = [item_id for item_id in ids if start_token is None or item_id > start_token]
+        self._partition_keys = partition_keys
+        self._page_size = page_size
+        self.continuation_token = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._ids:
+            raise StopAsyncIteration
+        page, self._ids = self._ids[:self._page_size], self._ids[self._page_size:]
+        self.continuation_token = page[-1] if self._ids else None
+
+        async def items():
+            for item_id in page:
+                yield {"id": item_id, "partition_key": self._partition_keys.get(item_id, "e1")}
+        return items()
+
+
+class FakeQueryIterable:
+    def __init__(self, ids, page_size, partition_keys):
+        self._ids = ids
+        self._page_size = page_size
+        self._partition_keys = partition_keys
+
+    def by_page(self, continuation_token=None):
+        return FakeQueryPager(self._ids, self._page_size, continuation_token, self._partition_keys)
+
+
+class FakeContainer:
+    def __init__(self, ids=(), fail_after_batches=None, partition_keys=None):
+        self.store = FakeStore(ids, partition_keys=partition_keys)
+        self.queries = []
+        self.fail_after_batches = fail_after_batches
+        self.calls = 0
+
+    def query_items(self, query, parameters, max_item_count, response_hook, partition_key=None):
+        self.queries.append(query)
+        return FakeQueryIterable(sorted(self.store.ids), max_item_count, self.store.partition_keys)
+
+    async def execute_item_batch(self, batch_operations, partition_key, response_hook):
+        self.calls += 1
+        if self.fail_after_batches is not None and self.calls > self.fail_after_batches:
+            raise RuntimeError("connection reset")
+        charge = await self.store.execute_batch(batch_operations, partition_key)
+        response_hook({"x-ms-request-charge": str(charge)}, None)
+        return []
+
+
+class MisroutedContainer(FakeContainer):
+    """Answers every delete with 404, as Cosmos does for the wrong partition key"""
+
+    async def execute_item_batch(self, batch_operations, partition_key, response_hook):
+        raise CosmosBatchOperationError(
+            error_index=0, status_code=404, message="Not found", headers={},
+            operation_responses=[{"statusCode": 404}] + [{"statusCode": 424}] * (len(batch_operations) - 1)
+        )
+
+
+class FakeDatabase:
+    def __init__(self, containers):
+        self.containers = containers
+
+    def get_container_client(self, name):
+        return self.containers.setdefault(name, FakeContainer())
+
+
+class FakeClient:
+    def __init__(self, containers):
+        self.database = FakeDatabase(containers)
+
+    def get_database_client(self, name):
+        return self.database
+
+    async def close(self):
+        pass
+
+
+class TestEngagementPurge:
+    """Test hard deleting an engagement across containers"""
+
+    @pytest.mark.asyncio
+    async def test_interrupted_purge_resumes_from_checkpoint(self):
+        containers = {
+            "embeddings": FakeContainer([f"emb-{i}" for i in range(250)]),
+            "documents": FakeContainer([f"doc-{i}" for i in range(300)], fail_after_batches=1),
+            "engagements": FakeContainer(["e1"])
+        }
+        pool = CosmosClientPool(
+            endpoint="https://fake.documents.azure.com",
+            database_name="test",
+            client_factory=lambda: FakeClient(containers)
+        )
+        repo = CosmosRepository(correlation_id="test", client_pool=pool)
+        checkpoints = []
+
+        async def on_progress(checkpoint):
+            checkpoints.append(checkpoint)
+
+        with pytest.raises(RuntimeError):
+            await repo.hard_delete_engagement_data("e1", on_progress=on_progress)
+
+        assert containers["embeddings"].store.ids == set()
+        assert len(containers["documents"].store.ids) == 200
+        assert containers["engagements"].store.ids == {"e1"}
+        checkpoint = checkpoints[-1]
+        assert checkpoint["containers"]["embeddings"]["completed"]
+        assert not checkpoint["containers"].get("documents", {}).get("completed")
+
+        containers["documents"].fail_after_batches = None
+        embedding_batches = len(containers["embeddings"].store.batches)
+        stats = await repo.hard_delete_engagement_data("e1", checkpoint=checkpoint, on_progress=on_progress)
+
+        # Finished containers are not queried again
+        assert len(containers["embeddings"].store.batches) == embedding_batches
+        assert all(not container.store.ids for container in containers.values())
+        assert stats["embeddings"] == 250
+        assert stats["documents"] == 300
+        assert stats["engagements"] == 1
+        assert set(stats) == set(ENGAGEMENT_PURGE_CONTAINERS)
+        assert checkpoints[-1]["containers"]["documents"]["batches"] == 3
+        assert repo.request_charge.total_ru >= 301
+
+    @pytest.mark.asyncio
+    async def test_items_are_batched_by_their_own_partition_key(self):
+        # Runlogs are partitioned by assessment, not engagement
+        runlog_partitions = {f"log-{i}": f"a{i % 3}" for i in range(150)}
+        containers = {"runlogs": FakeContainer(runlog_partitions, partition_keys=runlog_partitions)}
+        pool = CosmosClientPool(
+            endpoint="https://fake.documents.azure.com",
+            database_name="test",
+            client_factory=lambda: FakeClient(containers)
+        )
+        repo = CosmosRepository(correlation_id="test", client_pool=pool)
+
+        stats = await repo.hard_delete_engagement_data("e1")
+
+        runlogs = containers["runlogs"]
+        assert "c.assessment_id AS partition_key" in runlogs.queries[0]
+        assert runlogs.store.ids == set()
+        assert stats["runlogs"] == 150
+        assert sorted(len(batch) for batch in runlogs.store.batches) == [50, 50, 50]
+        for batch in runlogs.store.batches:
+            assert len({runlog_partitions[item_id] for item_id in batch}) == 1
+
+    @pytest.mark.asyncio
+    async def test_not_found_items_left_behind_fail_the_purge(self):
+        containers = {"runlogs": MisroutedContainer(["log-1", "log-2"])}
+        pool = CosmosClientPool(
+            endpoint="https://fake.documents.azure.com",
+            database_name="test",
+            client_factory=lambda: FakeClient(containers)
+        )
+        repo = CosmosRepository(correlation_id="test", client_pool=pool)
+        checkpoints = []
+
+        async def on_progress(checkpoint):
+            checkpoints.append(checkpoint)
+
+        with pytest.raises(HTTPException):
+            await repo.hard_delete_engagement_data("e1", on_progress=on_progress)
+
+        runlogs = checkpoints[-1]["containers"]["runlogs"]
+        assert containers["runlogs"].store.ids == {"log-1", "log-2"}
+        assert runlogs["not_found"] == 2
+        assert not runlogs["completed"]
+
+
+class FakeAuditService:
+    async def log_audit_event(self, **kwargs):
+        pass
+
+
+class PurgingRepository(InMemoryRepository):
+    def __init__(self):
+        super().__init__()
+        self.resumed_from = None
+        self.jobs = {}
+
+    async def store_background_job(self, job):
+        self.jobs[job.id] = job.model_copy(deep=True)
+
+    async def hard_delete_engagement_data(self, engagement_id, checkpoint=None, on_progress=None):
+        self.resumed_from = checkpoint
+        metrics = DeletionMetrics(container="documents", deleted=40, batches=1, completed=True)
+        await on_progress({"containers": {"documents": metrics.to_dict()}})
+        return {"documents": 40, "engagements": 1}
+
+
+class TestDataPurgeJob:
+    """Test the data_purge job handler"""
+
+    @pytest.mark.asyncio
+    async def test_hard_delete_resumes_from_job_checkpoint(self, tmp_path):
+        queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+        scheduler = JobScheduler(queue, poll_interval_seconds=0.05)
+        repository = PurgingRepository()
+        service = BackgroundJobService(repository, FakeAuditService(), scheduler)
+        checkpoint = {"containers": {"embeddings": {"container": "embeddings", "completed": True}}}
+        job = BackgroundJob(
+            job_type="data_purge", created_by="admin@example.com", engagement_id="e1",
+            parameters={"engagement_id": "e1", "purge_type": "hard_delete"}, checkpoint=checkpoint
+        )
+        await scheduler.enqueue(job)
+        await scheduler.start(service)
+        for _ in range(500):
+            if scheduler.get_metrics()["completed"]:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+        queue.close()
+
+        stored = repository.jobs[job.id]
+
+        assert repository.resumed_from == checkpoint
+        assert stored.result["records_purged"] == 41
+        assert stored.result["deletion_metrics"]["documents"]["deleted"] == 40
+        assert stored.checkpoint["containers"]["documents"]["completed"]
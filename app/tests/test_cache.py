@@ -0,0 +1,276 @@
+"""
+Unit tests for the in-process cache system.
+Tests single-flight loading, stale-while-revalidate, negative caching,
+size estimation and heap-based expiry.
+"""
+import pytest
+import asyncio
+
+from services.cache import InProcessCache, json_size_estimator, sampling_size_estimator
+
+
+@pytest.fixture
+def cache():
+    return InProcessCache(name="test", max_entries=100, default_ttl_seconds=60)
+
+
+class TestGetOrSet:
+    """Test get_or_set coordination"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_factory_call(self, cache):
+        calls = 0
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"value": calls}
+
+        results = await asyncio.gather(*[cache.get_or_set("key", factory) for _ in range(20)])
+
+        assert calls == 1
+        assert all(result == {"value": 1} for result in results)
+        assert cache.get_metrics()["coalesced_loads"] == 19
+
+    @pytest.mark.asyncio
+    async def test_factory_error_propagates_to_all_waiters(self, cache):
+        async def factory():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            *[cache.get_or_set("key", factory) for _ in range(3)],
+            return_exceptions=True
+        )
+
+        assert all(isinstance(result, ValueError) for result in results)
+        assert await cache.get("key") is None
+        assert cache._inflight == {}
+        # Callers saw the error; only background refreshes count as failures
+        assert cache.get_metrics()["refresh_failures"] == 0
+
+    @pytest.mark.asyncio
+    async def test_cached_none_is_a_hit(self, cache):
+        calls = 0
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            return None
+
+        assert await cache.get_or_set("missing", factory) is None
+        assert await cache.get_or_set("missing", factory) is None
+        assert calls == 1
+
+    @pytest.mark.asyncio
+    async def test_negative_ttl_caps_none_entries(self):
+        cache = InProcessCache(name="neg", default_ttl_seconds=60, negative_ttl_seconds=0)
+        calls = 0
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            return None
+
+        await cache.get_or_set("missing", factory)
+        await asyncio.sleep(0.01)
+        await cache.get_or_set("missing", factory)
+
+        assert calls == 2
+
+    @pytest.mark.asyncio
+    async def test_zero_negative_ttl_never_stores_none(self):
+        cache = InProcessCache(
+            name="neg", default_ttl_seconds=60, stale_while_revalidate_seconds=60, negative_ttl_seconds=0
+        )
+        calls = 0
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            return None
+
+        assert await cache.get_or_set("missing", factory) is None
+        assert await cache.get_or_set("missing", factory) is None
+
+        # Not even served stale within the SWR window
+        assert calls == 2
+        assert "missing" not in cache._cache
+
+    @pytest.mark.asyncio
+    async def test_stale_value_served_while_refreshing(self):
+        cache = InProcessCache(name="swr", default_ttl_seconds=60, stale_while_revalidate_seconds=60)
+        refreshed = asyncio.Event()
+        version = 0
+
+        async def factory():
+            nonlocal version
+            version += 1
+            if version > 1:
+                refreshed.set()
+            return version
+
+        await cache.get_or_set("key", factory, ttl_seconds=0)
+        await asyncio.sleep(0.01)
+
+        # Expired but within the SWR window: stale value returned immediately
+        assert await cache.get_or_set("key", factory) == 1
+        await asyncio.wait_for(refreshed.wait(), timeout=1)
+        await asyncio.sleep(0)
+
+        assert await cache.get_or_set("key", factory) == 2
+        metrics = cache.get_metrics()
+        assert metrics["stale_hits"] == 1
+        assert metrics["background_refreshes"] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidation_during_load_is_not_overwritten(self, cache):
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def factory():
+            started.set()
+            await release.wait()
+            return "old"
+
+        load = asyncio.create_task(cache.get_or_set("key", factory))
+        await started.wait()
+        await cache.delete("key")
+        release.set()
+
+        assert await load == "old"
+        assert await cache.get("key") is None
+
+    @pytest.mark.asyncio
+    async def test_unrelated_invalidation_does_not_block_load(self, cache):
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def factory():
+            started.set()
+            await release.wait()
+            return "fresh"
+
+        load = asyncio.create_task(cache.get_or_set("key", factory, tags=["engagement:e1"]))
+        await started.wait()
+        await cache.delete("other")
+        await cache.invalidate_by_tag("engagement:e2")
+        release.set()
+
+        assert await load == "fresh"
+        assert await cache.get("key") == "fresh"
+
+    @pytest.mark.asyncio
+    async def test_tag_invalidation_during_load_is_not_overwritten(self, cache):
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def factory():
+            started.set()
+            await release.wait()
+            return "old"
+
+        load = asyncio.create_task(cache.get_or_set("key", factory, tags=["engagement:e1"]))
+        await started.wait()
+        await cache.invalidate_by_tag("engagement:e1")
+        release.set()
+
+        assert await load == "old"
+        assert await cache.get("key") is None
+        assert cache._loading == {} and cache._invalidated_loads == set()
+
+
+class TestSizeEstimation:
+    """Test pluggable size estimators"""
+
+    def test_sampling_matches_json_for_small_values(self):
+        value = {"id": "preset", "pillars": [{"id": "p1", "weight": 0.5}]}
+        assert sampling_size_estimator(value) == json_size_estimator(value)
+
+    def test_sampling_approximates_large_values(self):
+        value = {"items": [{"id": i, "name": "n" * 40, "tags": ["a", "b"]} for i in range(5000)]}
+        exact = json_size_estimator(value)
+        assert sampling_size_estimator(value) == pytest.approx(exact, rel=0.05)
+
+    @pytest.mark.asyncio
+    async def test_caller_supplied_size_skips_estimation(self):
+        def fail(_):
+            raise AssertionError("estimator should not be called")
+
+        cache = InProcessCache(name="sized", size_estimator=fail)
+        await cache.set("key", ["x"] * 10, size_bytes=4096)
+        assert cache.get_metrics()["total_size_bytes"] == 4096
+
+    def test_unknown_estimator_rejected(self):
+        with pytest.raises(ValueError):
+            InProcessCache(name="bad", size_estimator="pickle")
+
+
+class TestHeapExpiry:
+    """Test heap-ordered expiry"""
+
+    @pytest.mark.asyncio
+    async def test_only_due_entries_are_removed(self, cache):
+        await cache.set("short", "a", ttl_seconds=0)
+        await cache.set("long", "b", ttl_seconds=60)
+        await asyncio.sleep(0.01)
+
+        assert cache._expire_entries() == 1
+        assert await cache.get("long") == "b"
+        assert cache.get_metrics()["expirations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_overwritten_key_uses_latest_ttl(self, cache):
+        await cache.set("key", "old", ttl_seconds=0)
+        await cache.set("key", "new", ttl_seconds=60)
+        await asyncio.sleep(0.01)
+
+        assert cache._expire_entries() == 0
+        assert await cache.get("key") == "new"
+
+    @pytest.mark.asyncio
+    async def test_expiry_batches_are_bounded(self, cache):
+        for i in range(50):
+            await cache.set(f"key_{i}", i, ttl_seconds=0)
+        await asyncio.sleep(0.01)
+
+        assert cache._expire_entries(max_entries=20) == 20
+        assert cache._expire_entries() == 30
+
+
+class TestTagInvalidation:
+    """Test tag-indexed invalidation"""
+
+    @pytest.mark.asyncio
+    async def test_invalidate_by_tag_removes_only_tagged_entries(self, cache):
+        await cache.set("doc_e1_d1", 1, tags=["engagement:e1", "document:e1:d1"])
+        await cache.set("doc_e1_d2", 2, tags=["engagement:e1", "document:e1:d2"])
+        await cache.set("doc_e2_d1", 3, tags=["engagement:e2", "document:e2:d1"])
+
+        assert await cache.invalidate_by_tag("document:e1:d1") == 1
+        assert await cache.invalidate_by_tag("engagement:e1") == 1
+        assert await cache.get("doc_e2_d1") == 3
+        assert cache._tag_index.keys() == {"engagement:e2", "document:e2:d1"}
+
+    @pytest.mark.asyncio
+    async def test_tag_index_follows_eviction_and_overwrite(self):
+        cache = InProcessCache(name="tags", max_entries=2)
+        await cache.set("a", 1, tags=["t:a"])
+        await cache.set("a", 2, tags=["t:b"])
+        await cache.set("b", 3, tags=["t:b"])
+        await cache.set("c", 4)
+
+        # "a" was evicted as least recently used
+        assert cache._tag_index == {"t:b": {"b"}}
+        assert await cache.invalidate_by_tag("t:a") == 0
+
+    @pytest.mark.asyncio
+    async def test_get_or_set_registers_tags(self, cache):
+        async def factory():
+            return "value"
+
+        await cache.get_or_set("key", factory, tags=["preset:p1"])
+
+        assert await cache.invalidate_by_tag("preset:p1") == 1
+        assert await cache.get("key") is None
@@ -0,0 +1,78 @@
+"""
+Throughput benchmark for the in-process cache.
+Measures set/get throughput and cleanup cost at 10k and 100k entries, and
+at 1M (about 40 s) when FULL_BENCHMARKS=1 is set.
+
+Run with: pytest tests/test_cache_benchmark.py -m slow -s
+"""
+import pytest
+import asyncio
+import os
+import time
+
+from services.cache import InProcessCache
+
+ENTRY_COUNTS = [10_000, 100_000] + ([1_000_000] if os.getenv("FULL_BENCHMARKS") else [])
+
+
+def _schema_value(i: int):
+    """Preset-schema-like value: a dict with a list of nested dicts"""
+    return {
+        "id": f"preset-{i}",
+        "pillars": [
+            {"id": f"p{j}", "name": f"Pillar {j}", "weight": 0.2, "capabilities": list(range(10))}
+            for j in range(5)
+        ]
+    }
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+@pytest.mark.parametrize("entry_count", ENTRY_COUNTS)
+async def test_cache_throughput(entry_count):
+    cache = InProcessCache(
+        name=f"bench_{entry_count}",
+        max_size_mb=10_000,
+        max_entries=entry_count,
+        default_ttl_seconds=3600
+    )
+    value = _schema_value(0)
+
+    start = time.perf_counter()
+    for i in range(entry_count):
+        await cache.set(f"key_{i}", value)
+    set_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(entry_count):
+        await cache.get(f"key_{i}")
+    get_seconds = time.perf_counter() - start
+
+    # Nothing is due, so cleanup must not scale with entry count
+    start = time.perf_counter()
+    with cache._lock:
+        expired = cache._expire_entries()
+    idle_cleanup_ms = (time.perf_counter() - start) * 1000
+
+    # Expire 1% of entries and measure the targeted cleanup
+    due = entry_count // 100
+    for i in range(due):
+        await cache.set(f"short_{i}", value, ttl_seconds=0)
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    with cache._lock:
+        expired_due = cache._expire_entries()
+    due_cleanup_ms = (time.perf_counter() - start) * 1000
+
+    print(
+        f"\n[cache] entries={entry_count:>9,} "
+        f"set={entry_count / set_seconds:>12,.0f}/s "
+        f"get={entry_count / get_seconds:>12,.0f}/s "
+        f"idle_cleanup={idle_cleanup_ms:.3f}ms "
+        f"cleanup_{due}_due={due_cleanup_ms:.2f}ms"
+    )
+
+    assert expired == 0
+    assert expired_due == due
+    assert idle_cleanup_ms < 5
+    assert cache.get_metrics()["hits"] == entry_count
@@ -0,0 +1,440 @@
+"""
+Unit tests for the shared async Cosmos client and CosmosRepository helpers.
+Tests paged streaming, RU accounting and budgets, retries, client reuse,
+cursor pagination and counter documents.
+"""
+import asyncio
+
+import pytest
+from azure.cosmos.exceptions import (
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError
+)
+from fastapi import HTTPException
+
+import api.database_errors as database_errors
+from api.schemas.gdpr import AuditLogEntry, BackgroundJob
+from repos.cosmos_client import (
+    CosmosClientPool,
+    begin_request_charge,
+    close_cosmos_client_pools,
+    current_request_charge,
+    decode_cursor,
+    encode_cursor,
+    get_cosmos_client_pool
+)
+from config import config
+from repos.cosmos_repository import CosmosRepository
+from services.cache import InProcessCache
+
+
+class FakePage:
+    def __init__(self, items):
+        self._items = list(items)
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for item in self._items:
+            yield item
+
+
+class FakePager:
+    def __init__(self, container, start_token, page_size, hook):
+        self._container = container
+        self._offset = int(start_token or 0)
+        self._page_size = page_size
+        self._hook = hook
+        self.continuation_token = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._container.fail_next_pages:
+            self._container.fail_next_pages -= 1
+            raise CosmosHttpResponseError(status_code=503, message="Service unavailable")
+        if self._offset >= len(self._container.items):
+            raise StopAsyncIteration
+        page = self._container.items[self._offset:self._offset + self._page_size]
+        self._offset += len(page)
+        self._container.pages_served += 1
+        self._hook({"x-ms-request-charge": str(self._container.charge_per_page)}, None)
+        self.continuation_token = str(self._offset) if self._offset < len(self._container.items) else None
+        return FakePage(page)
+
+
+class FakeQueryIterable:
+    def __init__(self, container, max_item_count, hook):
+        self._container = container
+        self._max_item_count = max_item_count
+        self._hook = hook
+
+    def by_page(self, continuation_token=None):
+        return FakePager(self._container, continuation_token, self._max_item_count, self._hook)
+
+
+class FakeContainer:
+    def __init__(self, items=(), charge_per_page=2.5):
+        self.items = list(items)
+        self.charge_per_page = charge_per_page
+        self.pages_served = 0
+        self.fail_next_pages = 0
+        self.count_queries = 0
+
+    def query_items(self, query, parameters, max_item_count, response_hook, partition_key=None):
+        if query.startswith("SELECT VALUE COUNT(1)"):
+            self.count_queries += 1
+            values = {parameter["name"]: parameter["value"] for parameter in parameters or []}
+            matching = [
+                item for item in self.items
+                if "@engagement_id" not in values or item.get("engagement_id") == values["@engagement_id"]
+            ]
+            result = FakeContainer([len(matching)])
+            result.fail_next_pages = self.fail_next_pages
+            return FakeQueryIterable(result, max_item_count, response_hook)
+        return FakeQueryIterable(self, max_item_count, response_hook)
+
+    async def read_item(self, item, partition_key, response_hook):
+        response_hook({"x-ms-request-charge": "1"}, None)
+        for existing in self.items:
+            if existing["id"] == item:
+                return existing
+        raise CosmosResourceNotFoundError(status_code=404, message="Not found")
+
+    async def upsert_item(self, body, response_hook):
+        response_hook({"x-ms-request-charge": "5"}, None)
+        self.items = [item for item in self.items if item["id"] != body["id"]] + [body]
+        return body
+
+    async def create_item(self, body, response_hook):
+        if any(item["id"] == body["id"] for item in self.items):
+            raise CosmosResourceExistsError(status_code=409, message="Conflict")
+        response_hook({"x-ms-request-charge": "5"}, None)
+        self.items.append(dict(body))
+        return body
+
+    async def patch_item(self, item, partition_key, patch_operations, response_hook):
+        for existing in self.items:
+            if existing["id"] == item:
+                for operation in patch_operations:
+                    field = operation["path"].lstrip("/")
+                    existing[field] = existing.get(field, 0) + operation["value"]
+                response_hook({"x-ms-request-charge": "3"}, None)
+                return existing
+        raise CosmosResourceNotFoundError(status_code=404, message="Not found")
+
+
+class FakeDatabase:
+    def __init__(self, containers):
+        self.containers = containers
+
+    def get_container_client(self, name):
+        return self.containers.setdefault(name, FakeContainer())
+
+
+class FakeClient:
+    def __init__(self, containers):
+        self.database = FakeDatabase(containers)
+        self.closed = False
+
+    def get_database_client(self, name):
+        return self.database
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def containers():
+    return {"audit_logs": FakeContainer([{"id": f"item-{i}"} for i in range(25)])}
+
+
+@pytest.fixture
+def repo(containers):
+    pool = CosmosClientPool(
+        endpoint="https://fake.documents.azure.com",
+        database_name="test",
+        client_factory=lambda: FakeClient(containers)
+    )
+    repository = CosmosRepository(correlation_id="test", client_pool=pool)
+    repository.query_page_size = 10
+    return repository
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(database_errors, "calculate_retry_delay", lambda attempt: 0)
+
+
+class TestQueryStreaming:
+    """Test paged queries"""
+
+    @pytest.mark.asyncio
+    async def test_query_items_follows_continuation_tokens(self, repo, containers):
+        items = await repo._query_items("audit_logs", "SELECT * FROM c")
+
+        assert [item["id"] for item in items] == [f"item-{i}" for i in range(25)]
+        assert containers["audit_logs"].pages_served == 3
+
+    @pytest.mark.asyncio
+    async def test_query_page_returns_resume_token(self, repo):
+        first, token = await repo._query_page("audit_logs", "SELECT * FROM c", page_size=20)
+        rest, final_token = await repo._query_page(
+            "audit_logs", "SELECT * FROM c", page_size=20, continuation_token=token
+        )
+
+        assert len(first) == 20 and len(rest) == 5
+        assert final_token is None
+
+    @pytest.mark.asyncio
+    async def test_stopping_early_skips_remaining_pages(self, repo, containers):
+        async for item in repo._iter_query("audit_logs", "SELECT * FROM c"):
+            if item["id"] == "item-3":
+                break
+
+        assert containers["audit_logs"].pages_served == 1
+
+    @pytest.mark.asyncio
+    async def test_transient_page_failure_is_retried(self, repo, containers):
+        containers["audit_logs"].fail_next_pages = 1
+
+        items = await repo._query_items("audit_logs", "SELECT * FROM c")
+
+        assert len(items) == 25
+
+    @pytest.mark.asyncio
+    async def test_missing_item_returns_none(self, repo):
+        assert await repo._get_item("audit_logs", "missing", "e1") is None
+        assert (await repo._get_item("audit_logs", "item-1", "e1"))["id"] == "item-1"
+
+
+class TestRequestCharge:
+    """Test RU accounting and budgets"""
+
+    @pytest.mark.asyncio
+    async def test_charges_accumulate_per_request(self, repo):
+        tracker = begin_request_charge()
+        await repo._query_items("audit_logs", "SELECT * FROM c")
+
+        assert repo.request_charge is tracker
+        assert tracker.total_ru == pytest.approx(7.5)
+        assert tracker.operations == 3
+
+    @pytest.mark.asyncio
+    async def test_budget_exceeded_fails_with_429(self, repo, containers):
+        begin_request_charge(budget_ru=4)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await repo._query_items("audit_logs", "SELECT * FROM c")
+
+        assert exc_info.value.status_code == 429
+        # Not retried: the budget stops the query after the second page
+        assert containers["audit_logs"].pages_served == 2
+
+
+    @pytest.mark.asyncio
+    async def test_background_refresh_is_not_charged_to_request(self):
+        cache = InProcessCache(name="swr", default_ttl_seconds=60, stale_while_revalidate_seconds=60)
+        await cache.get_or_set("key", lambda: asyncio.sleep(0, "old"), ttl_seconds=0)
+        await asyncio.sleep(0.01)
+        refreshed = asyncio.Future()
+
+        async def refresh():
+            refreshed.set_result(current_request_charge())
+            return "new"
+
+        begin_request_charge(budget_ru=1)
+        assert await cache.get_or_set("key", refresh) == "old"
+        assert await asyncio.wait_for(refreshed, timeout=1) is None
+
+
+class TestClientPool:
+    """Test client sharing"""
+
+    @pytest.mark.asyncio
+    async def test_repositories_share_one_client(self, containers):
+        created = []
+
+        def factory():
+            created.append(FakeClient(containers))
+            return created[-1]
+
+        pool = CosmosClientPool(endpoint="https://fake", database_name="test", client_factory=factory)
+        first = CosmosRepository(correlation_id="a", client_pool=pool)
+        second = CosmosRepository(correlation_id="b", client_pool=pool)
+
+        await first._query_items("audit_logs", "SELECT * FROM c")
+        await second._get_item("audit_logs", "item-1", "e1")
+        await pool.close()
+
+        assert len(created) == 1
+        assert created[0].closed
+
+    def test_client_from_closed_event_loop_is_closed(self, containers):
+        created = []
+
+        def factory():
+            created.append(FakeClient(containers))
+            return created[-1]
+
+        pool = CosmosClientPool(endpoint="https://fake", database_name="test", client_factory=factory)
+        repo = CosmosRepository(correlation_id="a", client_pool=pool)
+
+        # Each asyncio.run is a new loop, as with the sync wrappers
+        asyncio.run(repo._get_item("audit_logs", "item-1", "e1"))
+        asyncio.run(repo._get_item("audit_logs", "item-1", "e1"))
+
+        assert len(created) == 2
+        assert created[0].closed and not created[1].closed
+        asyncio.run(pool.close())
+        assert created[1].closed
+
+    def test_sync_wrapper_loop_leaves_running_client_alone(self, containers):
+        created = []
+
+        def factory():
+            created.append(FakeClient(containers))
+            return created[-1]
+
+        pool = CosmosClientPool(endpoint="https://fake", database_name="test", client_factory=factory)
+        repo = CosmosRepository(correlation_id="a", client_pool=pool)
+
+        async def main():
+            await repo._get_item("audit_logs", "item-1", "e1")
+            # A sync wrapper on another thread runs its own loop meanwhile
+            await asyncio.to_thread(asyncio.run, repo._get_item("audit_logs", "item-1", "e1"))
+            await repo._get_item("audit_logs", "item-1", "e1")
+            assert len(created) == 2
+            assert not created[0].closed
+            await pool.close()
+
+        asyncio.run(main())
+        assert all(client.closed for client in created)
+
+    @pytest.mark.asyncio
+    async def test_pool_is_shared_per_endpoint(self):
+        try:
+            pool = get_cosmos_client_pool("https://a.example", "db")
+            assert get_cosmos_client_pool("https://a.example", "db") is pool
+            assert get_cosmos_client_pool("https://b.example", "db") is not pool
+        finally:
+            await close_cosmos_client_pools()
+
+
+class TestCursorPagination:
+    """Test cursor-paginated listings and approximate counts"""
+
+    def test_cursor_round_trip(self):
+        token = '[{"token":"+RID:~abc==#RT:1","range":{"min":"","max":"FF"}}]'
+        cursor = encode_cursor(token)
+
+        assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+        assert decode_cursor(cursor) == token
+        assert encode_cursor(None) is None and decode_cursor(None) is None
+
+    def test_malformed_cursor_rejected(self):
+        with pytest.raises(ValueError):
+            decode_cursor("%%%")
+
+    @pytest.mark.asyncio
+    async def test_audit_log_pages_follow_cursor(self, repo, containers):
+        containers["audit_logs"].items = [
+            AuditLogEntry(
+                id=f"a{i}", action_type="data_access", user_email="u@example.com",
+                engagement_id="e1", action_description="read"
+            ).model_dump(mode="json")
+            for i in range(25)
+        ]
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            entries, cursor, total = await repo.list_audit_log_entries(page_size=10, cursor=cursor)
+            seen.extend(entry.id for entry in entries)
+            pages += 1
+            if cursor is None:
+                break
+
+        assert pages == 3
+        assert seen == [f"a{i}" for i in range(25)]
+        assert total is None
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_is_a_bad_request(self, repo):
+        with pytest.raises(HTTPException) as exc_info:
+            await repo.list_audit_log_entries(cursor="%%%")
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_counts_come_from_counter_documents(self, repo, containers):
+        containers["audit_logs"].items = []
+        for i in range(3):
+            await repo.store_audit_log_entry(AuditLogEntry(
+                action_type="data_access", user_email="u@example.com",
+                engagement_id="e1" if i < 2 else "e2", action_description="read"
+            ))
+        # Writes leave the counters alone
+        assert "counters" not in containers or containers["counters"].items == []
+
+        _, _, total = await repo.list_audit_log_entries(include_count=True)
+        _, _, engagement_total = await repo.list_audit_log_entries(engagement_id="e1", include_count=True)
+        _, _, filtered_total = await repo.list_audit_log_entries(user_email="u@example.com", include_count=True)
+        _, _, cached_total = await repo.list_audit_log_entries(include_count=True)
+
+        assert total == cached_total == 3
+        assert engagement_total == 2
+        assert containers["audit_logs"].count_queries == 2
+        # Counters cannot answer arbitrary filters
+        assert filtered_total is None
+
+    @pytest.mark.asyncio
+    async def test_stale_counts_are_recounted(self, repo, containers, monkeypatch):
+        job = BackgroundJob(job_type="data_export", created_by="admin@example.com", engagement_id="e1")
+        await repo.store_background_job(job)
+        job.status = "processing"
+        await repo.store_background_job(job)
+
+        jobs, cursor, total = await repo.list_background_jobs(include_count=True)
+
+        assert [j.id for j in jobs] == [job.id]
+        assert cursor is None
+        assert total == 1
+        assert [(item["id"], item["count"]) for item in containers["counters"].items] == [("background_jobs", 1)]
+
+        # Expired (or purged) jobs drop out of the count at the next recount
+        containers["background_jobs"].items = []
+        _, _, cached_total = await repo.list_background_jobs(include_count=True)
+        monkeypatch.setattr(config.cosmos, "counter_refresh_seconds", 0)
+        _, _, recounted_total = await repo.list_background_jobs(include_count=True)
+
+        assert cached_total == 1
+        assert recounted_total == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_recount_serves_previous_count(self, repo, containers, monkeypatch):
+        total = await repo._approximate_count("audit_logs")
+        monkeypatch.setattr(config.cosmos, "counter_refresh_seconds", 0)
+        containers["audit_logs"].fail_next_pages = 10
+
+        assert await repo._approximate_count("audit_logs") == total == 25
+
+
+class TestEngagementExport:
+    """Test streaming engagement data out of Cosmos"""
+
+    @pytest.mark.asyncio
+    async def test_iter_engagement_data_pages_each_container(self, repo, containers):
+        containers["engagements"] = FakeContainer([{"id": "e1"}])
+        containers["documents"] = FakeContainer([{"id": f"d{i}", "engagement_id": "e1"} for i in range(25)])
+
+        streamed = [
+            (name, item["id"])
+            async for name, item in repo.iter_engagement_data("e1", exclude={"embeddings"})
+        ]
+
+        assert streamed[0] == ("engagements", "e1")
+        assert [item_id for name, item_id in streamed if name == "documents"] == [f"d{i}" for i in range(25)]
+        assert containers["documents"].pages_served == 3
+        assert "embeddings" not in containers
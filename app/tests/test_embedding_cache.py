@@ -0,0 +1,165 @@
+"""
+Unit tests for the embedding cache.
+Tests content-addressed keys, the memory and SQLite tiers, LRU size
+eviction, and that re-embedding and reindexing only pay for changed chunks.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import services.embeddings as embeddings
+from config import config
+from domain.models import Document
+from services.embedding_cache import EmbeddingCache
+from services.embeddings import EmbeddingsService
+from services.ingestion_pipeline import IngestionPipeline
+from services.rag import IngestionStatus, RAGService
+
+DIMENSIONS = 8
+
+
+class FakeEmbeddingsAPI:
+    """Stands in for client.embeddings; counts the texts it is asked to embed"""
+
+    def __init__(self):
+        self.inputs = []
+
+    async def create(self, model, input, dimensions=None):
+        self.inputs.extend(input)
+        return SimpleNamespace(
+            model="text-embedding-3-large",
+            data=[SimpleNamespace(embedding=[float(len(text) % 7)] * DIMENSIONS) for text in input],
+            usage=SimpleNamespace(total_tokens=10 * len(input))
+        )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"), memory_entries=100)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def service(monkeypatch, cache):
+    api = FakeEmbeddingsAPI()
+
+    def initialize(self):
+        self.client = SimpleNamespace(embeddings=api)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: cache)
+    monkeypatch.setattr(EmbeddingsService, "_initialize_client", initialize)
+    service = EmbeddingsService("test")
+    service.api = api
+    return service
+
+
+class TestEmbeddingCache:
+    """Test keys, tiers and eviction"""
+
+    def test_key_covers_every_input(self):
+        base = ("text-embedding-3-large", "https://aoai|emb", 3072, "MFA is enforced")
+        key = EmbeddingCache.make_key(*base)
+        assert key == EmbeddingCache.make_key(*base[:3], "  MFA is\n enforced ")
+        for i, changed in enumerate(["text-embedding-3-small", "https://aoai|emb2", 1536, "MFA is optional"]):
+            variant = list(base)
+            variant[i] = changed
+            assert EmbeddingCache.make_key(*variant) != key
+
+    @pytest.mark.asyncio
+    async def test_vectors_round_trip_through_disk(self, cache, tmp_path):
+        await cache.put_many([("k1", [0.25, -1.5, 3.0], 12)])
+        assert await cache.get_many(["k1", "k2"]) == {"k1": ([0.25, -1.5, 3.0], 12)}
+        assert cache.metrics.memory_hits == 1
+
+        # A second worker on the same host reads the SQLite tier
+        other = EmbeddingCache(str(tmp_path / "embeddings.db"))
+        assert (await other.get_many(["k1"]))["k1"][1] == 12
+        assert other.metrics.disk_hits == 1
+        await other.get_many(["k1"])
+        assert other.metrics.memory_hits == 1
+        assert other.metrics.saved_tokens == 24
+        other.close()
+
+    @pytest.mark.asyncio
+    async def test_memory_tier_is_bounded(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path / "small.db"), memory_entries=2)
+        await cache.put_many([(f"k{i}", [float(i)], 1) for i in range(3)])
+        assert list(cache._memory) == ["k1", "k2"]
+        assert (await cache.get_many(["k0"]))["k0"][0] == [0.0]
+        assert cache.metrics.disk_hits == 1
+        cache.close()
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_rows_are_evicted(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path / "evict.db"), memory_entries=0, max_size_mb=0.1)
+        vector = [0.5] * 3072  # 12 KB as float32
+        for i in range(6):
+            await cache.put_many([(f"k{i}", vector, 1)])
+        await cache.get_many(["k0"])  # k0 is now the most recently used
+        for i in range(6, 10):
+            await cache.put_many([(f"k{i}", vector, 1)])
+
+        metrics = cache.get_metrics()
+        assert metrics["size_bytes"] <= metrics["max_size_bytes"]
+        assert metrics["evictions"] > 0
+        assert "k0" in await cache.get_many(["k0"])
+        assert "k1" not in await cache.get_many(["k1"])
+        cache.close()
+
+
+class TestCachedEmbeddings:
+    """Test that only changed text is sent to the model"""
+
+    @pytest.mark.asyncio
+    async def test_reembedding_only_pays_for_changed_chunks(self, service, monkeypatch):
+        monkeypatch.setattr(config.embeddings, "chunk_size", 5)
+        original = "Access is reviewed quarterly. MFA is enforced for admins. Backups are tested."
+        first = await service.embed_document(original, "doc-1")
+        assert len(service.api.inputs) == len(first) > 1
+
+        service.api.inputs.clear()
+        edited = original.replace("Backups are tested", "Backups are tested monthly")
+        second = await service.embed_document(edited, "doc-1")
+
+        assert len(service.api.inputs) == 1
+        assert [r.chunk.text for r in second] == [c.text for c in service.chunk_text(edited, "doc-1")]
+        assert second[0].embedding == first[0].embedding
+        assert service.cache.metrics.saved_tokens == 10 * (len(second) - 1)
+
+    @pytest.mark.asyncio
+    async def test_repeated_query_is_not_reembedded(self, service):
+        query = service.chunk_text("Which controls cover privileged access?", "search_query")
+        await service.generate_embeddings(query[:1], "search_query")
+        result = await service.generate_embeddings(query[:1], "search_query")
+        assert len(service.api.inputs) == 1
+        assert len(result[0].embedding) == DIMENSIONS
+
+    @pytest.mark.asyncio
+    async def test_unchanged_reindex_makes_no_requests(self, service, monkeypatch):
+        monkeypatch.setattr(config.embeddings, "chunk_size", 5)
+        documents = [
+            Document(id=f"d{i}", engagement_id="eng-1", filename=f"d{i}.txt", path="/nonexistent",
+                     uploaded_by="user@example.com")
+            for i in range(3)
+        ]
+        records = []
+
+        async def upload(batch, label):
+            records.extend(batch)
+
+        async def reindex():
+            pipeline = IngestionPipeline(service, RAGService._to_search_document, upload, "eng-1")
+            statuses = [IngestionStatus(d.id, "pending", 0, 0) for d in documents]
+            text = "Access for {} is reviewed quarterly. MFA is enforced for admins."
+            await pipeline.run([(d, text.format(d.id), s) for d, s in zip(documents, statuses)])
+            assert all(s.status == "completed" for s in statuses)
+            return pipeline
+
+        first = await reindex()
+        requests = len(service.api.inputs)
+        second = await reindex()
+
+        assert first.metrics.embedding.requests > 0
+        assert second.metrics.embedding.requests == 0
+        assert len(service.api.inputs) == requests
+        assert second.metrics.embedding.cache_hits == len(records) // 2
@@ -0,0 +1,288 @@
+"""
+Unit tests for the streaming GDPR engagement export.
+Tests chunked NDJSON/gzip output, per-collection progress, atomic local
+files, download lookup and the data_export job handler.
+"""
+import asyncio
+import gzip
+import json
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+
+import services.gdpr_export as gdpr_export
+from config import config
+from domain.models import Assessment, Document
+from domain.repository import InMemoryRepository
+from services.background_jobs import BackgroundJobService, JobScheduler
+from services.gdpr_export import (
+    ExportSink,
+    LocalExportSink,
+    NDJSONExportWriter,
+    open_export,
+    stream_engagement_export
+)
+from services.job_queue import SQLiteJobQueue
+
+
+class RecordingSink(ExportSink):
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+        self.aborted = False
+
+    async def write(self, chunk):
+        self.chunks.append(chunk)
+
+    async def close(self):
+        self.closed = True
+        return "memory://export"
+
+    async def abort(self):
+        self.aborted = True
+
+
+class FakeAuditService:
+    def __init__(self):
+        self.events = []
+
+    async def log_audit_event(self, **kwargs):
+        self.events.append(kwargs)
+
+
+def make_repository(engagement_id="e1", assessments=3, documents=5):
+    repository = InMemoryRepository()
+    for i in range(assessments):
+        repository.create_assessment(Assessment(name=f"Assessment {i}", engagement_id=engagement_id))
+    for i in range(documents):
+        repository.add_document(Document(
+            engagement_id=engagement_id, filename=f"doc-{i}.pdf", path=f"/tmp/doc-{i}.pdf",
+            uploaded_by="lead@example.com"
+        ))
+    return repository
+
+
+def read_lines(data: bytes, compressed: bool):
+    text = (gzip.decompress(data) if compressed else data).decode("utf-8")
+    return [json.loads(line) for line in text.splitlines()]
+
+
+class FakeBlobStore:
+    """Container client and credential stand-in that records whether they were closed"""
+
+    def __init__(self, blobs=None, fail_commit=False):
+        self.blobs = dict(blobs or {})
+        self.fail_commit = fail_commit
+        self.container_closed = False
+        self.credential_closed = False
+
+    def clients(self):
+        store = self
+
+        class Container:
+            def get_blob_client(self, name):
+                return FakeBlob(store, name)
+
+            async def close(self):
+                store.container_closed = True
+
+        class Credential:
+            async def close(self):
+                store.credential_closed = True
+
+        return Container(), Credential()
+
+    @property
+    def closed(self):
+        return self.container_closed and self.credential_closed
+
+
+class FakeBlob:
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.url = f"https://blob/{name}"
+        self.staged = []
+
+    async def stage_block(self, block_id, data, length):
+        self.staged.append(data)
+
+    async def commit_block_list(self, blocks):
+        if self.store.fail_commit:
+            raise RuntimeError("commit failed")
+        self.store.blobs[self.name] = b"".join(self.staged)
+
+    async def download_blob(self):
+        if self.name not in self.store.blobs:
+            raise ResourceNotFoundError("not found")
+        data = self.store.blobs[self.name]
+
+        class Downloader:
+            async def chunks(self):
+                yield data
+        return Downloader()
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.storage, "gdpr_export_dir", str(tmp_path / "exports"))
+    monkeypatch.setattr(config.storage, "use_blob_storage", False)
+    return tmp_path / "exports"
+
+
+class TestNDJSONWriter:
+    """Test chunked encoding"""
+
+    @pytest.mark.asyncio
+    async def test_output_is_flushed_in_bounded_chunks(self):
+        sink = RecordingSink()
+        writer = NDJSONExportWriter(sink, compress=False, chunk_size_bytes=256)
+
+        for i in range(100):
+            await writer.write_record("documents", {"id": i, "name": "x" * 20})
+        size, _ = await writer.close()
+
+        assert len(sink.chunks) > 10
+        # A chunk holds at most one record past the threshold
+        assert max(len(chunk) for chunk in sink.chunks) < 256 + 100
+        assert size == sum(len(chunk) for chunk in sink.chunks)
+        lines = read_lines(b"".join(sink.chunks), compressed=False)
+        assert [line["record"]["id"] for line in lines] == list(range(100))
+
+    @pytest.mark.asyncio
+    async def test_gzip_output_is_one_valid_stream(self):
+        sink = RecordingSink()
+        writer = NDJSONExportWriter(sink, compress=True, chunk_size_bytes=128)
+
+        for i in range(50):
+            await writer.write_record("assessments", {"id": i})
+        await writer.close()
+
+        lines = read_lines(b"".join(sink.chunks), compressed=True)
+        assert len(lines) == 50
+        assert lines[0] == {"collection": "assessments", "record": {"id": 0}}
+
+
+class TestStreamingExport:
+    """Test exporting an engagement"""
+
+    @pytest.mark.asyncio
+    async def test_export_reports_progress_per_collection(self, tmp_path):
+        repository = make_repository()
+        progress = []
+
+        async def on_progress(collection, records, total):
+            progress.append((collection, records, total))
+
+        path = tmp_path / "export.ndjson.gz"
+        manifest = await stream_engagement_export(
+            repository, "e1", "export-1", LocalExportSink(str(path)), on_progress=on_progress
+        )
+
+        assert progress == [("assessments", 3, 3), ("documents", 5, 8)]
+        assert manifest.record_counts == {"assessments": 3, "documents": 5}
+        assert manifest.size_bytes == path.stat().st_size
+        lines = read_lines(path.read_bytes(), compressed=True)
+        assert {line["record"]["engagement_id"] for line in lines} == {"e1"}
+
+    @pytest.mark.asyncio
+    async def test_documents_can_be_excluded(self):
+        sink = RecordingSink()
+        manifest = await stream_engagement_export(
+            make_repository(), "e1", "export-1", sink, compress=False, include_documents=False
+        )
+
+        assert manifest.record_counts == {"assessments": 3}
+        assert manifest.location == "memory://export"
+
+    @pytest.mark.asyncio
+    async def test_failed_export_leaves_no_file(self, tmp_path):
+        repository = make_repository()
+        repository.list_documents = lambda engagement_id: (_ for _ in ()).throw(RuntimeError("read failed"))
+        path = tmp_path / "export.ndjson.gz"
+
+        with pytest.raises(RuntimeError):
+            await stream_engagement_export(repository, "e1", "export-1", LocalExportSink(str(path)))
+
+        assert list(tmp_path.iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_open_export_only_finds_finished_files(self, export_dir):
+        export_id = "3f1c1b7e-8a7b-4a51-9f00-1c2d3e4f5a6b"
+        sink = gdpr_export.create_export_sink("e1", export_id, compress=True)
+        await sink.write(b"partial")
+        assert await open_export("e1", export_id) is None
+
+        await sink.close()
+        name, chunks = await open_export("e1", export_id)
+        assert name == f"{export_id}.ndjson.gz"
+        assert b"".join([chunk async for chunk in chunks]) == b"partial"
+        assert await open_export("e1", "../../etc/passwd") is None
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("fail_commit", [False, True])
+    async def test_blob_sink_closes_its_clients(self, monkeypatch, fail_commit):
+        store = FakeBlobStore(fail_commit=fail_commit)
+        monkeypatch.setattr(gdpr_export, "_blob_container_client", store.clients)
+        sink = gdpr_export.create_export_sink("e1", "export-1", compress=False)
+
+        if fail_commit:
+            with pytest.raises(RuntimeError):
+                await stream_engagement_export(make_repository(), "e1", "export-1", sink, compress=False)
+        else:
+            await stream_engagement_export(make_repository(), "e1", "export-1", sink, compress=False)
+            assert "e1/export-1.ndjson" in store.blobs
+        assert store.closed
+
+    @pytest.mark.asyncio
+    async def test_blob_download_closes_its_clients(self, monkeypatch, export_dir):
+        export_id = "3f1c1b7e-8a7b-4a51-9f00-1c2d3e4f5a6b"
+        store = FakeBlobStore({f"e1/{export_id}.ndjson": b"data"})
+        monkeypatch.setattr(gdpr_export, "_blob_container_client", store.clients)
+
+        name, chunks = await open_export("e1", export_id)
+        assert not store.closed
+        assert b"".join([chunk async for chunk in chunks]) == b"data"
+        assert store.closed
+
+        missing = FakeBlobStore()
+        monkeypatch.setattr(gdpr_export, "_blob_container_client", missing.clients)
+        assert await open_export("e1", export_id) is None
+        assert missing.closed
+
+
+class TestDataExportJob:
+    """Test the data_export job handler"""
+
+    @pytest.mark.asyncio
+    async def test_job_returns_download_handle(self, tmp_path, export_dir):
+        queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+        scheduler = JobScheduler(queue, poll_interval_seconds=0.05)
+        audit = FakeAuditService()
+        service = BackgroundJobService(make_repository(), audit, scheduler)
+        export_id = "0d4c3f8e-2a1b-4c5d-8e9f-a0b1c2d3e4f5"
+        finished = []
+        handler = service._job_handlers["data_export"]
+
+        async def recording_handler(job):
+            result = await handler(job)
+            finished.append(result)
+            return result
+
+        service.register_job_handler("data_export", recording_handler)
+        await service.create_job(
+            "data_export", "lead@example.com", {"engagement_id": "e1", "export_id": export_id}, engagement_id="e1"
+        )
+        await scheduler.start(service)
+        for _ in range(500):
+            if finished:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+        queue.close()
+
+        [result] = finished
+        assert result["record_count"] == 8
+        assert result["download_url"] == f"/api/gdpr/engagements/e1/export/{export_id}/download"
+        assert (export_dir / "e1" / f"{export_id}.ndjson.gz").exists()
+        assert any(event["action_type"] == "data_export_completed" for event in audit.events)
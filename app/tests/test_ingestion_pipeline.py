@@ -0,0 +1,326 @@
+"""
+Unit tests for the staged ingestion pipeline.
+Tests cross-document embedding batches, 429-driven adaptive concurrency,
+failure isolation, file extraction and checkpointed reindex resumption.
+
+Benchmark with: pytest tests/test_ingestion_pipeline.py -m slow -s
+"""
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import services.rag as rag
+from config import config
+from domain.models import Document
+from services.embeddings import EmbeddingResult, TextChunk
+from services.ingestion_pipeline import (
+    AdaptiveConcurrencyLimiter, IngestionCheckpoint, IngestionPipeline
+)
+from services.rag import IngestionStatus, RAGService
+
+
+class ThrottledError(Exception):
+    """Shaped like openai.RateLimitError"""
+
+    def __init__(self, retry_after_ms: str = "20"):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        self.response = SimpleNamespace(headers={"retry-after-ms": retry_after_ms})
+
+
+class FakeEmbeddings:
+    """Embeddings stand-in: one chunk per '|'-separated part, fixed latency"""
+
+    def __init__(self, latency: float = 0.0, throttle_first: int = 0, fail_on: str = None):
+        self.latency = latency
+        self.throttle_first = throttle_first
+        self.fail_on = fail_on
+        self.batches = []
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def chunk_text(self, text, document_id):
+        return [
+            TextChunk(text=part, start_index=0, end_index=len(part), chunk_index=i, token_count=len(part) // 4)
+            for i, part in enumerate(p for p in text.split("|") if p)
+        ]
+
+    async def get_cached(self, chunks, document_id):
+        return [None] * len(chunks)
+
+    async def store_cached(self, results):
+        pass
+
+    async def embed_chunks(self, chunks):
+        self.calls += 1
+        call = self.calls
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if call <= self.throttle_first:
+                raise ThrottledError()
+            if self.fail_on and any(self.fail_on in chunk.text for chunk in chunks):
+                raise RuntimeError("model error")
+        finally:
+            self.in_flight -= 1
+        self.batches.append(len(chunks))
+        return [EmbeddingResult(chunk=c, embedding=[0.1, 0.2], model="emb", usage_tokens=c.token_count) for c in chunks]
+
+
+class FakeIndex:
+    """Collects uploaded records; can reject records of one document"""
+
+    def __init__(self, reject_document: str = None):
+        self.reject_document = reject_document
+        self.records = []
+        self.batches = []
+
+    async def upload(self, records, label):
+        if any(r["document_id"] == self.reject_document for r in records):
+            raise RuntimeError("index unavailable")
+        self.batches.append(len(records))
+        self.records.extend(records)
+
+
+def make_document(doc_id: str, path: str = "/nonexistent", size: int = 100) -> Document:
+    return Document(id=doc_id, engagement_id="eng-1", filename=f"{doc_id}.txt",
+                    path=path, size=size, uploaded_by="user@example.com")
+
+
+def make_status(doc_id: str) -> IngestionStatus:
+    return IngestionStatus(document_id=doc_id, status="pending", chunks_processed=0, total_chunks=0)
+
+
+def make_pipeline(embeddings, index, checkpoint=None) -> IngestionPipeline:
+    return IngestionPipeline(embeddings, RAGService._to_search_document, index.upload, "eng-1", checkpoint)
+
+
+@pytest.fixture
+def pipeline_config(monkeypatch, tmp_path):
+    def configure(**settings):
+        monkeypatch.setattr(config.embeddings, "retry_delay", 0.01)
+        monkeypatch.setattr(config.rag, "ingestion_checkpoint_dir", str(tmp_path / "checkpoints"))
+        for name, value in settings.items():
+            section = config.embeddings if hasattr(config.embeddings, name) else config.rag
+            monkeypatch.setattr(section, name, value)
+    return configure
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Test additive increase, multiplicative decrease and Retry-After"""
+
+    @pytest.mark.asyncio
+    async def test_limit_grows_with_successes(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=2, maximum=4)
+        for _ in range(10):
+            await limiter.release(await limiter.acquire())
+        assert limiter.limit == 4
+
+    @pytest.mark.asyncio
+    async def test_burst_of_throttles_halves_once(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=8, maximum=8)
+        epochs = [await limiter.acquire() for _ in range(8)]
+        for epoch in epochs:
+            await limiter.release(epoch, throttled=True)
+        assert limiter.limit == 4
+        assert limiter.throttled == 8
+
+    @pytest.mark.asyncio
+    async def test_retry_after_pauses_callers(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=2, maximum=2)
+        await limiter.release(await limiter.acquire(), throttled=True, retry_after=0.1)
+        start = time.monotonic()
+        await limiter.acquire()
+        assert time.monotonic() - start >= 0.09
+
+
+class TestIngestionPipeline:
+    """Test the staged pipeline with fake embedding and index clients"""
+
+    @pytest.mark.asyncio
+    async def test_chunks_are_packed_across_documents(self, pipeline_config):
+        pipeline_config(batch_size=16, ingestion_upload_batch_size=50)
+        embeddings, index = FakeEmbeddings(), FakeIndex()
+        statuses = {f"d{i}": make_status(f"d{i}") for i in range(10)}
+        docs = [(make_document(doc_id), "alpha|beta|gamma", status) for doc_id, status in statuses.items()]
+
+        pipeline = make_pipeline(embeddings, index)
+        await pipeline.run(docs)
+
+        assert all(s.status == "completed" and s.chunks_processed == 3 for s in statuses.values())
+        assert sum(embeddings.batches) == 30
+        assert len(embeddings.batches) < 10  # Fewer requests than documents
+        assert max(embeddings.batches) == 16
+        assert len(index.records) == 30
+        assert len({r["id"] for r in index.records}) == 30
+        metrics = pipeline.metrics.as_dict()
+        assert metrics["stages"]["upload"]["items_out"] == 30
+        assert metrics["embedding"]["avg_chunks_per_request"] > 3
+
+    @pytest.mark.asyncio
+    async def test_token_budget_limits_batches(self, pipeline_config):
+        pipeline_config(batch_size=16, max_batch_tokens=10)
+        embeddings, index = FakeEmbeddings(), FakeIndex()
+        text = "|".join(["x" * 20] * 6)  # 5 tokens per chunk
+        await make_pipeline(embeddings, index).run([(make_document("d1"), text, make_status("d1"))])
+        assert embeddings.batches == [2, 2, 2]
+
+    @pytest.mark.asyncio
+    async def test_throttled_requests_are_retried(self, pipeline_config):
+        pipeline_config(batch_size=1, initial_concurrency=4, max_concurrency=4, max_retries=3)
+        embeddings, index = FakeEmbeddings(latency=0.01, throttle_first=2), FakeIndex()
+        status = make_status("d1")
+
+        pipeline = make_pipeline(embeddings, index)
+        await pipeline.run([(make_document("d1"), "a|b|c|d|e|f|g|h", status)])
+
+        assert status.status == "completed"
+        assert len(index.records) == 8
+        assert pipeline.metrics.embedding.throttled == 2
+        assert pipeline.metrics.embedding.retries == 2
+
+    @pytest.mark.asyncio
+    async def test_failures_are_isolated_per_document(self, pipeline_config):
+        # One record per upload so a rejected batch holds one document's chunk
+        pipeline_config(batch_size=1, max_retries=0, ingestion_upload_batch_size=1)
+        embeddings, index = FakeEmbeddings(fail_on="poison"), FakeIndex(reject_document="d3")
+        statuses = {doc_id: make_status(doc_id) for doc_id in ("d1", "d2", "d3")}
+        texts = {"d1": "fine|text", "d2": "fine|poison", "d3": "rejected|upload"}
+
+        pipeline = make_pipeline(embeddings, index)
+        await pipeline.run([(make_document(d), texts[d], statuses[d]) for d in statuses])
+
+        assert statuses["d1"].status == "completed"
+        assert statuses["d2"].status == "failed" and "Embedding failed" in statuses["d2"].error
+        assert statuses["d3"].status == "failed" and "Upload failed" in statuses["d3"].error
+        assert {r["document_id"] for r in index.records} == {"d1"}
+        assert pipeline.retryable_failures == 2
+
+    @pytest.mark.asyncio
+    async def test_text_is_extracted_from_files(self, pipeline_config, tmp_path):
+        pipeline_config()
+        path = tmp_path / "policy.txt"
+        path.write_text("Access reviews happen quarterly|MFA is enforced")
+        present, missing = make_status("present"), make_status("missing")
+
+        pipeline = make_pipeline(FakeEmbeddings(), FakeIndex())
+        await pipeline.run([
+            (make_document("present", path=str(path)), None, present),
+            (make_document("missing"), None, missing)
+        ])
+
+        assert present.status == "completed" and present.total_chunks == 2
+        assert missing.status == "failed" and missing.error == "Document file not found"
+        assert pipeline.retryable_failures == 0
+
+
+class TestCheckpointedReindex:
+    """Test resuming an interrupted engagement reindex"""
+
+    @pytest.fixture
+    def service(self, monkeypatch):
+        embeddings = FakeEmbeddings()
+        monkeypatch.setattr(rag, "create_embeddings_service", lambda correlation_id=None: embeddings)
+        monkeypatch.setattr(RAGService, "_initialize_clients", lambda self: None)
+        service = RAGService("test")
+        service.deleted = 0
+
+        async def delete(engagement_id):
+            service.deleted += 1
+        service._delete_engagement_documents = delete
+        return service
+
+    @pytest.mark.asyncio
+    async def test_resume_skips_completed_documents(self, service, pipeline_config):
+        pipeline_config(ingestion_upload_batch_size=2)
+        documents = [(make_document(d), "one|two") for d in ("a", "b")]
+
+        index = FakeIndex(reject_document="b")
+        service._upload_batch_with_retry = index.upload
+        first = await service.reindex_engagement_documents("eng-1", documents)
+        assert (first["a"].status, first["b"].status) == ("completed", "failed")
+
+        checkpoint = IngestionCheckpoint(config.rag.ingestion_checkpoint_dir, "eng-1")
+        assert checkpoint.load() and list(checkpoint.completed) == ["a"]
+
+        index.reject_document = None
+        second = await service.reindex_engagement_documents("eng-1", documents)
+        assert all(s.status == "completed" for s in second.values())
+        assert service.deleted == 1  # The resumed run kept the partial index
+        assert [r["document_id"] for r in index.records].count("a") == 2  # Not uploaded again
+        assert service.last_ingestion_metrics["skipped_from_checkpoint"] == 1
+        assert not checkpoint.path.exists()
+
+    @pytest.mark.asyncio
+    async def test_changed_document_is_reingested(self, service, pipeline_config):
+        pipeline_config()
+        checkpoint = IngestionCheckpoint(config.rag.ingestion_checkpoint_dir, "eng-1")
+        # Indexed before the edit: same size, different content
+        checkpoint.completed = {
+            "a": IngestionCheckpoint.content_key(make_document("a"), "one|two"),
+            "b": IngestionCheckpoint.content_key(make_document("b"), "one|two")
+        }
+        await checkpoint.save()
+        index = FakeIndex()
+        service._upload_batch_with_retry = index.upload
+
+        await service.reindex_engagement_documents("eng-1", [
+            (make_document("a"), "one|six"), (make_document("b"), "one|two")
+        ])
+        assert [r["document_id"] for r in index.records] == ["a", "a"]
+        assert service.deleted == 0
+
+    def test_content_key_hashes_the_file(self, tmp_path):
+        path = tmp_path / "a.txt"
+        path.write_text("one|two")
+        document = make_document("a", path=str(path), size=7)
+
+        assert IngestionCheckpoint.content_key(document) == IngestionCheckpoint.content_key(document, "one|two")
+        path.write_text("one|six")
+        assert IngestionCheckpoint.content_key(document) != IngestionCheckpoint.content_key(document, "one|two")
+        assert IngestionCheckpoint.content_key(make_document("missing")) is None
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_many_small_documents_throughput(pipeline_config):
+    """Three-chunk documents at 100ms per embedding request: per-document vs pipeline"""
+    pipeline_config(batch_size=16, initial_concurrency=2, max_concurrency=8)
+    # 60 documents by default; FULL_BENCHMARKS=1 runs 200
+    document_count = 200 if os.getenv("FULL_BENCHMARKS") else 60
+    docs = [(make_document(f"d{i}"), "alpha|beta|gamma") for i in range(document_count)]
+
+    # Previous behaviour: three documents at a time, one request each
+    embeddings = FakeEmbeddings(latency=0.1)
+    semaphore = asyncio.Semaphore(3)
+
+    async def per_document(document, text):
+        async with semaphore:
+            await embeddings.embed_chunks(embeddings.chunk_text(text, document.id))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[per_document(doc, text) for doc, text in docs])
+    sequential_seconds = time.perf_counter() - start
+    sequential_requests = embeddings.calls
+
+    embeddings, index = FakeEmbeddings(latency=0.1), FakeIndex()
+    pipeline = make_pipeline(embeddings, index)
+    start = time.perf_counter()
+    await pipeline.run([(doc, text, make_status(doc.id)) for doc, text in docs])
+    pipeline_seconds = time.perf_counter() - start
+
+    metrics = pipeline.metrics.as_dict()
+    print(
+        f"\nper-document: {sequential_seconds:.2f}s, {sequential_requests} requests; "
+        f"pipeline: {pipeline_seconds:.2f}s, {embeddings.calls} requests, "
+        f"peak concurrency {metrics['embedding']['peak_concurrency']}, "
+        f"throughput {metrics['stages']['upload']['throughput_per_second']} chunks/s"
+    )
+    assert len(index.records) == 3 * document_count
+    assert embeddings.calls < sequential_requests / 4
+    assert pipeline_seconds < sequential_seconds / 2
@@ -0,0 +1,266 @@
+"""
+Unit tests for the background job scheduler.
+Tests the persisted priority queue, per-type concurrency limits across
+workers, lease expiry and loss, progress checkpoints, retries and metrics.
+"""
+import asyncio
+import time
+
+import pytest
+
+from api.schemas.gdpr import BackgroundJob
+from services.background_jobs import BackgroundJobService, JobLeaseLostError, JobScheduler
+from services.job_queue import SQLiteJobQueue
+
+
+class FakeAuditService:
+    def __init__(self):
+        self.events = []
+
+    async def log_audit_event(self, **kwargs):
+        self.events.append(kwargs)
+
+
+def make_job(job_type="data_export", priority=0) -> BackgroundJob:
+    return BackgroundJob(job_type=job_type, created_by="admin@example.com", priority=priority)
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "jobs" / "queue.db")
+
+
+@pytest.fixture
+def queue(queue_path):
+    job_queue = SQLiteJobQueue(queue_path)
+    yield job_queue
+    job_queue.close()
+
+
+def make_service(queue, **kwargs):
+    kwargs.setdefault("poll_interval_seconds", 0.05)
+    scheduler = JobScheduler(queue, **kwargs)
+    return BackgroundJobService(None, FakeAuditService(), scheduler), scheduler
+
+
+async def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+class TestJobQueue:
+    """Test claiming from the persisted queue"""
+
+    def test_claims_highest_priority_first(self, queue):
+        for name, priority in [("low", 0), ("high", 10), ("mid", 5)]:
+            job = make_job(priority=priority)
+            job.parameters = {"name": name}
+            queue.enqueue(job, priority)
+
+        claimed = queue.claim("w1", 60, {}, default_limit=10, max_count=3)
+
+        assert [item.job.parameters["name"] for item in claimed] == ["high", "mid", "low"]
+
+    def test_type_limit_holds_across_workers(self, queue, queue_path):
+        other_worker = SQLiteJobQueue(queue_path)
+        for _ in range(3):
+            queue.enqueue(make_job("data_purge"))
+        queue.enqueue(make_job("ttl_cleanup"))
+        limits = {"data_purge": 1}
+
+        first = queue.claim("w1", 60, limits, default_limit=10, max_count=4)
+        second = other_worker.claim("w2", 60, limits, default_limit=10, max_count=4)
+
+        assert sorted(item.job.job_type for item in first) == ["data_purge", "ttl_cleanup"]
+        assert second == []
+        other_worker.close()
+
+    def test_expired_lease_is_reclaimed(self, queue):
+        queue.enqueue(make_job())
+        [first] = queue.claim("w1", 0.05, {}, default_limit=1)
+        assert queue.claim("w2", 60, {}, default_limit=1) == []
+
+        time.sleep(0.1)
+        [second] = queue.claim("w2", 60, {}, default_limit=1)
+
+        assert second.job.id == first.job.id
+        assert not queue.renew_lease(first.job.id, "w1", 60)
+        assert not queue.complete(first.job.id, "w1")
+        assert queue.complete(second.job.id, "w2")
+
+    def test_duplicate_enqueue_keeps_place(self, queue):
+        job = make_job()
+        assert queue.enqueue(job, 0)
+        assert not queue.enqueue(job, 100)
+        assert queue.stats()["queued"] == 1
+
+
+class TestJobScheduler:
+    """Test running jobs through the scheduler"""
+
+    @pytest.mark.asyncio
+    async def test_runs_jobs_within_concurrency_limits(self, queue):
+        service, scheduler = make_service(queue, max_concurrent_jobs=4, concurrency_limits={"data_export": 2})
+        running, peak = set(), []
+
+        async def handler(job):
+            running.add(job.id)
+            peak.append(len(running))
+            await asyncio.sleep(0.05)
+            running.discard(job.id)
+            return {"ok": True}
+
+        service.register_job_handler("data_export", handler)
+        jobs = [await service.create_job("data_export", "admin@example.com", {}) for _ in range(6)]
+        await scheduler.start(service)
+        await wait_until(lambda: scheduler.get_metrics()["completed"] == 6)
+        await scheduler.stop()
+
+        assert max(peak) == 2
+        assert queue.stats()["queued"] == 0
+        assert [await service.get_job(job.id) for job in jobs] == [None] * 6
+
+    @pytest.mark.asyncio
+    async def test_enqueue_without_running_scheduler_warns(self, queue, caplog):
+        service, scheduler = make_service(queue)
+
+        with caplog.at_level("WARNING", logger="services.background_jobs"):
+            await service.create_job("data_export", "admin@example.com", {})
+        assert "no job scheduler is running" in caplog.text
+
+        caplog.clear()
+        await scheduler.start(service)
+        with caplog.at_level("WARNING", logger="services.background_jobs"):
+            await service.create_job("data_export", "admin@example.com", {})
+        await scheduler.stop()
+        assert "no job scheduler is running" not in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_create_job_uses_priority(self, queue):
+        service, scheduler = make_service(queue, max_concurrent_jobs=1)
+        order = []
+
+        async def handler(job):
+            order.append(job.parameters["name"])
+            return {}
+
+        service.register_job_handler("ttl_cleanup", handler)
+        for name, priority in [("background", 0), ("urgent", 9), ("normal", 5)]:
+            await service.create_job("ttl_cleanup", "admin@example.com", {"name": name}, priority=priority)
+        await scheduler.start(service)
+        await wait_until(lambda: len(order) == 3)
+        await scheduler.stop()
+
+        assert order == ["urgent", "normal", "background"]
+
+    @pytest.mark.asyncio
+    async def test_failed_job_is_requeued_with_backoff(self, queue, monkeypatch):
+        service, scheduler = make_service(queue)
+        monkeypatch.setattr(service, "_schedule_retry", _no_backoff(service._schedule_retry))
+        attempts = []
+
+        async def flaky(job):
+            attempts.append(job.retry_count)
+            if len(attempts) == 1:
+                raise RuntimeError("transient")
+            return {"attempts": len(attempts)}
+
+        service.register_job_handler("data_export", flaky)
+        await service.create_job("data_export", "admin@example.com", {})
+        await scheduler.start(service)
+        await wait_until(lambda: scheduler.get_metrics()["completed"] == 1)
+        await scheduler.stop()
+
+        metrics = scheduler.get_metrics()
+        assert attempts == [0, 1]
+        assert metrics["retried"] == 1 and metrics["failed"] == 0
+
+    @pytest.mark.asyncio
+    async def test_checkpoint_survives_lost_worker(self, queue, queue_path):
+        service, scheduler = make_service(queue, lease_seconds=0.2)
+        checkpointed = asyncio.Event()
+
+        async def export_then_hang(job):
+            await service.update_job_progress(job.id, 50, "halfway", checkpoint={"offset": 500})
+            checkpointed.set()
+            await asyncio.sleep(60)
+
+        service.register_job_handler("data_export", export_then_hang)
+        job = await service.create_job("data_export", "admin@example.com", {})
+        await scheduler.start(service)
+        await asyncio.wait_for(checkpointed.wait(), timeout=5)
+        # Simulate a crashed worker: its lease stops being renewed
+        scheduler._task.cancel()
+        scheduler._running[job.id].cancel()
+        await asyncio.sleep(0.3)
+
+        other_worker = SQLiteJobQueue(queue_path)
+        [resumed] = other_worker.claim("w2", 60, {}, default_limit=1)
+        assert resumed.job.checkpoint == {"offset": 500}
+        assert resumed.job.progress_percent == 50
+        other_worker.close()
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_lost_lease_stops_the_handler(self, queue):
+        service, scheduler = make_service(queue, lease_seconds=60)
+        outcome = []
+        claimed = asyncio.Event()
+
+        async def handler(job):
+            claimed.set()
+            await asyncio.sleep(0.05)
+            try:
+                await service.update_job_progress(job.id, 10)
+            except JobLeaseLostError:
+                outcome.append("lease lost")
+                raise
+            outcome.append("kept running")
+
+        service.register_job_handler("data_export", handler)
+        job = await service.create_job("data_export", "admin@example.com", {})
+        await scheduler.start(service)
+        await asyncio.wait_for(claimed.wait(), timeout=5)
+        # Another worker takes the job over
+        queue.release(job, scheduler.owner)
+        queue.claim("w2", 60, {}, default_limit=1)
+        await wait_until(lambda: not scheduler._running)
+        await scheduler.stop()
+
+        assert outcome == ["lease lost"]
+        assert scheduler.get_metrics()["leases_lost"] == 1
+        assert queue.stats()["running"] == 1
+
+    @pytest.mark.asyncio
+    async def test_metrics_report_depth_and_wait(self, queue):
+        service, scheduler = make_service(queue, max_concurrent_jobs=1)
+        release = asyncio.Event()
+
+        async def handler(job):
+            await release.wait()
+            return {}
+
+        service.register_job_handler("data_export", handler)
+        for _ in range(3):
+            await service.create_job("data_export", "admin@example.com", {})
+        await scheduler.start(service)
+        await wait_until(lambda: scheduler.get_metrics()["running"] == 1)
+
+        metrics = scheduler.get_metrics()
+        assert metrics["queue"]["queued"] == 2
+        assert metrics["queue"]["by_type"]["data_export"] == {"queued": 2, "running": 1}
+        assert metrics["queue"]["oldest_wait_seconds"] >= 0
+
+        release.set()
+        await wait_until(lambda: scheduler.get_metrics()["completed"] == 3)
+        await scheduler.stop()
+        assert scheduler.get_metrics()["wait_seconds"]["max"] >= scheduler.get_metrics()["wait_seconds"]["avg"] > 0
+
+
+def _no_backoff(schedule_retry):
+    async def wrapper(job, error_message):
+        await schedule_retry(job, error_message)
+        return 0
+    return wrapper
@@ -0,0 +1,288 @@
+"""
+Unit tests for the async LLM client and streaming orchestrator.
+Tests the token bucket, pooled non-blocking calls, Retry-After handling and
+incremental parsing of streamed output against a mock Azure OpenAI server.
+
+Benchmark with: pytest tests/test_llm_client.py -m slow -s
+"""
+import asyncio
+import time
+
+import pytest
+
+import ai.llm as llm
+from ai.llm import LLMClient, LLMError, TokenBucket
+from ai.orchestrator import Orchestrator
+from config import config
+from tests.mock_openai_server import MockOpenAIServer
+
+requires_openai = pytest.mark.skipif(llm.AsyncAzureOpenAI is None, reason="openai and httpx not installed")
+
+ANALYSIS = (
+    "Findings:\n"
+    "- [high] Identity: MFA not enforced for admins.\n"
+    "- [medium] Data: No DLP policies for M365.\n"
+    "- [low] SecOps: Runbooks missing for P1 incidents.\n"
+)
+
+
+def current_pool() -> "llm._ClientPool":
+    return llm._pools[asyncio.get_running_loop()]
+
+
+class StreamingLLM:
+    """LLM stand-in that streams its answer in fixed-size pieces"""
+
+    def __init__(self, text: str, piece_size: int = 5):
+        self.text = text
+        self.piece_size = piece_size
+        self.generate_calls = 0
+
+    async def generate(self, system: str, user: str) -> str:
+        self.generate_calls += 1
+        return self.text
+
+    async def generate_stream(self, system: str, user: str):
+        for i in range(0, len(self.text), self.piece_size):
+            await asyncio.sleep(0)
+            yield self.text[i:i + self.piece_size]
+
+
+@pytest.fixture
+def azure_openai(monkeypatch):
+    """Point the LLM module at a mock server instead of resolving secrets"""
+    def configure(server: MockOpenAIServer, **settings):
+        monkeypatch.setattr(llm, "_settings", {
+            "api_key": "test-key",
+            "api_version": "2024-02-01",
+            "azure_endpoint": server.endpoint,
+        })
+        monkeypatch.setattr(llm, "_model", "gpt-test")
+        monkeypatch.setattr(llm, "USE_MOCK", False)
+        monkeypatch.setattr(llm, "_client_initialized", True)
+        monkeypatch.setattr(llm, "_pools", {})
+        monkeypatch.setattr(llm, "_limiter", None)
+        for name, value in settings.items():
+            monkeypatch.setattr(config.azure_openai, name, value)
+    return configure
+
+
+class TestTokenBucket:
+    """Test request pacing and Retry-After pauses"""
+
+    @pytest.mark.asyncio
+    async def test_unlimited_bucket_never_waits(self):
+        bucket = TokenBucket(0)
+        start = time.monotonic()
+        for _ in range(1000):
+            await bucket.acquire()
+        assert time.monotonic() - start < 0.5
+
+    @pytest.mark.asyncio
+    async def test_requests_beyond_burst_are_paced(self):
+        bucket = TokenBucket(requests_per_minute=1200, burst=2)  # 20/s
+        start = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        # Two from the burst, then two more at 50ms intervals
+        assert time.monotonic() - start >= 0.09
+
+    @pytest.mark.asyncio
+    async def test_pause_holds_back_every_caller(self):
+        bucket = TokenBucket(0)
+        bucket.pause(0.1)
+        start = time.monotonic()
+        await asyncio.gather(*[bucket.acquire() for _ in range(5)])
+        assert time.monotonic() - start >= 0.09
+
+
+class TestOrchestratorStreaming:
+    """Test line-by-line parsing of generated and streamed output"""
+
+    @pytest.mark.asyncio
+    async def test_streamed_analysis_matches_buffered(self, monkeypatch):
+        fake = StreamingLLM(ANALYSIS)
+        monkeypatch.setattr(config.azure_openai, "stream_responses", False)
+        buffered, buffered_log = await Orchestrator(fake).analyze("a-1", "content")
+
+        monkeypatch.setattr(config.azure_openai, "stream_responses", True)
+        streamed, streamed_log = await Orchestrator(fake).analyze("a-1", "content")
+
+        assert fake.generate_calls == 1
+        assert [(f.severity, f.area, f.title) for f in streamed] == [(f.severity, f.area, f.title) for f in buffered]
+        assert len(streamed) == 3
+        assert streamed_log.output_preview == buffered_log.output_preview
+
+    @pytest.mark.asyncio
+    async def test_streamed_recommendations_without_trailing_newline(self, monkeypatch):
+        monkeypatch.setattr(config.azure_openai, "stream_responses", True)
+        text = "1) Enforce MFA for admins (P1, M effort, 4 weeks)\n2) Deploy DLP policies (P3, S, 6 weeks)"
+        recs, log = await Orchestrator(StreamingLLM(text, piece_size=3)).recommend("a-1", "findings")
+
+        assert [(r.priority, r.effort, r.timeline_weeks) for r in recs] == [("P1", "M", 4), ("P3", "S", 6)]
+        assert log.agent == "GapRecommender"
+
+    @pytest.mark.asyncio
+    async def test_mock_client_streams_mock_response(self, monkeypatch):
+        monkeypatch.setattr(llm, "USE_MOCK", True)
+        monkeypatch.setattr(llm, "_client_initialized", True)
+        pieces = [piece async for piece in LLMClient().generate_stream("system", "user")]
+        assert "".join(pieces) == llm.MOCK_RESPONSE
+
+
+@requires_openai
+class TestAsyncClient:
+    """Test the pooled AsyncAzureOpenAI client against a mock server"""
+
+    @pytest.mark.asyncio
+    async def test_calls_run_concurrently_on_one_pool(self, azure_openai):
+        async with MockOpenAIServer(latency_seconds=0.2) as server:
+            azure_openai(server, max_concurrent_requests=16, requests_per_minute=0)
+            client = LLMClient()
+            start = time.monotonic()
+            results = await asyncio.gather(*[client.generate("system", "user") for _ in range(10)])
+
+            assert all("MFA" in result for result in results)
+            assert time.monotonic() - start < 1.0
+            assert server.peak_in_flight == 10
+            pool = current_pool()
+            await LLMClient().generate("system", "user")
+            assert current_pool() is pool
+            await llm.close_llm_client()
+
+    def test_pool_from_closed_event_loop_is_closed(self, monkeypatch):
+        monkeypatch.setattr(llm, "_settings", {
+            "api_key": "test-key",
+            "api_version": "2024-02-01",
+            "azure_endpoint": "https://example.openai.azure.com",
+        })
+        monkeypatch.setattr(llm, "_pools", {})
+        monkeypatch.setattr(llm, "_limiter", None)
+
+        # Each asyncio.run is a new loop, as with the sync wrappers
+        first = asyncio.run(llm._get_pool())
+        second = asyncio.run(llm._get_pool())
+
+        assert second is not first
+        assert second.limiter is first.limiter
+        assert first.http_client.is_closed and not second.http_client.is_closed
+        assert list(llm._pools.values()) == [second]
+        asyncio.run(llm.close_llm_client())
+
+    def test_pool_of_running_loop_is_left_alone(self, monkeypatch):
+        monkeypatch.setattr(llm, "_settings", {
+            "api_key": "test-key",
+            "api_version": "2024-02-01",
+            "azure_endpoint": "https://example.openai.azure.com",
+        })
+        monkeypatch.setattr(llm, "_pools", {})
+        monkeypatch.setattr(llm, "_limiter", None)
+
+        async def main():
+            pool = await llm._get_pool()
+            # A sync wrapper on another thread runs its own loop meanwhile
+            other = await asyncio.to_thread(asyncio.run, llm._get_pool())
+            assert other is not pool
+            assert not pool.http_client.is_closed
+            assert await llm._get_pool() is pool
+            await llm.close_llm_client()
+            assert pool.http_client.is_closed
+
+        asyncio.run(main())
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, azure_openai):
+        async with MockOpenAIServer(latency_seconds=0.05) as server:
+            azure_openai(server, max_concurrent_requests=3, requests_per_minute=0)
+            await asyncio.gather(*[LLMClient().generate("system", "user") for _ in range(9)])
+
+            assert server.peak_in_flight == 3
+            await llm.close_llm_client()
+
+    @pytest.mark.asyncio
+    async def test_retry_after_is_honoured(self, azure_openai):
+        async with MockOpenAIServer(rate_limited_requests=1, retry_after_seconds=0.2) as server:
+            azure_openai(server, max_retries=3, requests_per_minute=0)
+            result = await LLMClient().generate("system", "user")
+
+            assert "MFA" in result
+            assert server.requests == 2
+            assert server.request_times[1] - server.request_times[0] >= 0.19
+            await llm.close_llm_client()
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_exhausts_retries(self, azure_openai):
+        async with MockOpenAIServer(rate_limited_requests=5, retry_after_seconds=0.01) as server:
+            azure_openai(server, max_retries=2, requests_per_minute=0)
+            with pytest.raises(LLMError, match="Rate limit exceeded"):
+                await LLMClient().generate("system", "user")
+            assert server.requests == 2
+            # Slots released on failure
+            assert current_pool().slots._value == config.azure_openai.max_concurrent_requests
+            await llm.close_llm_client()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_calls_release_their_slots(self, azure_openai):
+        async with MockOpenAIServer(latency_seconds=0.5) as server:
+            azure_openai(server, max_concurrent_requests=2, requests_per_minute=0)
+            calls = [asyncio.create_task(LLMClient().generate("system", "user")) for _ in range(2)]
+            while server.peak_in_flight < 2:
+                await asyncio.sleep(0.01)
+            for call in calls:
+                call.cancel()
+            await asyncio.gather(*calls, return_exceptions=True)
+
+            assert current_pool().slots._value == 2
+            assert "MFA" in await asyncio.wait_for(LLMClient().generate("system", "user"), 2)
+            await llm.close_llm_client()
+
+    @pytest.mark.asyncio
+    async def test_streamed_analysis_from_server(self, azure_openai):
+        async with MockOpenAIServer(content=ANALYSIS) as server:
+            azure_openai(server, stream_responses=True, requests_per_minute=0)
+            findings, log = await Orchestrator(LLMClient()).analyze("a-1", "content")
+
+            assert [f.severity for f in findings] == ["high", "medium", "low"]
+            assert log.output_preview.startswith("Findings:")
+            assert current_pool().slots._value == config.azure_openai.max_concurrent_requests
+            await llm.close_llm_client()
+
+
+@requires_openai
+@pytest.mark.slow
+@pytest.mark.asyncio
+@pytest.mark.parametrize("concurrency", [8, 32])
+async def test_concurrent_analyze_throughput(azure_openai, concurrency):
+    """Concurrent analyze calls one event loop sustains: blocking vs async client"""
+    from openai import AzureOpenAI
+
+    async with MockOpenAIServer(content=ANALYSIS, latency_seconds=0.25) as server:
+        azure_openai(server, max_concurrent_requests=concurrency, max_connections=concurrency, requests_per_minute=0)
+
+        # Previous behaviour: one synchronous call after another
+        sync_client = AzureOpenAI(max_retries=0, **llm._settings)
+
+        # The mock server shares this loop, so the blocking calls run in a
+        # thread; in a worker they held the event loop for the same time
+        start = time.perf_counter()
+        await asyncio.to_thread(
+            lambda: [sync_client.chat.completions.create(model=llm._model, messages=[{"role": "user", "content": "x"}])
+                     for _ in range(concurrency)]
+        )
+        blocking_seconds = time.perf_counter() - start
+
+        orchestrator = Orchestrator(LLMClient())
+        start = time.perf_counter()
+        results = await asyncio.gather(*[orchestrator.analyze(f"a-{i}", "content") for i in range(concurrency)])
+        async_seconds = time.perf_counter() - start
+
+        print(
+            f"\n{concurrency} analyze calls at 250ms model latency: "
+            f"blocking {blocking_seconds:.2f}s ({concurrency / blocking_seconds:.1f}/s), "
+            f"async {async_seconds:.2f}s ({concurrency / async_seconds:.1f}/s), "
+            f"peak in flight {server.peak_in_flight}"
+        )
+        assert all(len(findings) == 3 for findings, _ in results)
+        assert async_seconds < blocking_seconds / 2
+        sync_client.close()
+        await llm.close_llm_client()
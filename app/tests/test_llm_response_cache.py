@@ -0,0 +1,152 @@
+"""
+Unit tests for the LLM response cache.
+Tests content-addressed keys, engagement isolation, deployment invalidation,
+LRU size eviction, per-request bypass and Orchestrator integration.
+"""
+import time
+
+import pytest
+
+from ai.orchestrator import Orchestrator, SYSTEM_ANALYZE
+from ai.response_cache import LLMResponseCache, estimate_tokens
+
+ANALYSIS = (
+    "Findings:\n"
+    "- [high] Identity: MFA not enforced for admins.\n"
+    "- [medium] Data: No DLP policies for M365.\n"
+)
+
+
+class CountingLLM:
+    """LLM stand-in that counts model calls and can switch deployment"""
+
+    def __init__(self, text: str = ANALYSIS, deployment: str = "gpt-4o|v1"):
+        self.text = text
+        self.deployment = deployment
+        self.calls = 0
+
+    async def cache_identity(self):
+        return "gpt-4o", self.deployment, 0.2
+
+    async def generate(self, system: str, user: str) -> str:
+        self.calls += 1
+        return self.text
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm_responses.db"), max_size_mb=1)
+    yield cache
+    cache.close()
+
+
+class TestResponseCache:
+    """Test keys, storage and invalidation"""
+
+    def test_key_covers_every_input(self):
+        base = ("gpt-4o", "dep", 0.2, "system", "user", "eng-1")
+        key = LLMResponseCache.make_key(*base)
+        assert key == LLMResponseCache.make_key(*base)
+        for i, changed in enumerate(["gpt-4", "dep2", 0.7, "system2", "user2", "eng-2"]):
+            variant = list(base)
+            variant[i] = changed
+            assert LLMResponseCache.make_key(*variant) != key
+
+    @pytest.mark.asyncio
+    async def test_hit_records_saved_tokens(self, cache):
+        await cache.put("k1", "eng-1", "dep", "answer", tokens=120)
+        assert await cache.get("k1", "dep") == "answer"
+        assert await cache.get("k2", "dep") is None
+
+        metrics = cache.get_metrics()
+        assert (metrics["hits"], metrics["misses"], metrics["entries"]) == (1, 1, 1)
+        assert metrics["saved_tokens_estimate"] == 120
+        assert metrics["hit_rate"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_new_deployment_invalidates_entries(self, cache):
+        await cache.put("k1", "eng-1", "dep-a", "answer", tokens=10)
+        assert await cache.get("k1", "dep-b") is None
+        assert await cache.get("k1", "dep-a") is None
+        assert cache.get_metrics()["invalidations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_delete_engagement(self, cache):
+        await cache.put("k1", "eng-1", "dep", "one", tokens=1)
+        await cache.put("k2", "eng-2", "dep", "two", tokens=1)
+        assert await cache.delete_engagement("eng-1") == 1
+        assert await cache.get("k1", "dep") is None
+        assert await cache.get("k2", "dep") == "two"
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_entries_are_evicted(self, cache):
+        response = "x" * 200_000
+        for i in range(4):
+            await cache.put(f"k{i}", "eng-1", "dep", response, tokens=1)
+        await cache.get("k0", "dep")  # k0 is now the most recently used
+        for i in range(4, 6):
+            await cache.put(f"k{i}", "eng-1", "dep", response, tokens=1)
+
+        metrics = cache.get_metrics()
+        assert metrics["size_bytes"] <= metrics["max_size_bytes"]
+        assert metrics["evictions"] > 0
+        assert await cache.get("k0", "dep") == response
+        assert await cache.get("k1", "dep") is None
+
+    @pytest.mark.asyncio
+    async def test_expired_entries_are_misses(self, tmp_path):
+        cache = LLMResponseCache(str(tmp_path / "ttl.db"), ttl_seconds=0.001)
+        await cache.put("k1", "eng-1", "dep", "answer", tokens=1)
+        time.sleep(0.01)
+        assert await cache.get("k1", "dep") is None
+        cache.close()
+
+
+class TestOrchestratorCaching:
+    """Test cached analyze and recommend calls"""
+
+    @pytest.mark.asyncio
+    async def test_repeat_analysis_is_served_from_cache(self, cache):
+        llm = CountingLLM()
+        orchestrator = Orchestrator(llm, cache)
+        first, _ = await orchestrator.analyze("a-1", "content", engagement_id="eng-1")
+        second, log = await orchestrator.analyze("a-1", "content", engagement_id="eng-1")
+
+        assert llm.calls == 1
+        assert [f.title for f in second] == [f.title for f in first]
+        assert log.output_preview.startswith("Findings:")
+        assert cache.metrics.saved_tokens_estimate == estimate_tokens(SYSTEM_ANALYZE, "content", ANALYSIS)
+
+    @pytest.mark.asyncio
+    async def test_engagements_do_not_share_entries(self, cache):
+        llm = CountingLLM()
+        orchestrator = Orchestrator(llm, cache)
+        await orchestrator.analyze("a-1", "content", engagement_id="eng-1")
+        await orchestrator.analyze("a-2", "content", engagement_id="eng-2")
+        # Without an engagement nothing is cached
+        await orchestrator.analyze("a-3", "content")
+        await orchestrator.analyze("a-3", "content")
+        assert llm.calls == 4
+
+    @pytest.mark.asyncio
+    async def test_bypass_refreshes_the_entry(self, cache):
+        llm = CountingLLM()
+        orchestrator = Orchestrator(llm, cache)
+        await orchestrator.analyze("a-1", "content", engagement_id="eng-1")
+        llm.text = "- [low] Data: Updated answer.\n"
+        refreshed, _ = await orchestrator.analyze("a-1", "content", engagement_id="eng-1", use_cache=False)
+        cached, _ = await orchestrator.analyze("a-1", "content", engagement_id="eng-1")
+
+        assert llm.calls == 2
+        assert cache.metrics.bypassed == 1
+        assert [f.title for f in cached] == [f.title for f in refreshed] == ["Updated answer."]
+
+    @pytest.mark.asyncio
+    async def test_deployment_change_forces_new_call(self, cache):
+        llm = CountingLLM()
+        orchestrator = Orchestrator(llm, cache)
+        await orchestrator.recommend("a-1", "findings", engagement_id="eng-1")
+        llm.deployment = "gpt-4o|v2"
+        await orchestrator.recommend("a-1", "findings", engagement_id="eng-1")
+        await orchestrator.recommend("a-1", "findings", engagement_id="eng-1")
+        assert llm.calls == 2
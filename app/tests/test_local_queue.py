@@ -0,0 +1,213 @@
+"""
+Unit tests for the local queue backends.
+Tests durable SQLite delivery: visibility timeouts, at-least-once redelivery,
+batched receive and ack, dead-lettering with retention and throughput metrics.
+"""
+import asyncio
+import time
+
+import pytest
+
+import services.local_queue as local_queue
+import services.service_bus as service_bus
+from domain.models import ServiceBusMessage
+from services.local_queue import InMemoryQueue, SQLiteQueue, create_local_queue
+from services.service_bus import ServiceBusConsumer
+
+
+def make_message(n: int = 0) -> ServiceBusMessage:
+    return ServiceBusMessage(type="test", payload={"n": n})
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "queue" / "messages.db")
+
+
+@pytest.fixture
+def queue(queue_path):
+    backend = SQLiteQueue(queue_path, poll_interval_seconds=0.05)
+    yield backend
+    backend.close()
+
+
+class TestSQLiteDelivery:
+    """Test durable peek-lock delivery"""
+
+    @pytest.mark.asyncio
+    async def test_messages_survive_restart(self, queue, queue_path):
+        sent = make_message(1)
+        await queue.send_message("ingest", sent)
+        queue.close()
+
+        reopened = SQLiteQueue(queue_path)
+        received = await reopened.receive_messages("ingest")
+        assert [message.id for message in received] == [sent.id]
+        assert received[0].payload == {"n": 1}
+        assert await reopened.complete_message("ingest", received[0])
+        assert reopened.get_queue_stats("ingest")["active_messages"] == 0
+        reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_workers_never_receive_the_same_message(self, queue, queue_path):
+        other_worker = SQLiteQueue(queue_path)
+        for i in range(10):
+            await queue.send_message("ingest", make_message(i))
+
+        first = await queue.receive_messages("ingest", max_count=6)
+        second = await other_worker.receive_messages("ingest", max_count=6)
+
+        assert len(first) == 6 and len(second) == 4
+        assert not {m.id for m in first} & {m.id for m in second}
+        other_worker.close()
+
+    @pytest.mark.asyncio
+    async def test_expired_lock_is_redelivered(self, queue):
+        await queue.send_message("ingest", make_message())
+        first = await queue.receive_messages("ingest", lock_duration_seconds=0.05)
+        assert await queue.receive_messages("ingest") == []
+
+        await asyncio.sleep(0.1)
+        second = await queue.receive_messages("ingest")
+
+        assert [m.id for m in second] == [first[0].id]
+        # The first delivery's lock is gone; only the redelivery can settle it
+        assert await queue.renew_message_lock("ingest", second[0])
+        assert await queue.complete_message("ingest", second[0])
+
+    @pytest.mark.asyncio
+    async def test_renewed_lock_keeps_message_hidden(self, queue):
+        await queue.send_message("ingest", make_message())
+        [message] = await queue.receive_messages("ingest", lock_duration_seconds=0.1)
+
+        await asyncio.sleep(0.06)
+        assert await queue.renew_message_lock("ingest", message, lock_duration_seconds=0.2)
+        await asyncio.sleep(0.06)
+
+        assert await queue.receive_messages("ingest") == []
+        assert queue.get_queue_stats("ingest")["locked_messages"] == 1
+
+    @pytest.mark.asyncio
+    async def test_requeue_updates_state_and_delays_visibility(self, queue):
+        await queue.send_message("ingest", make_message())
+        [message] = await queue.receive_messages("ingest")
+        message.retry_count = 1
+
+        await queue.requeue_message("ingest", message, delay_seconds=0.05)
+        assert queue.get_queue_stats("ingest")["scheduled_messages"] == 1
+        assert await queue.receive_messages("ingest") == []
+
+        await asyncio.sleep(0.1)
+        [redelivered] = await queue.receive_messages("ingest")
+        assert redelivered.id == message.id
+        assert redelivered.retry_count == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_acks_are_batched(self, queue, monkeypatch):
+        for i in range(40):
+            await queue.send_message("ingest", make_message(i))
+        messages = await queue.receive_messages("ingest", max_count=40)
+
+        batches = []
+        complete_batch = queue._complete_batch
+
+        def counting_complete_batch(handles):
+            batches.append(len(handles))
+            return complete_batch(handles)
+
+        monkeypatch.setattr(queue, "_complete_batch", counting_complete_batch)
+        results = await asyncio.gather(*[queue.complete_message("ingest", m) for m in messages])
+
+        assert all(results)
+        assert sum(batches) == 40
+        assert len(batches) < 40
+        assert queue.get_queue_stats("ingest") == {
+            "active_messages": 0, "locked_messages": 0, "scheduled_messages": 0, "dead_letter_messages": 0
+        }
+
+
+class TestSQLiteDeadLetters:
+    """Test dead-letter handling and retention"""
+
+    @pytest.mark.asyncio
+    async def test_dead_letter_settles_the_lock(self, queue):
+        await queue.send_message("ingest", make_message())
+        [message] = await queue.receive_messages("ingest")
+
+        await queue.dead_letter_message("ingest", message, "Handler returned False")
+
+        stats = queue.get_queue_stats("ingest")
+        assert stats["locked_messages"] == 0 and stats["dead_letter_messages"] == 1
+        [dead] = queue.get_dead_letters("ingest")
+        assert dead.id == message.id and dead.dead_letter_reason == "Handler returned False"
+
+    @pytest.mark.asyncio
+    async def test_poison_message_dead_lettered_after_max_deliveries(self, queue, monkeypatch):
+        monkeypatch.setattr(local_queue, "MAX_DELIVERY_COUNT", 2)
+        await queue.send_message("ingest", make_message())
+
+        for _ in range(2):
+            assert len(await queue.receive_messages("ingest", lock_duration_seconds=0)) == 1
+
+        assert await queue.receive_messages("ingest") == []
+        assert queue.get_queue_stats("ingest")["dead_letter_messages"] == 1
+
+    @pytest.mark.asyncio
+    async def test_dead_letters_pruned_after_retention(self, queue_path):
+        queue = SQLiteQueue(queue_path, dlq_retention_seconds=0, prune_interval_seconds=0)
+        await queue.dead_letter_message("ingest", make_message(), "expired")
+        await asyncio.sleep(0.01)
+
+        await queue.receive_messages("ingest")
+
+        assert queue.get_queue_stats("ingest")["dead_letter_messages"] == 0
+        queue.close()
+
+
+class TestLocalQueueRuntime:
+    """Test the consumer runtime on the durable backend"""
+
+    @pytest.mark.asyncio
+    async def test_consumer_processes_sqlite_messages(self, queue, monkeypatch):
+        monkeypatch.setattr(service_bus, "_local_queue", queue)
+        consumer = ServiceBusConsumer("ingest")
+        done = asyncio.Event()
+        processed = []
+
+        async def handler(message):
+            processed.append(message.payload["n"])
+            if len(processed) == 20:
+                done.set()
+            return True
+
+        for i in range(20):
+            await queue.send_message("ingest", make_message(i))
+        task = asyncio.create_task(consumer.start_listening(handler, max_concurrent_calls=4, prefetch_count=4))
+        await asyncio.wait_for(done.wait(), timeout=5)
+        consumer.stop()
+        await asyncio.wait_for(task, timeout=5)
+
+        assert sorted(processed) == list(range(20))
+        stats = service_bus.get_queue_statistics()
+        assert stats["mode"] == "sqlite"
+        assert stats["ingest"]["active_messages"] == 0
+        assert stats["ingest"]["throughput"]["completed"] == 20
+        assert stats["ingest"]["throughput"]["sent_per_second"] > 0
+
+    @pytest.mark.asyncio
+    async def test_idle_wait_polls_for_other_workers(self, queue, queue_path):
+        other_worker = SQLiteQueue(queue_path)
+        started = time.perf_counter()
+        waiter = asyncio.create_task(queue.wait_for_messages("ingest", timeout=30))
+        await other_worker.send_message("ingest", make_message())
+
+        await asyncio.wait_for(waiter, timeout=1)
+        assert time.perf_counter() - started < 0.5
+        assert len(await queue.receive_messages("ingest")) == 1
+        other_worker.close()
+
+    def test_backend_selection(self, queue_path):
+        assert isinstance(create_local_queue("memory", queue_path), InMemoryQueue)
+        assert isinstance(create_local_queue("sqlite", queue_path), SQLiteQueue)
+        with pytest.raises(ValueError):
+            create_local_queue("redis", queue_path)
@@ -1,6 +1,10 @@
 """
 Unit tests for PII Scrubbing MCP Tool.
 """
+import os
+import random
+import time
+
 import pytest
 from unittest.mock import Mock, MagicMock
 from datetime import datetime, timezone
@@ -518,4 +522,138 @@ class TestToolRegistration:
         register_tool(tool_registry)
         
         assert "pii.scrub" in tool_registry
-        assert tool_registry["pii.scrub"] == PIIScrubberTool
\ No newline at end of file
+        assert tool_registry["pii.scrub"] == PIIScrubberTool
+
+
+def sequential_scrub(tool, text, config):
+    """The pattern-at-a-time approach: a findall and a sub per enabled pattern"""
+    counts = {}
+    for name in config["enabled_patterns"]:
+        if name in tool.compiled_patterns:
+            regex = tool.compiled_patterns[name]["regex"]
+            matches = regex.findall(text)
+            if matches:
+                counts[name] = len(matches)
+                text = regex.sub(tool.compiled_patterns[name]["replacement"], text)
+    return text, counts
+
+
+class TestCombinedScrubEngine:
+    """Test single-pass scrubbing, the compiled pattern cache and streaming."""
+    
+    def test_single_pass_matches_sequential_scrub(self, pii_tool, sample_pii_text):
+        """Test that one combined pass gives the per-pattern results."""
+        config = pii_tool.validate_scrub_config({})
+        text = sample_pii_text + "\nToken ghp_" + "a" * 36 + " id 123e4567-e89b-12d3-a456-426614174000"
+        
+        assert pii_tool.scrub_text(text, config) == sequential_scrub(pii_tool, text, config)
+    
+    def test_custom_patterns_follow_case_sensitivity(self, pii_tool):
+        """Test custom patterns honour case_sensitive while defaults ignore case."""
+        config = pii_tool.validate_scrub_config({"scrub_config": {
+            "enabled_patterns": ["email_address", "employee_id"],
+            "custom_patterns": {"employee_id": {"pattern": r"EMP\d{6}", "replacement": "[EMP]"}},
+            "case_sensitive": True
+        }})
+        
+        scrubbed, counts = pii_tool.scrub_text("EMP123456 emp654321 JANE@CORP.COM", config)
+        
+        assert scrubbed == "[EMP] emp654321 [REDACTED-EMAIL]"
+        assert counts == {"employee_id": 1, "email_address": 1}
+    
+    def test_unsafe_custom_patterns_are_applied_separately(self, pii_tool):
+        """Test backreferences and replacement templates still work."""
+        config = pii_tool.validate_scrub_config({"scrub_config": {
+            "enabled_patterns": ["us_ssn", "ticket", "repeated"],
+            "custom_patterns": {
+                "ticket": {"pattern": r"TICKET-(\d+)", "replacement": r"TICKET-[\1]"},
+                "repeated": {"pattern": r"\b(\w)\1{3,}\b", "replacement": "[REPEATED]"}
+            }
+        }})
+        
+        scrubbed, counts = pii_tool.scrub_text("ticket-42 for 123-45-6789: zzzz", config)
+        
+        assert scrubbed == "TICKET-[42] for [REDACTED-SSN]: [REPEATED]"
+        assert counts == {"us_ssn": 1, "ticket": 1, "repeated": 1}
+    
+    def test_compiled_engine_is_cached_per_config(self, pii_tool):
+        """Test equal configurations share a compiled engine."""
+        config = pii_tool.validate_scrub_config({})
+        
+        assert pii_tool._scrubber_for(config) is pii_tool._scrubber_for(dict(config))
+        assert PIIScrubberTool(Mock())._scrubber_for(config) is pii_tool._scrubber_for(config)
+        assert pii_tool._scrubber_for({**config, "enabled_patterns": ["us_ssn"]}) is not pii_tool._scrubber_for(config)
+    
+    def test_streamed_chunks_match_whole_text(self, pii_tool, sample_pii_text):
+        """Test matches split across chunk boundaries are still redacted."""
+        config = pii_tool.validate_scrub_config({})
+        text = sample_pii_text * 200
+        rng = random.Random(5)
+        chunks = []
+        position = 0
+        while position < len(text):
+            size = rng.randint(1, 700)
+            chunks.append(text[position:position + size])
+            position += size
+        
+        counts = {}
+        streamed = "".join(pii_tool.scrub_text_chunks(iter(chunks), config, counts))
+        
+        assert (streamed, counts) == pii_tool.scrub_text(text, config)
+
+
+def synthetic_transcript(size_bytes, seed=7):
+    """Meeting-transcript-like text with a PII item every few lines"""
+    rng = random.Random(seed)
+    words = "the team reviewed firewall rules patch cadence and incident response for the quarter".split()
+    pii = [
+        lambda i: f"mail analyst{i}@example.com",
+        lambda i: f"call (555) 201-{i % 10000:04d}",
+        lambda i: f"ssn 123-45-{i % 10000:04d}",
+        lambda i: f"host 10.0.{i % 256}.{i % 200}",
+        lambda i: f"key AKIA{i:016d}"
+    ]
+    lines = []
+    total = 0
+    i = 0
+    while total < size_bytes:
+        line = " ".join(rng.choice(words) for _ in range(14))
+        if i % 5 == 0:
+            line += " " + rng.choice(pii)(i)
+        lines.append(line)
+        total += len(line) + 1
+        i += 1
+    return "\n".join(lines)
+
+
+@pytest.mark.slow
+def test_scrub_throughput_benchmark():
+    tool = PIIScrubberTool(Mock())
+    config = tool.validate_scrub_config({})
+    # 1 MB by default; FULL_BENCHMARKS=1 scrubs a 4 MB transcript
+    text = synthetic_transcript((4 if os.getenv("FULL_BENCHMARKS") else 1) * 1024 * 1024)
+    megabytes = len(text) / (1024 * 1024)
+    
+    started = time.perf_counter()
+    expected = sequential_scrub(tool, text, config)
+    sequential_seconds = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    result = tool.scrub_text(text, config)
+    single_pass_seconds = time.perf_counter() - started
+    
+    chunks = (text[i:i + 64 * 1024] for i in range(0, len(text), 64 * 1024))
+    counts = {}
+    started = time.perf_counter()
+    streamed = "".join(tool.scrub_text_chunks(chunks, config, counts))
+    streamed_seconds = time.perf_counter() - started
+    
+    print(
+        f"\n{megabytes:.1f} MB, {sum(result[1].values())} redactions: "
+        f"per pattern {megabytes / sequential_seconds:.2f} MB/s, "
+        f"single pass {megabytes / single_pass_seconds:.2f} MB/s, "
+        f"streamed {megabytes / streamed_seconds:.2f} MB/s"
+    )
+    assert result == expected
+    assert (streamed, counts) == result
+    assert single_pass_seconds < sequential_seconds
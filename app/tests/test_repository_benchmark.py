@@ -0,0 +1,78 @@
+"""
+Micro-benchmark for repository secondary indexes.
+Compares indexed per-engagement reads with the previous full-collection
+scans at 100k records.
+
+Run with: pytest tests/test_repository_benchmark.py -m slow -s
+"""
+import pytest
+import time
+
+from domain.models import Assessment, Document, Engagement, Finding, Membership
+from domain.repository import InMemoryRepository
+
+RECORD_COUNT = 100_000
+ENGAGEMENT_COUNT = 1_000
+
+
+def _populate(repo: InMemoryRepository) -> None:
+    per_engagement = RECORD_COUNT // ENGAGEMENT_COUNT
+    for e in range(ENGAGEMENT_COUNT):
+        eid = f"e{e}"
+        repo.create_engagement(Engagement(id=eid, name=eid, created_by="lead@example.com"))
+        repo.add_membership(Membership(engagement_id=eid, user_email=f"User{e % 100}@Example.com"))
+        repo.create_assessment(Assessment(id=f"{eid}-a", name="A", engagement_id=eid))
+        repo.add_findings(f"{eid}-a", [
+            Finding(id=f"{eid}-f{i}", assessment_id=f"{eid}-a", title="F") for i in range(per_engagement)
+        ])
+        for i in range(per_engagement // 10):
+            repo.add_document(Document(
+                id=f"{eid}-d{i}", engagement_id=eid, filename="f", path="/nonexistent", uploaded_by="u"
+            ))
+
+
+# The pre-index implementations, kept here as the baseline
+def _scan_findings(repo, engagement_id):
+    engagement_assessment_ids = {a.id for a in repo.assessments.values() if a.engagement_id == engagement_id}
+    return [f for f in repo.findings.values() if f.assessment_id in engagement_assessment_ids]
+
+
+def _scan_documents(repo, engagement_id):
+    return [d for d in repo.documents.values() if d.engagement_id == engagement_id]
+
+
+def _scan_engagements_for_user(repo, user_email):
+    user_engagement_ids = {m.engagement_id for m in repo.memberships.values()
+                           if m.user_email.lower() == user_email.lower()}
+    return [e for e in repo.engagements.values() if e.id in user_engagement_ids]
+
+
+def _time_per_call(fn, *args, calls=20):
+    start = time.perf_counter()
+    for _ in range(calls):
+        result = fn(*args)
+    return (time.perf_counter() - start) / calls * 1000, result
+
+
+@pytest.mark.slow
+def test_indexed_reads_vs_scans():
+    repo = InMemoryRepository()
+    _populate(repo)
+
+    cases = [
+        ("get_findings", repo.get_findings, _scan_findings, "e500"),
+        ("list_documents", repo.list_documents, _scan_documents, "e500"),
+        ("engagements_for_user", lambda email: repo.list_engagements_for_user(email, admin=False),
+         _scan_engagements_for_user, "user7@example.com"),
+    ]
+
+    for name, indexed, scan, arg in cases:
+        indexed_ms, indexed_result = _time_per_call(indexed, arg)
+        scan_ms, scan_result = _time_per_call(scan, repo, arg)
+        print(
+            f"\n[repo] records={len(repo.findings):,} {name:<22} "
+            f"indexed={indexed_ms:.3f}ms scan={scan_ms:.3f}ms speedup={scan_ms / indexed_ms:,.0f}x"
+        )
+
+        assert {item.id for item in indexed_result} == {item.id for item in scan_result}
+        assert indexed_ms < scan_ms
@@ -0,0 +1,81 @@
+"""
+Tests for repository secondary indexes.
+Runs the same scenarios against FileRepository and InMemoryRepository.
+"""
+import pytest
+
+from domain.file_repo import FileRepository
+from domain.models import Assessment, Document, Engagement, Finding, Membership, Recommendation, RunLog
+from domain.repository import InMemoryRepository
+
+
+@pytest.fixture(params=["file", "memory"])
+def repo(request, tmp_path):
+    if request.param == "file":
+        return FileRepository(str(tmp_path))
+    return InMemoryRepository()
+
+
+def _seed(repo):
+    for eid in ("e1", "e2"):
+        repo.create_engagement(Engagement(id=eid, name=eid, created_by="lead@example.com"))
+        repo.create_assessment(Assessment(id=f"{eid}-a1", name="A1", engagement_id=eid))
+        repo.create_assessment(Assessment(id=f"{eid}-a2", name="A2", engagement_id=eid))
+        for aid in (f"{eid}-a1", f"{eid}-a2"):
+            repo.add_findings(aid, [Finding(id=f"{aid}-f", assessment_id=aid, title="F")])
+            repo.add_recommendations(aid, [Recommendation(id=f"{aid}-r", assessment_id=aid, title="R")])
+            repo.add_runlog(RunLog(assessment_id=aid, agent="DocAnalyzer"))
+    repo.add_membership(Membership(id="m1", engagement_id="e1", user_email="Alice@Example.com"))
+    repo.add_membership(Membership(id="m2", engagement_id="e2", user_email="alice@example.com"))
+
+
+class TestSecondaryIndexes:
+    """Test indexed reads return exactly the scoped records"""
+
+    def test_per_engagement_reads(self, repo):
+        _seed(repo)
+
+        assert {a.id for a in repo.list_assessments("e1")} == {"e1-a1", "e1-a2"}
+        assert {f.id for f in repo.get_findings("e1")} == {"e1-a1-f", "e1-a2-f"}
+        assert {r.id for r in repo.get_recommendations("e2")} == {"e2-a1-r", "e2-a2-r"}
+        assert {log.assessment_id for log in repo.get_runlogs("e2")} == {"e2-a1", "e2-a2"}
+        assert repo.get_findings("missing") == []
+
+    def test_membership_lookups_ignore_email_case(self, repo):
+        _seed(repo)
+
+        assert repo.get_membership("e1", "ALICE@example.com").id == "m1"
+        assert repo.get_membership("e1", "bob@example.com") is None
+        assert {e.id for e in repo.list_engagements_for_user("alice@EXAMPLE.com", admin=False)} == {"e1", "e2"}
+        with pytest.raises(ValueError):
+            repo.add_membership(Membership(engagement_id="e1", user_email="alice@example.com"))
+
+    def test_document_index_follows_delete(self, repo, tmp_path):
+        _seed(repo)
+        for i in range(3):
+            repo.add_document(Document(
+                id=f"d{i}", engagement_id="e1", filename=f"{i}.txt",
+                path=str(tmp_path / f"{i}.txt"), uploaded_by="lead@example.com"
+            ))
+
+        assert repo.delete_document("e1", "d1")
+        assert [d.id for d in repo.list_documents("e1")] == ["d0", "d2"]
+        assert repo.list_documents("e2") == []
+
+    def test_replacing_a_record_moves_it_between_keys(self, repo):
+        _seed(repo)
+        repo.add_findings("e2-a1", [Finding(id="e1-a1-f", assessment_id="e2-a1", title="Moved")])
+
+        assert {f.id for f in repo.get_findings("e1")} == {"e1-a2-f"}
+        assert "e1-a1-f" in {f.id for f in repo.get_findings("e2")}
+
+
+def test_file_repository_rebuilds_indexes_on_load(tmp_path):
+    repo = FileRepository(str(tmp_path))
+    _seed(repo)
+    repo.close()
+
+    reloaded = FileRepository(str(tmp_path))
+
+    assert {f.id for f in reloaded.get_findings("e1")} == {"e1-a1-f", "e1-a2-f"}
+    assert reloaded.get_membership("e2", "ALICE@example.com").id == "m2"
@@ -3,14 +3,18 @@ Tests for Service Bus implementation including in-memory queue and message seria
 """
 import pytest
 import asyncio
+import time
+import uuid
 from datetime import datetime, timezone
 from unittest.mock import patch, MagicMock
 
+from config import config
 from domain.models import ServiceBusMessage, QueueConfig
 from services.service_bus import (
     ServiceBusProducer, 
     ServiceBusConsumer, 
     InMemoryQueue,
+    get_local_queue,
     get_queue_statistics,
     retry
 )
@@ -131,7 +135,7 @@ class TestServiceBusProducer:
     async def test_send_message_in_memory(self, producer):
         """Test sending message using in-memory queue"""
         # Patch config to use in-memory mode
-        with patch('services.service_bus.config.service_bus.is_configured', return_value=False):
+        with patch('config.ServiceBusConfig.is_configured', return_value=False):
             result = await producer.send_message(
                 topic="test-topic",
                 message_type="test",
@@ -145,7 +149,7 @@ class TestServiceBusProducer:
     @pytest.mark.asyncio
     async def test_send_message_with_idempotency_key(self, producer):
         """Test sending message with idempotency key"""
-        with patch('services.service_bus.config.service_bus.is_configured', return_value=False):
+        with patch('config.ServiceBusConfig.is_configured', return_value=False):
             result = await producer.send_message(
                 topic="test-topic",
                 message_type="test",
@@ -289,7 +293,7 @@ class TestQueueStatistics:
     
     def test_queue_statistics_in_memory_mode(self):
         """Test getting queue statistics in in-memory mode"""
-        with patch('services.service_bus.config.service_bus.is_configured', return_value=False):
+        with patch('config.ServiceBusConfig.is_configured', return_value=False):
             stats = get_queue_statistics()
             
             assert stats["mode"] == "in_memory"
@@ -304,8 +308,189 @@ class TestQueueStatistics:
     
     def test_queue_statistics_azure_mode(self):
         """Test getting queue statistics in Azure Service Bus mode"""
-        with patch('services.service_bus.config.service_bus.is_configured', return_value=True):
+        with patch('config.ServiceBusConfig.is_configured', return_value=True):
             stats = get_queue_statistics()
             
             assert stats["mode"] == "azure_service_bus"
-            assert stats["status"] == "not_implemented"
\ No newline at end of file
+            assert stats["status"] == "not_implemented"
+
+
+async def _send(topic: str, count: int):
+    for i in range(count):
+        await get_local_queue().send_message(topic, ServiceBusMessage(type="test", payload={"n": i}))
+
+
+async def _consume_until(consumer, handler, done: asyncio.Event, **kwargs):
+    """Run consumer until done is set, then stop it and wait for it to drain"""
+    task = asyncio.create_task(consumer.start_listening(handler, **kwargs))
+    await asyncio.wait_for(done.wait(), timeout=5)
+    consumer.stop()
+    await asyncio.wait_for(task, timeout=5)
+
+
+class TestConsumerRuntime:
+    """Test the concurrent consumer runtime"""
+    
+    @pytest.fixture
+    def topic(self):
+        return f"test-{uuid.uuid4().hex[:8]}"
+    
+    @pytest.mark.asyncio
+    async def test_handlers_run_concurrently_up_to_limit(self, topic):
+        """Test max_concurrent_calls bounds parallel handlers"""
+        consumer = ServiceBusConsumer(topic)
+        running = peak = processed = 0
+        done = asyncio.Event()
+        
+        async def handler(message):
+            nonlocal running, peak, processed
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+            processed += 1
+            if processed == 12:
+                done.set()
+            return True
+        
+        await _send(topic, 12)
+        await _consume_until(consumer, handler, done, max_concurrent_calls=3, prefetch_count=2)
+        
+        assert peak == 3
+        assert consumer.metrics.messages_completed == 12
+        assert get_local_queue().get_queue_stats(topic)["locked_messages"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_idle_consumer_wakes_on_enqueue(self, topic):
+        """Test an idle consumer picks up new messages without polling delay"""
+        consumer = ServiceBusConsumer(topic)
+        done = asyncio.Event()
+        received_after = []
+        
+        async def handler(message):
+            received_after.append(time.perf_counter() - sent_at)
+            done.set()
+            return True
+        
+        task = asyncio.create_task(consumer.start_listening(handler, max_concurrent_calls=1))
+        await asyncio.sleep(0.05)
+        sent_at = time.perf_counter()
+        await _send(topic, 1)
+        await asyncio.wait_for(done.wait(), timeout=5)
+        consumer.stop()
+        await asyncio.wait_for(task, timeout=5)
+        
+        assert received_after[0] < 0.5
+    
+    @pytest.mark.asyncio
+    async def test_sync_handlers_do_not_block_the_loop(self, topic):
+        """Test blocking handlers run in worker threads"""
+        consumer = ServiceBusConsumer(topic)
+        done = asyncio.Event()
+        processed = []
+        loop = asyncio.get_running_loop()
+        
+        def handler(message):
+            time.sleep(0.1)
+            processed.append(message.id)
+            if len(processed) == 4:
+                loop.call_soon_threadsafe(done.set)
+            return True
+        
+        await _send(topic, 4)
+        started = time.perf_counter()
+        await _consume_until(consumer, handler, done, max_concurrent_calls=4)
+        
+        assert time.perf_counter() - started < 0.35
+    
+    @pytest.mark.asyncio
+    async def test_backpressure_and_prefetch_are_reported(self, topic):
+        """Test the receive loop stops pulling when handlers and prefetch are full"""
+        consumer = ServiceBusConsumer(topic)
+        done = asyncio.Event()
+        observed = []
+        
+        async def handler(message):
+            observed.append(consumer.metrics.to_dict())
+            await asyncio.sleep(0.01)
+            if len(observed) == 6:
+                done.set()
+            return True
+        
+        await _send(topic, 6)
+        await _consume_until(consumer, handler, done, max_concurrent_calls=1, prefetch_count=1)
+        
+        assert consumer.metrics.backpressure_waits >= 1
+        assert max(snapshot["prefetched"] for snapshot in observed) <= 1
+    
+    @pytest.mark.asyncio
+    async def test_lock_renewed_for_slow_handlers(self, topic):
+        """Test locks are renewed while a slow handler runs so the message is not redelivered"""
+        consumer = ServiceBusConsumer(topic)
+        consumer.lock_duration_seconds = 0.05
+        done = asyncio.Event()
+        calls = 0
+        
+        async def handler(message):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.15)
+            done.set()
+            return True
+        
+        await _send(topic, 1)
+        await _consume_until(consumer, handler, done, max_concurrent_calls=2)
+        
+        assert calls == 1
+        assert consumer.metrics.lock_renewals >= 2
+    
+    @pytest.mark.asyncio
+    async def test_failed_message_retried_then_dead_lettered(self, topic, monkeypatch):
+        """Test failures are requeued with backoff and finally dead-lettered"""
+        monkeypatch.setattr(config.service_bus, "retry_delay_seconds", 0.01)
+        consumer = ServiceBusConsumer(topic)
+        done = asyncio.Event()
+        attempts = 0
+        
+        async def handler(message):
+            nonlocal attempts
+            attempts += 1
+            if attempts == 3:
+                asyncio.get_running_loop().call_later(0.05, done.set)
+            return False
+        
+        await _send(topic, 1)
+        await _consume_until(consumer, handler, done, max_concurrent_calls=1)
+        
+        assert attempts == 3
+        assert consumer.metrics.messages_retried == 2
+        assert consumer.metrics.messages_dead_lettered == 1
+        assert get_local_queue().get_queue_stats(topic)["dead_letter_messages"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_base_consumer_awaits_async_handler(self):
+        """Test BaseConsumer handlers are awaited, so failures are counted"""
+        consumer = IngestConsumer()
+        topic = consumer.topic
+        done = asyncio.Event()
+        original = consumer.process_message
+        queue_stats = []
+        
+        async def process_message(message):
+            result = await original(message)
+            with patch('config.ServiceBusConfig.is_configured', return_value=False):
+                queue_stats.append(get_queue_statistics())
+            done.set()
+            return result
+        
+        consumer.process_message = process_message
+        await get_local_queue().send_message(topic, ServiceBusMessage(type="ingest", payload={}, max_retries=1))
+        task = asyncio.create_task(consumer.start(max_concurrent_calls=2))
+        await asyncio.wait_for(done.wait(), timeout=5)
+        consumer.stop()
+        await asyncio.wait_for(task, timeout=5)
+        
+        assert queue_stats[0]["ingest"]["consumers"][0]["active_handlers"] == 1
+        stats = consumer.get_statistics()
+        assert stats["statistics"]["messages_failed"] == 1
+        assert stats["runtime"]["messages_dead_lettered"] == 1
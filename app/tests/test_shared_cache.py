@@ -0,0 +1,202 @@
+"""
+Unit tests for the shared second-tier cache.
+Each CacheManager stands in for one gunicorn worker sharing a SQLite file.
+"""
+import pytest
+import asyncio
+
+import services.cache as cache_module
+from services.cache import CacheManager, invalidate_cache_key, invalidate_cache_tag
+from services.shared_cache import SQLiteSharedCache, create_shared_backend
+
+
+@pytest.fixture
+def workers(tmp_path):
+    path = str(tmp_path / "shared_cache.db")
+    managers = []
+    for _ in range(2):
+        manager = CacheManager()
+        manager.configure_shared_backend(SQLiteSharedCache(path))
+        managers.append(manager)
+    return managers
+
+
+def _counting_factory(value):
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        return value
+
+    return factory, calls
+
+
+class TestSharedTier:
+    """Test L2 reads and write-back across workers"""
+
+    @pytest.mark.asyncio
+    async def test_value_computed_once_across_workers(self, workers):
+        first, second = (w.get_cache("presets") for w in workers)
+        factory, calls = _counting_factory({"id": "p1"})
+
+        assert await first.get_or_set("preset_p1", factory) == {"id": "p1"}
+        assert await second.get_or_set("preset_p1", factory) == {"id": "p1"}
+
+        assert len(calls) == 1
+        assert second.get_metrics()["shared_hits"] == 1
+        # Later reads are served from the second worker's L1
+        assert await second.get("preset_p1") == {"id": "p1"}
+
+    @pytest.mark.asyncio
+    async def test_shared_hit_keeps_tags(self, workers):
+        first, second = (w.get_cache("docs") for w in workers)
+        factory, _ = _counting_factory([1, 2])
+
+        await first.get_or_set("docs_e1", factory, tags=["engagement:e1"])
+        await second.get_or_set("docs_e1", factory)
+
+        assert second._tag_index == {"engagement:e1": {"docs_e1"}}
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("value", [lambda: None, {"ids": ("a", "b")}, {1: "int key"}])
+    async def test_values_without_exact_json_form_stay_local(self, workers, value):
+        first, second = (w.get_cache("misc") for w in workers)
+        factory, calls = _counting_factory(value)
+
+        await first.get_or_set("value", factory)
+        assert await second.get_or_set("value", factory) is value
+
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_stored_values_are_never_unpickled(self, workers, tmp_path):
+        import pickle
+        import sqlite3
+
+        class Payload:
+            def __reduce__(self):
+                return (exec, ("raise SystemExit('unpickled')",))
+
+        conn = sqlite3.connect(str(tmp_path / "shared_cache.db"))
+        conn.execute(
+            "INSERT INTO shared_entries (cache_name, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            ("misc", "planted", pickle.dumps(Payload()), 4102444800)
+        )
+        conn.commit()
+        conn.close()
+
+        factory, calls = _counting_factory("computed")
+        assert await workers[0].get_cache("misc").get_or_set("planted", factory) == "computed"
+        assert len(calls) == 1
+
+
+class TestInvalidationChannel:
+    """Test invalidations propagate to other workers' L1"""
+
+    @pytest.mark.asyncio
+    async def test_tag_invalidation_reaches_other_worker(self, workers):
+        first, second = (w.get_cache("presets") for w in workers)
+        factory, calls = _counting_factory("v1")
+        await first.get_or_set("schema_p1", factory, tags=["preset:p1"])
+        await second.get_or_set("schema_p1", factory, tags=["preset:p1"])
+
+        await first.invalidate_by_tag("preset:p1")
+        assert await second.get("schema_p1") == "v1"
+
+        assert await workers[1].sync_invalidations() == 1
+        assert await second.get("schema_p1") is None
+        # The shared copy was removed too, so the next load recomputes
+        await second.get_or_set("schema_p1", factory, tags=["preset:p1"])
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_clear_and_key_delete_propagate(self, workers):
+        first, second = (w.get_cache("frameworks") for w in workers)
+        await second.set("a", 1)
+        await second.set("b", 2)
+
+        await first.delete("a")
+        await workers[1].sync_invalidations()
+        assert await second.get("a") is None
+        assert await second.get("b") == 2
+
+        await first.clear()
+        await workers[1].sync_invalidations()
+        assert await second.get("b") is None
+
+    @pytest.mark.asyncio
+    async def test_own_invalidations_are_not_reapplied(self, workers):
+        cache = workers[0].get_cache("presets")
+        await cache.delete("missing")
+
+        assert await workers[0].sync_invalidations() == 0
+        assert cache.get_metrics()["remote_invalidations"] == 0
+
+    @pytest.mark.asyncio
+    async def test_load_racing_invalidation_is_not_shared(self, workers):
+        first, second = (w.get_cache("presets") for w in workers)
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_factory():
+            started.set()
+            await release.wait()
+            return "old"
+
+        load = asyncio.create_task(first.get_or_set("preset_p1", slow_factory))
+        await started.wait()
+        await second.delete("preset_p1")
+        release.set()
+        await load
+
+        factory, calls = _counting_factory("new")
+        assert await second.get_or_set("preset_p1", factory) == "new"
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_unrelated_invalidation_does_not_block_write_back(self, workers):
+        first, second = (w.get_cache("presets") for w in workers)
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_factory():
+            started.set()
+            await release.wait()
+            return "v1"
+
+        load = asyncio.create_task(first.get_or_set("preset_p1", slow_factory, tags=["preset:p1"]))
+        await started.wait()
+        await second.delete("preset_p2")
+        await second.invalidate_by_tag("preset:p2")
+        release.set()
+        await load
+
+        factory, calls = _counting_factory("recomputed")
+        assert await second.get_or_set("preset_p1", factory) == "v1"
+        assert calls == []
+
+    @pytest.mark.asyncio
+    async def test_invalidation_without_local_cache_reaches_shared_tier(self, workers, monkeypatch):
+        # The first worker never created "presets", but the second and the shared tier hold entries
+        second = workers[1].get_cache("presets")
+        factory, calls = _counting_factory("v1")
+        await second.get_or_set("schema_p1", factory, tags=["preset:p1"])
+        await second.get_or_set("schema_p2", factory)
+        monkeypatch.setattr(cache_module, "cache_manager", workers[0])
+
+        assert await invalidate_cache_tag("presets", "preset:p1") == 0
+        assert await invalidate_cache_key("presets", "schema_p2") is False
+        assert "presets" not in workers[0]._caches
+
+        assert await workers[1].sync_invalidations() == 2
+        assert await second.get("schema_p1") is None
+        assert await second.get("schema_p2") is None
+        await workers[0].get_cache("presets").get_or_set("schema_p1", factory)
+        assert len(calls) == 3
+
+
+def test_backend_factory(tmp_path):
+    assert create_shared_backend("none", str(tmp_path / "x.db")) is None
+    assert isinstance(create_shared_backend("sqlite", str(tmp_path / "x.db")), SQLiteSharedCache)
+    with pytest.raises(ValueError):
+        create_shared_backend("memcached", str(tmp_path / "x.db"))
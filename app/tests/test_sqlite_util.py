@@ -0,0 +1,62 @@
+"""
+Unit tests for the shared SQLite connection helper.
+Tests that concurrent first use opens one connection and that a fork gets
+its own.
+"""
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import util.sqlite as sqlite_util
+from util.sqlite import ProcessConnection
+
+
+def test_concurrent_first_use_shares_one_connection(tmp_path, monkeypatch):
+    opened = []
+    connect = sqlite3.connect
+
+    def slow_connect(*args, **kwargs):
+        time.sleep(0.05)  # Widen the window between the pid check and the swap
+        return connect(*args, **kwargs)
+
+    monkeypatch.setattr(sqlite_util.sqlite3, "connect", slow_connect)
+    db = ProcessConnection(tmp_path / "store.db", on_open=lambda: opened.append(1))
+    start = threading.Barrier(8)
+
+    def first_use(_):
+        start.wait()
+        locked = db.connection()
+        return locked._conn, locked._lock
+
+    with ThreadPoolExecutor(8) as pool:
+        handles = list(pool.map(first_use, range(8)))
+
+    assert len(set(handles)) == 1
+    assert opened == [1]
+    db.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_forked_child_opens_its_own_connection(tmp_path):
+    db = ProcessConnection(tmp_path / "store.db")
+    with db.connection() as conn:
+        conn.execute("CREATE TABLE t (v INTEGER)")
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            with db.connection() as conn:
+                conn.execute("INSERT INTO t VALUES (1)")
+            os._exit(0 if db._conn_pid == os.getpid() else 1)
+        except BaseException:
+            os._exit(1)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+    db.close()
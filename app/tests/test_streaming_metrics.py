@@ -0,0 +1,176 @@
+"""
+Unit tests for streaming latency aggregates.
+Tests quantile accuracy, rotating time buckets, series caps, Prometheus
+exposition and PerformanceMonitor statistics, plus a query-cost benchmark.
+"""
+import random
+import statistics
+import time
+
+import pytest
+
+from services.performance import PerformanceMonitor, QueryMetrics, RequestMetrics
+from services.streaming_metrics import (
+    OVERFLOW_LABEL,
+    HistogramFamily,
+    LatencyHistogram,
+    RollingCounter,
+    RollingHistogram,
+    render_prometheus_summary
+)
+
+
+class TestLatencyHistogram:
+    """Test the log-binned histogram"""
+
+    def test_quantiles_within_two_percent(self):
+        rng = random.Random(7)
+        values = [rng.lognormvariate(3, 1) for _ in range(20000)]
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+
+        exact = statistics.quantiles(values, n=100)
+        p50, p95, p99 = histogram.quantiles((0.5, 0.95, 0.99))
+        for approximate, expected in ((p50, exact[49]), (p95, exact[94]), (p99, exact[98])):
+            assert abs(approximate - expected) / expected < 0.03
+        assert histogram.mean == pytest.approx(statistics.mean(values))
+        # Sparse bins: memory depends on the value range, not the sample count
+        assert len(histogram.bins) < 400
+
+    def test_quantiles_clamped_to_observed_range(self):
+        histogram = LatencyHistogram()
+        histogram.record(100.0)
+
+        assert histogram.quantiles((0.5, 0.99)) == [100.0, 100.0]
+        assert LatencyHistogram().quantiles((0.5,)) == [0.0]
+
+
+class TestRollingWindows:
+    """Test rotating time buckets"""
+
+    def test_old_buckets_leave_the_window(self):
+        rolling = RollingHistogram(bucket_seconds=60, bucket_count=10)
+        rolling.record(10.0, now=0)
+        rolling.record(20.0, now=300)
+        rolling.record(30.0, now=590)
+
+        assert rolling.snapshot(600, now=590).count == 3
+        assert rolling.snapshot(300, now=590).count == 2
+        assert rolling.snapshot(60, now=590).count == 1
+        # Bucket 0 is reused ten buckets later
+        rolling.record(40.0, now=600)
+        assert rolling.snapshot(3600, now=600).count == 3
+        assert rolling.count == 4
+
+    def test_counters_follow_the_window(self):
+        counter = RollingCounter(bucket_seconds=60, bucket_count=5)
+        counter.add("hits", 3, now=0)
+        counter.add("hits", 2, now=120)
+        counter.add("misses", now=120)
+
+        assert counter.totals(300, now=120) == {"hits": 5, "misses": 1}
+        assert counter.totals(60, now=120) == {"hits": 2, "misses": 1}
+        assert counter.totals(300, now=500) == {}
+
+    def test_series_beyond_cap_share_overflow_series(self):
+        family = HistogramFamily("latency", "test", ("method", "route"), max_series=2)
+        family.record(("GET", "/a"), 1.0)
+        family.record(("GET", "/b"), 1.0)
+        family.record(("GET", "/c"), 1.0)
+        family.record(("GET", "/d"), 1.0)
+
+        snapshot = family.snapshot(60)
+        assert set(snapshot) == {("GET", "/a"), ("GET", "/b"), (OVERFLOW_LABEL, OVERFLOW_LABEL)}
+        assert snapshot[(OVERFLOW_LABEL, OVERFLOW_LABEL)].count == 2
+
+
+class TestPrometheusExport:
+    """Test text exposition"""
+
+    def test_summary_format(self):
+        family = HistogramFamily("http_request_duration_seconds", "Latency", ("method", "route"))
+        for value in (100.0, 200.0, 300.0):
+            family.record(("GET", '/api/"x"'), value)
+
+        text = render_prometheus_summary(family, 300, scale=0.001)
+
+        assert "# TYPE http_request_duration_seconds summary" in text
+        median = next(line for line in text.splitlines() if 'quantile="0.5"' in line)
+        assert median.startswith('http_request_duration_seconds{method="GET",route="/api/\\"x\\"",quantile="0.5"} ')
+        assert float(median.split()[-1]) == pytest.approx(0.2, rel=0.02)
+        assert 'http_request_duration_seconds_sum{method="GET",route="/api/\\"x\\""} 0.6' in text
+        assert 'http_request_duration_seconds_count{method="GET",route="/api/\\"x\\""} 3' in text
+
+
+class TestPerformanceMonitor:
+    """Test statistics built from streaming aggregates"""
+
+    def test_statistics_and_percentiles_per_route(self):
+        monitor = PerformanceMonitor()
+        for i in range(100):
+            monitor.record_request_metrics(RequestMetrics(
+                method="GET", path="/api/engagements", status_code=200,
+                execution_time_ms=float(i + 1), cache_hits=1
+            ))
+        monitor.record_request_metrics(RequestMetrics(
+            method="POST", path="/api/documents", status_code=201,
+            execution_time_ms=monitor.config.slow_request_threshold_ms + 1, cache_misses=1
+        ))
+        monitor.record_query_metrics(QueryMetrics(query_type="list_engagements", execution_time_ms=12.0))
+
+        stats = monitor.get_performance_statistics(time_window_minutes=5)
+        assert stats.total_requests == 101
+        assert stats.slow_requests_count == 1
+        assert stats.total_db_queries == 1
+        assert stats.cache_hit_rate == pytest.approx(100 / 101 * 100)
+
+        percentiles = monitor.get_latency_percentiles(time_window_minutes=5)
+        route = percentiles["routes"]["GET /api/engagements"]
+        assert route.count == 100
+        assert route.p50_ms == pytest.approx(50, rel=0.03)
+        assert route.p99_ms == pytest.approx(99, rel=0.03)
+        assert percentiles["queries"]["list_engagements"].count == 1
+        assert monitor.get_slow_requests()[0].path == "/api/documents"
+
+        text = monitor.export_prometheus()
+        assert 'db_query_duration_seconds_count{query_type="list_engagements"} 1' in text
+
+        monitor.clear_metrics()
+        assert monitor.get_performance_statistics().total_requests == 0
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("sample_count", [60_000, 600_000])
+def test_statistics_query_cost(sample_count):
+    monitor = PerformanceMonitor()
+    rng = random.Random(1)
+    routes = [f"/api/route-{i}" for i in range(50)]
+
+    start = time.perf_counter()
+    for i in range(sample_count):
+        monitor.record_request_metrics(RequestMetrics(
+            method="GET", path=routes[i % len(routes)], status_code=200,
+            execution_time_ms=rng.lognormvariate(3, 1)
+        ))
+    record_us = (time.perf_counter() - start) / sample_count * 1e6
+
+    start = time.perf_counter()
+    for _ in range(10):
+        monitor.get_performance_statistics(time_window_minutes=60)
+    stats_ms = (time.perf_counter() - start) / 10 * 1000
+
+    start = time.perf_counter()
+    monitor.get_latency_percentiles(time_window_minutes=60)
+    percentiles_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    monitor.export_prometheus()
+    prometheus_ms = (time.perf_counter() - start) * 1000
+
+    print(
+        f"\n{sample_count} samples: record {record_us:.2f}us, statistics {stats_ms:.2f}ms, "
+        f"percentiles for {len(routes)} routes {percentiles_ms:.2f}ms, prometheus {prometheus_ms:.2f}ms"
+    )
+    # Query cost depends on buckets and bins, not on the number of samples
+    assert stats_ms < 50
@@ -0,0 +1,214 @@
+"""
+Unit tests for the in-process engagement vector index.
+Tests ranking parity with brute-force cosine similarity and index maintenance
+from the Cosmos embeddings repository.
+"""
+import pytest
+import random
+from unittest.mock import Mock, patch
+
+np = pytest.importorskip("numpy")
+
+from repos.vector_index import EngagementVectorIndex, VectorIndexRegistry
+from repos.cosmos_embeddings_repository import CosmosEmbeddingsRepository
+from domain.models import EmbeddingDocument
+
+
+def _item(item_id: str, vector, doc_id: str = "doc1", engagement_id: str = "eng-1"):
+    return {
+        "id": item_id,
+        "engagement_id": engagement_id,
+        "doc_id": doc_id,
+        "chunk_id": f"{doc_id}_{item_id}",
+        "vector": vector,
+        "text": f"text for {item_id}",
+    }
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    na = sum(x * x for x in a) ** 0.5
+    nb = sum(y * y for y in b) ** 0.5
+    return dot / (na * nb)
+
+
+@pytest.fixture
+def random_items():
+    rng = random.Random(42)
+    return [
+        _item(f"e{i}", [rng.uniform(-1, 1) for _ in range(16)], doc_id=f"doc{i % 5}")
+        for i in range(200)
+    ]
+
+
+class TestEngagementVectorIndex:
+    """Test index search and maintenance"""
+
+    def test_search_matches_brute_force(self, random_items):
+        index = EngagementVectorIndex("eng-1", initial_capacity=8)
+        assert index.upsert(random_items) == 200
+
+        query = random_items[7]["vector"]
+        expected = sorted(
+            ((item["id"], _cosine(query, item["vector"])) for item in random_items),
+            key=lambda pair: pair[1],
+            reverse=True
+        )[:10]
+
+        results = index.search(query, top_k=10, similarity_threshold=-1.0)
+
+        assert [payload["id"] for payload, _, _ in results] == [item_id for item_id, _ in expected]
+        for (_, _, score), (_, expected_score) in zip(results, expected):
+            assert score == pytest.approx(expected_score, abs=1e-5)
+
+    def test_search_returns_stored_vectors(self, random_items):
+        index = EngagementVectorIndex("eng-1", initial_capacity=8)
+        index.upsert(random_items)
+        index.remove_document("doc0")  # Swaps rows, which must carry their norms
+        stored = {item["id"]: item["vector"] for item in random_items}
+
+        for payload, vector, _ in index.search(random_items[1]["vector"], top_k=20, similarity_threshold=-1.0):
+            assert vector == pytest.approx(stored[payload["id"]], rel=1e-5, abs=1e-6)
+
+    def test_search_applies_threshold(self, random_items):
+        index = EngagementVectorIndex("eng-1")
+        index.upsert(random_items)
+
+        results = index.search(random_items[0]["vector"], top_k=50, similarity_threshold=0.5)
+
+        assert results
+        assert all(score >= 0.5 for _, _, score in results)
+        assert results[0][0]["id"] == "e0"
+
+    def test_upsert_replaces_existing_item(self):
+        index = EngagementVectorIndex("eng-1")
+        index.upsert([_item("a", [1.0, 0.0]), _item("b", [0.0, 1.0])])
+        index.upsert([_item("a", [0.0, 2.0])])
+
+        results = index.search([0.0, 1.0], top_k=5, similarity_threshold=0.9)
+
+        assert len(index) == 2
+        assert {payload["id"] for payload, _, _ in results} == {"a", "b"}
+
+    def test_remove_keeps_remaining_rows_searchable(self, random_items):
+        index = EngagementVectorIndex("eng-1")
+        index.upsert(random_items)
+
+        removed = index.remove_document("doc0")
+        results = index.search(random_items[1]["vector"], top_k=200, similarity_threshold=-1.0)
+
+        assert removed == 40
+        assert len(index) == 160
+        assert all(payload["doc_id"] != "doc0" for payload, _, _ in results)
+        assert results[0][0]["id"] == "e1"
+
+    def test_mismatched_dimensions_are_ignored(self):
+        index = EngagementVectorIndex("eng-1")
+        index.upsert([_item("a", [1.0, 0.0]), _item("b", [1.0, 0.0, 0.0])])
+
+        assert len(index) == 1
+        assert index.search([1.0, 0.0, 0.0], top_k=5, similarity_threshold=0.0) == []
+
+
+class TestVectorIndexRegistry:
+    """Test registry eviction and TTL"""
+
+    def test_lru_eviction(self):
+        registry = VectorIndexRegistry(max_engagements=2, ttl_seconds=0)
+        for engagement_id in ("a", "b"):
+            registry.put(EngagementVectorIndex(engagement_id))
+        registry.get("a")
+        registry.put(EngagementVectorIndex("c"))
+
+        assert registry.get("a") is not None
+        assert registry.get("b") is None
+        assert registry.get("c") is not None
+
+    def test_build_racing_a_write_is_not_registered(self):
+        registry = VectorIndexRegistry()
+        generation = registry.generation("a")
+        registry.record_write("a")
+
+        assert not registry.put(EngagementVectorIndex("a"), expected_generation=generation)
+        assert registry.get("a") is None
+        assert registry.put(EngagementVectorIndex("a"), expected_generation=registry.generation("a"))
+
+    def test_ttl_expiry(self):
+        registry = VectorIndexRegistry(ttl_seconds=10)
+        index = EngagementVectorIndex("a")
+        index.loaded_at -= 20
+        registry.put(index)
+
+        assert registry.get("a") is None
+
+
+class TestRepositoryIndexIntegration:
+    """Test that the repository keeps the warm index in sync"""
+
+    @pytest.fixture
+    def repository(self, random_items):
+        registry = VectorIndexRegistry()
+        container = Mock()
+        container.query_items.side_effect = lambda **kwargs: iter(
+            [item for item in random_items if "doc_id = @doc_id" not in kwargs["query"]
+             or item["doc_id"] == kwargs["parameters"][1]["value"]]
+        )
+
+        with patch.object(CosmosEmbeddingsRepository, "_initialize_client"), \
+             patch("repos.cosmos_embeddings_repository.get_vector_index_registry", return_value=registry), \
+             patch("repos.cosmos_embeddings_repository.config") as mock_config:
+            mock_config.rag.vector_index_enabled = True
+            mock_config.rag.vector_index_max_engagements = 4
+            mock_config.rag.vector_index_ttl_seconds = 300
+            mock_config.rag.search_top_k = 5
+            mock_config.rag.similarity_threshold = 0.1
+
+            repo = CosmosEmbeddingsRepository("test-correlation-id")
+            repo.container = container
+            yield repo
+
+    @pytest.mark.asyncio
+    async def test_search_loads_index_once(self, repository, random_items):
+        first = await repository.vector_search(random_items[3]["vector"], "eng-1", top_k=3)
+        second = await repository.vector_search(random_items[3]["vector"], "eng-1", top_k=3)
+
+        assert repository.container.query_items.call_count == 1
+        assert first[0].embedding_doc.id == "e3"
+        assert [r.embedding_doc.id for r in first] == [r.embedding_doc.id for r in second]
+
+    @pytest.mark.asyncio
+    async def test_store_and_delete_update_warm_index(self, repository, random_items):
+        await repository.vector_search(random_items[0]["vector"], "eng-1")
+
+        new_vector = [1.0] + [0.0] * 15
+        await repository.store_embeddings([EmbeddingDocument(
+            id="fresh", engagement_id="eng-1", doc_id="doc-new", chunk_id="doc-new_0",
+            vector=new_vector, text="fresh chunk"
+        )])
+        results = await repository.vector_search(new_vector, "eng-1", top_k=1)
+        assert results[0].embedding_doc.id == "fresh"
+
+        await repository.delete_embeddings_by_document("eng-1", "doc-new")
+        results = await repository.vector_search(new_vector, "eng-1", top_k=1)
+        assert results[0].embedding_doc.id != "fresh"
+
+    @pytest.mark.asyncio
+    async def test_write_during_cold_build_is_not_lost(self, repository, random_items):
+        query_items = repository.container.query_items.side_effect
+        new_vector = [1.0] + [0.0] * 15
+
+        def racing_query(**kwargs):
+            # A store lands after the build's query has read the partition
+            rows = list(query_items(**kwargs))
+            repository._update_vector_index([_item("fresh", new_vector, doc_id="doc-new")])
+            random_items.append(_item("fresh", new_vector, doc_id="doc-new"))
+            return iter(rows)
+
+        repository.container.query_items.side_effect = racing_query
+        first = await repository.vector_search(new_vector, "eng-1", top_k=1)
+        repository.container.query_items.side_effect = query_items
+        second = await repository.vector_search(new_vector, "eng-1", top_k=1)
+
+        assert first[0].embedding_doc.id != "fresh"
+        assert second[0].embedding_doc.id == "fresh"
+        assert repository.container.query_items.call_count == 2
@@ -297,6 +297,29 @@ class RAGMetricsLogger:
             success_rate=chunks_processed / total_chunks if total_chunks > 0 else 0
         )
     
+    def log_embedding_cache_operation(
+        self,
+        document_id: str,
+        lookups: int,
+        hits: int,
+        saved_tokens: int,
+        cache_hit_rate: float,
+        cache_saved_tokens: int
+    ):
+        """Log embedding cache lookup metrics"""
+        self.logger.info(
+            "Embedding cache lookup completed",
+            metric_type="embedding_cache",
+            document_id=document_id,
+            lookups=lookups,
+            hits=hits,
+            misses=lookups - hits,
+            saved_tokens=saved_tokens,
+            hit_rate=hits / lookups if lookups > 0 else 0,
+            cache_hit_rate=round(cache_hit_rate, 4),
+            cache_saved_tokens=cache_saved_tokens
+        )
+    
     def log_search_operation(
         self,
         engagement_id: str,
@@ -0,0 +1,82 @@
+"""
+Shared SQLite connection handling for the local stores
+
+The job queue, local message queue, shared cache tier, LLM response cache
+and embedding cache each keep one WAL-mode database on local disk that every
+worker on the host opens. Each process holds a single connection, used from
+asyncio.to_thread workers under a lock, and reopens it after a fork
+(gunicorn preload_app) since SQLite connections must not cross processes.
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+
+class LockedConnection:
+    """Serializes use of one sqlite3 connection across worker threads"""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._lock.acquire()
+        return self._conn
+
+    def __exit__(self, *exc_info) -> None:
+        self._lock.release()
+
+
+class ProcessConnection:
+    """
+    Per-process WAL-mode connection to one SQLite database
+
+    on_open runs whenever a new connection is opened, including after a
+    fork, for stores that keep per-process state tied to the connection.
+    """
+
+    # Guards the pid check, open and lock swap so threads using a store for
+    # the first time (e.g. right after fork) all get the same connection
+    _open_lock = threading.Lock()
+
+    def __init__(self, path: Union[str, Path], on_open: Optional[Callable[[], None]] = None):
+        self.path = Path(path)
+        self._on_open = on_open
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_pid: Optional[int] = None
+
+    def connection(self) -> LockedConnection:
+        """Connection for this process; reopened after fork"""
+        pid = os.getpid()
+        with self._open_lock:
+            if self._conn is None or self._conn_pid != pid:
+                conn = sqlite3.connect(
+                    str(self.path), timeout=10.0, isolation_level=None, check_same_thread=False
+                )
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn, self._conn_pid = conn, pid
+                self._lock = threading.Lock()
+                if self._on_open is not None:
+                    self._on_open()
+            return LockedConnection(self._conn, self._lock)
+
+    def close(self) -> None:
+        with self._open_lock:
+            # A connection inherited from the parent process belongs to the parent
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._conn_pid = None
+
+
+def _reset_open_lock() -> None:
+    # Another thread may have held the lock at fork time; the child starts clean
+    ProcessConnection._open_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_open_lock)
@@ -53,6 +53,7 @@ MCP_ENABLED = os.getenv("MCP_ENABLED", "false").lower() == "true"
 MAX_FILE_SIZE_MB = int(os.getenv("MCP_MAX_FILE_SIZE_MB", "10"))
 MAX_REQUEST_SIZE_MB = int(os.getenv("MCP_MAX_REQUEST_SIZE_MB", "50"))
 MAX_SEARCH_RESULTS = int(os.getenv("MCP_MAX_SEARCH_RESULTS", "20"))
+VECTOR_STORAGE_MODE = os.getenv("MCP_VECTOR_STORAGE_MODE", "mmap")  # mmap|sqlite
 
 # Global components
 tool_registry = McpToolRegistry()
@@ -61,7 +62,7 @@ security_validator = SecurityValidator(
     max_file_size_mb=MAX_FILE_SIZE_MB,
     max_request_size_mb=MAX_REQUEST_SIZE_MB
 )
-vector_store_manager = VectorStoreManager(data_root=MCP_DATA_ROOT)
+vector_store_manager = VectorStoreManager(data_root=MCP_DATA_ROOT, storage_mode=VECTOR_STORAGE_MODE)
 secret_redactor = SecretRedactor()
 
 class McpCallRequest(BaseModel):
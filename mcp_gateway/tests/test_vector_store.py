@@ -0,0 +1,118 @@
+"""
+Vector store tests for MCP Gateway
+"""
+
+import pytest
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from vector_store import (
+    EngagementVectorStore,
+    VectorStoreManager,
+    STORAGE_MODE_MMAP,
+    STORAGE_MODE_SQLITE,
+)
+
+class TestMmapVectorStore:
+    """Test memory-mapped vector storage mode"""
+
+    def setup_method(self):
+        """Set up test environment"""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.dim = 8
+        self.rng = np.random.default_rng(7)
+
+    def teardown_method(self):
+        """Clean up test environment"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _store(self, name: str, mode: str = STORAGE_MODE_MMAP) -> EngagementVectorStore:
+        path = self.temp_dir / name
+        path.mkdir(parents=True, exist_ok=True)
+        return EngagementVectorStore(path, self.dim, storage_mode=mode)
+
+    def _populate(self, *stores, count: int = 50):
+        vectors = self.rng.uniform(-1, 1, size=(count, self.dim)).tolist()
+        for i, vector in enumerate(vectors):
+            for store in stores:
+                store.add_vector(f"v{i}", f"text {i}", vector, {"index": i})
+        return vectors
+
+    def test_mmap_search_matches_sqlite_mode(self):
+        """Test mmap ranking and scores match the SQLite scan"""
+        mmap_store = self._store("mmap")
+        sqlite_store = self._store("sqlite", STORAGE_MODE_SQLITE)
+        vectors = self._populate(mmap_store, sqlite_store)
+
+        expected = sqlite_store.search(vectors[3], top_k=10)
+        actual = mmap_store.search(vectors[3], top_k=10)
+
+        assert [r.id for r in actual] == [r.id for r in expected]
+        for a, e in zip(actual, expected):
+            assert a.score == pytest.approx(e.score, abs=1e-5)
+            assert a.metadata == e.metadata
+            assert a.text == e.text
+
+    def test_replace_and_delete_tombstone_rows(self):
+        """Test replaced and deleted vectors are excluded from results"""
+        store = self._store("mmap")
+        vectors = self._populate(store, count=10)
+
+        store.add_vector("v0", "replaced", vectors[5], {"replaced": True})
+        assert store.delete_vector("v5")
+
+        results = store.search(vectors[5], top_k=3)
+        assert results[0].id == "v0"
+        assert results[0].text == "replaced"
+        assert "v5" not in [r.id for r in results]
+        assert store.count_vectors() == 9
+
+    def test_compaction_reclaims_tombstones(self):
+        """Test compaction shrinks the matrix file to live rows"""
+        store = self._store("mmap")
+        vectors = self._populate(store, count=20)
+
+        for i in range(15):
+            store.delete_vector(f"v{i}")
+
+        row_bytes = self.dim * 4
+        assert store.matrix_path.stat().st_size <= 20 * row_bytes
+        store.compact()
+        assert store.matrix_path.stat().st_size == 5 * row_bytes
+        assert store.search(vectors[17], top_k=1)[0].id == "v17"
+
+    def test_reopen_and_migrate_legacy_store(self):
+        """Test a store written in sqlite mode is rebuilt when opened as mmap"""
+        legacy = self._store("legacy", STORAGE_MODE_SQLITE)
+        vectors = self._populate(legacy, count=12)
+
+        reopened = EngagementVectorStore(legacy.store_path, self.dim, storage_mode=STORAGE_MODE_MMAP)
+
+        assert reopened.matrix_path.exists()
+        assert reopened.search(vectors[4], top_k=1)[0].id == "v4"
+
+    def test_other_instance_sees_mutations(self):
+        """Test stores sharing a path reload the slot table on change"""
+        first = self._store("shared")
+        second = EngagementVectorStore(first.store_path, self.dim)
+        vectors = self._populate(first, count=5)
+
+        assert second.search(vectors[2], top_k=1)[0].id == "v2"
+        first.delete_vector("v2")
+        assert "v2" not in [r.id for r in second.search(vectors[2], top_k=5)]
+
+    def test_clear_resets_matrix(self):
+        """Test clearing the store removes all vectors"""
+        store = self._store("mmap")
+        vectors = self._populate(store, count=5)
+
+        assert store.clear() == 5
+        assert store.search(vectors[0], top_k=5) == []
+
+    def test_manager_rejects_unknown_mode(self):
+        """Test invalid storage modes are rejected"""
+        with pytest.raises(ValueError):
+            VectorStoreManager(str(self.temp_dir), storage_mode="redis")
@@ -18,6 +18,13 @@ from security import SecurityValidator, PathSecurityError
 
 logger = logging.getLogger(__name__)
 
+# Storage modes for engagement vector stores
+STORAGE_MODE_SQLITE = "sqlite"  # embeddings read from SQLite BLOBs on every search
+STORAGE_MODE_MMAP = "mmap"      # pre-normalized float32 rows in a memory-mapped file
+
+# Fraction of tombstoned rows that triggers compaction of the mmap file
+COMPACTION_TOMBSTONE_RATIO = 0.25
+
 @dataclass
 class VectorEntry:
     """Represents a vector entry in the store"""
@@ -38,8 +45,12 @@ class SearchResult:
 class VectorStoreManager:
     """Manages vector stores for embeddings and search"""
     
-    def __init__(self, data_root: str):
+    def __init__(self, data_root: str, storage_mode: str = STORAGE_MODE_MMAP):
+        if storage_mode not in (STORAGE_MODE_SQLITE, STORAGE_MODE_MMAP):
+            raise ValueError(f"Unknown vector storage mode: {storage_mode}")
+        
         self.data_root = Path(data_root)
+        self.storage_mode = storage_mode
         self.stores: Dict[str, 'EngagementVectorStore'] = {}
         
         # Mock embedding function for demo (in production, use real embeddings)
@@ -52,7 +63,9 @@ class VectorStoreManager:
             store_path = self.data_root / engagement_id / "mcp_index"
             store_path.mkdir(parents=True, exist_ok=True)
             
-            self.stores[engagement_id] = EngagementVectorStore(store_path, self.embedding_dim)
+            self.stores[engagement_id] = EngagementVectorStore(
+                store_path, self.embedding_dim, storage_mode=self.storage_mode
+            )
         
         return self.stores[engagement_id]
     
@@ -88,15 +101,36 @@ class VectorStoreManager:
         return embedding
 
 class EngagementVectorStore:
-    """Vector store for a specific engagement"""
+    """Vector store for a specific engagement
     
-    def __init__(self, store_path: Path, embedding_dim: int):
+    SQLite always holds the authoritative id, text, metadata and raw embedding.
+    In mmap mode the embeddings are additionally kept as contiguous,
+    pre-normalized float32 rows in ``vectors.f32``. Rows are append-only:
+    replaced and deleted vectors leave tombstoned slots that are reclaimed by
+    compaction, and the ``vector_slots`` table maps live slots to ids.
+    """
+    
+    def __init__(self, store_path: Path, embedding_dim: int, storage_mode: str = STORAGE_MODE_MMAP):
         self.store_path = store_path
         self.embedding_dim = embedding_dim
+        self.storage_mode = storage_mode
         self.db_path = store_path / "vectors.db"
+        self.matrix_path = store_path / "vectors.f32"
+        
+        # In-memory view of the mmap file, refreshed when the generation changes
+        self._row_bytes = embedding_dim * np.dtype(np.float32).itemsize
+        self._matrix: Optional[np.memmap] = None
+        self._row_count = 0
+        self._live = np.zeros(0, dtype=bool)
+        self._slot_ids: List[Optional[str]] = []
+        self._id_slots: Dict[str, int] = {}
+        self._generation: Optional[int] = None
         
         # Initialize SQLite database
         self._init_db()
+        
+        if self.storage_mode == STORAGE_MODE_MMAP:
+            self._load_mmap()
     
     def _init_db(self):
         """Initialize SQLite database for vector storage"""
@@ -113,8 +147,213 @@ class EngagementVectorStore:
             conn.execute("""
                 CREATE INDEX IF NOT EXISTS idx_created_at ON vectors(created_at)
             """)
+            if self.storage_mode == STORAGE_MODE_MMAP:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS vector_slots (
+                        slot INTEGER PRIMARY KEY,
+                        id TEXT NOT NULL UNIQUE
+                    )
+                """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS store_meta (
+                        key TEXT PRIMARY KEY,
+                        value INTEGER NOT NULL
+                    )
+                """)
+                conn.execute("INSERT OR IGNORE INTO store_meta (key, value) VALUES ('generation', 0)")
             conn.commit()
     
+    # ------------------------------------------------------------------
+    # mmap storage internals
+    # ------------------------------------------------------------------
+    
+    def _normalize(self, embedding: List[float]) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 row"""
+        row = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(row))
+        if norm > 0:
+            row = row / norm
+        return row.astype(np.float32, copy=False)
+    
+    def _bump_generation(self, conn: sqlite3.Connection) -> int:
+        conn.execute("UPDATE store_meta SET value = value + 1 WHERE key = 'generation'")
+        return conn.execute("SELECT value FROM store_meta WHERE key = 'generation'").fetchone()[0]
+    
+    def _read_generation(self, conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT value FROM store_meta WHERE key = 'generation'").fetchone()[0]
+    
+    def _remap(self):
+        """Map the matrix file read-only at its current length"""
+        size = self.matrix_path.stat().st_size if self.matrix_path.exists() else 0
+        self._row_count = size // self._row_bytes
+        if self._row_count == 0:
+            self._matrix = None
+        else:
+            self._matrix = np.memmap(
+                str(self.matrix_path), dtype=np.float32, mode="r",
+                shape=(self._row_count, self.embedding_dim)
+            )
+    
+    def _load_mmap(self):
+        """Load slot mapping from SQLite, rebuilding the matrix file if inconsistent"""
+        with sqlite3.connect(str(self.db_path)) as conn:
+            self._generation = self._read_generation(conn)
+            slots = conn.execute("SELECT slot, id FROM vector_slots").fetchall()
+            vector_count = conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        
+        self._remap()
+        
+        # Slots pointing past the file, or vectors without slots (legacy
+        # stores created in sqlite mode), require a rebuild from SQLite
+        if len(slots) != vector_count or any(slot >= self._row_count for slot, _ in slots):
+            logger.info(
+                "Rebuilding mmap vector file from SQLite",
+                extra={"store_path": str(self.store_path), "vectors": vector_count}
+            )
+            self.compact()
+            return
+        
+        self._apply_slots(slots)
+    
+    def _apply_slots(self, slots: List[Tuple[int, str]]):
+        self._live = np.zeros(self._row_count, dtype=bool)
+        self._slot_ids = [None] * self._row_count
+        self._id_slots = {}
+        for slot, id in slots:
+            self._live[slot] = True
+            self._slot_ids[slot] = id
+            self._id_slots[id] = slot
+    
+    def _refresh_if_stale(self):
+        """Reload the slot mapping if another store instance mutated the files"""
+        with sqlite3.connect(str(self.db_path)) as conn:
+            generation = self._read_generation(conn)
+        if generation != self._generation:
+            self._load_mmap()
+    
+    def _append_row(self, row: np.ndarray) -> int:
+        """Append a row to the matrix file and return its slot"""
+        with open(self.matrix_path, "ab") as f:
+            offset = f.tell()
+            if offset % self._row_bytes:
+                # Drop a torn trailing row left by an interrupted append
+                f.truncate(offset - offset % self._row_bytes)
+                offset = f.tell()
+            f.write(row.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        return offset // self._row_bytes
+    
+    def _tombstone(self, id: str):
+        slot = self._id_slots.pop(id, None)
+        if slot is not None and slot < len(self._live):
+            self._live[slot] = False
+            self._slot_ids[slot] = None
+    
+    def _maybe_compact(self):
+        live_count = len(self._id_slots)
+        tombstones = self._row_count - live_count
+        if tombstones and tombstones >= COMPACTION_TOMBSTONE_RATIO * self._row_count:
+            self.compact()
+    
+    def compact(self) -> int:
+        """
+        Rewrite the mmap file with only live vectors.
+        
+        The new file is written alongside and atomically swapped in before the
+        slot table is replaced, so an interrupted compaction is repaired by
+        the consistency check on the next load.
+        
+        Returns:
+            Number of tombstoned rows reclaimed
+        """
+        if self.storage_mode != STORAGE_MODE_MMAP:
+            return 0
+        
+        previous_rows = self._row_count
+        tmp_path = self.matrix_path.with_suffix(".f32.tmp")
+        slots: List[Tuple[int, str]] = []
+        
+        with sqlite3.connect(str(self.db_path)) as conn:
+            with open(tmp_path, "wb") as f:
+                cursor = conn.execute("SELECT id, embedding FROM vectors ORDER BY created_at, id")
+                for slot, (id, embedding_bytes) in enumerate(cursor):
+                    f.write(self._normalize(np.frombuffer(embedding_bytes, dtype=np.float32)).tobytes())
+                    slots.append((slot, id))
+                f.flush()
+                os.fsync(f.fileno())
+            
+            self._matrix = None
+            os.replace(tmp_path, self.matrix_path)
+            
+            conn.execute("DELETE FROM vector_slots")
+            conn.executemany("INSERT INTO vector_slots (slot, id) VALUES (?, ?)", slots)
+            self._generation = self._bump_generation(conn)
+            conn.commit()
+        
+        self._remap()
+        self._apply_slots(slots)
+        
+        reclaimed = max(previous_rows - len(slots), 0)
+        logger.debug(
+            "Compacted mmap vector file",
+            extra={"store_path": str(self.store_path), "live": len(slots), "reclaimed": reclaimed}
+        )
+        return reclaimed
+    
+    def _search_mmap(self, query_array: np.ndarray, top_k: int) -> List[SearchResult]:
+        self._refresh_if_stale()
+        
+        live_count = len(self._id_slots)
+        if live_count == 0 or top_k <= 0:
+            return []
+        
+        query_norm = float(np.linalg.norm(query_array))
+        if query_norm == 0:
+            query_array = np.zeros_like(query_array)
+        else:
+            query_array = query_array / query_norm
+        
+        # Single zero-copy matmul over the mapped rows; tombstones sink to -inf
+        scores = np.asarray(self._matrix @ query_array, dtype=np.float32)
+        scores[~self._live] = -np.inf
+        
+        k = min(top_k, live_count)
+        if k < self._row_count:
+            top_slots = np.argpartition(scores, self._row_count - k)[self._row_count - k:]
+        else:
+            top_slots = np.arange(self._row_count)
+        top_slots = top_slots[np.argsort(scores[top_slots])[::-1]][:k]
+        
+        ranked = [(self._slot_ids[slot], float(scores[slot])) for slot in top_slots]
+        ids = [id for id, _ in ranked]
+        
+        # Decode text and metadata for the hits only
+        placeholders = ",".join("?" * len(ids))
+        with sqlite3.connect(str(self.db_path)) as conn:
+            rows = {
+                row[0]: row for row in conn.execute(
+                    f"SELECT id, text, metadata FROM vectors WHERE id IN ({placeholders})", ids
+                )
+            }
+        
+        results = []
+        for id, score in ranked:
+            row = rows.get(id)
+            if row is None:
+                continue
+            results.append(SearchResult(
+                id=id,
+                text=row[1],
+                score=score,
+                metadata=json.loads(row[2])
+            ))
+        return results
+    
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    
     def add_vector(self, id: str, text: str, embedding: List[float], metadata: Dict[str, Any]) -> None:
         """Add vector to store"""
         if len(embedding) != self.embedding_dim:
@@ -126,12 +365,33 @@ class EngagementVectorStore:
         # Convert embedding to bytes
         embedding_bytes = np.array(embedding, dtype=np.float32).tobytes()
         
+        if self.storage_mode == STORAGE_MODE_MMAP:
+            self._refresh_if_stale()
+            # Append before committing so a crash leaves at most an orphan row
+            slot = self._append_row(self._normalize(embedding))
+        
         with sqlite3.connect(str(self.db_path)) as conn:
             conn.execute("""
                 INSERT OR REPLACE INTO vectors (id, text, embedding, metadata, created_at)
                 VALUES (?, ?, ?, ?, ?)
             """, (id, text, embedding_bytes, json.dumps(metadata), created_at))
+            if self.storage_mode == STORAGE_MODE_MMAP:
+                conn.execute("INSERT OR REPLACE INTO vector_slots (slot, id) VALUES (?, ?)", (slot, id))
+                self._generation = self._bump_generation(conn)
             conn.commit()
+        
+        if self.storage_mode == STORAGE_MODE_MMAP:
+            self._tombstone(id)
+            self._remap()
+            if len(self._live) < self._row_count:
+                grown = np.zeros(self._row_count, dtype=bool)
+                grown[:len(self._live)] = self._live
+                self._live = grown
+                self._slot_ids.extend([None] * (self._row_count - len(self._slot_ids)))
+            self._live[slot] = True
+            self._slot_ids[slot] = id
+            self._id_slots[id] = slot
+            self._maybe_compact()
     
     def search(self, query_embedding: List[float], top_k: int = 10) -> List[SearchResult]:
         """Search for similar vectors"""
@@ -140,6 +400,9 @@ class EngagementVectorStore:
         
         query_array = np.array(query_embedding, dtype=np.float32)
         
+        if self.storage_mode == STORAGE_MODE_MMAP:
+            return self._search_mmap(query_array, top_k)
+        
         results = []
         
         with sqlite3.connect(str(self.db_path)) as conn:
@@ -199,8 +462,17 @@ class EngagementVectorStore:
         """Delete vector by ID"""
         with sqlite3.connect(str(self.db_path)) as conn:
             cursor = conn.execute("DELETE FROM vectors WHERE id = ?", (id,))
+            deleted = cursor.rowcount > 0
+            if self.storage_mode == STORAGE_MODE_MMAP and deleted:
+                conn.execute("DELETE FROM vector_slots WHERE id = ?", (id,))
+                self._generation = self._bump_generation(conn)
             conn.commit()
-            return cursor.rowcount > 0
+        
+        if self.storage_mode == STORAGE_MODE_MMAP and deleted:
+            self._tombstone(id)
+            self._maybe_compact()
+        
+        return deleted
     
     def list_vectors(self, limit: int = 100, offset: int = 0) -> List[VectorEntry]:
         """List vectors in store"""
@@ -237,5 +509,16 @@ class EngagementVectorStore:
         """Clear all vectors from store"""
         with sqlite3.connect(str(self.db_path)) as conn:
             cursor = conn.execute("DELETE FROM vectors")
+            cleared = cursor.rowcount
+            if self.storage_mode == STORAGE_MODE_MMAP:
+                conn.execute("DELETE FROM vector_slots")
+                self._generation = self._bump_generation(conn)
             conn.commit()
-            return cursor.rowcount
\ No newline at end of file
+        
+        if self.storage_mode == STORAGE_MODE_MMAP:
+            self._matrix = None
+            self.matrix_path.unlink(missing_ok=True)
+            self._remap()
+            self._apply_slots([])
+        
+        return cleared
\ No newline at end of file
@@ -1,13 +1,14 @@
 import os, json, time, glob, logging
-import requests
 import asyncio
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
 
 from common.models import Project, Report
 from mcp_client import create_mcp_client, IMcpClient, generate_correlation_id
 from mcp_connectors import create_mcp_connectors, MCPConnectors
+from pipeline import AgentClient, PipelineExecutor, Stage, StageResult, STAGE_OK
 
 DATA_DIR = os.environ.get("DATA_DIR", "/app/data")
 
@@ -18,6 +19,30 @@ PRIORITIZE   = os.environ.get("PRIORITIZATION_URL","http://localhost:8141")
 ROADMAP      = os.environ.get("ROADMAP_URL",      "http://localhost:8151")
 REPORT       = os.environ.get("REPORT_URL",       "http://localhost:8161")
 
+# Agent calls: pooled connections, default per-call timeout and circuit breakers
+AGENT_TIMEOUT_SECONDS = float(os.environ.get("AGENT_TIMEOUT_SECONDS", "30"))
+AGENT_MAX_CONNECTIONS = int(os.environ.get("AGENT_MAX_CONNECTIONS", "50"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("CIRCUIT_RESET_SECONDS", "30"))
+
+# Documentation analysis is fanned out in batches of documents
+DOC_BATCH_SIZE = int(os.environ.get("DOC_BATCH_SIZE", "20"))
+DOC_ANALYZER_CONCURRENCY = int(os.environ.get("DOC_ANALYZER_CONCURRENCY", "8"))
+
+# Whole-stage timeouts in seconds, e.g. "documentation_analysis=180,report=120"
+STAGE_TIMEOUTS: Dict[str, float] = {
+    "documentation_analysis": 120.0,
+    "gap_analysis": 60.0,
+    "initiatives": 60.0,
+    "prioritization": 60.0,
+    "roadmap": 60.0,
+    "report": 120.0,
+}
+for _item in os.environ.get("STAGE_TIMEOUTS", "").split(","):
+    _name, _, _seconds = _item.partition("=")
+    if _name.strip() and _seconds.strip():
+        STAGE_TIMEOUTS[_name.strip()] = float(_seconds)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,66 +53,125 @@ app = FastAPI(title="AI Orchestrator", version="0.1.0")
 mcp_client: IMcpClient = create_mcp_client()
 mcp_enabled = os.environ.get("MCP_ENABLED", "false").lower() == "true"
 mcp_connectors: MCPConnectors = create_mcp_connectors(mcp_client)
+agents = AgentClient(
+    mcp_client,
+    mcp_enabled=mcp_enabled,
+    timeout_seconds=AGENT_TIMEOUT_SECONDS,
+    max_connections=AGENT_MAX_CONNECTIONS,
+    failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout_seconds=CIRCUIT_RESET_SECONDS
+)
 
 def _project_path(project_id: str) -> str:
     return os.path.join(DATA_DIR, "projects", project_id)
 
-async def _call_service_or_mcp(service_url: str, endpoint: str, payload: Dict[str, Any], 
-                              mcp_tool: str, engagement_id: str, corr_id: str) -> Dict[str, Any]:
+def _load_documents(pdir: str, project: Project) -> List[Dict[str, str]]:
+    docs_dir = os.path.join(pdir, "docs")
+    doc_texts = []
+    if os.path.exists(docs_dir):
+        for doc in project.documents:
+            # prefer stored content; fallback to reading file
+            if doc.content:
+                doc_texts.append({"filename": doc.filename, "content": doc.content})
+            else:
+                fpath = os.path.join(docs_dir, doc.filename)
+                if os.path.exists(fpath):
+                    try:
+                        with open(fpath, "r", encoding="utf-8", errors="ignore") as ftxt:
+                            doc_texts.append({"filename": doc.filename, "content": ftxt.read()})
+                    except Exception:
+                        pass
+    return doc_texts
+
+def build_pipeline(
+    project: Project,
+    doc_texts: List[Dict[str, str]],
+    engagement_id: str,
+    corr_id: str,
+    client: Optional[AgentClient] = None
+) -> PipelineExecutor:
     """
-    Call either MCP tool or fallback to direct service call.
-    
-    Args:
-        service_url: Direct service URL for fallback
-        endpoint: Service endpoint path
-        payload: Request payload
-        mcp_tool: MCP tool name
-        engagement_id: Engagement ID for tracking
-        corr_id: Correlation ID for logging
-        
-    Returns:
-        Service response with optional mcp_call_id
+    Agent calls as a DAG:
+
+        documentation_analysis -> gap_analysis -> initiatives -> prioritization -> roadmap
+        report (after documentation_analysis, gap_analysis, prioritization, roadmap)
     """
-    if mcp_enabled:
-        try:
-            logger.info(
-                f"Attempting MCP call for {mcp_tool}",
-                extra={"corr_id": corr_id, "engagement_id": engagement_id}
-            )
-            result = await mcp_client.call(mcp_tool, payload, engagement_id)
-            logger.info(
-                f"MCP call successful for {mcp_tool}",
-                extra={
-                    "corr_id": corr_id, 
-                    "engagement_id": engagement_id,
-                    "mcp_call_id": result.get("mcp_call_id")
-                }
-            )
-            return result
-        except Exception as e:
-            logger.warning(
-                f"MCP call failed for {mcp_tool}, falling back to direct service",
-                extra={
-                    "corr_id": corr_id,
-                    "engagement_id": engagement_id,
-                    "error": str(e)
-                }
-            )
-    
-    # Fallback to direct service call
-    logger.info(
-        f"Using direct service call for {endpoint}",
-        extra={"corr_id": corr_id, "engagement_id": engagement_id}
-    )
-    
-    response = requests.post(f"{service_url}/{endpoint}", json=payload)
-    response.raise_for_status()
-    result = response.json()
-    
-    # Add tracking field to indicate direct service call
-    result["mcp_call_id"] = None
-    
-    return result
+    client = client or agents
+
+    async def documentation_analysis(_: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        # Per-document batches run concurrently; evidence keeps document order
+        slots = asyncio.Semaphore(max(1, DOC_ANALYZER_CONCURRENCY))
+        batch_size = max(1, DOC_BATCH_SIZE)
+        batches = [doc_texts[i:i + batch_size] for i in range(0, len(doc_texts), batch_size)] or [[]]
+
+        async def analyze_batch(batch: List[Dict[str, str]]) -> Dict[str, Any]:
+            async with slots:
+                return await client.call(
+                    DOC_ANALYZER, "analyze",
+                    {"documents": batch},
+                    "analyze_documents", engagement_id, corr_id
+                )
+
+        results = await asyncio.gather(*[analyze_batch(batch) for batch in batches])
+        return {
+            "evidence": [item for result in results for item in result.get("evidence", [])],
+            "batches": len(batches)
+        }
+
+    async def gap_analysis(done: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        return await client.call(
+            GAP_ANALYSIS, "analyze",
+            {"standard": project.standard, "evidence": done["documentation_analysis"]["evidence"]},
+            "gap_analysis", engagement_id, corr_id
+        )
+
+    async def initiatives(done: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        return await client.call(
+            INITIATIVE, "generate",
+            {"gaps": done["gap_analysis"]["gaps"]},
+            "initiative_generation", engagement_id, corr_id
+        )
+
+    async def prioritization(done: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        return await client.call(
+            PRIORITIZE, "prioritize",
+            {"initiatives": done["initiatives"]["initiatives"]},
+            "prioritization", engagement_id, corr_id
+        )
+
+    async def roadmap(done: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        return await client.call(
+            ROADMAP, "plan",
+            {"prioritized": done["prioritization"]["prioritized"]},
+            "roadmap_planning", engagement_id, corr_id
+        )
+
+    async def report(done: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        return await client.call(
+            REPORT, "generate",
+            {
+                "project_id": project.project_id,
+                "project_name": project.name,
+                "standard": project.standard,
+                "evidence": done["documentation_analysis"]["evidence"],
+                "gaps": done["gap_analysis"]["gaps"],
+                "initiatives": done["prioritization"]["prioritized"],
+                "roadmap": done["roadmap"]["roadmap"]
+            },
+            "report_generation", engagement_id, corr_id
+        )
+
+    stages = [
+        Stage("documentation_analysis", documentation_analysis),
+        Stage("gap_analysis", gap_analysis, ("documentation_analysis",)),
+        Stage("initiatives", initiatives, ("gap_analysis",)),
+        Stage("prioritization", prioritization, ("initiatives",)),
+        Stage("roadmap", roadmap, ("prioritization",)),
+        Stage("report", report, ("documentation_analysis", "gap_analysis", "prioritization", "roadmap")),
+    ]
+    for stage in stages:
+        stage.timeout_seconds = STAGE_TIMEOUTS.get(stage.name)
+    return PipelineExecutor(stages)
 
 
 class OrchestrateRequest(BaseModel):
@@ -98,8 +182,7 @@ class OrchestrateRequest(BaseModel):
 def health():
     return {"ok": True}
 
-@app.post("/orchestrate/analyze")
-async def orchestrate(req: OrchestrateRequest):
+async def _prepare(req: OrchestrateRequest):
     # Generate correlation ID for request tracking
     corr_id = generate_correlation_id()
     engagement_id = req.engagement_id or f"eng_{req.project_id[:8]}"
@@ -122,77 +205,36 @@ async def orchestrate(req: OrchestrateRequest):
     with open(pjson, "r", encoding="utf-8") as f:
         project = Project.model_validate_json(f.read())
 
-    # 1) Documentation Analyzer over all docs
-    docs_dir = os.path.join(pdir, "docs")
-    doc_texts = []
-    if os.path.exists(docs_dir):
-        for doc in project.documents:
-            # prefer stored content; fallback to reading file
-            if doc.content:
-                doc_texts.append({"filename": doc.filename, "content": doc.content})
-            else:
-                fpath = os.path.join(docs_dir, doc.filename)
-                if os.path.exists(fpath):
-                    try:
-                        with open(fpath, "r", encoding="utf-8", errors="ignore") as ftxt:
-                            doc_texts.append({"filename": doc.filename, "content": ftxt.read()})
-                    except Exception:
-                        pass
+    doc_texts = await asyncio.to_thread(_load_documents, pdir, project)
+    return corr_id, engagement_id, pdir, project, doc_texts
 
-    # Call Documentation Analyzer via MCP or direct service
-    da = await _call_service_or_mcp(
-        DOC_ANALYZER, "analyze", 
-        {"documents": doc_texts},
-        "analyze_documents", engagement_id, corr_id
-    )
+async def _complete(
+    req: OrchestrateRequest,
+    corr_id: str,
+    engagement_id: str,
+    pdir: str,
+    results: Dict[str, StageResult]
+) -> Dict[str, Any]:
+    failed = [r.summary() for r in results.values() if r.status != STAGE_OK]
+    if failed:
+        logger.error(
+            "Orchestration failed",
+            extra={"corr_id": corr_id, "engagement_id": engagement_id, "stages": failed}
+        )
+        raise HTTPException(502, {"message": "Orchestration failed", "stages": failed, "correlation_id": corr_id})
 
-    # 2) Gap Analysis via MCP or direct service
-    gaps = await _call_service_or_mcp(
-        GAP_ANALYSIS, "analyze",
-        {"standard": project.standard, "evidence": da.get("evidence", [])},
-        "gap_analysis", engagement_id, corr_id
-    )
-
-    # 3) Initiatives via MCP or direct service
-    inits = await _call_service_or_mcp(
-        INITIATIVE, "generate",
-        {"gaps": gaps["gaps"]},
-        "initiative_generation", engagement_id, corr_id
-    )
-
-    # 4) Prioritization via MCP or direct service
-    prio = await _call_service_or_mcp(
-        PRIORITIZE, "prioritize",
-        {"initiatives": inits["initiatives"]},
-        "prioritization", engagement_id, corr_id
-    )
-
-    # 5) Roadmap via MCP or direct service
-    road = await _call_service_or_mcp(
-        ROADMAP, "plan",
-        {"prioritized": prio["prioritized"]},
-        "roadmap_planning", engagement_id, corr_id
-    )
-
-    # 6) Report via MCP or direct service
-    rep = await _call_service_or_mcp(
-        REPORT, "generate",
-        {
-            "project_id": project.project_id,
-            "project_name": project.name,
-            "standard": project.standard,
-            "evidence": da.get("evidence", []),
-            "gaps": gaps["gaps"],
-            "initiatives": prio["prioritized"],
-            "roadmap": road["roadmap"]
-        },
-        "report_generation", engagement_id, corr_id
-    )
+    da = results["documentation_analysis"].output
+    gaps = results["gap_analysis"].output
+    prio = results["prioritization"].output
+    rep = results["report"].output
 
     # Persist report
-    with open(os.path.join(pdir, "report.json"), "w", encoding="utf-8") as f:
-        json.dump(rep, f, indent=2)
+    def write_report():
+        with open(os.path.join(pdir, "report.json"), "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=2)
+    await asyncio.to_thread(write_report)
 
+    stages = [r.summary() for r in results.values()]
     logger.info(
         "Orchestration completed",
         extra={
@@ -201,7 +243,8 @@ async def orchestrate(req: OrchestrateRequest):
             "project_id": req.project_id,
             "evidence_count": len(da.get("evidence", [])),
             "gaps_count": len(gaps["gaps"]),
-            "initiatives_count": len(prio["prioritized"])
+            "initiatives_count": len(prio["prioritized"]),
+            "stage_latency_ms": {stage["stage"]: stage["latency_ms"] for stage in stages}
         }
     )
 
@@ -212,7 +255,36 @@ async def orchestrate(req: OrchestrateRequest):
             "gaps": len(gaps["gaps"]), 
             "initiatives": len(prio["prioritized"])
         },
+        "stages": stages,
         "mcp_enabled": mcp_enabled,
         "engagement_id": engagement_id,
         "correlation_id": corr_id
     }
+
+@app.post("/orchestrate/analyze")
+async def orchestrate(req: OrchestrateRequest):
+    corr_id, engagement_id, pdir, project, doc_texts = await _prepare(req)
+    results = await build_pipeline(project, doc_texts, engagement_id, corr_id).run()
+    return await _complete(req, corr_id, engagement_id, pdir, results)
+
+@app.post("/orchestrate/analyze/stream")
+async def orchestrate_stream(req: OrchestrateRequest):
+    """Same pipeline, streamed as NDJSON: one line per finished stage, then the outcome."""
+    corr_id, engagement_id, pdir, project, doc_texts = await _prepare(req)
+
+    async def events():
+        results: Dict[str, StageResult] = {}
+        async for result in build_pipeline(project, doc_texts, engagement_id, corr_id).stream():
+            results[result.stage] = result
+            yield json.dumps({"event": "stage", **result.summary(), "output": result.output}) + "\n"
+        try:
+            outcome = await _complete(req, corr_id, engagement_id, pdir, results)
+            yield json.dumps({"event": "completed", **outcome}) + "\n"
+        except HTTPException as e:
+            yield json.dumps({"event": "failed", **e.detail}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.on_event("shutdown")
+async def shutdown():
+    await agents.aclose()
@@ -0,0 +1,324 @@
+"""DAG pipeline executor and pooled agent client for the orchestrator service."""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from mcp_client import IMcpClient
+
+
+logger = logging.getLogger(__name__)
+
+STAGE_OK = "ok"
+STAGE_FAILED = "failed"
+STAGE_SKIPPED = "skipped"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open."""
+
+
+class PipelineDefinitionError(Exception):
+    """Raised for unknown dependencies or dependency cycles."""
+
+
+@dataclass(frozen=True, eq=False)
+class CallPermit:
+    """Returned by CircuitBreaker.allow() for a call it lets through."""
+    trial: bool = False
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After failure_threshold failures in a row the circuit opens and calls
+    fail fast for reset_timeout_seconds. Then one trial call is let through
+    (half-open): success closes the circuit, failure opens it again. Only the
+    call holding the trial's permit can end the trial.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial: Optional[CallPermit] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> Optional[CallPermit]:
+        """A permit for the call, or None if it must fail fast."""
+        state = self.state
+        if state == "closed":
+            return CallPermit()
+        if state == "half_open" and self._trial is None:
+            self._trial = CallPermit(trial=True)
+            return self._trial
+        return None
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        # A closed circuit has no trial to wait on
+        self._trial = None
+
+    def record_failure(self, permit: Optional[CallPermit] = None) -> None:
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.release(permit)
+
+    def release(self, permit: Optional[CallPermit]) -> None:
+        """End the half-open trial if permit is the trial's, whatever its outcome."""
+        if permit is not None and permit is self._trial:
+            self._trial = None
+
+
+class AgentClient:
+    """
+    Calls agent services through the MCP Gateway or directly over HTTP.
+
+    Direct calls share one pooled httpx.AsyncClient and each service URL has
+    its own circuit breaker, so a failing agent is not hammered by every
+    concurrent orchestration.
+    """
+
+    def __init__(
+        self,
+        mcp_client: IMcpClient,
+        mcp_enabled: bool = False,
+        timeout_seconds: float = 30.0,
+        max_connections: int = 50,
+        failure_threshold: int = 5,
+        reset_timeout_seconds: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.mcp_client = mcp_client
+        self.mcp_enabled = mcp_enabled
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._http = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout_seconds, connect=5.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport
+        )
+
+    def breaker(self, service_url: str) -> CircuitBreaker:
+        if service_url not in self.breakers:
+            self.breakers[service_url] = CircuitBreaker(self.failure_threshold, self.reset_timeout_seconds)
+        return self.breakers[service_url]
+
+    async def call(
+        self,
+        service_url: str,
+        endpoint: str,
+        payload: Dict[str, Any],
+        mcp_tool: str,
+        engagement_id: str,
+        corr_id: str,
+        timeout_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Call either MCP tool or fallback to direct service call.
+
+        Args:
+            service_url: Direct service URL for fallback
+            endpoint: Service endpoint path
+            payload: Request payload
+            mcp_tool: MCP tool name
+            engagement_id: Engagement ID for tracking
+            corr_id: Correlation ID for logging
+            timeout_seconds: Overrides the client timeout for this call
+
+        Returns:
+            Service response with optional mcp_call_id
+
+        Raises:
+            CircuitOpenError: If the service has failed repeatedly
+            httpx.HTTPError: If the direct call fails or times out
+        """
+        if self.mcp_enabled:
+            try:
+                logger.info(
+                    f"Attempting MCP call for {mcp_tool}",
+                    extra={"corr_id": corr_id, "engagement_id": engagement_id}
+                )
+                result = await self.mcp_client.call(mcp_tool, payload, engagement_id)
+                logger.info(
+                    f"MCP call successful for {mcp_tool}",
+                    extra={
+                        "corr_id": corr_id,
+                        "engagement_id": engagement_id,
+                        "mcp_call_id": result.get("mcp_call_id")
+                    }
+                )
+                return result
+            except Exception as e:
+                logger.warning(
+                    f"MCP call failed for {mcp_tool}, falling back to direct service",
+                    extra={
+                        "corr_id": corr_id,
+                        "engagement_id": engagement_id,
+                        "error": str(e)
+                    }
+                )
+
+        # Fallback to direct service call
+        breaker = self.breaker(service_url)
+        permit = breaker.allow()
+        if permit is None:
+            raise CircuitOpenError(f"Circuit open for {service_url}")
+
+        logger.info(
+            f"Using direct service call for {endpoint}",
+            extra={"corr_id": corr_id, "engagement_id": engagement_id}
+        )
+        try:
+            response = await self._http.post(
+                f"{service_url}/{endpoint}",
+                json=payload,
+                headers={"X-Correlation-ID": corr_id},
+                timeout=timeout_seconds if timeout_seconds is not None else httpx.USE_CLIENT_DEFAULT
+            )
+            response.raise_for_status()
+            result = response.json()
+        except (httpx.HTTPError, ValueError):
+            # Slow agents trip too: the per-call timeout raises httpx.TimeoutException
+            breaker.record_failure(permit)
+            raise
+        else:
+            breaker.record_success()
+        finally:
+            # Cancellation or an unexpected error says nothing about the agent's
+            # health, but must not leave a half-open circuit waiting on a trial
+            breaker.release(permit)
+
+        # Add tracking field to indicate direct service call
+        result["mcp_call_id"] = None
+
+        return result
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+# A stage receives the outputs of every stage finished so far
+StageFn = Callable[[Dict[str, Dict[str, Any]]], Awaitable[Dict[str, Any]]]
+
+
+@dataclass
+class Stage:
+    """One node of the pipeline DAG."""
+    name: str
+    run: StageFn
+    depends_on: Tuple[str, ...] = ()
+    timeout_seconds: Optional[float] = None
+
+
+@dataclass
+class StageResult:
+    """Outcome of a stage, emitted as soon as the stage finishes."""
+    stage: str
+    status: str
+    latency_ms: float = 0.0
+    output: Optional[Dict[str, Any]] = field(default=None, repr=False)
+    error: Optional[str] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "status": self.status,
+            "latency_ms": round(self.latency_ms, 2),
+            "error": self.error
+        }
+
+
+class PipelineExecutor:
+    """
+    Runs stages as soon as their dependencies have finished.
+
+    Independent stages run concurrently. A failed or timed-out stage marks
+    everything downstream of it as skipped; unrelated branches keep going.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        self._check_graph()
+
+    def _check_graph(self) -> None:
+        for stage in self.stages.values():
+            unknown = [dep for dep in stage.depends_on if dep not in self.stages]
+            if unknown:
+                raise PipelineDefinitionError(f"Stage '{stage.name}' depends on unknown stages {unknown}")
+
+        # Kahn's algorithm: every stage must become ready eventually
+        remaining = {name: set(stage.depends_on) for name, stage in self.stages.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise PipelineDefinitionError(f"Dependency cycle between stages {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    async def _run_stage(self, stage: Stage, outputs: Dict[str, Dict[str, Any]]) -> StageResult:
+        start = time.perf_counter()
+        try:
+            output = await asyncio.wait_for(stage.run(dict(outputs)), stage.timeout_seconds)
+            return StageResult(stage.name, STAGE_OK, (time.perf_counter() - start) * 1000, output=output)
+        except asyncio.TimeoutError:
+            error = f"timed out after {stage.timeout_seconds}s"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return StageResult(stage.name, STAGE_FAILED, (time.perf_counter() - start) * 1000, error=error)
+
+    async def stream(self) -> AsyncIterator[StageResult]:
+        """Yield each stage's result in completion order."""
+        outputs: Dict[str, Dict[str, Any]] = {}
+        finished: Dict[str, str] = {}
+        running: Dict[asyncio.Task, str] = {}
+        waiting = dict(self.stages)
+
+        try:
+            while waiting or running:
+                for name, stage in list(waiting.items()):
+                    if any(finished.get(dep) in (STAGE_FAILED, STAGE_SKIPPED) for dep in stage.depends_on):
+                        del waiting[name]
+                        finished[name] = STAGE_SKIPPED
+                        yield StageResult(name, STAGE_SKIPPED, error="upstream stage did not complete")
+                    elif all(finished.get(dep) == STAGE_OK for dep in stage.depends_on):
+                        del waiting[name]
+                        running[asyncio.create_task(self._run_stage(stage, outputs))] = name
+
+                if not running:
+                    # Skips above may have unblocked further skips
+                    continue
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    del running[task]
+                    result = task.result()
+                    finished[result.stage] = result.status
+                    if result.status == STAGE_OK:
+                        outputs[result.stage] = result.output
+                    yield result
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def run(self) -> Dict[str, StageResult]:
+        """Run the whole pipeline and return results by stage name."""
+        return {result.stage: result async for result in self.stream()}
@@ -0,0 +1,253 @@
+"""Tests for the DAG pipeline executor, agent client and batched document analysis.
+
+Agents are in-process stubs behind httpx.MockTransport with configurable
+latency. The 200-document benchmark is marked slow:
+
+    pytest test_pipeline.py -m slow -s
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from urllib.parse import urlparse
+
+import httpx
+import pytest
+
+# Orchestrator modules and the shared common package
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import main
+from common.models import Document, Project
+from mcp_client import MockMcpClient
+from pipeline import (
+    AgentClient, CircuitBreaker, CircuitOpenError, PipelineDefinitionError,
+    PipelineExecutor, Stage, STAGE_FAILED, STAGE_OK, STAGE_SKIPPED
+)
+
+
+class StubAgents:
+    """Stand-in for the six agent services, routed by port."""
+
+    def __init__(self, base_latency: float = 0.0, per_doc_latency: float = 0.0):
+        self.base_latency = base_latency
+        self.per_doc_latency = per_doc_latency
+        self.calls = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.failing_ports = set()
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        port = urlparse(str(request.url)).port
+        self.calls[port] = self.calls.get(port, 0) + 1
+        if port in self.failing_ports:
+            return httpx.Response(503, json={"detail": "unavailable"})
+
+        body = json.loads(request.content)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            docs = body.get("documents", [])
+            await asyncio.sleep(self.base_latency + self.per_doc_latency * len(docs))
+            if port == 8111:
+                evidence = [{"control": "ID.AM-1", "description": d["filename"], "confidence": 0.7} for d in docs]
+                return httpx.Response(200, json={"evidence": evidence})
+            if port == 8121:
+                return httpx.Response(200, json={"gaps": [{"control": "PR.AC-1", "rationale": "missing"}]})
+            if port == 8131:
+                return httpx.Response(200, json={"initiatives": [{"title": "Enforce MFA"}]})
+            if port == 8141:
+                return httpx.Response(200, json={"prioritized": [{"title": "Enforce MFA", "rank": 1}]})
+            if port == 8151:
+                return httpx.Response(200, json={"roadmap": [{"title": "Enforce MFA", "quarter": "Q1"}]})
+            return httpx.Response(200, json={"project_id": body["project_id"], "summary_markdown": "# Report"})
+        finally:
+            self.in_flight -= 1
+
+    def client(self, **kwargs) -> AgentClient:
+        return AgentClient(MockMcpClient(), transport=httpx.MockTransport(self.handle), **kwargs)
+
+
+def make_project(doc_count: int) -> tuple:
+    project = Project(
+        name="Bench",
+        documents=[Document(filename=f"doc{i}.txt", content=f"asset inventory {i}") for i in range(doc_count)]
+    )
+    docs = [{"filename": d.filename, "content": d.content} for d in project.documents]
+    return project, docs
+
+
+def sleeper(seconds: float, output=None, fail: bool = False):
+    async def run(_):
+        await asyncio.sleep(seconds)
+        if fail:
+            raise RuntimeError("boom")
+        return output or {}
+    return run
+
+
+class TestPipelineExecutor:
+
+    @pytest.mark.asyncio
+    async def test_independent_stages_run_concurrently(self):
+        executor = PipelineExecutor([
+            Stage("a", sleeper(0.1)),
+            Stage("b", sleeper(0.1)),
+            Stage("c", sleeper(0.0), ("a", "b")),
+        ])
+        start = time.perf_counter()
+        results = await executor.run()
+        assert time.perf_counter() - start < 0.18
+        assert all(r.status == STAGE_OK for r in results.values())
+        assert list(results)[-1] == "c"
+
+    @pytest.mark.asyncio
+    async def test_failure_skips_downstream_only(self):
+        executor = PipelineExecutor([
+            Stage("a", sleeper(0.0, fail=True)),
+            Stage("b", sleeper(0.0), ("a",)),
+            Stage("c", sleeper(0.0), ("b",)),
+            Stage("d", sleeper(0.01)),
+        ])
+        results = await executor.run()
+        assert results["a"].status == STAGE_FAILED
+        assert "boom" in results["a"].error
+        assert results["b"].status == results["c"].status == STAGE_SKIPPED
+        assert results["d"].status == STAGE_OK
+
+    @pytest.mark.asyncio
+    async def test_stage_timeout(self):
+        results = await PipelineExecutor([Stage("slow", sleeper(1.0), timeout_seconds=0.05)]).run()
+        assert results["slow"].status == STAGE_FAILED
+        assert "timed out" in results["slow"].error
+        assert results["slow"].latency_ms < 500
+
+    def test_invalid_graphs_are_rejected(self):
+        with pytest.raises(PipelineDefinitionError):
+            PipelineExecutor([Stage("a", sleeper(0), ("missing",))])
+        with pytest.raises(PipelineDefinitionError):
+            PipelineExecutor([Stage("a", sleeper(0), ("b",)), Stage("b", sleeper(0), ("a",))])
+
+
+class TestAgentClient:
+
+    def test_circuit_breaker_opens_and_recovers(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=0.05)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open" and not breaker.allow()
+        time.sleep(0.06)
+        assert breaker.allow()  # one trial call
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    def test_only_the_trial_call_ends_the_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout_seconds=0)
+        earlier = breaker.allow()  # Started while the circuit was closed
+        breaker.record_failure()
+        trial = breaker.allow()
+        assert trial.trial and not earlier.trial
+
+        # The earlier call finishing neither frees nor ends the trial
+        breaker.record_failure(earlier)
+        breaker.release(earlier)
+        assert breaker.state == "half_open" and breaker.allow() is None
+
+        breaker.release(trial)
+        assert breaker.allow() is not None
+
+    @pytest.mark.asyncio
+    async def test_failing_agent_trips_its_circuit(self):
+        stubs = StubAgents()
+        stubs.failing_ports.add(8121)
+        client = stubs.client(failure_threshold=2, reset_timeout_seconds=60)
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.call(main.GAP_ANALYSIS, "analyze", {}, "gap_analysis", "eng", "corr")
+        with pytest.raises(CircuitOpenError):
+            await client.call(main.GAP_ANALYSIS, "analyze", {}, "gap_analysis", "eng", "corr")
+        assert stubs.calls[8121] == 2
+        # Other agents are unaffected
+        result = await client.call(main.INITIATIVE, "generate", {"gaps": []}, "initiative_generation", "eng", "corr")
+        assert result["mcp_call_id"] is None
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_trial_does_not_wedge_half_open_circuit(self):
+        stubs = StubAgents(base_latency=10)
+        client = stubs.client(failure_threshold=1, reset_timeout_seconds=0)
+        breaker = client.breaker(main.GAP_ANALYSIS)
+        breaker.record_failure()
+        assert breaker.state == "half_open"
+
+        call = asyncio.create_task(client.call(main.GAP_ANALYSIS, "analyze", {}, "gap_analysis", "eng", "corr"))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+        # Not counted as a failure, and the next trial is let through
+        assert breaker.failures == 1
+        assert breaker.allow()
+        await client.aclose()
+
+
+class TestOrchestrationPipeline:
+
+    @pytest.mark.asyncio
+    async def test_documents_are_analyzed_in_ordered_batches(self, monkeypatch):
+        monkeypatch.setattr(main, "DOC_BATCH_SIZE", 20)
+        stubs = StubAgents(per_doc_latency=0.001)
+        client = stubs.client()
+        project, docs = make_project(45)
+
+        stages = []
+        async for result in main.build_pipeline(project, docs, "eng", "corr", client).stream():
+            stages.append(result.stage)
+            assert result.status == STAGE_OK
+
+        assert stages == ["documentation_analysis", "gap_analysis", "initiatives", "prioritization", "roadmap", "report"]
+        assert stubs.calls[8111] == 3
+        results = await main.build_pipeline(project, docs, "eng", "corr", client).run()
+        evidence = results["documentation_analysis"].output["evidence"]
+        assert [e["description"] for e in evidence] == [d["filename"] for d in docs]
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_failed_agent_skips_report(self):
+        stubs = StubAgents()
+        stubs.failing_ports.add(8141)
+        client = stubs.client()
+        project, docs = make_project(3)
+        results = await main.build_pipeline(project, docs, "eng", "corr", client).run()
+
+        assert results["prioritization"].status == STAGE_FAILED
+        assert results["roadmap"].status == results["report"].status == STAGE_SKIPPED
+        assert 8161 not in stubs.calls
+        await client.aclose()
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_200_document_latency(monkeypatch):
+    """End-to-end latency for 200 documents: one analyzer payload vs concurrent batches."""
+    project, docs = make_project(200)
+    timings = {}
+    for label, batch_size in (("single payload", 10_000), ("batched", 20)):
+        monkeypatch.setattr(main, "DOC_BATCH_SIZE", batch_size)
+        stubs = StubAgents(base_latency=0.05, per_doc_latency=0.005)
+        client = stubs.client()
+        start = time.perf_counter()
+        results = await main.build_pipeline(project, docs, "eng", "corr", client).run()
+        timings[label] = time.perf_counter() - start
+        assert results["report"].status == STAGE_OK
+        stage_ms = {name: round(r.latency_ms) for name, r in results.items()}
+        print(f"\n{label}: {timings[label]:.2f}s, peak analyzer calls {stubs.peak_in_flight}, stages {stage_ms}")
+        await client.aclose()
+
+    assert timings["batched"] < timings["single payload"] / 2